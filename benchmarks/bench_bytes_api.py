@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+内存接口性能基准
+
+对比上传服务的两种处理方式（输入和输出都是内存中的编码数据）：
+- file:   写入临时文件 → process_single_image → 读回输出文件（原先的做法）
+- bytes:  ImageProcessor.process_bytes 直接处理，不经过文件系统
+
+两种方式共用同一个处理器，字体和水印层缓存对两者同样有效。
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageFilter
+
+from src.core.config import Config, WatermarkType
+from src.core.image_processor import ImageProcessor
+
+
+def make_upload(width: int, height: int, output_format: str) -> bytes:
+    """生成类照片的合成图片并编码"""
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 40).filter(ImageFilter.GaussianBlur(1))
+    image = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    buffer = io.BytesIO()
+    image.save(buffer, format=output_format, quality=90)
+    return buffer.getvalue()
+
+
+def via_files(processor: ImageProcessor, data: bytes, temp_dir: str, suffix: str) -> bytes:
+    input_path = os.path.join(temp_dir, 'upload' + suffix)
+    output_path = os.path.join(temp_dir, 'result' + suffix)
+    with open(input_path, 'wb') as f:
+        f.write(data)
+    success, message = processor.process_single_image(
+        input_path, output_path, quality=processor.config.config.output_quality
+    )
+    if not success:
+        raise RuntimeError(message)
+    with open(output_path, 'rb') as f:
+        result = f.read()
+    os.remove(input_path)
+    os.remove(output_path)
+    return result
+
+
+def time_call(func, iterations):
+    """重复执行并返回平均耗时（毫秒）"""
+    total = 0.0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        total += time.perf_counter() - start
+    return total / iterations * 1000
+
+
+def run(sizes, iterations: int, temp_root: str):
+    config = Config()
+    config.config.watermark_type = WatermarkType.TEXT
+    config.config.text_watermark.text = '© PhotoWatermark'
+    processor = ImageProcessor(config)
+
+    print(f"迭代: {iterations}  临时目录: {temp_root or tempfile.gettempdir()}")
+    print(f"{'size':>11} {'format':<6} {'KB':>8} {'file(ms)':>10} {'bytes(ms)':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory(dir=temp_root) as temp_dir:
+        for width, height in sizes:
+            for output_format, suffix in (('JPEG', '.jpg'), ('PNG', '.png')):
+                config.config.output_format = output_format
+                data = make_upload(width, height, output_format)
+                # 预热字体和水印层缓存
+                processor.process_bytes(data)
+                file_ms = time_call(lambda: via_files(processor, data, temp_dir, suffix), iterations)
+                bytes_ms = time_call(lambda: processor.process_bytes(data), iterations)
+                print(f"{width:>5}x{height:<5} {output_format:<6} {len(data) / 1024:>8.1f} "
+                      f"{file_ms:>10.1f} {bytes_ms:>10.1f} {file_ms / bytes_ms:>7.2f}x")
+
+
+def parse_size(value: str):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="内存接口与文件路径的性能对比")
+    parser.add_argument('--sizes', nargs='+', type=parse_size,
+                        default=[(640, 480), (1920, 1080), (4000, 3000)],
+                        help='图片尺寸，如 1920x1080')
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--temp-dir', default=None,
+                        help='临时文件所在目录（默认系统临时目录；可指定实际磁盘而非tmpfs）')
+    args = parser.parse_args()
+    run(args.sizes, args.iterations, args.temp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+编码配置档性能基准
+
+对每种输出格式和编码配置档，测量编码耗时与输出字节数。
+输入为合成的类照片图像（渐变 + 噪声），先以JPEG编码一次作为源图，
+以便 keep-source-quality 配置档可以沿用源量化表。
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from src.core.config import EncoderProfile
+from src.core import encoder
+
+
+def make_source_jpeg(width: int, height: int, quality: int) -> bytes:
+    """生成类照片的合成源图并编码为JPEG"""
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 40).filter(ImageFilter.GaussianBlur(1))
+    image = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+
+    draw = ImageDraw.Draw(image)
+    for i in range(0, width, max(1, width // 12)):
+        draw.ellipse((i, height // 3, i + width // 10, height // 3 + width // 10), fill=(200, 80, 40))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def run(width: int, height: int, quality: int, iterations: int):
+    source_bytes = make_source_jpeg(width, height, 85)
+
+    print(f"源图: {width}x{height} JPEG ({len(source_bytes) / 1024:.1f} KB)  质量参数: {quality}  迭代: {iterations}")
+    print(f"{'format':<6} {'profile':<20} {'encode(ms)':>11} {'bytes':>10} {'KB/s':>10}")
+
+    with Image.open(io.BytesIO(source_bytes)) as source:
+        source_encoding = encoder.get_source_encoding(source)
+        source.load()
+        image = source.copy()
+
+    for output_format in encoder.OUTPUT_FORMATS:
+        for profile in EncoderProfile:
+            total = 0.0
+            size = 0
+            for _ in range(iterations):
+                buffer = io.BytesIO()
+                start = time.perf_counter()
+                encoder.save_image(image, buffer, output_format, profile, quality, source_encoding)
+                total += time.perf_counter() - start
+                size = buffer.tell()
+            elapsed_ms = total / iterations * 1000
+            throughput = size / 1024 / (elapsed_ms / 1000) if elapsed_ms else 0
+            print(f"{output_format:<6} {profile.value:<20} {elapsed_ms:>11.1f} {size:>10} {throughput:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="编码配置档性能基准")
+    parser.add_argument('--width', type=int, default=3000)
+    parser.add_argument('--height', type=int, default=2000)
+    parser.add_argument('--quality', type=int, default=90)
+    parser.add_argument('--iterations', type=int, default=3)
+    args = parser.parse_args()
+    run(args.width, args.height, args.quality, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
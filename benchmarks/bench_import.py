@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+启动导入耗时基准
+
+用 `python -X importtime` 在新进程中测量几类短命令的导入耗时：
+
+- package:   import src
+- cli:       import src.cli（--help 和参数校验的开销）
+- colors:    python -m src colors（只查询元数据的工具命令）
+- positions: python -m src positions
+
+这些场景都不应导入 PIL、piexif、tqdm 和水印渲染模块；导入了这些模块，
+或 cli 场景的导入耗时中位数超过预算时以非零状态退出，可直接用于CI守护启动开销。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    'package': ['-c', 'import src'],
+    'cli': ['-c', 'import src.cli'],
+    'colors': ['-m', 'src', 'colors'],
+    'positions': ['-m', 'src', 'positions'],
+}
+
+# 元数据命令不应导入的重量级模块
+FORBIDDEN_MODULES = ('PIL', 'piexif', 'tqdm', 'src.core.watermark', 'src.utils.font_manager')
+
+# cli 场景导入耗时中位数的默认预算（毫秒）
+DEFAULT_BUDGET_MS = 150.0
+
+
+def parse_importtime(output: str) -> List[Tuple[str, int, float, float]]:
+    """解析 -X importtime 输出：[(模块名, 嵌套层级, 自身耗时ms, 累计耗时ms)]"""
+    modules = []
+    for line in output.splitlines():
+        # 格式: "import time:      1234 |       5678 |     package.module"，缩进表示嵌套层级
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        head, cumulative_us, name = line.split('|', 2)
+        self_us = head.rsplit(':', 1)[1]
+        name = name[1:]
+        level = (len(name) - len(name.lstrip(' '))) // 2
+        modules.append((name.strip(), level, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return modules
+
+
+def measure(args: List[str]) -> Tuple[float, List[Tuple[str, int, float, float]]]:
+    """在新进程中运行一次，返回 (导入总耗时ms, 模块列表)"""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime'] + args,
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+    )
+    modules = parse_importtime(completed.stderr)
+    total = sum(cumulative for _, level, _, cumulative in modules if level == 0)
+    return total, modules
+
+
+def forbidden_imports(modules: List[Tuple[str, int, float, float]]) -> List[str]:
+    """导入了的禁止模块"""
+    names = {name for name, _, _, _ in modules}
+    return sorted(name for name in names
+                  if any(name == forbidden or name.startswith(forbidden + '.') for forbidden in FORBIDDEN_MODULES))
+
+
+def run(iterations: int, top: int) -> Dict[str, Dict]:
+    results = {}
+    for scenario, args in SCENARIOS.items():
+        totals = []
+        modules = []
+        for _ in range(iterations):
+            total, modules = measure(args)
+            totals.append(total)
+        slowest = sorted((m for m in modules if m[1] == 0), key=lambda m: m[3], reverse=True)[:top]
+        results[scenario] = {
+            'median_ms': round(statistics.median(totals), 3),
+            'min_ms': round(min(totals), 3),
+            'max_ms': round(max(totals), 3),
+            'modules': len(modules),
+            'slowest': [{'module': name, 'cumulative_ms': round(cumulative, 3)}
+                        for name, _, _, cumulative in slowest],
+            'forbidden': forbidden_imports(modules),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动导入耗时基准")
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5, help='每个场景列出的最慢顶层导入数量')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help='cli 场景导入耗时中位数的预算（毫秒）')
+    parser.add_argument('--json', dest='json_path', help='结果JSON输出路径')
+    args = parser.parse_args()
+
+    results = run(args.iterations, args.top)
+    failures = []
+    print(f"{'scenario':<10} {'median(ms)':>11} {'min(ms)':>9} {'max(ms)':>9} {'modules':>8}")
+    for scenario, result in results.items():
+        print(f"{scenario:<10} {result['median_ms']:>11.1f} {result['min_ms']:>9.1f} "
+              f"{result['max_ms']:>9.1f} {result['modules']:>8}")
+        for entry in result['slowest']:
+            print(f"{'':<12}{entry['cumulative_ms']:>9.1f}  {entry['module']}")
+        if result['forbidden']:
+            failures.append(f"{scenario} 导入了重量级模块: {', '.join(result['forbidden'])}")
+
+    if results['cli']['median_ms'] > args.budget_ms:
+        failures.append(f"cli 导入耗时 {results['cli']['median_ms']:.1f}ms 超出预算 {args.budget_ms:.1f}ms")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'budget_ms': args.budget_ms, 'scenarios': results}, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.json_path}")
+
+    for failure in failures:
+        print(f"失败: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
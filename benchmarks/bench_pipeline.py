@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+处理流程分阶段性能基准
+
+在 corpus.py 生成的合成图库上，按 TIMESTAMP / TEXT / IMAGE 三种水印类型
+分别测量处理流程各阶段的耗时：
+
+- scan:      扫描输入目录（每次迭代一次）
+- exif_read: 读取拍摄时间并格式化水印文本
+- decode:    解码图片像素
+- font_load: 清空字体缓存后加载字体（图片水印没有此阶段）
+- render:    生成水印局部层（文本绘制 / Logo读取与缩放）
+- composite: 把局部层合成到图片上
+- resize:    按50%缩放图片
+- encode:    按输出格式和编码配置档编码到内存
+
+结果写入JSON；用 --compare 指定之前的结果文件时打印各阶段平均耗时的变化。
+"""
+
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import PIL
+
+from src.core.config import Config, WatermarkConfig, WatermarkType, EncoderProfile
+from src.core import encoder
+from src.core import orientation as exif_orientation
+from src.core import watermark as watermark_module
+from src.core.exif_reader import ExifReader
+from src.core.image_handle import ImageHandle
+from src.core.image_processor import ImageProcessor
+from src.core.watermark import WatermarkProcessor
+from src.utils.font_manager import font_manager
+
+from corpus import DEFAULT_SEED, PRESETS, generate_corpus
+
+
+SCHEMA_VERSION = 1
+STAGES = ('exif_read', 'decode', 'font_load', 'render', 'composite', 'resize', 'encode')
+RESIZE_CONFIG = {'enabled': True, 'type': 'percentage', 'percentage': 50}
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """汇总一个阶段的耗时样本（毫秒）"""
+    ordered = sorted(samples)
+    p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+    return {
+        'count': len(ordered),
+        'total_ms': round(sum(ordered), 3),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'median_ms': round(statistics.median(ordered), 3),
+        'p95_ms': round(ordered[p95_index], 3),
+        'min_ms': round(ordered[0], 3),
+        'max_ms': round(ordered[-1], 3),
+    }
+
+
+def make_config(watermark_type: WatermarkType, manifest: Dict[str, Any], corpus_dir: str,
+                output_format: str, profile: EncoderProfile) -> Config:
+    """为指定水印类型生成基准配置"""
+    watermark_config = WatermarkConfig(watermark_type=watermark_type, output_format=output_format,
+                                       encoder_profile=profile)
+    if watermark_type == WatermarkType.TEXT:
+        watermark_config.text_watermark.text = manifest['text']
+        watermark_config.text_watermark.shadow_enabled = True
+        watermark_config.text_watermark.stroke_enabled = True
+    elif watermark_type == WatermarkType.IMAGE:
+        # 使用大Logo，覆盖大图缩放的路径
+        logo = max(manifest['logos'], key=lambda entry: entry['size'][0] * entry['size'][1])
+        watermark_config.image_watermark.image_path = os.path.join(corpus_dir, logo['path'])
+    return Config(watermark_config)
+
+
+def load_font(processor: WatermarkProcessor, watermark_type: WatermarkType,
+              image_size, orientation: int, text: str) -> None:
+    """按水印类型加载该图片尺寸下使用的字体"""
+    config = processor.config
+    width, height = exif_orientation.display_size(image_size, orientation)
+    if watermark_type == WatermarkType.TEXT:
+        text_config = config.config.text_watermark
+        font_size = text_config.font_size or config.get_auto_font_size(width, height)
+        processor._get_font(font_size, text_config.font_path, text_config.font_bold,
+                            text_config.font_italic, text_config.text)
+    else:
+        processor._get_font(config.get_auto_font_size(width, height), text=text)
+
+
+def clear_caches() -> None:
+    """清空字体和阴影缓存，使每张图片的测量互不影响"""
+    font_manager.clear_cache()
+    with watermark_module._shadow_cache_lock:
+        watermark_module._shadow_cache.clear()
+
+
+def bench_type(watermark_type: WatermarkType, manifest: Dict[str, Any], corpus_dir: str,
+               iterations: int, output_format: str, profile: EncoderProfile) -> Dict[str, Dict[str, float]]:
+    """测量一种水印类型在整个图库上的各阶段耗时"""
+    config = make_config(watermark_type, manifest, corpus_dir, output_format, profile)
+    processor = WatermarkProcessor(config)
+    exif_reader = ExifReader()
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+
+    def timed(stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        samples[stage].append((time.perf_counter() - start) * 1000)
+        return result
+
+    for _ in range(iterations):
+        for entry in manifest['files']:
+            clear_caches()
+            with ImageHandle(os.path.join(corpus_dir, entry['path'])) as handle:
+                text = timed('exif_read', exif_reader.get_watermark_text, handle,
+                             config.config.date_format) or '2024-01-01'
+                image = handle.image
+                orientation = exif_orientation.get_orientation(image)
+                timed('decode', handle.load)
+
+                if watermark_type != WatermarkType.IMAGE:
+                    timed('font_load', load_font, processor, watermark_type, image.size, orientation, text)
+
+                layer = timed('render', processor.watermark_layer, image.size, text, orientation)
+                watermarked = image
+                if layer is not None:
+                    watermarked = timed('composite', processor._composite_layer, image, *layer)
+
+                timed('resize', processor._resize_image, watermarked, RESIZE_CONFIG, orientation)
+                timed('encode', encoder.save_image, watermarked, io.BytesIO(), output_format, profile,
+                      config.config.output_quality)
+
+    return {stage: summarize(values) for stage, values in samples.items() if values}
+
+
+def bench_scan(corpus_dir: str, iterations: int) -> Dict[str, float]:
+    """测量递归扫描图库目录的耗时"""
+    config = Config(WatermarkConfig(recursive=True))
+    processor = ImageProcessor(config)
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        processor.find_images(corpus_dir)
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def run(corpus_dir: str, preset: str, seed: int, iterations: int, output_format: str,
+        profile: EncoderProfile, types: List[WatermarkType]) -> Dict[str, Any]:
+    manifest = generate_corpus(corpus_dir, preset, seed)
+    result = {
+        'schema': SCHEMA_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+        },
+        'corpus': {
+            'preset': manifest['preset'],
+            'seed': manifest['seed'],
+            'files': len(manifest['files']),
+            'megapixels': manifest['megapixels'],
+        },
+        'settings': {
+            'iterations': iterations,
+            'output_format': output_format,
+            'encoder_profile': profile.value,
+        },
+        'scan': bench_scan(os.path.join(corpus_dir, 'photos'), iterations),
+        'watermark_types': {},
+    }
+    for watermark_type in types:
+        result['watermark_types'][watermark_type.value] = bench_type(
+            watermark_type, manifest, corpus_dir, iterations, output_format, profile
+        )
+    return result
+
+
+def print_result(result: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    corpus = result['corpus']
+    print(f"图库: {corpus['preset']} (种子 {corpus['seed']}, {corpus['files']} 张, {corpus['megapixels']} MP)  "
+          f"迭代: {result['settings']['iterations']}  输出: {result['settings']['output_format']}/"
+          f"{result['settings']['encoder_profile']}")
+    print(f"{'type':<10} {'stage':<10} {'mean(ms)':>10} {'median(ms)':>11} {'p95(ms)':>9} {'total(ms)':>11}"
+          + (f" {'vs base':>8}" if baseline else ''))
+
+    def row(type_name, stage, stats, base_stats):
+        line = (f"{type_name:<10} {stage:<10} {stats['mean_ms']:>10.2f} {stats['median_ms']:>11.2f} "
+                f"{stats['p95_ms']:>9.2f} {stats['total_ms']:>11.1f}")
+        if baseline:
+            if base_stats and base_stats['mean_ms']:
+                change = (stats['mean_ms'] - base_stats['mean_ms']) / base_stats['mean_ms'] * 100
+                line += f" {change:>+7.1f}%"
+            else:
+                line += f" {'-':>8}"
+        print(line)
+
+    row('-', 'scan', result['scan'], baseline.get('scan') if baseline else None)
+    for type_name, stages in result['watermark_types'].items():
+        base_stages = (baseline or {}).get('watermark_types', {}).get(type_name, {})
+        for stage, stats in stages.items():
+            row(type_name, stage, stats, base_stages.get(stage))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="处理流程分阶段性能基准")
+    parser.add_argument('--corpus-dir', help='图库目录（默认使用临时目录，运行结束后删除）')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='quick')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--iterations', type=int, default=3)
+    parser.add_argument('--output-format', choices=encoder.OUTPUT_FORMATS, default='JPEG')
+    parser.add_argument('--encoder-profile', choices=[p.value for p in EncoderProfile],
+                        default=EncoderProfile.BALANCED.value)
+    parser.add_argument('--types', nargs='+', choices=[t.value for t in WatermarkType],
+                        default=[t.value for t in WatermarkType])
+    parser.add_argument('--json', dest='json_path', help='结果JSON输出路径')
+    parser.add_argument('--compare', help='与之前的结果JSON对比')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    types = [WatermarkType(value) for value in args.types]
+    profile = EncoderProfile(args.encoder_profile)
+    if args.corpus_dir:
+        result = run(args.corpus_dir, args.preset, args.seed, args.iterations,
+                     args.output_format, profile, types)
+    else:
+        with tempfile.TemporaryDirectory(prefix='watermark-bench-') as corpus_dir:
+            result = run(corpus_dir, args.preset, args.seed, args.iterations,
+                         args.output_format, profile, types)
+
+    print_result(result, baseline)
+    if baseline and baseline.get('corpus') != result['corpus']:
+        print("警告: 对比结果使用的图库不同，变化百分比仅供参考")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
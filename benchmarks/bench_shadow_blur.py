@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+阴影模糊性能基准
+
+对比三种阴影生成方式在模糊半径 2-20 下的耗时：
+- legacy: 在整个局部RGBA层上重新绘制文本并对四个通道做高斯模糊（旧实现）
+- mask:   在裁剪后的单通道遮罩上模糊（新实现，清空缓存后测量）
+- cached: 相同文本再次渲染时直接复用缓存的阴影
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from src.core.config import Config
+from src.core import watermark as watermark_module
+from src.core.watermark import WatermarkProcessor
+
+
+RADII = [2, 4, 6, 8, 10, 12, 14, 16, 18, 20]
+SHADOW_COLOR = (0, 0, 0, 128)
+
+
+def legacy_shadow(processor, text_layer, position, text, font, blur):
+    """旧实现：整层RGBA绘制 + 四通道高斯模糊 + 合成"""
+    shadow_overlay = Image.new('RGBA', text_layer.size, (0, 0, 0, 0))
+    shadow_draw = ImageDraw.Draw(shadow_overlay)
+    processor._draw_multiline_text(shadow_draw, position, text, font, SHADOW_COLOR)
+    shadow_overlay = shadow_overlay.filter(ImageFilter.GaussianBlur(blur))
+    return Image.alpha_composite(text_layer, shadow_overlay)
+
+
+def mask_shadow(processor, text_layer, position, text, font, blur):
+    """新实现：裁剪遮罩模糊后合成"""
+    layer_draw = ImageDraw.Draw(text_layer)
+    processor._draw_shadow(text_layer, layer_draw, position, text, font, SHADOW_COLOR, blur)
+    return text_layer
+
+
+def time_call(func, iterations, before=None):
+    """重复执行并返回平均耗时（毫秒）"""
+    total = 0.0
+    for _ in range(iterations):
+        if before:
+            before()
+        start = time.perf_counter()
+        func()
+        total += time.perf_counter() - start
+    return total / iterations * 1000
+
+
+def run(text: str, font_size: int, iterations: int):
+    processor = WatermarkProcessor(Config())
+    font = processor._get_font(font_size, text=text)
+    text_width, text_height = processor._get_text_size(text, font)
+    layer_size = (text_width + 40, text_height + 40)
+    position = (22, 22)
+
+    def clear_cache():
+        with watermark_module._shadow_cache_lock:
+            watermark_module._shadow_cache.clear()
+
+    print(f"文本: {text!r}  字号: {font_size}  局部层: {layer_size[0]}x{layer_size[1]}  迭代: {iterations}")
+    print(f"{'radius':>6} {'legacy(ms)':>12} {'mask(ms)':>10} {'cached(ms)':>11} {'speedup':>8}")
+
+    for radius in RADII:
+        legacy = time_call(
+            lambda: legacy_shadow(processor, Image.new('RGBA', layer_size, (0, 0, 0, 0)),
+                                  position, text, font, radius),
+            iterations
+        )
+        uncached = time_call(
+            lambda: mask_shadow(processor, Image.new('RGBA', layer_size, (0, 0, 0, 0)),
+                                position, text, font, radius),
+            iterations, before=clear_cache
+        )
+        cached = time_call(
+            lambda: mask_shadow(processor, Image.new('RGBA', layer_size, (0, 0, 0, 0)),
+                                position, text, font, radius),
+            iterations
+        )
+        print(f"{radius:>6} {legacy:>12.3f} {uncached:>10.3f} {cached:>11.3f} {legacy / cached:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="阴影模糊性能基准")
+    parser.add_argument('--text', default="2024-06-01 PhotoWatermark\n© 水印测试")
+    parser.add_argument('--font-size', type=int, default=72)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+    run(args.text, args.font_size, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+合成基准图库生成器
+
+按固定随机种子生成可复现的测试图库：混合分辨率的JPEG/PNG/TIFF、
+有无EXIF拍摄时间、带透明通道的PNG、带方向标签的竖拍照片，以及大小两种
+Logo水印图片。同一种子和规模生成的图库逐字节相同，便于不同版本之间对比。
+
+生成结果写入 manifest.json，记录每个文件的尺寸、格式和特征。
+"""
+
+import json
+import os
+import random
+import sys
+import argparse
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import piexif
+from PIL import Image, ImageDraw
+
+
+MANIFEST_NAME = 'manifest.json'
+DEFAULT_SEED = 20240601
+
+# 图库规模：(名称, 宽, 高, 格式, 是否带EXIF, 是否带透明通道, EXIF方向)
+PRESETS: Dict[str, List[tuple]] = {
+    'quick': [
+        ('small_exif', 640, 480, 'JPEG', True, False, 1),
+        ('small_noexif', 800, 600, 'JPEG', False, False, 1),
+        ('alpha', 720, 720, 'PNG', False, True, 1),
+        ('portrait', 600, 800, 'JPEG', True, False, 6),
+    ],
+    'standard': [
+        ('vga_exif', 640, 480, 'JPEG', True, False, 1),
+        ('hd_exif', 1920, 1080, 'JPEG', True, False, 1),
+        ('hd_noexif', 1920, 1080, 'JPEG', False, False, 1),
+        ('12mp_exif', 4000, 3000, 'JPEG', True, False, 1),
+        ('12mp_portrait', 4000, 3000, 'JPEG', True, False, 6),
+        ('24mp_exif', 6000, 4000, 'JPEG', True, False, 1),
+        ('alpha_small', 1024, 1024, 'PNG', False, True, 1),
+        ('alpha_large', 3000, 2000, 'PNG', False, True, 1),
+        ('scan', 3508, 2480, 'TIFF', False, False, 1),
+    ],
+}
+PRESETS['large'] = PRESETS['standard'] + [
+    ('50mp_exif', 8688, 5792, 'JPEG', True, False, 1),
+    ('panorama', 12000, 3000, 'JPEG', True, False, 1),
+    ('alpha_huge', 6000, 6000, 'PNG', False, True, 1),
+]
+
+# Logo水印：(名称, 宽, 高)
+LOGOS = [
+    ('logo_small', 256, 128),
+    ('logo_large', 2400, 1200),
+]
+
+FORMAT_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'TIFF': '.tif'}
+
+# 文本水印使用的中日韩文本，覆盖中文回退字体的加载路径
+CJK_TEXT = "版权所有 © 2024 写真 사진"
+
+
+def _photo_like(size, rng: random.Random, alpha: bool) -> Image.Image:
+    """绘制类照片的合成图：渐变背景 + 随机色块（完全由种子决定）"""
+    width, height = size
+    horizontal = Image.linear_gradient('L').rotate(90).resize(size)
+    vertical = Image.linear_gradient('L').resize(size)
+    radial = Image.radial_gradient('L').resize(size)
+    image = Image.merge('RGB', (horizontal, vertical, radial))
+
+    draw = ImageDraw.Draw(image)
+    for _ in range(24):
+        x = rng.randrange(width)
+        y = rng.randrange(height)
+        radius = rng.randrange(max(2, min(size) // 20), max(3, min(size) // 4))
+        color = tuple(rng.randrange(256) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=color)
+        else:
+            draw.rectangle((x - radius, y - radius // 2, x + radius, y + radius // 2), fill=color)
+
+    if alpha:
+        mask = Image.radial_gradient('L').resize(size).point(lambda value: 255 - value)
+        image.putalpha(mask)
+    return image
+
+
+def _logo(size, rng: random.Random) -> Image.Image:
+    """绘制带透明通道的Logo"""
+    width, height = size
+    logo = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(logo)
+    color = tuple(rng.randrange(64, 256) for _ in range(3))
+    draw.rounded_rectangle((0, 0, width - 1, height - 1), radius=min(size) // 6,
+                           fill=color + (200,), outline=(255, 255, 255, 255),
+                           width=max(1, min(size) // 40))
+    draw.ellipse((width // 8, height // 4, width // 8 + height // 2, height * 3 // 4),
+                 fill=(255, 255, 255, 230))
+    return logo
+
+
+def _exif_bytes(rng: random.Random, orientation: int) -> bytes:
+    taken = datetime(2020, 1, 1) + timedelta(seconds=rng.randrange(4 * 365 * 86400))
+    stamp = taken.strftime('%Y:%m:%d %H:%M:%S').encode('ascii')
+    return piexif.dump({
+        '0th': {piexif.ImageIFD.Make: b'BenchCam', piexif.ImageIFD.Orientation: orientation},
+        'Exif': {piexif.ExifIFD.DateTimeOriginal: stamp},
+    })
+
+
+def generate_corpus(output_dir: str, preset: str = 'standard', seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+    """生成图库并返回清单
+
+    输出目录中已有同种子、同规模的清单时直接复用，不重新生成。
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"未知的图库规模: {preset}")
+
+    existing = load_manifest(output_dir)
+    if (existing and existing.get('seed') == seed and existing.get('preset') == preset
+            and all(os.path.exists(os.path.join(output_dir, entry['path']))
+                    for entry in existing['files'] + existing['logos'])):
+        return existing
+
+    photos_dir = os.path.join(output_dir, 'photos')
+    logos_dir = os.path.join(output_dir, 'logos')
+    os.makedirs(photos_dir, exist_ok=True)
+    os.makedirs(logos_dir, exist_ok=True)
+
+    rng = random.Random(seed)
+    files = []
+    for name, width, height, image_format, has_exif, has_alpha, orientation in PRESETS[preset]:
+        image = _photo_like((width, height), rng, has_alpha)
+        path = os.path.join(photos_dir, name + FORMAT_EXTENSIONS[image_format])
+        save_kwargs = {}
+        if image_format == 'JPEG':
+            save_kwargs['quality'] = 90
+        elif image_format == 'TIFF':
+            save_kwargs['compression'] = 'tiff_lzw'
+        if has_exif:
+            save_kwargs['exif'] = _exif_bytes(rng, orientation)
+        image.save(path, image_format, **save_kwargs)
+        files.append({
+            'path': os.path.relpath(path, output_dir),
+            'size': [width, height],
+            'format': image_format,
+            'exif': has_exif,
+            'alpha': has_alpha,
+            'orientation': orientation,
+        })
+
+    logos = []
+    for name, width, height in LOGOS:
+        path = os.path.join(logos_dir, name + '.png')
+        _logo((width, height), rng).save(path, 'PNG')
+        logos.append({'path': os.path.relpath(path, output_dir), 'size': [width, height]})
+
+    manifest = {
+        'seed': seed,
+        'preset': preset,
+        'files': files,
+        'logos': logos,
+        'text': CJK_TEXT,
+        'megapixels': round(sum(w * h for w, h in (f['size'] for f in files)) / 1_000_000, 2),
+    }
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def load_manifest(corpus_dir: str) -> Optional[Dict[str, Any]]:
+    """读取图库清单（不存在时返回None）"""
+    path = os.path.join(corpus_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成可复现的合成基准图库")
+    parser.add_argument('output_dir')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='standard')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    args = parser.parse_args()
+
+    manifest = generate_corpus(args.output_dir, args.preset, args.seed)
+    print(f"图库: {args.output_dir}  规模: {manifest['preset']}  种子: {manifest['seed']}")
+    print(f"照片 {len(manifest['files'])} 张，共 {manifest['megapixels']} MP；Logo {len(manifest['logos'])} 个")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,7 @@ PhotoWatermark GUI应用启动入口
 
 import sys
 import os
+import logging
 
 # 添加当前目录到Python路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -16,6 +17,10 @@ from src.gui import MainWindow
 
 def main():
     """主函数"""
+    # PHOTOWATERMARK_DEBUG=1 时输出调试日志（含启动各阶段耗时）
+    if os.environ.get('PHOTOWATERMARK_DEBUG'):
+        logging.basicConfig(level=logging.DEBUG, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    
     try:
         # 创建并运行主窗口
         app = MainWindow()
@@ -11,7 +11,7 @@ import os
 # 添加当前目录到Python路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from src.cli import main
+from src.cli import run
 
 if __name__ == '__main__':
-    main()
+    run()
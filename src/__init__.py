@@ -9,14 +9,35 @@ __version__ = "1.0.0"
 __author__ = "PhotoWatermark Team"
 __email__ = "contact@photowatermark.com"
 
-from .core.image_processor import ImageProcessor
-from .core.watermark import WatermarkProcessor
-from .core.exif_reader import ExifReader
-from .core.config import Config
+import importlib
+
+# 公开的类按需导入：import src 或只用到颜色/位置等元数据的命令不加载 PIL、字体管理器等重量级依赖
+_LAZY_ATTRIBUTES = {
+    'ImageProcessor': '.core.image_processor',
+    'WatermarkProcessor': '.core.watermark',
+    'ExifReader': '.core.exif_reader',
+    'Config': '.core.config',
+    'watermark_bytes': '.core.image_processor',
+}
 
 __all__ = [
     'ImageProcessor',
     'WatermarkProcessor', 
     'ExifReader',
-    'Config'
+    'Config',
+    'watermark_bytes',
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # 缓存到模块字典，之后的访问不再经过 __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -4,7 +4,7 @@
 允许使用 python -m photo_watermark 运行程序
 """
 
-from .cli import main
+from .cli import run
 
 if __name__ == '__main__':
-    main()
+    run()
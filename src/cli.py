@@ -6,14 +6,17 @@
 
 import os
 import sys
+from datetime import datetime
 from typing import Optional
 import click
 from colorama import init, Fore, Style
 
-from .core.config import Config, WatermarkConfig, Position, DateFormat
-from .core.image_processor import ImageProcessor
+from .core.config import Config, WatermarkConfig, Position, DateFormat, EncoderProfile, MetadataMode
 from .utils.color_utils import get_available_colors, parse_color
 
+# 图像处理相关模块（PIL、tqdm、piexif、字体管理器）在真正处理图片时才导入，
+# colors/positions/formats 等只查询元数据的命令和 --help 不承担这部分启动开销
+
 # 初始化colorama
 init()
 
@@ -98,10 +101,45 @@ def validate_date_format(ctx, param, value):
         )
 
 
+def validate_memory_size(ctx, param, value):
+    """验证内存大小参数"""
+    if value is None:
+        return value
+    
+    from .core.scheduler import parse_memory_size
+    
+    try:
+        parse_memory_size(value)
+    except ValueError:
+        raise click.BadParameter(
+            f"无效的内存大小: {value}\n"
+            f"示例: 512M, 2G, 1.5GB（纯数字按MB计）"
+        )
+    
+    return value
+
+
+def validate_shard(ctx, param, value):
+    """验证分片参数，返回 (index, count)"""
+    if value is None:
+        return value
+    
+    from .core.shard import parse_shard
+    
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
 @click.command()
-@click.argument('input_path', type=click.Path(exists=True))
+@click.argument('input_path', type=click.Path(exists=True), required=False)
+@click.option('--input-list', type=click.File('rb'),
+              help='从文件逐条读取输入路径（- 表示标准输入），每行可用制表符再跟一个输出路径')
+@click.option('-0', '--null', 'null_separated', is_flag=True,
+              help='--input-list 中的记录以NUL分隔（配合 find -print0）')
 @click.option('-o', '--output', 'output_dir', 
-              help='输出目录 (默认: INPUT_PATH_watermark)')
+              help='输出目录，或输出归档 .zip/.tar[.gz] (默认: INPUT_PATH_watermark)')
 @click.option('-s', '--font-size', type=int,
               help='字体大小 (默认: 自适应图片尺寸)')
 @click.option('-c', '--color', default='white', callback=validate_color,
@@ -117,12 +155,48 @@ def validate_date_format(ctx, param, value):
               help='日期格式 (默认: YYYY-MM-DD)')
 @click.option('--font-path', type=click.Path(exists=True),
               help='自定义字体文件路径')
-@click.option('--output-format', type=click.Choice(['JPEG', 'PNG'], case_sensitive=False),
+@click.option('--output-format', type=click.Choice(['JPEG', 'PNG', 'WEBP', 'TIFF'], case_sensitive=False),
               default='JPEG', help='输出图片格式 (默认: JPEG)')
 @click.option('--quality', type=click.IntRange(1, 100), default=95,
-              help='JPEG输出质量 1-100 (默认: 95)')
+              help='JPEG/WebP输出质量 1-100 (默认: 95)')
+@click.option('--encoder-profile', type=click.Choice([p.value for p in EncoderProfile]),
+              help='编码配置档 (默认: balanced，或使用配置文件中的设置)')
+@click.option('--webp-method', type=click.IntRange(0, 6),
+              help='WebP编码速度 0(最快)-6(最小文件) (默认: 由编码配置档决定)')
+@click.option('--metadata', 'metadata_mode', type=click.Choice([m.value for m in MetadataMode]),
+              help='源元数据处理: strip 不保留, passthrough 原样保留EXIF/ICC/XMP (默认: strip)')
 @click.option('--recursive', is_flag=True,
               help='递归处理子目录')
+@click.option('-j', '--workers', type=click.IntRange(1, 64),
+              help='并发处理的线程数 (默认: 1)')
+@click.option('--max-memory', callback=validate_memory_size,
+              help='并发处理的内存预算，如 512M、2G；超出预算的大图串行处理 (默认: 不限制)')
+@click.option('--dedup', type=click.Choice(['link', 'copy']),
+              help='内容相同的输入只渲染一次，其余输出用硬链接(link)或复制(copy)得到')
+@click.option('--max-megapixels', type=click.FloatRange(min=0, min_open=True),
+              help='单张图片的像素上限（百万像素），超出则跳过')
+@click.option('--tiled-min-megapixels', type=click.FloatRange(min=0),
+              help='TIFF输入、TIFF输出时超过该像素数（百万像素）按分块流式处理 (默认: 64)')
+@click.option('--profile', is_flag=True,
+              help='输出各处理阶段的耗时直方图 (p50/p95/max)')
+@click.option('--profile-top', type=click.IntRange(min=1), default=5, show_default=True,
+              help='--profile-dump 保留的最慢图片数量')
+@click.option('--profile-dump', type=click.Path(file_okay=False),
+              help='对每张图片运行cProfile，把最慢图片的pstats数据写入该目录（隐含 --profile）')
+@click.option('--trace', 'trace_file', type=click.Path(dir_okay=False),
+              help='把每张图片各阶段的时间线写为 Chrome/Perfetto trace-event JSON 文件')
+@click.option('--journal', 'journal_file', type=click.Path(dir_okay=False),
+              help='把每张图片的处理结果逐行追加到 JSONL 处理日志')
+@click.option('--resume', is_flag=True,
+              help='跳过处理日志中已成功且未修改的图片（需配合 --journal 或 --shard）')
+@click.option('--queue', 'queue_file', type=click.Path(dir_okay=False),
+              help='使用 SQLite 任务队列文件记录每个输入的状态；中断后用同一队列重新运行即可继续，'
+                   '失败的任务按退避时间自动重试')
+@click.option('--max-attempts', type=click.IntRange(min=1), default=3, show_default=True,
+              help='使用 --queue 时每个任务的最大尝试次数')
+@click.option('--shard', callback=validate_shard,
+              help='只处理 INDEX/COUNT 分片（按相对路径的稳定哈希划分，INDEX从0开始），'
+                   '写出该分片的处理日志和清单')
 @click.option('--preview', is_flag=True,
               help='预览模式，不保存文件')
 @click.option('--config', 'config_file', type=click.Path(exists=True),
@@ -133,16 +207,24 @@ def validate_date_format(ctx, param, value):
               help='详细输出')
 @click.option('--no-banner', is_flag=True,
               help='不显示程序横幅')
-def main(input_path: str, output_dir: Optional[str], font_size: Optional[int],
+def main(input_path: Optional[str], input_list, null_separated: bool,
+         output_dir: Optional[str], font_size: Optional[int],
          color: str, alpha: float, position: Position, margin: int,
          date_format: DateFormat, font_path: Optional[str], 
-         output_format: str, quality: int, recursive: bool, preview: bool,
+         output_format: str, quality: int, encoder_profile: Optional[str],
+         webp_method: Optional[int], metadata_mode: Optional[str],
+         recursive: bool, workers: Optional[int], max_memory: Optional[str],
+         dedup: Optional[str], max_megapixels: Optional[float], tiled_min_megapixels: Optional[float],
+         profile: bool, profile_top: int, profile_dump: Optional[str],
+         trace_file: Optional[str], journal_file: Optional[str], resume: bool,
+         queue_file: Optional[str], max_attempts: int,
+         shard: Optional[tuple], preview: bool,
          config_file: Optional[str], save_config_file: Optional[str],
          verbose: bool, no_banner: bool):
     """
     PhotoWatermark - 基于EXIF拍摄时间的图片水印工具
     
-    INPUT_PATH: 输入图片文件或目录路径
+    INPUT_PATH: 输入图片文件、目录或 ZIP/TAR 归档路径（使用 --input-list 时省略）
     
     示例:
     
@@ -155,6 +237,43 @@ def main(input_path: str, output_dir: Optional[str], font_size: Optional[int],
         # 使用配置文件
         python -m photo_watermark /path/to/photos --config my_style.json
         
+        # 快速编码输出WebP
+        python -m photo_watermark /path/to/photos --output-format WEBP --encoder-profile fast
+        
+        # 原样保留EXIF、ICC配置文件和XMP
+        python -m photo_watermark /path/to/photos --metadata passthrough
+        
+        # 4线程并发，内存预算2GB
+        python -m photo_watermark /path/to/photos -j 4 --max-memory 2G
+        
+        # 千兆像素扫描件：分块处理并输出分块TIFF
+        python -m photo_watermark /path/to/scans --output-format TIFF --max-megapixels 4000
+        
+        # 查看各阶段耗时，并保存最慢10张图片的cProfile数据
+        python -m photo_watermark /path/to/photos --profile --profile-dump ./profile --profile-top 10
+        
+        # 导出并发批处理的时间线（在 chrome://tracing 或 ui.perfetto.dev 中打开）
+        python -m photo_watermark /path/to/photos -j 4 --trace trace.json
+        
+        # 直接处理ZIP归档，不解压到磁盘，结果写入 shoot_watermark.zip
+        python -m photo_watermark shoot.zip -j 4
+        
+        # 处理 find 找到的图片，读到第一条路径就开始处理
+        find /data -name '*.jpg' -print0 | python -m photo_watermark --input-list - -0 -o /export
+        
+        # 三台机器共享存储，各自处理一个分片，最后合并各分片的统计
+        python -m photo_watermark /nfs/photos -o /nfs/out -j 8 --shard 0/3
+        python -m src merge-reports /nfs/out
+        
+        # 记录处理日志，中断后续跑时跳过已完成的图片
+        python -m photo_watermark /path/to/photos --journal run.jsonl --resume
+        
+        # 备份目录中逐字节相同的照片只渲染一次，其余输出用硬链接
+        python -m photo_watermark /path/to/archive --recursive --dedup link
+        
+        # 用任务队列记录每张图片的状态，被中断后重新运行同一命令即可继续
+        python -m photo_watermark /nfs/photos -o /nfs/out -j 8 --queue jobs.db
+        
         # 预览效果
         python -m photo_watermark /path/to/photos --preview
         
@@ -172,6 +291,49 @@ def main(input_path: str, output_dir: Optional[str], font_size: Optional[int],
             print_error("透明度必须在 0.0 到 1.0 之间")
             sys.exit(1)
         
+        if (input_path is None) == (input_list is None):
+            print_error("需要指定 INPUT_PATH 或 --input-list 中的一个")
+            sys.exit(1)
+        
+        if null_separated and input_list is None:
+            print_error("-0/--null 需要配合 --input-list 使用")
+            sys.exit(1)
+        
+        if resume and not journal_file and not shard:
+            print_error("--resume 需要配合 --journal 使用")
+            sys.exit(1)
+        
+        from .core.archive import is_archive
+        if resume and input_path and is_archive(input_path):
+            print_error("归档输入不支持 --resume")
+            sys.exit(1)
+        
+        if queue_file and input_path and is_archive(input_path):
+            print_error("归档输入不支持 --queue")
+            sys.exit(1)
+        
+        if dedup and (queue_file or (input_path and is_archive(input_path))):
+            print_error("--dedup 不支持归档输入，也不能与 --queue 同时使用")
+            sys.exit(1)
+        
+        if shard:
+            from .core import shard as shard_module
+            if input_path and is_archive(input_path):
+                print_error("归档输入不支持 --shard")
+                sys.exit(1)
+            # 每个分片写自己的处理日志，清单与日志放在一起
+            if journal_file:
+                journal_file = shard_module.shard_path(journal_file, *shard)
+            elif output_dir:
+                journal_file = os.path.join(output_dir, shard_module.REPORT_DIR,
+                                            shard_module.shard_name(*shard) + '.jsonl')
+            else:
+                print_error("--shard 需要指定 -o 或 --journal（用于存放分片的处理日志和清单）")
+                sys.exit(1)
+            if queue_file:
+                queue_file = shard_module.shard_path(queue_file, *shard)
+            started = datetime.now()
+        
         # 创建配置对象
         config = Config()
         
@@ -196,7 +358,23 @@ def main(input_path: str, output_dir: Optional[str], font_size: Optional[int],
             config.config.font_path = font_path
         config.config.output_format = output_format.upper()
         config.config.output_quality = quality
+        if encoder_profile:
+            config.config.encoder_profile = EncoderProfile(encoder_profile)
+        if webp_method is not None:
+            config.config.webp_method = webp_method
+        if metadata_mode:
+            config.config.metadata_mode = MetadataMode(metadata_mode)
         config.config.recursive = recursive
+        if workers:
+            config.config.workers = workers
+        if max_memory:
+            config.config.max_memory = max_memory
+        if max_megapixels:
+            config.config.max_megapixels = max_megapixels
+        if tiled_min_megapixels is not None:
+            config.config.tiled_min_megapixels = tiled_min_megapixels
+        if dedup:
+            config.config.dedup = dedup
         config.config.preview_mode = preview
         config.config.verbose = verbose
         
@@ -212,7 +390,7 @@ def main(input_path: str, output_dir: Optional[str], font_size: Optional[int],
         # 显示当前配置
         if verbose:
             print_info("当前配置:")
-            print(f"  输入路径: {input_path}")
+            print(f"  输入路径: {input_path or '路径列表 ' + input_list.name}")
             print(f"  输出目录: {output_dir or '自动生成'}")
             print(f"  字体大小: {config.config.font_size or '自适应'}")
             print(f"  字体颜色: {config.config.font_color}")
@@ -221,17 +399,34 @@ def main(input_path: str, output_dir: Optional[str], font_size: Optional[int],
             print(f"  边距: {config.config.margin}px")
             print(f"  日期格式: {config.config.date_format.value}")
             print(f"  输出格式: {config.config.output_format}")
-            if config.config.output_format == 'JPEG':
+            if config.config.output_format in ('JPEG', 'WEBP'):
                 print(f"  输出质量: {config.config.output_quality}")
+            print(f"  编码配置档: {config.config.encoder_profile.value}")
+            print(f"  元数据: {config.config.metadata_mode.value}")
             print(f"  递归处理: {'是' if config.config.recursive else '否'}")
+            print(f"  并发线程: {config.config.workers}")
+            print(f"  内存预算: {config.config.max_memory or '不限制'}")
+            print(f"  输入去重: {config.config.dedup or '否'}")
             print(f"  预览模式: {'是' if config.config.preview_mode else '否'}")
             print()
         
+        from .core.image_processor import ImageProcessor
+        from .core.journal import Journal
+        from .core.profiling import Profiler
+        
         # 创建图像处理器
-        processor = ImageProcessor(config)
+        profiler = None
+        if profile or profile_dump or trace_file:
+            profiler = Profiler(top_n=profile_top if profile_dump else 0, trace=bool(trace_file))
+        journal = Journal(journal_file) if journal_file else None
+        queue = None
+        if queue_file:
+            from .core.job_queue import JobQueue
+            queue = JobQueue(queue_file, max_attempts=max_attempts)
+        processor = ImageProcessor(config, profiler, journal, queue)
         
         # 验证输入路径
-        if not processor.validate_input_path(input_path):
+        if input_path and not processor.validate_input_path(input_path):
             sys.exit(1)
         
         # 开始处理
@@ -239,7 +434,38 @@ def main(input_path: str, output_dir: Optional[str], font_size: Optional[int],
             print_info("预览模式 - 不会保存文件")
         
         print_info("开始处理图片...")
-        processor.process_images(input_path, output_dir)
+        try:
+            if input_list is not None:
+                from .core.input_list import iter_input_list
+                processor.process_input_list(iter_input_list(input_list, null_separated),
+                                             output_dir, resume=resume, shard=shard)
+            elif os.path.isfile(input_path) and is_archive(input_path):
+                processor.process_archive(input_path, output_dir)
+            else:
+                processor.process_images(input_path, output_dir, resume=resume, shard=shard)
+        finally:
+            if journal is not None:
+                journal.close()
+            if queue is not None:
+                queue.close()
+        if journal is not None:
+            print_info(f"已写入 {journal.records} 条处理记录到: {journal_file}")
+        if shard:
+            manifest_file = shard_module.manifest_path(journal_file)
+            shard_module.write_manifest(manifest_file, shard_module.build_manifest(
+                shard[0], shard[1], input_path or input_list.name, output_dir,
+                journal_file, processor.stats, started))
+            print_info(f"已写入分片清单: {manifest_file}")
+        
+        if profile or profile_dump:
+            print("\n各阶段耗时:")
+            print(profiler.format_report())
+            if profile_dump:
+                written = profiler.dump_stats(profile_dump)
+                print_info(f"已写入 {len(written)} 份cProfile数据到: {profile_dump}")
+        if trace_file:
+            count = profiler.write_trace(trace_file)
+            print_info(f"已写入 {count} 个时间线区间到: {trace_file}")
         
         print_success("处理完成!")
         
@@ -285,6 +511,136 @@ def formats():
         print(f"  {fmt.value}")
 
 
+@cli.command()
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False),
+              help='监听的Unix域套接字路径')
+@click.option('--port', type=click.IntRange(0, 65535),
+              help='监听 127.0.0.1 上的TCP端口（0表示由系统分配）')
+@click.option('--token-file', type=click.Path(dir_okay=False),
+              help='访问令牌文件（--port 必需，不存在时生成；只允许所有者读写）')
+@click.option('--config', 'config_file', type=click.Path(exists=True),
+              help='请求未指定模板时使用的默认配置文件')
+@click.option('-j', '--workers', type=click.IntRange(1, 64),
+              help='处理任务的线程数 (默认: CPU核心数)')
+@click.option('--max-memory', callback=validate_memory_size,
+              help='并发任务的内存预算，如 512M、2G (默认: 不限制)')
+def serve(socket_path: Optional[str], port: Optional[int], token_file: Optional[str],
+          config_file: Optional[str], workers: Optional[int], max_memory: Optional[str]):
+    """启动常驻水印服务，接受换行分隔的JSON批量任务"""
+    if bool(socket_path) == (port is not None):
+        print_error("需要指定 --socket 或 --port 中的一个")
+        sys.exit(1)
+    if port is not None and not token_file:
+        print_error("TCP 端口对本机所有用户开放，--port 需要同时指定 --token-file")
+        sys.exit(1)
+
+    from .core.daemon import DEFAULT_HOST, DaemonError, WatermarkDaemon, read_token_file
+    from .core.scheduler import parse_memory_size
+    from .core.template_manager import TemplateManager
+
+    config = Config()
+    if config_file:
+        try:
+            config.load_from_file(config_file)
+        except Exception as e:
+            print_error(f"加载配置文件失败: {e}")
+            sys.exit(1)
+
+    token = None
+    if token_file:
+        try:
+            token = read_token_file(token_file, create=True)
+        except (DaemonError, OSError) as e:
+            print_error(f"读取令牌文件失败: {e}")
+            sys.exit(1)
+
+    try:
+        daemon = WatermarkDaemon(socket_path or (DEFAULT_HOST, port), config,
+                                 workers or os.cpu_count() or 1, parse_memory_size(max_memory),
+                                 TemplateManager(), token)
+    except (DaemonError, OSError) as e:
+        print_error(f"服务启动失败: {e}")
+        sys.exit(1)
+
+    try:
+        print_info("正在预热字体和水印缓存...")
+        daemon.warm_up()
+        address = daemon.address
+        where = address if isinstance(address, str) else f"{address[0]}:{address[1]}"
+        print_success(f"服务已启动: {where}（{daemon.scheduler.workers} 个工作线程）")
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        print_warning("\n服务已停止")
+    finally:
+        daemon.close()
+
+
+@cli.command('merge-reports')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('--json', 'json_file', type=click.Path(dir_okay=False),
+              help='把合并后的报告写入JSON文件')
+def merge_reports(paths, json_file: Optional[str]):
+    """合并各分片的清单（清单文件，或包含清单的输出目录）"""
+    import json
+    from .core import shard as shard_module
+    
+    try:
+        manifests = [shard_module.load_manifest(path) for path in shard_module.find_manifests(paths)]
+        if not manifests:
+            print_error("未找到分片清单")
+            sys.exit(1)
+        report = shard_module.merge_manifests(manifests)
+    except (OSError, ValueError) as e:
+        print_error(f"读取分片清单失败: {e}")
+        sys.exit(1)
+    
+    print(f"{'分片':<10} {'主机':<20} {'总数':>8} {'成功':>8} {'失败':>8} {'跳过':>8} {'耗时(s)':>10}")
+    for manifest in report['shards']:
+        stats = manifest['stats']
+        name = f"{manifest['shard']['index']}/{manifest['shard']['count']}"
+        print(f"{name:<10} {manifest['host'][:20]:<20} {stats['total_files']:>8} "
+              f"{stats['processed_files']:>8} {stats['failed_files']:>8} "
+              f"{stats['skipped_files']:>8} {manifest['duration_s']:>10.1f}")
+    
+    stats = report['stats']
+    print("\n" + "="*50)
+    print("合并统计:")
+    print(f"分片: {len(report['shards'])}/{report['count']}")
+    print(f"总文件数: {stats['total_files']}")
+    print(f"成功处理: {stats['processed_files']}")
+    print(f"处理失败: {stats['failed_files']}")
+    print(f"无EXIF信息: {stats['no_exif_files']}")
+    if stats['skipped_files']:
+        print(f"已处理跳过: {stats['skipped_files']}")
+    if stats.get('deduplicated_files'):
+        print(f"重复输入（复用输出，未重新渲染）: {stats['deduplicated_files']}")
+    print("="*50)
+    
+    if json_file:
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print_info(f"已写入合并报告: {json_file}")
+    
+    if report['duplicates']:
+        print_warning(f"重复的分片（以最后完成的为准）: {report['duplicates']}")
+    if report['missing']:
+        print_error(f"缺少分片: {report['missing']}")
+        sys.exit(1)
+
+
+def run(args=None):
+    """程序入口
+    
+    第一个参数是 colors/positions/formats 等工具命令（且不是已存在的路径）时交给
+    工具命令组，其余情况交给处理图片的主命令。
+    """
+    args = sys.argv[1:] if args is None else list(args)
+    if args and args[0] in cli.commands and not os.path.exists(args[0]):
+        cli(args)
+    else:
+        main(args)
+
+
 if __name__ == '__main__':
     # 如果直接运行cli.py，执行主命令
-    main()
+    run()
@@ -0,0 +1,204 @@
+"""
+归档文件模块
+
+直接处理 ZIP/TAR 归档中的图片：按顺序读取成员数据交给解码器，不解压到磁盘；
+处理结果直接写入输出归档（或输出目录）。TAR 按流式模式读取，压缩的 .tar.gz 等
+也只顺序解压一遍。写入 ZIP 时 JPEG 等已压缩的格式按存储（不压缩）方式写入，
+不浪费时间重复压缩。
+"""
+
+import io
+import os
+import posixpath
+import stat
+import tarfile
+import threading
+import time
+import zipfile
+from typing import Iterator, Optional, Tuple, Union
+
+
+# 支持的归档扩展名 → 写入时 tarfile 的压缩方式（ZIP 为 None）
+_ARCHIVE_SUFFIXES = {
+    '.zip': None,
+    '.tar': '',
+    '.tar.gz': 'gz', '.tgz': 'gz',
+    '.tar.bz2': 'bz2', '.tbz2': 'bz2',
+    '.tar.xz': 'xz', '.txz': 'xz',
+}
+
+# 本身已压缩的格式：写入 ZIP 时不再压缩
+STORED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+
+_ZIP_EPOCH = 315619200  # 1980-01-02
+
+
+class ArchiveMember:
+    """归档中的一张图片
+
+    name 为归档内的规范化相对路径（'/' 分隔），data 为成员的完整数据。
+    """
+
+    def __init__(self, name: str, data: bytes, mtime: float):
+        self.name = name
+        self.data = data
+        self.mtime = mtime
+
+    @property
+    def stat(self) -> os.stat_result:
+        """成员的文件状态（拍摄时间缺失时回退到成员的修改时间）"""
+        mtime = int(self.mtime)
+        return os.stat_result((stat.S_IFREG | 0o644, 0, 0, 1, 0, 0, len(self.data),
+                               mtime, mtime, mtime))
+
+
+def archive_suffix(path: str) -> Optional[str]:
+    """归档扩展名（如 '.tar.gz'），不是支持的归档时返回None"""
+    lower = path.lower()
+    for suffix in sorted(_ARCHIVE_SUFFIXES, key=len, reverse=True):
+        if lower.endswith(suffix):
+            return suffix
+    return None
+
+
+def is_archive(path: str) -> bool:
+    """按扩展名判断是否为支持的归档文件"""
+    return archive_suffix(path) is not None
+
+
+def default_output_path(input_path: str) -> str:
+    """默认输出归档：与输入同目录，如 shoot.zip → shoot_watermark.zip"""
+    suffix = archive_suffix(input_path)
+    return input_path[:-len(suffix)] + '_watermark' + input_path[-len(suffix):]
+
+
+def member_name(name: str) -> Optional[str]:
+    """规范化成员路径；指向归档外部的路径（绝对路径、..）返回None"""
+    name = posixpath.normpath(name.replace('\\', '/'))
+    if name.startswith('/') or name == '..' or name.startswith('../') or name == '.':
+        return None
+    return name
+
+
+def iter_members(path: str, accept) -> Iterator[ArchiveMember]:
+    """按归档中的顺序读取被 accept(名称) 接受的普通文件成员"""
+    if archive_suffix(path) == '.zip':
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                name = member_name(info.filename)
+                if info.is_dir() or name is None or not accept(name):
+                    continue
+                yield ArchiveMember(name, archive.read(info), time.mktime(info.date_time + (0, 0, -1)))
+    else:
+        # 流式模式：压缩的TAR也只顺序解压一遍，不需要随机访问
+        with tarfile.open(path, 'r|*') as archive:
+            for info in archive:
+                name = member_name(info.name)
+                if not info.isfile() or name is None or not accept(name):
+                    continue
+                with archive.extractfile(info) as member:
+                    yield ArchiveMember(name, member.read(), info.mtime)
+
+
+def count_members(path: str, accept) -> Optional[int]:
+    """ZIP 从中央目录直接得到成员数；TAR 需要完整读一遍，返回None表示未知"""
+    if archive_suffix(path) != '.zip':
+        return None
+    with zipfile.ZipFile(path) as archive:
+        return sum(1 for info in archive.infolist()
+                   if not info.is_dir() and member_name(info.filename) is not None
+                   and accept(member_name(info.filename)))
+
+
+class ArchiveWriter:
+    """线程安全的输出归档
+
+    先写入同目录的临时文件，commit() 后才替换为目标文件，中断时不会留下
+    看似完整的半成品归档。
+    """
+
+    def __init__(self, path: str):
+        suffix = archive_suffix(path)
+        if suffix is None:
+            raise ValueError(f"不支持的归档格式: {path}")
+        self.path = path
+        self.members = 0
+        self._temp_path = path + '.part'
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        compression = _ARCHIVE_SUFFIXES[suffix]
+        if compression is None:
+            self._zip = zipfile.ZipFile(self._temp_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+            self._tar = None
+        else:
+            self._zip = None
+            self._tar = tarfile.open(self._temp_path, 'w:' + compression if compression else 'w')
+
+    def __enter__(self) -> 'ArchiveWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+    def add(self, name: str, data: Union[bytes, memoryview], mtime: Optional[float] = None) -> None:
+        """写入一个成员（可在多个工作线程中调用）"""
+        mtime = time.time() if mtime is None else mtime
+        with self._lock:
+            if self._zip is not None:
+                # ZIP 的时间戳不能早于1980年
+                info = zipfile.ZipInfo(name, time.localtime(max(mtime, _ZIP_EPOCH))[:6])
+                extension = os.path.splitext(name)[1].lower()
+                info.compress_type = (zipfile.ZIP_STORED if extension in STORED_EXTENSIONS
+                                      else zipfile.ZIP_DEFLATED)
+                info.external_attr = 0o644 << 16
+                self._zip.writestr(info, data)
+            else:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = int(mtime)
+                info.mode = 0o644
+                self._tar.addfile(info, io.BytesIO(data))
+            self.members += 1
+
+    def _close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+        else:
+            self._tar.close()
+
+    def commit(self) -> None:
+        """完成写入并替换为目标文件"""
+        self._close()
+        os.replace(self._temp_path, self.path)
+
+    def abort(self) -> None:
+        """放弃写入，删除临时文件"""
+        self._close()
+        try:
+            os.remove(self._temp_path)
+        except OSError:
+            pass
+
+
+class NamedBuffer(io.BytesIO):
+    """带名称的内存输出（处理日志中记录为该名称）"""
+
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+
+
+def split_output(output: Optional[str], input_path: str) -> Tuple[str, bool]:
+    """确定归档输入的输出位置，返回 (路径, 是否为归档)
+
+    未指定时输出到同目录的 *_watermark 归档；指定的路径带归档扩展名时写归档，
+    否则视为输出目录。
+    """
+    if output is None:
+        return default_output_path(input_path), True
+    return output, is_archive(output)
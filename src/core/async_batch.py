@@ -0,0 +1,169 @@
+"""
+asyncio 批处理接口
+
+供基于 asyncio 的服务调用：文件读写在独立的 I/O 线程池中进行，解码、渲染和编码
+在限定并发数的线程池中进行，事件循环不会被阻塞。批处理结果以异步迭代器按完成
+顺序返回；取消迭代（或所在的任务）时，尚未开始的任务不再执行。
+
+    async with AsyncImageProcessor(config, concurrency=4) as processor:
+        async for result in processor.process_batch([('a.jpg', 'out/a.jpg'), (data, None)]):
+            ...
+"""
+
+import asyncio
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Optional, Set, Tuple, Union
+
+from .config import Config
+from .image_handle import ImageHandle
+from .image_processor import ImageProcessor
+from .profiling import Profiler
+
+
+# 任务输入：文件路径，或 bytes/bytearray/memoryview 形式的编码图片
+JobInput = Union[str, bytes, bytearray, memoryview]
+
+# 文件读写线程数（I/O 等待不占用处理线程）
+DEFAULT_IO_WORKERS = 4
+
+
+@dataclass
+class AsyncJobResult:
+    """单个任务的结果
+
+    output 为None时，成功任务的编码结果放在 data 中。
+    """
+    input: str
+    output: Optional[str]
+    success: bool
+    message: str
+    data: Optional[bytes] = None
+    duration_ms: float = 0.0
+
+
+class AsyncImageProcessor:
+    """asyncio 批处理器
+
+    concurrency 限制同时处理的任务数（None 表示使用配置中的 workers）。
+    同一实例的多个协程可以并发调用，共享同一个并发限制和字体/水印缓存。
+    """
+
+    def __init__(self, config: Config, concurrency: Optional[int] = None,
+                 io_workers: int = DEFAULT_IO_WORKERS, profiler: Optional[Profiler] = None):
+        self.processor = ImageProcessor(config, profiler)
+        self.concurrency = max(1, int(concurrency or config.config.workers or 1))
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency,
+                                            thread_name_prefix='watermark-async')
+        self._io_executor = ThreadPoolExecutor(max_workers=max(1, io_workers),
+                                               thread_name_prefix='watermark-io')
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> 'AsyncImageProcessor':
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """关闭线程池（已排队未开始的任务被取消，不等待正在执行的任务）"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._io_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def process_bytes(self, data, **options) -> bytes:
+        """异步处理内存中的编码图片，参数见 ImageProcessor.process_bytes"""
+        async with self._slot():
+            return await self._run(self._executor, lambda: self.processor.process_bytes(data, **options))
+
+    async def process_file(self, input_path: str, output_path: Optional[str] = None) -> AsyncJobResult:
+        """异步处理一个文件；output_path 为None时结果以 data 返回"""
+        async with self._slot():
+            return await self._process(input_path, output_path)
+
+    async def process_batch(self, jobs: Iterable[Tuple[JobInput, Optional[str]]]
+                            ) -> AsyncIterator[AsyncJobResult]:
+        """批量处理 (输入, 输出路径或None)，按完成顺序逐个产出结果
+
+        jobs 按需读取，同时在途的任务不超过并发数，超大批次不会一次性创建全部任务。
+        单个任务的错误记录在结果中，不会中断整个批次；停止迭代或取消时，
+        未开始的任务不再执行。
+        """
+        pending: Set[asyncio.Task] = set()
+        iterator = iter(jobs)
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < self.concurrency:
+                    job = next(iterator, None)
+                    if job is None:
+                        exhausted = True
+                    else:
+                        pending.add(asyncio.ensure_future(self._guarded(*job)))
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def _slot(self) -> asyncio.Semaphore:
+        # 信号量需要在事件循环中创建
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _guarded(self, source: JobInput, output_path: Optional[str]) -> AsyncJobResult:
+        async with self._slot():
+            return await self._process(source, output_path)
+
+    async def _run(self, executor: ThreadPoolExecutor, fn):
+        return await asyncio.get_running_loop().run_in_executor(executor, fn)
+
+    async def _process(self, source: JobInput, output_path: Optional[str]) -> AsyncJobResult:
+        start = time.perf_counter()
+        name = source if isinstance(source, str) else '<memory>'
+        try:
+            if isinstance(source, str):
+                data, stat = await self._run(self._io_executor, lambda: _read_file(source))
+            else:
+                data, stat = source, None
+            success, message, encoded = await self._run(
+                self._executor, lambda: self._encode(name, data, stat))
+            if success and output_path is not None and encoded:
+                await self._run(self._io_executor, lambda: _write_file(output_path, encoded))
+                encoded = None
+        except (OSError, ValueError) as e:
+            success, message, encoded = False, f"处理出错: {e}", None
+        return AsyncJobResult(name, output_path, success, message,
+                              encoded if success else None,
+                              round((time.perf_counter() - start) * 1000, 3))
+
+    def _encode(self, name: str, data, stat) -> Tuple[bool, str, Optional[bytes]]:
+        """在处理线程中解码、渲染并编码到内存"""
+        output = io.BytesIO()
+        with ImageHandle(name, data=data, stat=stat) as handle:
+            success, message = self.processor.process_single_image(
+                handle, output, quality=self.processor.config.config.output_quality
+            )
+        # 预览模式不编码，data 为空
+        return success, message, output.getvalue() if success else None
+
+
+def _read_file(path: str) -> Tuple[bytes, os.stat_result]:
+    with open(path, 'rb') as f:
+        return f.read(), os.fstat(f.fileno())
+
+
+def _write_file(path: str, data: bytes) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
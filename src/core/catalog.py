@@ -0,0 +1,210 @@
+"""
+文件目录（FileCatalog）模块
+
+GUI 图片列表和命令行批处理共用的文件清单：每个文件一个使用 __slots__ 的紧凑条目
+（路径、大小、修改时间、尺寸、拍摄时间、处理状态），并按规范化路径建立索引，
+重复导入的判断为 O(1)。扫描目录时只记录路径，大小和修改时间在首次访问时读取，
+尺寸等图片信息只读取文件头，拍摄时间只在需要时解析 EXIF，读取后缓存在条目中。
+"""
+
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from PIL import Image
+
+
+# 处理状态
+STATUS_PENDING = 'pending'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+# 尚未读取的字段
+_UNLOADED = object()
+
+
+def path_key(path: str) -> str:
+    """索引使用的键：绝对路径并按系统规则规范大小写（'./a.jpg' 与 'a.jpg' 视为同一文件）"""
+    return os.path.normcase(os.path.abspath(path))
+
+
+class CatalogEntry:
+    """目录中的一个文件，元数据按需读取并缓存"""
+
+    __slots__ = ('path', 'status', '_size', '_mtime', '_header', '_captured')
+
+    def __init__(self, path: str, size: Optional[int] = None, mtime: Optional[float] = None):
+        self.path = path
+        self.status = STATUS_PENDING
+        self._size = _UNLOADED if size is None else size
+        self._mtime = _UNLOADED if mtime is None else mtime
+        self._header = _UNLOADED
+        self._captured = _UNLOADED
+
+    def __repr__(self) -> str:
+        return f"CatalogEntry({self.path!r}, status={self.status!r})"
+
+    @property
+    def filename(self) -> str:
+        return os.path.basename(self.path)
+
+    def _load_stat(self) -> None:
+        try:
+            stat = os.stat(self.path)
+            self._size, self._mtime = stat.st_size, stat.st_mtime
+        except OSError:
+            self._size = self._mtime = None
+
+    @property
+    def size(self) -> Optional[int]:
+        """文件字节数（无法读取时为None）"""
+        if self._size is _UNLOADED:
+            self._load_stat()
+        return self._size
+
+    @property
+    def mtime(self) -> Optional[float]:
+        """修改时间（无法读取时为None）"""
+        if self._mtime is _UNLOADED:
+            self._load_stat()
+        return self._mtime
+
+    def _load_header(self) -> Optional[Tuple[int, int, str, str, bool]]:
+        if self._header is _UNLOADED:
+            try:
+                # 只解析文件头，不解码像素
+                with Image.open(self.path) as img:
+                    transparent = img.mode in ('RGBA', 'LA') or 'transparency' in img.info
+                    self._header = (img.size[0], img.size[1], img.mode, img.format, transparent)
+            except Exception:
+                self._header = None
+        return self._header
+
+    def set_dimensions(self, size: Tuple[int, int], mode: str, image_format: Optional[str],
+                       transparent: bool = False) -> None:
+        """已打开图片的调用方（如生成缩略图时）直接填入图片信息，不必再读文件头"""
+        self._header = (size[0], size[1], mode, image_format, transparent)
+
+    @property
+    def dimensions(self) -> Optional[Tuple[int, int]]:
+        """图片尺寸 (宽, 高)（无法读取时为None）"""
+        header = self._load_header()
+        return (header[0], header[1]) if header else None
+
+    @property
+    def mode(self) -> Optional[str]:
+        header = self._load_header()
+        return header[2] if header else None
+
+    @property
+    def image_format(self) -> Optional[str]:
+        header = self._load_header()
+        return header[3] if header else None
+
+    @property
+    def has_transparency(self) -> bool:
+        header = self._load_header()
+        return bool(header and header[4])
+
+    @property
+    def captured(self) -> Optional[datetime]:
+        """拍摄时间（EXIF 中没有时为文件修改时间）"""
+        if self._captured is _UNLOADED:
+            from .exif_reader import ExifReader
+            try:
+                self._captured = ExifReader().extract_datetime(self.path)
+            except Exception:
+                self._captured = None
+        return self._captured
+
+    def refresh(self) -> None:
+        """文件可能已变化：丢弃缓存的元数据，下次访问时重新读取"""
+        self._size = self._mtime = self._header = self._captured = _UNLOADED
+
+
+class FileCatalog:
+    """按加入顺序保存文件条目，并按规范化路径索引"""
+
+    def __init__(self, paths: Iterable[str] = ()):
+        self._entries: Dict[str, CatalogEntry] = {}
+        self.extend(paths)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[CatalogEntry]:
+        return iter(self._entries.values())
+
+    def __contains__(self, path: str) -> bool:
+        return path_key(path) in self._entries
+
+    def get(self, path: str) -> Optional[CatalogEntry]:
+        return self._entries.get(path_key(path))
+
+    def add(self, path: str, size: Optional[int] = None,
+            mtime: Optional[float] = None) -> Optional[CatalogEntry]:
+        """加入一个文件，返回新条目；已在目录中时返回None"""
+        key = path_key(path)
+        if key in self._entries:
+            return None
+        entry = self._entries[key] = CatalogEntry(path, size, mtime)
+        return entry
+
+    def extend(self, paths: Iterable[str]) -> List[CatalogEntry]:
+        """加入多个文件，返回其中新加入的条目"""
+        added = []
+        for path in paths:
+            entry = self.add(path)
+            if entry is not None:
+                added.append(entry)
+        return added
+
+    def remove(self, path: str) -> Optional[CatalogEntry]:
+        return self._entries.pop(path_key(path), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def paths(self) -> List[str]:
+        return [entry.path for entry in self._entries.values()]
+
+    def set_status(self, path: str, status: str) -> None:
+        """更新文件的处理状态（不在目录中的文件忽略）"""
+        entry = self._entries.get(path_key(path))
+        if entry is not None:
+            entry.status = status
+
+    def with_status(self, status: str) -> List[CatalogEntry]:
+        return [entry for entry in self._entries.values() if entry.status == status]
+
+    def scan(self, root: str, extensions: Iterable[str], recursive: bool = False,
+             include_hidden: bool = False) -> List[CatalogEntry]:
+        """扫描目录中扩展名匹配（不区分大小写）的文件并按路径排序加入，返回新加入的条目
+
+        只读取目录项，不读取文件元数据。include_hidden 为False时跳过以 '.' 开头的
+        文件和目录。root 为文件时只检查该文件。
+        """
+        extensions = tuple(ext.lower() for ext in extensions)
+        if os.path.isfile(root):
+            found = [root] if root.lower().endswith(extensions) else []
+        else:
+            found = []
+            pending = [root]
+            while pending:
+                directory = pending.pop()
+                try:
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            if not include_hidden and entry.name.startswith('.'):
+                                continue
+                            try:
+                                if entry.is_dir():
+                                    if recursive:
+                                        pending.append(entry.path)
+                                elif entry.name.lower().endswith(extensions) and entry.is_file():
+                                    found.append(entry.path)
+                            except OSError:
+                                continue
+                except OSError:
+                    continue
+        return self.extend(sorted(found))
@@ -41,6 +41,20 @@ class WatermarkType(Enum):
     IMAGE = "image"         # 图片水印
 
 
+class EncoderProfile(Enum):
+    """输出编码配置档"""
+    FAST = "fast"                                  # 最快编码，文件较大
+    BALANCED = "balanced"                          # 速度与体积平衡（默认）
+    SMALLEST = "smallest"                          # 最小文件，编码最慢
+    KEEP_SOURCE_QUALITY = "keep-source-quality"    # 沿用源JPEG的量化表和色度采样
+
+
+class MetadataMode(Enum):
+    """输出元数据处理方式"""
+    STRIP = "strip"              # 不保留源元数据（仅保留方向标签）
+    PASSTHROUGH = "passthrough"  # 逐字节透传源文件的EXIF/ICC/XMP等元数据段
+
+
 class ScaleMode(Enum):
     """图片水印缩放模式"""
     PERCENTAGE = "percentage"  # 按百分比
@@ -115,11 +129,19 @@ class WatermarkConfig:
     image_watermark: ImageWatermarkConfig = None
     
     # 输出设置
-    output_format: str = "JPEG"  # JPEG, PNG
-    output_quality: int = 95  # JPEG质量 1-100
+    output_format: str = "JPEG"  # JPEG, PNG, WEBP, TIFF
+    output_quality: int = 95  # JPEG/WebP质量 1-100
+    encoder_profile: EncoderProfile = EncoderProfile.BALANCED
+    webp_method: Optional[int] = None  # WebP编码速度 0(快)-6(慢)，None表示由配置档决定
+    metadata_mode: MetadataMode = MetadataMode.STRIP
     
     # 处理设置
     recursive: bool = False
+    workers: int = 1  # 并发处理的线程数
+    max_memory: Optional[str] = None  # 并发任务的内存预算，如 "2G"；None表示不限制
+    max_megapixels: Optional[float] = None  # 单张图片的像素上限（百万像素），超出则拒绝处理
+    tiled_min_megapixels: Optional[float] = 64  # TIFF→TIFF且超过该像素数时分块处理；None表示不分块
+    dedup: Optional[str] = None  # 内容相同的输入只渲染一次，其余 'link' 硬链接或 'copy' 复制输出；None表示不去重
     preview_mode: bool = False
     verbose: bool = False
     
@@ -137,6 +159,8 @@ class WatermarkConfig:
         data['watermark_type'] = self.watermark_type.value
         data['position'] = self.position.value
         data['date_format'] = self.date_format.value
+        data['encoder_profile'] = self.encoder_profile.value
+        data['metadata_mode'] = self.metadata_mode.value
         
         # 处理嵌套配置
         if 'text_watermark' in data and data['text_watermark']:
@@ -159,6 +183,10 @@ class WatermarkConfig:
             data['position'] = Position(data['position'])
         if 'date_format' in data:
             data['date_format'] = DateFormat(data['date_format'])
+        if 'encoder_profile' in data:
+            data['encoder_profile'] = EncoderProfile(data['encoder_profile'])
+        if 'metadata_mode' in data:
+            data['metadata_mode'] = MetadataMode(data['metadata_mode'])
         
         # 处理嵌套配置
         if 'text_watermark' in data and data['text_watermark']:
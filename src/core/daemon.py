@@ -0,0 +1,509 @@
+"""
+常驻水印服务模块
+
+`python -m src serve` 启动的本机守护进程，在 Unix 域套接字或 127.0.0.1 的TCP端口上
+接受批量任务。进程常驻，字体、水印图片和渲染好的水印局部层缓存在多次请求之间一直
+有效，省去每次调用命令行时的解释器启动、模块导入、字体扫描和字体加载开销。
+
+协议为换行分隔的 JSON，每行一条消息。请求::
+
+    {"id": "r1", "template": "logo", "config": {"font_color": "red"},
+     "jobs": [{"id": "a", "input": "/photos/a.jpg", "output": "/out/a.jpg"},
+              {"id": "b", "data": "<base64>"}]}
+
+config 中的字段覆盖模板（未指定模板时为服务的默认配置）中的同名字段，
+text_watermark / image_watermark 按字段合并。任务的输入是文件路径（input）或
+base64 编码的图片数据（data）；给出 output 时写入该路径，否则把编码后的结果以
+base64 放在响应的 data 中。
+
+任务在服务的线程池中并发处理（受内存预算约束），结果按完成顺序逐条写回，
+最后一条 done 消息汇总整个请求::
+
+    {"request": "r1", "job": "b", "status": "ok", "message": "...", "data": "<base64>", "duration_ms": 12.3}
+    {"request": "r1", "done": true, "ok": 2, "failed": 0, "duration_ms": 25.1}
+
+另有 {"op": "ping"}（服务状态和缓存统计）和 {"op": "shutdown"}（停止服务）。
+
+服务可以读写调用者有权访问的任意路径，因此只接受本机用户自己的连接：Unix 域套接字
+以 0600 权限创建；TCP 端口对本机所有用户开放，必须配置访问令牌，连接后的第一条
+消息须为 {"op": "auth", "token": "..."}，否则服务报错并断开连接。令牌通常保存在
+只有所有者可读的文件中（见 read_token_file）。
+"""
+
+import base64
+import binascii
+import hmac
+import io
+import itertools
+import json
+import os
+import secrets
+import socket
+import socketserver
+import stat
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from .config import Config, WatermarkConfig
+from .image_handle import ImageHandle
+from .image_processor import ImageProcessor
+from .scheduler import JobScheduler
+from .template_manager import TemplateManager
+from . import watermark as watermark_module
+from ..utils.font_manager import font_manager
+
+
+# Unix 域套接字路径，或 (主机, 端口)
+Address = Union[str, Tuple[str, int]]
+
+# TCP 只监听本机
+DEFAULT_HOST = '127.0.0.1'
+
+
+class DaemonError(Exception):
+    """请求无法执行（格式错误、模板不存在等）或服务无法启动"""
+
+
+def read_token_file(path: str, create: bool = False) -> str:
+    """读取访问令牌文件
+
+    文件不存在且 create 为真时生成随机令牌，以 0600 权限写入。POSIX 系统上拒绝
+    同组或其他用户可访问的令牌文件。
+    """
+    path = os.path.expanduser(path)
+    if create and not os.path.exists(path):
+        token = secrets.token_urlsafe(32)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(token + '\n')
+        return token
+    if os.name == 'posix' and os.stat(path).st_mode & 0o077:
+        raise DaemonError(f"令牌文件权限过宽，请执行 chmod 600 {path}")
+    with open(path, 'r', encoding='utf-8') as f:
+        token = f.read().strip()
+    if not token:
+        raise DaemonError(f"令牌文件为空: {path}")
+    return token
+
+
+def merge_config(base: WatermarkConfig, overrides: Optional[Dict[str, Any]]) -> WatermarkConfig:
+    """把请求中的配置字段合并到基础配置上，返回新的配置（嵌套的水印设置按字段合并）"""
+    data = base.to_dict()
+    for key, value in (overrides or {}).items():
+        if key not in data:
+            raise DaemonError(f"未知的配置字段: {key}")
+        if isinstance(value, dict) and isinstance(data[key], dict):
+            data[key].update(value)
+        else:
+            data[key] = value
+    try:
+        return WatermarkConfig.from_dict(data)
+    except (TypeError, ValueError) as e:
+        raise DaemonError(f"无效的配置: {e}")
+
+
+class _RequestState:
+    """一个请求的任务计数（任务在多个线程中完成，每个任务只计数一次）"""
+
+    def __init__(self, request_id: Any, send: Callable[[Dict[str, Any]], None]):
+        self.request_id = request_id
+        self.send = send
+        self.ok = 0
+        self.failed = 0
+        self._reported = set()
+        self._lock = threading.Lock()
+
+    def record(self, index: int, success: bool) -> bool:
+        """记录第 index 个任务的结果，该任务已记录过时返回False"""
+        with self._lock:
+            if index in self._reported:
+                return False
+            self._reported.add(index)
+            if success:
+                self.ok += 1
+            else:
+                self.failed += 1
+        return True
+
+    def report(self, job_id: Any, success: bool, result: Dict[str, Any]) -> None:
+        message = {'request': self.request_id, 'job': job_id,
+                   'status': 'ok' if success else 'failed'}
+        message.update(result)
+        self.send(message)
+
+
+class WatermarkDaemon:
+    """常驻水印服务
+
+    address 为字符串时监听该路径的 Unix 域套接字，否则为 (主机, 端口)，端口为0时
+    由系统分配。所有连接共享同一个按内存预算放行的线程池。TCP 模式必须给出
+    token，客户端认证通过后才能提交请求。
+    """
+
+    def __init__(self, address: Address, config: Optional[Config] = None, workers: int = 1,
+                 max_memory: Optional[int] = None,
+                 template_manager: Optional[TemplateManager] = None,
+                 token: Optional[str] = None):
+        if not isinstance(address, str) and not token:
+            raise DaemonError("TCP 模式需要访问令牌（--token-file）")
+        self.token = token
+        self.config = config or Config()
+        self.template_manager = template_manager
+        self.stats = {'requests': 0, 'jobs_ok': 0, 'jobs_failed': 0}
+        self._stats_lock = threading.Lock()
+        self._started = time.time()
+        self._server = _create_server(address)
+        self._server.watermark_daemon = self
+        self.scheduler = JobScheduler(workers, max_memory)
+
+    @property
+    def address(self) -> Address:
+        """实际监听的地址（TCP 端口为0时是系统分配的端口）"""
+        address = self._server.server_address
+        return address if isinstance(address, str) else tuple(address[:2])
+
+    def warm_up(self) -> None:
+        """预热：扫描系统字体，并按默认配置渲染一次水印（加载字体和水印图片）"""
+        font_manager.get_system_fonts()
+        processor = ImageProcessor(self.config)
+        text = processor.exif_reader.format_date(datetime.now(), self.config.config.date_format)
+        try:
+            processor.watermark_processor.watermark_layer((1920, 1080), text)
+        except Exception:
+            # 默认配置无法渲染（如水印图片不存在）时由实际请求报告错误
+            pass
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def shutdown(self) -> None:
+        """停止 serve_forever（不能在调用 serve_forever 的线程中调用）"""
+        self._server.shutdown()
+
+    def close(self) -> None:
+        """关闭监听套接字和线程池，删除 Unix 域套接字文件"""
+        self._server.server_close()
+        self.scheduler.shutdown()
+        if isinstance(self.address, str):
+            try:
+                os.unlink(self.address)
+            except OSError:
+                pass
+
+    def check_token(self, token: Any) -> bool:
+        """检查客户端给出的令牌（未配置令牌时总是通过）"""
+        if self.token is None:
+            return True
+        if not isinstance(token, str):
+            return False
+        return hmac.compare_digest(token.encode('utf-8'), self.token.encode('utf-8'))
+
+    def status(self) -> Dict[str, Any]:
+        """服务状态和缓存统计"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {
+            'ok': True,
+            'pid': os.getpid(),
+            'uptime_s': round(time.time() - self._started, 3),
+            'workers': self.scheduler.workers,
+            **stats,
+            'caches': {
+                'fonts': font_manager.get_cache_stats(),
+                'watermark': watermark_module.get_cache_stats(),
+            },
+        }
+
+    def resolve_config(self, message: Dict[str, Any]) -> Config:
+        """按请求中的模板名和配置字段生成本次请求的配置"""
+        template = message.get('template')
+        if template:
+            if self.template_manager is None:
+                raise DaemonError("服务未启用模板")
+            try:
+                base = self.template_manager.load_template(template)
+            except FileNotFoundError:
+                raise DaemonError(f"模板不存在: {template}")
+        else:
+            base = self.config.config
+        overrides = message.get('config')
+        if overrides is not None and not isinstance(overrides, dict):
+            raise DaemonError("config 必须是JSON对象")
+        return Config(merge_config(base, overrides))
+
+    def handle_message(self, message: Dict[str, Any], send: Callable[[Dict[str, Any]], None]) -> None:
+        """处理一条消息，结果通过 send 写回（可能在工作线程中调用）"""
+        op = message.get('op', 'process')
+        if op == 'auth':
+            # 连接已在 _RequestHandler 中认证，重复的认证消息直接确认
+            if not self.check_token(message.get('token')):
+                raise DaemonError("认证失败")
+            send({'ok': True})
+        elif op == 'ping':
+            send(self.status())
+        elif op == 'shutdown':
+            send({'ok': True})
+            self.shutdown()
+        elif op == 'process':
+            self._process(message, send)
+        else:
+            raise DaemonError(f"未知的操作: {op}")
+
+    def _process(self, message: Dict[str, Any], send: Callable[[Dict[str, Any]], None]) -> None:
+        jobs = message.get('jobs')
+        if not isinstance(jobs, list):
+            raise DaemonError("请求缺少 jobs 列表")
+        config = self.resolve_config(message)
+        processor = ImageProcessor(config)
+        state = _RequestState(message.get('id'), send)
+        start = time.perf_counter()
+        with self._stats_lock:
+            self.stats['requests'] += 1
+
+        futures = []
+        for index, job in enumerate(jobs):
+            job_id = job.get('id', index) if isinstance(job, dict) else index
+            handle = None
+            try:
+                handle, output = _open_job(job, job_id)
+                # 只读取文件头来估算内存占用，句柄交给任务继续使用
+                cost = processor.estimate_memory(handle)
+            except Exception as e:
+                if handle is not None:
+                    handle.close()
+                self._report(state, index, job_id, False, {'message': f"处理出错: {e}"})
+                continue
+            # 预算不足时阻塞，直到已放行的任务释放内存
+            futures.append((index, job_id, self.scheduler.submit(
+                cost, self._run_job, processor, state, index, job_id, handle, output)))
+
+        for index, job_id, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                # 任务在写回结果前出错（如结果编码失败）时记为失败；已写回的任务不重复计数
+                self._report(state, index, job_id, False, {'message': f"处理出错: {e}"})
+        send({'request': state.request_id, 'done': True, 'ok': state.ok, 'failed': state.failed,
+              'duration_ms': round((time.perf_counter() - start) * 1000, 3)})
+
+    def _run_job(self, processor: ImageProcessor, state: _RequestState, index: int, job_id: Any,
+                 handle: ImageHandle, output: Optional[str]) -> None:
+        start = time.perf_counter()
+        buffer = io.BytesIO() if output is None else None
+        with handle:
+            success, message = processor.process_single_image(
+                handle, output or buffer, quality=processor.config.config.output_quality
+            )
+        result = {'message': message, 'duration_ms': round((time.perf_counter() - start) * 1000, 3)}
+        if success:
+            if output is None:
+                result['data'] = base64.b64encode(buffer.getbuffer()).decode('ascii')
+            else:
+                result['output'] = output
+        self._report(state, index, job_id, success, result)
+
+    def _report(self, state: _RequestState, index: int, job_id: Any, success: bool,
+                result: Dict[str, Any]) -> None:
+        if not state.record(index, success):
+            return
+        with self._stats_lock:
+            self.stats['jobs_ok' if success else 'jobs_failed'] += 1
+        state.report(job_id, success, result)
+
+
+def _open_job(job: Any, job_id: Any) -> Tuple[ImageHandle, Optional[str]]:
+    """按任务描述创建图片句柄，返回 (句柄, 输出路径或None)"""
+    if not isinstance(job, dict):
+        raise DaemonError("任务必须是JSON对象")
+    output = job.get('output')
+    if 'data' in job:
+        try:
+            data = base64.b64decode(job['data'], validate=True)
+        except (binascii.Error, TypeError, ValueError) as e:
+            raise DaemonError(f"无效的base64数据: {e}")
+        return ImageHandle(job.get('name') or f"<job {job_id}>", data=data), output
+    if 'input' in job:
+        return ImageHandle(job['input']), output
+    raise DaemonError("任务需要 input（文件路径）或 data（base64 图片数据）")
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """一个客户端连接：逐行读取请求，结果可能来自多个工作线程，写回时加锁"""
+
+    def handle(self) -> None:
+        daemon = self.server.watermark_daemon
+        lock = threading.Lock()
+        connected = [True]
+
+        def send(message: Dict[str, Any]) -> None:
+            line = (json.dumps(message, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+            with lock:
+                if not connected[0]:
+                    return
+                try:
+                    self.wfile.write(line)
+                except OSError:
+                    # 客户端已断开，剩余结果直接丢弃
+                    connected[0] = False
+
+        if daemon.token is not None and not self._authenticate(daemon, send):
+            return
+
+        for raw in self.rfile:
+            if not raw.strip():
+                continue
+            message = None
+            try:
+                message = json.loads(raw)
+                if not isinstance(message, dict):
+                    raise DaemonError("请求必须是JSON对象")
+                daemon.handle_message(message, send)
+            except (ValueError, DaemonError) as e:
+                request_id = message.get('id') if isinstance(message, dict) else None
+                send({'request': request_id, 'error': str(e)})
+            if not connected[0]:
+                return
+
+    def _authenticate(self, daemon: WatermarkDaemon, send: Callable[[Dict[str, Any]], None]) -> bool:
+        """第一条消息必须是携带正确令牌的 auth 消息，否则回复错误并断开"""
+        raw = self.rfile.readline()
+        try:
+            message = json.loads(raw) if raw.strip() else None
+        except ValueError:
+            message = None
+        if (isinstance(message, dict) and message.get('op') == 'auth'
+                and daemon.check_token(message.get('token'))):
+            send({'ok': True})
+            return True
+        if raw:
+            send({'request': None, 'error': "认证失败"})
+        return False
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+else:
+    _ThreadingUnixServer = None
+
+
+def _remove_stale_socket(path: str) -> None:
+    """删除上次异常退出时遗留的套接字文件；已有服务在监听时报错"""
+    if not os.path.exists(path):
+        return
+    if not stat.S_ISSOCK(os.stat(path).st_mode):
+        raise DaemonError(f"路径已存在且不是套接字: {path}")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise DaemonError(f"已有服务在监听: {path}")
+    finally:
+        probe.close()
+
+
+def _create_server(address: Address) -> socketserver.BaseServer:
+    if isinstance(address, str):
+        if _ThreadingUnixServer is None:
+            raise DaemonError("当前平台不支持Unix域套接字，请改用TCP端口")
+        _remove_stale_socket(address)
+        # 套接字文件在 bind 时创建，用 umask 保证它从一开始就只有所有者可以连接
+        old_umask = os.umask(0o177)
+        try:
+            server = _ThreadingUnixServer(address, _RequestHandler)
+        finally:
+            os.umask(old_umask)
+        os.chmod(address, 0o600)
+        return server
+    return _ThreadingTCPServer(tuple(address), _RequestHandler)
+
+
+class DaemonClient:
+    """常驻服务的客户端（一个实例对应一个连接，不能在多个线程中同时使用）
+
+    任务中的 data 可以直接传入 bytes，返回结果中的 data 也已解码为 bytes。
+    服务配置了访问令牌时需传入 token，连接后先完成认证。
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, address: Address, timeout: Optional[float] = None,
+                 token: Optional[str] = None):
+        if isinstance(address, str):
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(timeout)
+            self._sock.connect(address)
+        else:
+            self._sock = socket.create_connection(tuple(address), timeout)
+        self._reader = self._sock.makefile('rb')
+        if token is not None:
+            try:
+                self._send({'op': 'auth', 'token': token})
+                self._receive()
+            except Exception:
+                self.close()
+                raise
+
+    def __enter__(self) -> 'DaemonClient':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._reader.close()
+        self._sock.close()
+
+    def _send(self, message: Dict[str, Any]) -> None:
+        self._sock.sendall((json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8'))
+
+    def _receive(self) -> Dict[str, Any]:
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("服务已关闭连接")
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise DaemonError(reply['error'])
+        return reply
+
+    def process(self, jobs: List[Dict[str, Any]], config: Optional[Dict[str, Any]] = None,
+                template: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """提交一批任务，按完成顺序逐条返回任务结果，最后一条是 done 汇总"""
+        message: Dict[str, Any] = {'id': next(self._ids), 'jobs': [_encode_job(job) for job in jobs]}
+        if config is not None:
+            message['config'] = config
+        if template is not None:
+            message['template'] = template
+        self._send(message)
+        while True:
+            reply = self._receive()
+            if 'data' in reply:
+                reply['data'] = base64.b64decode(reply['data'])
+            yield reply
+            if reply.get('done'):
+                return
+
+    def ping(self) -> Dict[str, Any]:
+        self._send({'op': 'ping'})
+        return self._receive()
+
+    def shutdown(self) -> None:
+        """请求服务停止"""
+        self._send({'op': 'shutdown'})
+        self._receive()
+
+
+def _encode_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    data = job.get('data')
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        job = dict(job, data=base64.b64encode(data).decode('ascii'))
+    return job
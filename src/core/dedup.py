@@ -0,0 +1,118 @@
+"""
+输入去重模块
+
+归档中常有同一张照片的多份逐字节相同的副本（重复导出、备份目录）。去重时先比较
+文件大小，只有出现同样大小的文件时才对其内容做流式哈希（安装了 xxhash 时使用
+xxh3-128，否则使用 blake2b）；内容相同且输出格式相同的输入只渲染一次，其余目标
+直接硬链接或复制第一份的输出。
+
+内容相同的文件渲染结果也可能不同：没有 EXIF 拍摄时间的图片以文件修改时间作为
+水印日期。调用方可以给出这类影响输出的属性（variant），只在内容相同时读取。
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+from typing import Callable, Dict, Optional, Tuple, Union
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+# 去重方式：硬链接（不同文件系统时自动改为复制）或复制
+MODE_LINK = 'link'
+MODE_COPY = 'copy'
+MODES = (MODE_LINK, MODE_COPY)
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    """流式计算文件内容的哈希"""
+    digest = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DuplicateFinder:
+    """按 (大小, 内容哈希, 输出格式, variant) 识别重复输入（线程安全）
+
+    每个大小只出现一次的文件不需要读取内容；同样大小的第二个文件出现时才计算
+    两者的哈希。输入可以边读边查（如 --input-list 的流），不需要预先知道全部文件。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (大小, 输出格式) -> 尚未计算哈希的唯一文件，或 {哈希: 第一个文件}；
+        # 出现内容相同的文件后 {哈希: {variant: 第一个文件}}
+        self._groups: Dict[Tuple[int, str], Union[str, Dict[str, Union[str, Dict[str, str]]]]] = {}
+        self.hashed_files = 0
+
+    def find(self, path: str, output_format: str = '',
+             variant: Optional[Callable[[str], str]] = None) -> Optional[str]:
+        """返回此前登记过的内容相同的输入；没有时登记该输入并返回None
+
+        output_format 不同的输入即使内容相同也不视为重复（输出字节不同）。variant
+        返回影响输出的其它属性（如水印文本），只对内容相同的文件调用，结果不同的
+        输入不视为重复。读取失败时抛出 OSError。
+        """
+        key = (os.path.getsize(path), output_format)
+        with self._lock:
+            group = self._groups.get(key)
+            if group is None:
+                self._groups[key] = path
+                return None
+            if isinstance(group, str):
+                group = self._groups[key] = {self._digest(group): group}
+            digest = self._digest(path)
+            variants = group.get(digest)
+            if variants is None:
+                group[digest] = path
+                return None
+            if isinstance(variants, str):
+                variants = group[digest] = {_variant(variants, variant): variants}
+            value = _variant(path, variant)
+            original = variants.get(value)
+            if original is None:
+                variants[value] = path
+            return original
+
+    def _digest(self, path: str) -> str:
+        self.hashed_files += 1
+        return file_digest(path)
+
+
+def _variant(path: str, variant: Optional[Callable[[str], str]]) -> str:
+    return variant(path) if variant is not None else ''
+
+
+def copy_output(source: str, destination: str, mode: str = MODE_LINK) -> str:
+    """把已渲染的输出放到另一个目标路径，返回实际使用的方式（'link' 或 'copy'）
+
+    目标已存在时覆盖（与重新渲染的行为一致）；先写到临时路径再替换。
+    """
+    directory = os.path.dirname(destination)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = destination + '.dedup-tmp'
+    if os.path.lexists(temp_path):
+        os.remove(temp_path)
+    used = MODE_COPY
+    if mode == MODE_LINK:
+        try:
+            os.link(source, temp_path)
+            used = MODE_LINK
+        except OSError:
+            pass
+    if used == MODE_COPY:
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, destination)
+    return used
@@ -0,0 +1,152 @@
+"""
+图片编码模块
+
+负责按输出格式和编码配置档（fast/balanced/smallest/keep-source-quality）保存图片。
+"""
+
+from typing import Any, BinaryIO, Dict, Optional, Union
+from PIL import Image, JpegImagePlugin
+
+from .config import EncoderProfile
+
+
+# 支持的输出格式及对应扩展名
+OUTPUT_FORMATS = ('JPEG', 'PNG', 'WEBP', 'TIFF')
+FORMAT_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'WEBP': '.webp',
+    'TIFF': '.tif'
+}
+
+# 各配置档的编码参数
+PROFILE_SETTINGS: Dict[EncoderProfile, Dict[str, Dict[str, Any]]] = {
+    EncoderProfile.FAST: {
+        'JPEG': {'optimize': False},
+        'PNG': {'compress_level': 1},
+        'WEBP': {'method': 0},
+        'TIFF': {'compression': 'tiff_lzw'}
+    },
+    EncoderProfile.BALANCED: {
+        'JPEG': {'optimize': True},
+        'PNG': {'compress_level': 6},
+        'WEBP': {'method': 4},
+        'TIFF': {'compression': 'tiff_adobe_deflate'}
+    },
+    EncoderProfile.SMALLEST: {
+        'JPEG': {'optimize': True, 'progressive': True},
+        'PNG': {'optimize': True},
+        'WEBP': {'method': 6},
+        'TIFF': {'compression': 'tiff_adobe_deflate'}
+    },
+    EncoderProfile.KEEP_SOURCE_QUALITY: {
+        'JPEG': {'optimize': True},
+        'PNG': {'compress_level': 6},
+        'WEBP': {'method': 4},
+        'TIFF': {'compression': 'tiff_adobe_deflate'}
+    }
+}
+
+
+def parse_profile(profile: Union[EncoderProfile, str, None]) -> EncoderProfile:
+    """解析编码配置档（接受枚举或字符串，None表示默认的balanced）"""
+    if profile is None:
+        return EncoderProfile.BALANCED
+    if isinstance(profile, EncoderProfile):
+        return profile
+    return EncoderProfile(profile)
+
+
+def get_source_encoding(image: Image.Image) -> Optional[Dict[str, Any]]:
+    """提取源JPEG的量化表和色度采样（非JPEG返回None）
+
+    需要在对图片做任何变换之前调用，变换后的图片不再携带这些信息。
+    """
+    if not isinstance(image, JpegImagePlugin.JpegImageFile):
+        return None
+
+    quantization = getattr(image, 'quantization', None)
+    if not quantization:
+        return None
+
+    source = {'qtables': quantization}
+    subsampling = JpegImagePlugin.get_sampling(image)
+    if subsampling != -1:
+        source['subsampling'] = subsampling
+    return source
+
+
+def get_save_kwargs(output_format: str, profile: Union[EncoderProfile, str, None] = None,
+                    quality: int = 95, source_encoding: Optional[Dict[str, Any]] = None,
+                    webp_method: Optional[int] = None) -> Dict[str, Any]:
+    """根据输出格式和配置档生成 Image.save 参数"""
+    output_format = output_format.upper()
+    profile = parse_profile(profile)
+    save_kwargs = dict(PROFILE_SETTINGS[profile].get(output_format, {}))
+
+    if output_format == 'JPEG':
+        if profile == EncoderProfile.KEEP_SOURCE_QUALITY and source_encoding:
+            # 沿用源图的量化表，quality参数不再生效
+            save_kwargs.update(source_encoding)
+        else:
+            save_kwargs['quality'] = quality
+    elif output_format == 'WEBP':
+        save_kwargs['quality'] = quality
+        if webp_method is not None:
+            save_kwargs['method'] = max(0, min(6, webp_method))
+
+    return save_kwargs
+
+
+def prepare_for_format(image: Image.Image, output_format: str) -> Image.Image:
+    """将图片转换为输出格式支持的色彩模式"""
+    output_format = output_format.upper()
+
+    if output_format == 'JPEG':
+        # JPEG不支持透明通道，合成到白色背景上
+        if image.mode in ('RGBA', 'LA'):
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            if image.mode == 'RGBA':
+                background.paste(image, mask=image.split()[-1])
+            else:
+                background.paste(image)
+            return background
+        if image.mode != 'RGB':
+            return image.convert('RGB')
+    elif output_format in ('WEBP', 'TIFF'):
+        supported = ('RGB', 'RGBA', 'L') if output_format == 'TIFF' else ('RGB', 'RGBA')
+        if image.mode not in supported:
+            has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+            return image.convert('RGBA' if has_alpha else 'RGB')
+
+    return image
+
+
+def save_image(image: Image.Image, fp: Union[str, BinaryIO], output_format: str,
+               profile: Union[EncoderProfile, str, None] = None, quality: int = 95,
+               source_encoding: Optional[Dict[str, Any]] = None,
+               webp_method: Optional[int] = None, exif: Optional[bytes] = None,
+               metadata=None) -> None:
+    """按配置档编码并保存图片
+
+    Args:
+        image: 待保存的图片
+        fp: 输出路径或可写的二进制文件对象
+        output_format: 输出格式 ('JPEG'、'PNG'、'WEBP' 或 'TIFF')
+        profile: 编码配置档
+        quality: JPEG/WebP质量 (1-100)
+        source_encoding: get_source_encoding 返回的源图编码信息
+        webp_method: WebP编码速度 0-6，覆盖配置档的默认值
+        exif: 写入输出文件的原始EXIF数据块
+        metadata: metadata.read_metadata 返回的源元数据，给出时逐字节透传（忽略exif参数）
+    """
+    output_format = output_format.upper()
+    image = prepare_for_format(image, output_format)
+    save_kwargs = get_save_kwargs(output_format, profile, quality, source_encoding, webp_method)
+    if metadata is not None and not metadata.is_empty():
+        from .metadata import save_with_metadata
+        save_with_metadata(image, fp, output_format, save_kwargs, metadata)
+        return
+    if exif:
+        save_kwargs['exif'] = exif
+    image.save(fp, format=output_format, **save_kwargs)
@@ -6,12 +6,12 @@ EXIF信息读取模块
 
 import os
 from datetime import datetime
-from typing import Optional, Dict, Any
-from PIL import Image
+from typing import Optional, Dict, Any, Union
 from PIL.ExifTags import TAGS
 import piexif
 
 from .config import DateFormat
+from .image_handle import ImageHandle, open_image_handle
 
 
 class ExifReader:
@@ -25,17 +25,26 @@ class ExifReader:
         ext = os.path.splitext(filepath)[1].lower()
         return ext in self.supported_formats
     
-    def extract_datetime(self, filepath: str) -> Optional[datetime]:
-        """提取图片的拍摄时间"""
-        # 对于不支持EXIF的格式（如BMP、PNG），直接使用文件修改时间
-        if not self.can_read_exif(filepath):
-            return self._get_file_modification_time(filepath)
+    def _supports_exif(self, handle: ImageHandle) -> bool:
+        """句柄对应的图片是否支持EXIF（内存中的图片没有扩展名，按解析出的格式判断）"""
+        if handle.in_memory:
+            return handle.format in ('JPEG', 'MPO', 'TIFF')
+        return self.can_read_exif(handle.path)
+    
+    def extract_datetime(self, source: Union[str, ImageHandle]) -> Optional[datetime]:
+        """提取图片的拍摄时间
         
-        try:
-            # 使用PIL读取EXIF信息
-            with Image.open(filepath) as img:
-                # 使用getexif()方法替代已弃用的_getexif()
-                exif_data = img.getexif()
+        Args:
+            source: 图片路径或已打开的图片句柄（传入句柄时不会再次打开文件）
+        """
+        with open_image_handle(source) as handle:
+            # 对于不支持EXIF的格式（如BMP、PNG），直接使用文件修改时间
+            if not self._supports_exif(handle):
+                return self._get_file_modification_time(handle)
+            
+            try:
+                # 使用PIL读取EXIF信息
+                exif_data = handle.get_exif()
                 
                 if exif_data is not None and len(exif_data) > 0:
                     for tag, value in exif_data.items():
@@ -49,21 +58,25 @@ class ExifReader:
                                 continue
                 
                 # 如果PIL方法失败，尝试使用piexif
-                piexif_result = self._extract_datetime_with_piexif(filepath)
+                piexif_result = self._extract_datetime_with_piexif(handle)
                 if piexif_result:
                     return piexif_result
                 
                 # 如果都失败了，使用文件修改时间作为备选
-                return self._get_file_modification_time(filepath)
+                return self._get_file_modification_time(handle)
                 
-        except Exception as e:
-            # 如果出现异常，尝试使用文件修改时间
-            return self._get_file_modification_time(filepath)
+            except Exception as e:
+                # 如果出现异常，尝试使用文件修改时间
+                return self._get_file_modification_time(handle)
     
-    def _extract_datetime_with_piexif(self, filepath: str) -> Optional[datetime]:
-        """使用piexif提取时间信息"""
+    def _extract_datetime_with_piexif(self, handle: ImageHandle) -> Optional[datetime]:
+        """使用piexif提取时间信息（解析句柄中已读取的EXIF数据块）"""
         try:
-            exif_dict = piexif.load(filepath)
+            exif_bytes = handle.exif_bytes
+            if not exif_bytes:
+                return None
+            
+            exif_dict = piexif.load(exif_bytes)
             
             # 检查Exif IFD中的DateTimeOriginal
             if 'Exif' in exif_dict and exif_dict['Exif']:
@@ -93,13 +106,10 @@ class ExifReader:
             # 静默处理，不输出错误信息
             return None
     
-    def _get_file_modification_time(self, filepath: str) -> Optional[datetime]:
+    def _get_file_modification_time(self, handle: ImageHandle) -> Optional[datetime]:
         """获取文件修改时间作为备选"""
         try:
-            if os.path.exists(filepath):
-                mtime = os.path.getmtime(filepath)
-                return datetime.fromtimestamp(mtime)
-            return None
+            return datetime.fromtimestamp(handle.mtime)
         except Exception:
             return None
     
@@ -120,33 +130,32 @@ class ExifReader:
         else:
             return dt.strftime('%Y-%m-%d')  # 默认格式
     
-    def get_watermark_text(self, filepath: str, format_type: DateFormat) -> Optional[str]:
+    def get_watermark_text(self, source: Union[str, ImageHandle], format_type: DateFormat) -> Optional[str]:
         """获取用于水印的文本"""
-        dt = self.extract_datetime(filepath)
+        dt = self.extract_datetime(source)
         # 如果无法从图片或文件元信息中提取时间，则回退到当前时间
         if dt is None:
             dt = datetime.now()
 
         return self.format_date(dt, format_type)
     
-    def get_all_exif_info(self, filepath: str) -> Dict[str, Any]:
+    def get_all_exif_info(self, source: Union[str, ImageHandle]) -> Dict[str, Any]:
         """获取所有EXIF信息（用于调试）"""
         exif_info = {}
         
-        if not self.can_read_exif(filepath):
-            return exif_info
-        
-        try:
-            with Image.open(filepath) as img:
-                # 使用getexif()方法替代已弃用的_getexif()
-                exif_data = img.getexif()
+        with open_image_handle(source) as handle:
+            if not self._supports_exif(handle):
+                return exif_info
+            
+            try:
+                exif_data = handle.get_exif()
                 
                 if exif_data is not None and len(exif_data) > 0:
                     for tag, value in exif_data.items():
                         tag_name = TAGS.get(tag, tag)
                         exif_info[tag_name] = value
-                        
-        except Exception as e:
-            exif_info['error'] = str(e)
+                            
+            except Exception as e:
+                exif_info['error'] = str(e)
         
         return exif_info
@@ -0,0 +1,238 @@
+"""
+图片句柄模块
+
+为单个处理任务提供共享的图片访问：文件只打开一次，文件头、EXIF、尺寸和
+按需解码的像素在元数据读取、水印渲染和保存阶段之间共享。
+"""
+
+import io
+import os
+import struct
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple, Union
+from PIL import Image
+
+
+# max_pixels 的默认值：沿用 Pillow 当前的解压炸弹上限
+_PILLOW_LIMIT = object()
+
+
+class ImageHandle:
+    """图片句柄
+
+    首次访问图片属性时打开文件并解析文件头，像素数据直到 load() 或
+    实际绘制时才解码。同一任务内的各个阶段应共享同一个句柄。
+    传入 data（bytes、bytearray 或 memoryview）时直接从内存解码，不读写文件，也不
+    复制数据，此时 path 只用作日志和统计中的名称；数据读自文件时可同时传入该文件
+    的 stat，拍摄时间仍可回退到文件修改时间。
+
+    像素上限在解码前检查，而不是在解析文件头时：超过 Pillow 解压炸弹上限的图片
+    仍可读取尺寸、EXIF 和原始数据（如分块处理超大TIFF），只有 load() 整幅解码时
+    才会被拒绝。max_pixels 为该句柄的像素上限，未设置时沿用 Pillow 的上限
+    （Image.MAX_IMAGE_PIXELS 的2倍），None 表示不限制。
+    """
+
+    def __init__(self, path: str, data=None, stat: Optional[os.stat_result] = None):
+        self.path = path
+        self.max_pixels = _PILLOW_LIMIT
+        self._data = data
+        self._fp = None
+        self._image: Optional[Image.Image] = None
+        self._exif: Optional[Image.Exif] = None
+        self._stat: Optional[os.stat_result] = stat
+
+    def __enter__(self) -> 'ImageHandle':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def image(self) -> Image.Image:
+        """图片对象（只解析了文件头，像素按需解码）"""
+        if self._image is None:
+            fp = _open_buffer(self._data) if self._data is not None else open(self.path, 'rb')
+            try:
+                try:
+                    self._image = Image.open(fp)
+                except Image.DecompressionBombError:
+                    # 只解析文件头，像素上限由 load() 按句柄的设置检查
+                    self._image = _open_unchecked(fp)
+            except Exception:
+                fp.close()
+                raise
+            self._fp = fp
+        return self._image
+
+    @property
+    def file(self) -> BinaryIO:
+        """底层文件对象（直接读取原始字节时需自行保存并恢复读取位置）"""
+        _ = self.image
+        return self._fp
+
+    @property
+    def format(self) -> Optional[str]:
+        """图片格式（如 'JPEG'、'PNG'）"""
+        return self.image.format
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """图片尺寸 (宽, 高)"""
+        return self.image.size
+
+    @property
+    def mode(self) -> str:
+        """色彩模式"""
+        return self.image.mode
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        """文件头中解析出的附加信息"""
+        return self.image.info
+
+    @property
+    def exif_bytes(self) -> Optional[bytes]:
+        """原始EXIF数据块（没有时为None）"""
+        return self.image.info.get('exif')
+
+    @property
+    def in_memory(self) -> bool:
+        """是否从内存中的编码数据解码"""
+        return self._data is not None
+
+    @property
+    def stat(self) -> os.stat_result:
+        """文件状态（已打开时使用fstat，不会再次打开文件）"""
+        if self.in_memory and self._stat is None:
+            raise OSError(f"内存中的图片没有文件状态: {self.path}")
+        if self._stat is None:
+            if self._fp is not None:
+                self._stat = os.fstat(self._fp.fileno())
+            else:
+                self._stat = os.stat(self.path)
+        return self._stat
+
+    @property
+    def mtime(self) -> float:
+        """文件修改时间"""
+        return self.stat.st_mtime
+
+    def get_exif(self) -> Image.Exif:
+        """获取解析后的EXIF信息（缓存）"""
+        if self._exif is None:
+            self._exif = self.image.getexif()
+        return self._exif
+
+    def load(self) -> Image.Image:
+        """解码像素数据（只解码一次）并返回图片对象
+
+        Raises:
+            Image.DecompressionBombError: 像素数超过句柄的像素上限
+        """
+        image = self.image
+        limit = self.max_pixels
+        if limit is _PILLOW_LIMIT:
+            limit = 2 * Image.MAX_IMAGE_PIXELS if Image.MAX_IMAGE_PIXELS else None
+        pixels = image.size[0] * image.size[1]
+        if limit is not None and pixels > limit:
+            raise Image.DecompressionBombError(
+                f"图片像素过多（{pixels} 像素），超过解码上限 {limit} 像素")
+        image.load()
+        return image
+
+    def close(self) -> None:
+        """关闭图片及底层文件"""
+        if self._image is not None:
+            self._image.close()
+            self._image = None
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+        self._exif = None
+
+
+def _open_unchecked(fp: BinaryIO) -> Image.Image:
+    """按文件头识别格式并打开图片，不做 Pillow 的解压炸弹检查"""
+    Image.init()
+    fp.seek(0)
+    prefix = fp.read(16)
+    for format_id in Image.ID:
+        factory, accept = Image.OPEN[format_id]
+        result = accept(prefix) if accept else True
+        if not result or isinstance(result, str):
+            continue
+        fp.seek(0)
+        try:
+            return factory(fp, None)
+        except (SyntaxError, IndexError, TypeError, struct.error):
+            continue
+    raise Image.UnidentifiedImageError("无法识别的图片文件")
+
+
+class _BufferReader(io.RawIOBase):
+    """只读、可定位的内存缓冲区文件对象（直接读取调用方的缓冲区，不复制整个数据）"""
+
+    def __init__(self, data):
+        self._view = memoryview(data).cast('B')
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        chunk = self._view[self._pos:self._pos + len(buffer)]
+        n = len(chunk)
+        memoryview(buffer).cast('B')[:n] = chunk
+        self._pos += n
+        return n
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else self._pos + size
+        chunk = self._view[self._pos:end].tobytes()
+        self._pos += len(chunk)
+        return chunk
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError(f"无效的读取位置: {offset}")
+        self._pos = offset
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self) -> None:
+        self._view.release()
+        super().close()
+
+
+def _open_buffer(data) -> BinaryIO:
+    """以文件对象读取内存中的编码数据（bytes 由 BytesIO 共享，其余缓冲区直接读取）"""
+    if isinstance(data, bytes):
+        return io.BytesIO(data)
+    return _BufferReader(data)
+
+
+@contextmanager
+def open_image_handle(source: Union[str, ImageHandle]) -> Iterator[ImageHandle]:
+    """获取图片句柄
+
+    传入路径时创建新句柄并在退出时关闭；传入已有句柄时直接复用，
+    由句柄的创建者负责关闭。
+    """
+    if isinstance(source, ImageHandle):
+        yield source
+        return
+
+    handle = ImageHandle(source)
+    try:
+        yield handle
+    finally:
+        handle.close()
@@ -4,17 +4,33 @@
 负责协调整个图片处理流程，包括文件扫描、EXIF读取、水印添加等。
 """
 
+import io
 import os
-import glob
-from typing import List, Tuple, Optional, Generator
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Iterable, List, Tuple, Optional, Generator, Union
 from pathlib import Path
 from tqdm import tqdm
 from PIL import Image
 from datetime import datetime
 
-from .config import Config
+from .config import Config, WatermarkConfig
 from .exif_reader import ExifReader
 from .watermark import WatermarkProcessor
+from .encoder import FORMAT_EXTENSIONS
+from .image_handle import ImageHandle, open_image_handle
+from .scheduler import JobScheduler, estimate_job_memory, parse_memory_size
+from . import archive
+from . import catalog as catalog_module
+from .catalog import FileCatalog
+from . import dedup
+from . import shard as shard_module
+from . import tiled
+from .profiling import NULL_PROFILER, Profiler
+from . import journal as journal_module
+from .journal import Journal
+from .job_queue import DONE, FAILED, JobQueue, QueuedJob, is_transient_error
 
 
 class ImageProcessor:
@@ -23,10 +39,21 @@ class ImageProcessor:
     # 支持的图片格式
     SUPPORTED_FORMATS = {'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp'}
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, profiler: Optional[Profiler] = None,
+                 journal: Optional[Journal] = None, queue: Optional[JobQueue] = None):
         self.config = config
+        self.journal = journal
+        # 指定任务队列时，批量任务先入队再从队列领取，中断后可从队列继续
+        self.queue = queue
+        # 最近一次 process_images 处理的文件目录（条目状态随处理结果更新）
+        self.catalog: Optional[FileCatalog] = None
+        # 处理日志需要逐张记录阶段耗时，未指定剖析器时启用一个只做逐张统计的剖析器
+        if profiler is None and journal is not None:
+            profiler = Profiler(summarize=False)
+        self.profiler = profiler or NULL_PROFILER
         self.exif_reader = ExifReader()
-        self.watermark_processor = WatermarkProcessor(config)
+        self.watermark_processor = WatermarkProcessor(config, self.profiler)
+        self._stats_lock = threading.Lock()
         
         # 统计信息
         self.stats = {
@@ -34,7 +61,8 @@ class ImageProcessor:
             'processed_files': 0,
             'failed_files': 0,
             'no_exif_files': 0,
-            'skipped_files': 0
+            'skipped_files': 0,
+            'deduplicated_files': 0
         }
     
     def is_supported_format(self, filepath: str) -> bool:
@@ -42,38 +70,19 @@ class ImageProcessor:
         ext = os.path.splitext(filepath)[1].lower()
         return ext in self.SUPPORTED_FORMATS
     
-    def find_images(self, input_path: str) -> List[str]:
-        """查找所有支持的图片文件"""
-        image_files = []
-        
-        if os.path.isfile(input_path):
-            # 单个文件
-            if self.is_supported_format(input_path):
-                image_files.append(input_path)
-        elif os.path.isdir(input_path):
-            # 目录
-            if self.config.config.recursive:
-                # 递归查找
-                for ext in self.SUPPORTED_FORMATS:
-                    pattern = os.path.join(input_path, '**', f'*{ext}')
-                    image_files.extend(glob.glob(pattern, recursive=True))
-                    pattern = os.path.join(input_path, '**', f'*{ext.upper()}')
-                    image_files.extend(glob.glob(pattern, recursive=True))
-            else:
-                # 只查找当前目录
-                for ext in self.SUPPORTED_FORMATS:
-                    pattern = os.path.join(input_path, f'*{ext}')
-                    image_files.extend(glob.glob(pattern))
-                    pattern = os.path.join(input_path, f'*{ext.upper()}')
-                    image_files.extend(glob.glob(pattern))
-        
-        # 去重并排序
-        image_files = sorted(list(set(image_files)))
+    def scan(self, input_path: str) -> FileCatalog:
+        """扫描支持的图片文件（按路径排序），元数据在使用时才读取"""
+        catalog = FileCatalog()
+        catalog.scan(input_path, self.SUPPORTED_FORMATS, self.config.config.recursive)
         
         if self.config.config.verbose:
-            print(f"找到 {len(image_files)} 个图片文件")
+            print(f"找到 {len(catalog)} 个图片文件")
         
-        return image_files
+        return catalog
+    
+    def find_images(self, input_path: str) -> List[str]:
+        """查找所有支持的图片文件"""
+        return self.scan(input_path).paths()
     
     def get_output_path(self, input_path: str, input_root: str, 
                        output_root: str) -> str:
@@ -84,7 +93,22 @@ class ImageProcessor:
         # 构建输出路径
         output_path = os.path.join(output_root, rel_path)
         
-        return output_path
+        return self.with_output_extension(output_path)
+    
+    def with_output_extension(self, path: str) -> str:
+        """扩展名与输出格式不一致时替换（.jpeg 等同义扩展名保持不变）"""
+        output_format = self.config.config.output_format.upper()
+        base, ext = os.path.splitext(path)
+        if output_format in FORMAT_EXTENSIONS and ext.lower() not in self._format_extensions(output_format):
+            path = base + FORMAT_EXTENSIONS[output_format]
+        return path
+    
+    @staticmethod
+    def _format_extensions(output_format: str) -> Tuple[str, ...]:
+        """输出格式可接受的扩展名"""
+        if output_format == 'JPEG':
+            return ('.jpg', '.jpeg')
+        return (FORMAT_EXTENSIONS[output_format],)
     
     def create_output_directory(self, input_path: str) -> str:
         """创建输出目录"""
@@ -108,64 +132,195 @@ class ImageProcessor:
     
     def process_single_image(self, input_path: str, output_path: str, 
                            output_format: str = None, quality: int = 95, 
-                           resize_config: dict = None) -> Tuple[bool, str]:
+                           resize_config: dict = None,
+                           encoder_profile=None, raise_errors: bool = False) -> Tuple[bool, str]:
         """处理单张图片
         
         Args:
-            input_path: 输入图片路径
-            output_path: 输出图片路径
-            output_format: 输出格式 ('JPEG' 或 'PNG')
-            quality: JPEG质量 (1-100)
+            input_path: 输入图片路径，或调度时已打开的 ImageHandle（由调用方负责关闭）
+            output_path: 输出图片路径，或可写的二进制文件对象（日志中记录其 name 属性）
+            output_format: 输出格式 ('JPEG'、'PNG' 或 'WEBP')
+            quality: JPEG/WebP质量 (1-100)
             resize_config: 尺寸调整配置
+            encoder_profile: 编码配置档，None表示使用配置中的设置
+            raise_errors: 为True时处理中的异常在记录统计和日志后重新抛出，
+                而不是转为 (False, 错误信息)
         
         Returns:
             Tuple[bool, str]: (是否成功, 错误信息或成功信息)
         """
+        path = getattr(input_path, 'path', input_path)
+        in_memory = getattr(input_path, 'in_memory', False)
+        record = {'input': path if in_memory else journal_module.input_key(path),
+                  'output': output_path if isinstance(output_path, str) else getattr(output_path, 'name', None)}
+        start = time.perf_counter()
+        image_stats = None
+        error = None
+        try:
+            # 整个任务共享同一个句柄，文件只打开一次
+            with self.profiler.image(path) as image_stats, \
+                    open_image_handle(input_path) as handle:
+                record['width'], record['height'] = handle.size
+                success, message = self._process_handle(handle, output_path, output_format,
+                                                        quality, resize_config, encoder_profile)
+        except Exception as e:
+            self._count('failed_files')
+            success, message = False, f"处理出错: {e}"
+            record['error'] = f"{type(e).__name__}: {e}"
+            error = e
+        
+        if self.journal is not None:
+            self._write_journal(record, output_path, success, message,
+                                time.perf_counter() - start, image_stats)
+        if error is not None and raise_errors:
+            raise error
+        return success, message
+    
+    def process_bytes(self, data, output_format: Optional[str] = None,
+                      quality: Optional[int] = None, resize_config: Optional[dict] = None,
+                      encoder_profile=None, name: str = '<memory>') -> bytes:
+        """处理内存中的编码图片，返回编码后的输出（不读写任何文件）
+        
+        Args:
+            data: 编码后的图片数据（bytes、bytearray 或 memoryview，直接读取不复制）
+            output_format: 输出格式，None表示使用配置中的设置
+            quality: JPEG/WebP质量，None表示使用配置中的设置
+            resize_config: 尺寸调整配置
+            encoder_profile: 编码配置档，None表示使用配置中的设置
+            name: 用于剖析和错误信息的图片名称
+        
+        Raises:
+            ValueError: 处于预览模式，或图片被拒绝（如像素过多）
+            其它解码、渲染和编码错误原样抛出
+        """
+        if self.config.config.preview_mode:
+            raise ValueError("预览模式不生成输出")
+        if quality is None:
+            quality = self.config.config.output_quality
+        
+        output = io.BytesIO()
+        with self.profiler.image(name), ImageHandle(name, data=data) as handle:
+            success, message = self._process_handle(handle, output, output_format,
+                                                    quality, resize_config, encoder_profile)
+        if not success:
+            raise ValueError(message)
+        return output.getvalue()
+    
+    def _write_journal(self, record: dict, output_path, success: bool, message: str,
+                       elapsed: float, image_stats: Optional[dict]) -> None:
+        """向处理日志追加一条任务记录"""
+        if not success:
+            record['status'] = journal_module.STATUS_FAILED
+            record.setdefault('error', message)
+        elif self.config.config.preview_mode:
+            record['status'] = journal_module.STATUS_PREVIEW
+        else:
+            record['status'] = journal_module.STATUS_OK
+        record['message'] = message
+        
         try:
-            # 提取拍摄时间
+            stat = os.stat(record['input'])
+            record['bytes_in'] = stat.st_size
+            record['mtime'] = stat.st_mtime
+        except OSError:
+            pass
+        if record['status'] == journal_module.STATUS_OK and not isinstance(output_path, str):
+            with output_path.getbuffer() as view:
+                record['bytes_out'] = view.nbytes
+        elif record['status'] == journal_module.STATUS_OK:
+            try:
+                record['bytes_out'] = os.path.getsize(output_path)
+                # 只读取文件头获取输出尺寸（缩放后与输入不同）
+                with Image.open(output_path) as output:
+                    record['output_width'], record['output_height'] = output.size
+            except (OSError, Image.UnidentifiedImageError):
+                pass
+        
+        record['duration_ms'] = round(elapsed * 1000, 3)
+        if image_stats:
+            record['stages'] = {stage: round(ms, 3) for stage, ms in image_stats['stages'].items()}
+            record['cache'] = dict(image_stats['counters'])
+        self.journal.write(record)
+    
+    def estimate_memory(self, handle: ImageHandle) -> int:
+        """按文件头估算处理该图片的峰值内存（字节），用于调度时的内存预算"""
+        if tiled.should_tile(handle, self.config.config.output_format,
+                             self.config.config.tiled_min_megapixels):
+            return tiled.estimate_memory(handle)
+        return estimate_job_memory(handle.size, handle.mode)
+    
+    def _count(self, key: str) -> None:
+        """线程安全地累加统计项"""
+        with self._stats_lock:
+            self.stats[key] += 1
+    
+    def _process_handle(self, handle: ImageHandle, output_path: str,
+                        output_format: Optional[str], quality: int,
+                        resize_config: Optional[dict], encoder_profile) -> Tuple[bool, str]:
+        """使用已打开的图片句柄完成元数据读取、水印渲染和保存"""
+        # 解码前按文件头尺寸拒绝超大图片
+        max_megapixels = self.config.config.max_megapixels
+        if max_megapixels:
+            megapixels = handle.size[0] * handle.size[1] / 1_000_000
+            if megapixels > max_megapixels:
+                self._count('failed_files')
+                return False, f"图片像素过多: {megapixels:.1f}MP，上限 {max_megapixels}MP"
+            # 显式设置的像素上限代替 Pillow 的默认上限（只作用于该句柄）
+            handle.max_pixels = int(max_megapixels * 1_000_000)
+        
+        # 提取拍摄时间
+        with self.profiler.span('exif_read'):
             watermark_text = self.exif_reader.get_watermark_text(
-                input_path, self.config.config.date_format
-            )
-            
-            # ExifReader now always returns a formatted date string (falls back to current date)
-            # but we still record when the original image had no EXIF info for statistics.
-            if watermark_text is None:
-                # 记录无EXIF的情况，但不阻止处理流程（ExifReader will now fallback to current date）
-                self.stats['no_exif_files'] += 1
-                # 获取一个回退的时间字符串以继续处理
-                watermark_text = self.exif_reader.format_date(datetime.now(), self.config.config.date_format)
-            
-            # 预览模式
-            if self.config.config.preview_mode:
-                try:
-                    with Image.open(input_path) as img:
-                        preview_img = self.watermark_processor.preview_watermark(img, watermark_text)
-                        # 这里可以添加预览显示逻辑
-                        return True, f"预览水印文本: {watermark_text}"
-                except Exception as e:
-                    return False, f"预览失败: {e}"
-            
-            # 实际处理
-            success = self.watermark_processor.process_image_with_options(
-                input_path, output_path, watermark_text, 
-                output_format, quality, resize_config
+                handle, self.config.config.date_format
             )
-            
-            if success:
-                self.stats['processed_files'] += 1
-                return True, f"成功添加水印: {watermark_text}"
-            else:
-                self.stats['failed_files'] += 1
-                return False, "水印处理失败"
-                
-        except Exception as e:
-            self.stats['failed_files'] += 1
-            return False, f"处理出错: {e}"
+        
+        # ExifReader now always returns a formatted date string (falls back to current date)
+        # but we still record when the original image had no EXIF info for statistics.
+        if watermark_text is None:
+            # 记录无EXIF的情况，但不阻止处理流程（ExifReader will now fallback to current date）
+            self._count('no_exif_files')
+            # 获取一个回退的时间字符串以继续处理
+            watermark_text = self.exif_reader.format_date(datetime.now(), self.config.config.date_format)
+        
+        # 预览模式
+        if self.config.config.preview_mode:
+            try:
+                preview_img = self.watermark_processor.preview_watermark(handle.load(), watermark_text)
+                # 这里可以添加预览显示逻辑
+                return True, f"预览水印文本: {watermark_text}"
+            except Exception as e:
+                return False, f"预览失败: {e}"
+        
+        # 实际处理
+        success = self.watermark_processor.process_image_with_options(
+            handle, output_path, watermark_text, 
+            output_format, quality, resize_config, encoder_profile,
+            raise_errors=True
+        )
+        
+        if success:
+            self._count('processed_files')
+            return True, f"成功添加水印: {watermark_text}"
+        else:
+            self._count('failed_files')
+            return False, "水印处理失败"
     
-    def process_images(self, input_path: str, output_dir: Optional[str] = None) -> None:
-        """批量处理图片"""
+    def process_images(self, input_path: str, output_dir: Optional[str] = None,
+                       resume: bool = False, shard: Optional[Tuple[int, int]] = None,
+                       catalog: Optional[FileCatalog] = None) -> None:
+        """批量处理图片
+        
+        resume 为True时跳过处理日志中已成功、输入文件未变化且输出仍然存在的图片。
+        shard 为 (index, count) 时只处理相对路径哈希落在该分片中的图片。
+        catalog 为已有的文件目录（如 GUI 列表中的文件）时处理其中的文件而不扫描
+        input_path（input_path 仍用于计算输出的相对路径）。处理过程中目录条目的
+        状态随结果更新，处理结束后可从 self.catalog 查看。
+        """
         # 查找所有图片文件
-        image_files = self.find_images(input_path)
+        if catalog is None:
+            catalog = self.scan(input_path)
+        self.catalog = catalog
+        image_files = catalog.paths()
         
         if not image_files:
             print("未找到支持的图片文件")
@@ -183,19 +338,194 @@ class ImageProcessor:
         else:
             input_root = input_path
         
-        self.stats['total_files'] = len(image_files)
+        if shard is not None:
+            index, count = shard
+            discovered = len(image_files)
+            image_files = [image_file for image_file in image_files
+                           if shard_module.shard_of(os.path.relpath(image_file, input_root), count) == index]
+            if self.config.config.verbose:
+                print(f"分片 {index}/{count}: 处理 {len(image_files)} / {discovered} 个图片文件")
+        
+        jobs = ((image_file, self.get_output_path(image_file, input_root, output_dir))
+                for image_file in image_files)
+        self._process_jobs(jobs, len(image_files), resume)
+    
+    def process_input_list(self, entries: Iterable[Tuple[str, Optional[str]]],
+                           output_dir: Optional[str] = None, resume: bool = False,
+                           shard: Optional[Tuple[int, int]] = None) -> None:
+        """按顺序处理 (输入路径, 输出路径或None) 列表
+        
+        entries 按需读取（可以是 input_list.iter_input_list 返回的流），读到第一条就开始
+        处理，不排序也不在内存中保留整个列表；读取按工作线程的进度进行，同时打开的
+        文件只有少量排队中的任务。未给出输出路径时，指定了 output_dir 则在
+        其下镜像输入路径，否则写入输入文件所在目录的 *_watermark 子目录（与单文件输入相同）。
+        shard 为 (index, count) 时只处理列表中路径哈希落在该分片中的条目。
+        """
+        if shard is not None:
+            index, count = shard
+            entries = (entry for entry in entries if shard_module.shard_of(entry[0], count) == index)
+        jobs = ((input_path, output_path or self.get_list_output_path(input_path, output_dir))
+                for input_path, output_path in entries)
+        self._process_jobs(jobs, None, resume)
+    
+    def get_list_output_path(self, input_path: str, output_dir: Optional[str]) -> str:
+        """路径列表中未指定输出的条目的默认输出路径"""
+        if output_dir is None:
+            input_dir = os.path.dirname(input_path)
+            dir_name = os.path.basename(os.path.abspath(input_dir)) or "images"
+            output_path = os.path.join(input_dir, f"{dir_name}_watermark", os.path.basename(input_path))
+        else:
+            # 在输出目录下镜像输入路径：不同目录中的同名文件不会互相覆盖
+            relative = os.path.normpath(input_path)
+            if os.path.isabs(relative) or relative.split(os.sep)[0] == os.pardir:
+                relative = os.path.splitdrive(os.path.abspath(input_path))[1].lstrip(os.sep)
+            output_path = os.path.join(output_dir, relative)
+        return self.with_output_extension(output_path)
+    
+    def _process_jobs(self, jobs: Iterable[Tuple[str, str]], total: Optional[int],
+                      resume: bool) -> None:
+        """按顺序提交 (输入路径, 输出路径) 任务并输出统计；total 为None时边读边计数"""
+        if self.queue is not None:
+            self._process_queue(jobs)
+            return
+        
+        self.stats['total_files'] = total or 0
+        
+        completed = {}
+        if resume and self.journal is not None:
+            completed = journal_module.load_completed(self.journal.path)
+        
+        workers = self.config.config.workers
+        max_memory = parse_memory_size(self.config.config.max_memory)
+        
+        # 去重：内容相同的输入只渲染第一个，其余在全部渲染结束后链接或复制其输出
+        finder = dedup.DuplicateFinder() if self.config.config.dedup else None
+        rendered = {}
+        duplicates = []
+        
+        def watermark_text(path: str) -> str:
+            # 没有 EXIF 拍摄时间时水印日期取自修改时间，内容相同的文件也可能渲染出不同的输出
+            return self.exif_reader.get_watermark_text(path, self.config.config.date_format) or ''
         
         # 处理进度条
-        with tqdm(image_files, desc="处理图片", unit="张") as pbar:
-            for image_file in pbar:
-                # 计算输出路径
-                output_path = self.get_output_path(image_file, input_root, output_dir)
+        with tqdm(total=total, desc="处理图片", unit="张") as pbar, \
+                JobScheduler(workers, max_memory) as scheduler:
+            
+            report = self._progress_reporter(pbar)
+            
+            def run(handle: ImageHandle, output_path: str, submitted: float) -> None:
+                # 时间线上显示任务从提交到开始执行的等待（含内存预算的放行等待）
+                self.profiler.add_span('queued', submitted, time.perf_counter(), handle.path,
+                                       category='wait', record=False)
+                with handle:
+                    success, message = self.process_single_image(
+                        handle, output_path, quality=self.config.config.output_quality
+                    )
+                if finder is not None:
+                    rendered[handle.path] = (output_path, success)
+                report(handle.path, success, message)
+            
+            for image_file, output_path in jobs:
+                if total is None:
+                    self.stats['total_files'] += 1
+                
+                if completed and journal_module.is_unchanged(image_file, output_path, completed):
+                    self._count('skipped_files')
+                    report(image_file, True, "已处理，跳过")
+                    continue
                 
-                # 处理单张图片
-                success, message = self.process_single_image(image_file, output_path)
+                if finder is not None:
+                    try:
+                        original = finder.find(image_file, os.path.splitext(output_path)[1].lower(),
+                                               watermark_text)
+                    except OSError as e:
+                        self._record_unreadable(image_file, output_path, e)
+                        report(image_file, False, f"处理出错: {e}")
+                        continue
+                    if original is not None:
+                        duplicates.append((original, image_file, output_path))
+                        continue
                 
-                # 更新进度条描述
-                filename = os.path.basename(image_file)
+                # 只读取文件头来估算内存占用，句柄交给任务继续使用
+                handle = ImageHandle(image_file)
+                try:
+                    cost = self.estimate_memory(handle)
+                except Exception as e:
+                    handle.close()
+                    self._record_unreadable(image_file, output_path, e)
+                    report(image_file, False, f"处理出错: {e}")
+                    continue
+                
+                # 预算不足时阻塞，直到已放行的任务释放内存
+                waiting = time.perf_counter()
+                scheduler.submit(cost, run, handle, output_path, waiting)
+                self.profiler.add_span('admission_wait', waiting, time.perf_counter(), image_file,
+                                       category='wait', record=False)
+            
+            if duplicates:
+                # 等待所有渲染结束后再放置重复输入的输出
+                scheduler.shutdown()
+                for original, image_file, output_path in duplicates:
+                    self._place_duplicate(original, image_file, output_path, rendered, report)
+        
+        if self.config.config.verbose and finder is not None:
+            print(f"去重: 计算了 {finder.hashed_files} 个文件的哈希，节省 {self.stats['deduplicated_files']} 次渲染")
+        if self.config.config.verbose and scheduler.stats['serial']:
+            print(f"超出内存预算、串行处理的大图: {scheduler.stats['serial']} 张")
+        
+        # 输出统计信息
+        self.print_statistics()
+    
+    def _place_duplicate(self, original: str, image_file: str, output_path: str,
+                         rendered: dict, report) -> None:
+        """把已渲染的相同输入的输出链接或复制到重复输入的输出路径"""
+        original_output, success = rendered.get(original, (None, False))
+        if not success:
+            self._count('failed_files')
+            report(image_file, False, f"与 {original} 内容相同，其处理失败")
+            return
+        
+        record = {'input': journal_module.input_key(image_file), 'output': output_path,
+                  'duplicate_of': original}
+        try:
+            if self.config.config.preview_mode:
+                record['status'] = journal_module.STATUS_PREVIEW
+            else:
+                if os.path.abspath(original_output) != os.path.abspath(output_path):
+                    record['dedup'] = dedup.copy_output(original_output, output_path,
+                                                        self.config.config.dedup)
+                record['status'] = journal_module.STATUS_OK
+                record['bytes_out'] = os.path.getsize(output_path)
+            stat = os.stat(image_file)
+            record['bytes_in'], record['mtime'] = stat.st_size, stat.st_mtime
+        except OSError as e:
+            self._count('failed_files')
+            if self.journal is not None:
+                self.journal.write({'input': journal_module.input_key(image_file),
+                                    'output': output_path,
+                                    'status': journal_module.STATUS_FAILED,
+                                    'duplicate_of': original, 'error': f"{type(e).__name__}: {e}"})
+            report(image_file, False, f"复制重复输入的输出失败: {e}")
+            return
+        
+        self._count('processed_files')
+        self._count('deduplicated_files')
+        if self.journal is not None:
+            self.journal.write(record)
+        report(image_file, True, f"与 {original} 内容相同，复用其输出")
+    
+    def _progress_reporter(self, pbar: tqdm):
+        """返回线程安全地更新进度条（并在详细模式下输出结果）的回调"""
+        progress_lock = threading.Lock()
+        
+        def report(image_file: str, success: bool, message: str) -> None:
+            if self.catalog is not None:
+                self.catalog.set_status(image_file, catalog_module.STATUS_DONE if success
+                                        else catalog_module.STATUS_FAILED)
+            # 更新进度条描述
+            filename = os.path.basename(image_file)
+            with progress_lock:
+                pbar.update(1)
                 if success:
                     pbar.set_postfix_str(f"✓ {filename}")
                 else:
@@ -206,9 +536,183 @@ class ImageProcessor:
                     status = "成功" if success else "失败"
                     print(f"[{status}] {filename}: {message}")
         
-        # 输出统计信息
+        return report
+    
+    def _process_queue(self, jobs: Iterable[Tuple[str, str]]) -> None:
+        """经持久化任务队列处理任务
+        
+        任务先全部入队（已在队列中的输入保持原状态，已完成的不再处理），再由本进程
+        领取执行；失败的任务按退避时间重试，达到次数上限后记为失败。上次运行中被
+        中断的任务和已失败的任务在本次运行中重新处理。统计按队列状态汇总：
+        skipped_files 为此前已完成的任务数。只有偶发的 I/O 错误会重试，被拒绝、损坏或
+        不支持的图片直接记为失败。
+        """
+        queue = self.queue
+        queue.add(jobs)
+        queue.recover()
+        queue.retry_failed()
+        counts = queue.counts()
+        self.stats['total_files'] = sum(counts.values())
+        self.stats['skipped_files'] = counts[DONE]
+        
+        workers = self.config.config.workers
+        max_memory = parse_memory_size(self.config.config.max_memory)
+        # 领取的任务数有上限：其余任务留在队列中，可由共享该队列的其他进程领取
+        max_in_flight = max(1, int(workers or 1)) * 2
+        
+        with tqdm(total=self.stats['total_files'] - counts[DONE], desc="处理图片", unit="张") as pbar, \
+                JobScheduler(workers, max_memory) as scheduler:
+            report = self._progress_reporter(pbar)
+            
+            def finish(job: QueuedJob, success: bool, message: str, retry: bool = False) -> None:
+                if success:
+                    queue.complete(job)
+                elif queue.fail(job, message, retry):
+                    if self.config.config.verbose:
+                        print(f"[重试] {os.path.basename(job.input)}: {message}（第{job.attempts}次失败）")
+                    return
+                report(job.input, success, message)
+            
+            def run(handle: ImageHandle, job: QueuedJob, submitted: float) -> None:
+                self.profiler.add_span('queued', submitted, time.perf_counter(), handle.path,
+                                       category='wait', record=False)
+                with handle:
+                    try:
+                        success, message = self.process_single_image(
+                            handle, job.output, quality=self.config.config.output_quality,
+                            raise_errors=True
+                        )
+                    except Exception as e:
+                        finish(job, False, f"处理出错: {e}", is_transient_error(e))
+                        return
+                finish(job, success, message)
+            
+            futures = set()
+            while True:
+                at_capacity = len(futures) >= max_in_flight
+                job = None if at_capacity else queue.claim()
+                if job is None:
+                    delay = None if at_capacity else queue.next_ready_in()
+                    if futures:
+                        # 等待在途任务完成（或到达下一个重试时间）后再领取
+                        done, futures = wait(futures, timeout=delay, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                        continue
+                    if delay is None:
+                        break
+                    time.sleep(delay)
+                    continue
+                
+                handle = ImageHandle(job.input)
+                try:
+                    cost = self.estimate_memory(handle)
+                except Exception as e:
+                    handle.close()
+                    self._record_unreadable(job.input, job.output, e)
+                    finish(job, False, f"处理出错: {e}", is_transient_error(e))
+                    continue
+                
+                waiting = time.perf_counter()
+                futures.add(scheduler.submit(cost, run, handle, job, waiting))
+                self.profiler.add_span('admission_wait', waiting, time.perf_counter(), job.input,
+                                       category='wait', record=False)
+        
+        # 重试过的任务每次失败都计入了 failed_files，以队列中的最终状态为准
+        counts = queue.counts()
+        self.stats['failed_files'] = counts[FAILED]
         self.print_statistics()
     
+    def process_archive(self, input_path: str, output: Optional[str] = None) -> None:
+        """处理 ZIP/TAR 归档中的图片，成员数据直接交给解码器，不解压到磁盘
+        
+        output 为None时写入同目录的 *_watermark 归档；带归档扩展名时写入该归档，
+        否则视为输出目录，按成员路径写出文件。归档中各级子目录的图片都会处理。
+        """
+        output, to_archive = archive.split_output(output, input_path)
+        preview = self.config.config.preview_mode
+        writer = archive.ArchiveWriter(output) if to_archive and not preview else None
+        # ZIP 可从中央目录直接得到图片数量，流式读取的TAR只能边读边计数
+        total = archive.count_members(input_path, self.is_supported_format)
+        self.stats['total_files'] = total or 0
+        
+        workers = self.config.config.workers
+        max_memory = parse_memory_size(self.config.config.max_memory)
+        progress_lock = threading.Lock()
+        
+        try:
+            with tqdm(total=total, desc="处理图片", unit="张") as pbar, \
+                    JobScheduler(workers, max_memory) as scheduler:
+                
+                def report(name: str, success: bool, message: str) -> None:
+                    filename = os.path.basename(name)
+                    with progress_lock:
+                        pbar.update(1)
+                        pbar.set_postfix_str(f"{'✓' if success else '✗'} {filename}")
+                        if self.config.config.verbose:
+                            status = "成功" if success else "失败"
+                            print(f"[{status}] {filename}: {message}")
+                
+                def run(handle: ImageHandle, member: archive.ArchiveMember, output_name: str,
+                        submitted: float) -> None:
+                    self.profiler.add_span('queued', submitted, time.perf_counter(), handle.path,
+                                           category='wait', record=False)
+                    if to_archive:
+                        target = archive.NamedBuffer(f"{output}/{output_name}")
+                    else:
+                        target = os.path.join(output, *output_name.split('/'))
+                    with handle:
+                        success, message = self.process_single_image(
+                            handle, target, quality=self.config.config.output_quality
+                        )
+                    if success and writer is not None:
+                        try:
+                            writer.add(output_name, target.getbuffer(), member.mtime)
+                        except OSError as e:
+                            self._count('failed_files')
+                            success, message = False, f"写入归档失败: {e}"
+                    report(handle.path, success, message)
+                
+                # submit 在未结束的任务达到上限时阻塞，读取成员不会跑在工作线程前面，
+                # 同时读入内存的只有少量成员
+                for member in archive.iter_members(input_path, self.is_supported_format):
+                    if total is None:
+                        self.stats['total_files'] += 1
+                    output_name = self.with_output_extension(member.name)
+                    # 成员的修改时间作为拍摄时间缺失时的回退
+                    handle = ImageHandle(os.path.join(input_path, member.name),
+                                         data=member.data, stat=member.stat)
+                    try:
+                        cost = self.estimate_memory(handle)
+                    except Exception as e:
+                        handle.close()
+                        self._record_unreadable(handle.path, f"{output}/{output_name}", e)
+                        report(handle.path, False, f"处理出错: {e}")
+                        continue
+                    
+                    waiting = time.perf_counter()
+                    scheduler.submit(cost, run, handle, member, output_name, waiting)
+                    self.profiler.add_span('admission_wait', waiting, time.perf_counter(), handle.path,
+                                           category='wait', record=False)
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+        if writer is not None:
+            writer.commit()
+            print(f"已写入 {writer.members} 张图片到: {output}")
+        
+        self.print_statistics()
+    
+    def _record_unreadable(self, image_file: str, output_path: str, error: Exception) -> None:
+        """记录无法读取文件头的图片（尚未进入处理流程）"""
+        self._count('failed_files')
+        if self.journal is not None:
+            self.journal.write({'input': journal_module.input_key(image_file),
+                                'output': output_path,
+                                'status': journal_module.STATUS_FAILED,
+                                'error': f"{type(error).__name__}: {error}"})
+    
     def print_statistics(self) -> None:
         """打印处理统计信息"""
         print("\n" + "="*50)
@@ -217,9 +721,14 @@ class ImageProcessor:
         print(f"成功处理: {self.stats['processed_files']}")
         print(f"处理失败: {self.stats['failed_files']}")
         print(f"无EXIF信息: {self.stats['no_exif_files']}")
+        if self.stats['skipped_files']:
+            print(f"已处理跳过: {self.stats['skipped_files']}")
+        if self.stats['deduplicated_files']:
+            print(f"重复输入（复用输出，未重新渲染）: {self.stats['deduplicated_files']}")
         
         if self.stats['total_files'] > 0:
-            success_rate = (self.stats['processed_files'] / self.stats['total_files']) * 100
+            success_rate = ((self.stats['processed_files'] + self.stats['skipped_files'])
+                            / self.stats['total_files']) * 100
             print(f"成功率: {success_rate:.1f}%")
         
         print("="*50)
@@ -230,6 +739,8 @@ class ImageProcessor:
             print(f"错误: 输入路径不存在: {input_path}")
             return False
         
+        if os.path.isfile(input_path) and archive.is_archive(input_path):
+            return True
         if os.path.isfile(input_path):
             if not self.is_supported_format(input_path):
                 print(f"错误: 不支持的文件格式: {input_path}")
@@ -247,3 +758,18 @@ class ImageProcessor:
                 print("提示: 使用 --recursive 选项可以递归搜索子目录")
         
         return True
+
+
+def watermark_bytes(data, config: Union[Config, WatermarkConfig, None] = None,
+                    output_format: Optional[str] = None, quality: Optional[int] = None,
+                    resize_config: Optional[dict] = None, encoder_profile=None) -> bytes:
+    """给内存中的编码图片添加水印，返回编码后的结果
+    
+    面向上传服务等场景，不需要先把图片写入临时文件。config 可以是 Config 或
+    WatermarkConfig，None 表示默认配置；其余参数见 ImageProcessor.process_bytes。
+    批量处理时应复用同一个 ImageProcessor，避免重复创建处理器。
+    """
+    if not isinstance(config, Config):
+        config = Config(config)
+    return ImageProcessor(config).process_bytes(data, output_format, quality,
+                                                resize_config, encoder_profile)
@@ -0,0 +1,62 @@
+"""
+路径列表模块
+
+从文件或标准输入逐条读取待处理的路径（`--input-list`），便于接在 find、数据库
+查询等命令之后。每条记录是一个输入路径，可以用制表符分隔再跟一个输出路径::
+
+    photos/a.jpg
+    photos/b.jpg<TAB>/export/b_final.jpg
+
+记录之间用换行分隔，或用 NUL 分隔（配合 `find -print0`，路径中可以含有换行）。
+读取是流式的：读到第一条记录就可以开始处理，不排序，也不在内存中保留整个列表。
+"""
+
+import os
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+
+# 每次从流中读取的最大字节数（管道中有多少读多少，不等待填满）
+_CHUNK_SIZE = 64 * 1024
+
+OUTPUT_SEPARATOR = b'\t'
+
+
+def iter_records(stream: BinaryIO, delimiter: bytes = b'\n') -> Iterator[bytes]:
+    """按分隔符逐条产出原始记录（不含分隔符，跳过空记录）"""
+    read = stream.read1 if hasattr(stream, 'read1') else stream.read
+    pending = b''
+    while True:
+        chunk = read(_CHUNK_SIZE)
+        if not chunk:
+            break
+        pending += chunk
+        *records, pending = pending.split(delimiter)
+        for record in records:
+            if record:
+                yield record
+    if pending:
+        yield pending
+
+
+def parse_record(record: bytes, delimiter: bytes = b'\n') -> Tuple[str, Optional[str]]:
+    """解析一条记录为 (输入路径, 输出路径或None)
+
+    路径按文件系统编码解码，无法解码的字节原样保留（os.fsdecode），
+    与 find 等工具输出的任意文件名一致。
+    """
+    if delimiter == b'\n' and record.endswith(b'\r'):
+        record = record[:-1]
+    input_path, separator, output_path = record.partition(OUTPUT_SEPARATOR)
+    return os.fsdecode(input_path), os.fsdecode(output_path) if separator and output_path else None
+
+
+def iter_input_list(stream: BinaryIO, null: bool = False) -> Iterator[Tuple[str, Optional[str]]]:
+    """从二进制流中逐条读取 (输入路径, 输出路径或None)
+
+    null 为True时记录以 NUL 分隔，否则以换行分隔。
+    """
+    delimiter = b'\0' if null else b'\n'
+    for record in iter_records(stream, delimiter):
+        entry = parse_record(record, delimiter)
+        if entry[0]:
+            yield entry
@@ -0,0 +1,276 @@
+"""
+持久化任务队列模块
+
+用本地 SQLite 文件保存每个输入的处理状态（pending/running/done/failed），
+进程崩溃、被 OOM 杀死或机器重启后可以从队列继续，已完成的任务不会重做。
+工作线程（或共享同一队列文件的多个进程）以原子方式领取任务；失败的任务按
+指数退避重新排队，达到次数上限后才记为失败，网络存储上的偶发读取错误因此
+不会直接算作失败。损坏、格式不支持或被拒绝的图片重试也不会成功，直接记为失败
+（见 is_transient_error）。
+"""
+
+import errno
+import os
+import socket
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+
+# 任务状态
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+DEFAULT_MAX_ATTEMPTS = 3
+# 第 n 次失败后等待 backoff * 2^(n-1) 秒再重试，最多等待 max_backoff 秒
+DEFAULT_BACKOFF = 2.0
+DEFAULT_MAX_BACKOFF = 60.0
+# 其他主机上的领取者超过该时间未完成时，任务可被重新领取
+DEFAULT_LEASE = 600.0
+
+# 重试也不会成功的文件系统错误
+_PERMANENT_ERRNOS = frozenset((errno.ENOENT, errno.ENOTDIR, errno.EISDIR, errno.EACCES,
+                               errno.EPERM, errno.ENAMETOOLONG))
+
+# 每个事务插入的任务数（边读边写，不在内存中积累整个列表）
+_INSERT_BATCH = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    input TEXT NOT NULL UNIQUE,
+    output TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL DEFAULT 0,
+    claimed_at REAL,
+    owner TEXT,
+    error TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, not_before);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+@dataclass
+class QueuedJob:
+    """领取到的任务（attempts 为包括本次在内的尝试次数）"""
+    id: int
+    input: str
+    output: str
+    attempts: int
+
+
+class JobQueue:
+    """SQLite 任务队列（线程安全，同一文件可被多个进程共享）
+
+    同一输入只入队一次：再次添加已有的输入时保留其原有状态和输出路径，
+    因此重新运行同一批任务即可从中断处继续。
+    """
+
+    def __init__(self, path: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 backoff: float = DEFAULT_BACKOFF, max_backoff: float = DEFAULT_MAX_BACKOFF,
+                 lease: float = DEFAULT_LEASE):
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 自动提交模式，事务由 _transaction 显式控制
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(_SCHEMA)
+
+    def __enter__(self) -> 'JobQueue':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _transaction(self):
+        """BEGIN IMMEDIATE 事务：立即取得写锁，多个进程领取任务时不会重复"""
+        queue = self
+
+        class _Transaction:
+            def __enter__(self):
+                queue._lock.acquire()
+                try:
+                    queue._conn.execute('BEGIN IMMEDIATE')
+                except BaseException:
+                    queue._lock.release()
+                    raise
+                return queue._conn
+
+            def __exit__(self, exc_type, exc_val, exc_tb):
+                try:
+                    queue._conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+                finally:
+                    queue._lock.release()
+
+        return _Transaction()
+
+    def bind(self, key: str) -> bool:
+        """把队列绑定到一批任务的标识（如输入列表和设置的哈希）
+
+        队列中是另一批任务（标识不同）时清空这些任务，避免用新的设置处理旧的任务；
+        返回是否清空了旧任务。
+        """
+        with self._transaction() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'batch'").fetchone()
+            if row is not None and row[0] == key:
+                return False
+            stale = conn.execute('SELECT COUNT(*) FROM jobs').fetchone()[0] > 0
+            conn.execute('DELETE FROM jobs')
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('batch', ?)", (key,))
+        return stale
+
+    def add(self, jobs: Iterable[Tuple[str, str]]) -> int:
+        """添加 (输入, 输出) 任务，已在队列中的输入保持不变，返回新增的任务数"""
+        added = 0
+        batch = []
+        for job in jobs:
+            batch.append(job)
+            if len(batch) >= _INSERT_BATCH:
+                added += self._insert(batch)
+                batch = []
+        if batch:
+            added += self._insert(batch)
+        return added
+
+    def _insert(self, batch) -> int:
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO jobs (input, output, updated) VALUES (?, ?, ?)',
+                [(input_path, output_path, now) for input_path, output_path in batch]
+            )
+            return conn.total_changes - before
+
+    def recover(self) -> int:
+        """把本机已退出的进程留下的 running 任务放回 pending，返回恢复的任务数
+
+        其他主机的任务无法判断领取者是否存活，超过租约时间后由 claim 重新领取。
+        """
+        host = socket.gethostname()
+        recovered = 0
+        with self._transaction() as conn:
+            rows = conn.execute('SELECT id, owner FROM jobs WHERE state = ?', (RUNNING,)).fetchall()
+            for job_id, owner in rows:
+                owner_host, _, pid = (owner or '').rpartition(':')
+                if owner_host == host and not _process_alive(pid):
+                    conn.execute('UPDATE jobs SET state = ?, owner = NULL, updated = ? WHERE id = ?',
+                                 (PENDING, time.time(), job_id))
+                    recovered += 1
+        return recovered
+
+    def claim(self) -> Optional[QueuedJob]:
+        """原子地领取一个可执行的任务（没有时返回None）"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                'SELECT id, input, output, attempts FROM jobs '
+                'WHERE (state = ? AND not_before <= ?) OR (state = ? AND claimed_at < ?) '
+                'ORDER BY id LIMIT 1',
+                (PENDING, now, RUNNING, now - self.lease)
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, input_path, output_path, attempts = row
+            conn.execute(
+                'UPDATE jobs SET state = ?, attempts = ?, claimed_at = ?, owner = ?, updated = ? '
+                'WHERE id = ?',
+                (RUNNING, attempts + 1, now, self.owner, now, job_id)
+            )
+        return QueuedJob(job_id, input_path, output_path, attempts + 1)
+
+    def complete(self, job: QueuedJob) -> None:
+        """标记任务完成"""
+        with self._transaction() as conn:
+            conn.execute('UPDATE jobs SET state = ?, error = NULL, owner = NULL, updated = ? WHERE id = ?',
+                         (DONE, time.time(), job.id))
+
+    def fail(self, job: QueuedJob, error: str, retry: bool = True) -> bool:
+        """记录一次失败；retry 为真且未达到次数上限时按退避时间重新排队，返回是否还会重试"""
+        now = time.time()
+        retry = retry and job.attempts < self.max_attempts
+        delay = min(self.backoff * 2 ** (job.attempts - 1), self.max_backoff) if retry else 0
+        with self._transaction() as conn:
+            conn.execute(
+                'UPDATE jobs SET state = ?, not_before = ?, error = ?, owner = NULL, updated = ? '
+                'WHERE id = ?',
+                (PENDING if retry else FAILED, now + delay, error, now, job.id)
+            )
+        return retry
+
+    def retry_failed(self) -> int:
+        """把已失败的任务重新排队（重置尝试次数），返回任务数"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET state = ?, attempts = 0, not_before = 0, updated = ? WHERE state = ?',
+                (PENDING, time.time(), FAILED)
+            )
+            return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的任务数"""
+        with self._lock:
+            rows = self._conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall()
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update(rows)
+        return counts
+
+    def next_ready_in(self) -> Optional[float]:
+        """距最近一个等待重试的任务可以领取还有多少秒（没有待处理任务时返回None）"""
+        with self._lock:
+            row = self._conn.execute('SELECT MIN(not_before) FROM jobs WHERE state = ?',
+                                     (PENDING,)).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def failures(self) -> Iterable[Tuple[str, str]]:
+        """已失败任务的 (输入, 最后一次错误)"""
+        with self._lock:
+            return self._conn.execute('SELECT input, error FROM jobs WHERE state = ? ORDER BY id',
+                                      (FAILED,)).fetchall()
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """判断失败是否可能是偶发的（如网络存储上的读取超时），值得重试
+
+    只有操作系统报告的 I/O 错误（带 errno 的 OSError）才会重试。解码器报告的损坏或
+    不支持的图片（UnidentifiedImageError 等不带 errno 的 OSError）、文件不存在或无权
+    访问、超过像素上限（DecompressionBombError）和其它异常重试也不会成功。
+    """
+    return (isinstance(error, OSError) and error.errno is not None
+            and error.errno not in _PERMANENT_ERRNOS)
+
+
+def _process_alive(pid: str) -> bool:
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,121 @@
+"""
+处理日志模块
+
+每个任务处理结束后向 JSONL 文件追加一条结构化记录（输入、输出、字节数、尺寸、
+各阶段耗时、缓存命中、错误），逐条写入磁盘而不在内存中累积，百万级文件的批处理
+也只占用固定内存。日志可用于中断后续跑（跳过已成功且输入未变化的文件）以及
+离线分析（jq、pandas 等按行读取即可）。
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+# 记录状态
+STATUS_OK = 'ok'
+STATUS_FAILED = 'failed'
+STATUS_PREVIEW = 'preview'
+
+
+class Journal:
+    """追加写入的 JSONL 处理日志（线程安全）
+
+    每条记录写完即刷新到文件，进程中断时最多丢失正在写入的最后一行。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        # 上次中断时写了一半的行单独成行，不与新记录拼在一起
+        if self._file.tell() and not _ends_with_newline(path):
+            self._file.write('\n')
+        self._lock = threading.Lock()
+        self.records = 0
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """追加一条记录（自动补充写入时间）"""
+        entry = {'time': datetime.now().isoformat(timespec='milliseconds')}
+        entry.update(record)
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.records += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self) -> 'Journal':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def read_journal(path: str) -> Iterator[Dict[str, Any]]:
+    """逐行读取处理日志，跳过空行和中断时写了一半的行"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def input_key(path: str) -> str:
+    """记录和查找输入文件使用的路径
+
+    使用绝对路径：以相对路径或在其他工作目录下续跑时仍能匹配已完成的记录。
+    """
+    return os.path.abspath(path)
+
+
+def load_completed(path: str) -> Dict[str, Tuple[Optional[int], Optional[float]]]:
+    """读取已成功处理的输入文件：{绝对输入路径: (字节数, 修改时间)}
+
+    同一输入有多条记录时以最后一条为准（后来失败的文件不算完成）。
+    日志不存在时返回空字典。
+    """
+    completed: Dict[str, Tuple[Optional[int], Optional[float]]] = {}
+    if not os.path.exists(path):
+        return completed
+    for record in read_journal(path):
+        input_path = record.get('input')
+        if not input_path:
+            continue
+        input_path = input_key(input_path)
+        if record.get('status') == STATUS_OK:
+            completed[input_path] = (record.get('bytes_in'), record.get('mtime'))
+        else:
+            completed.pop(input_path, None)
+    return completed
+
+
+def is_unchanged(input_path: str, output_path: str,
+                 completed: Dict[str, Tuple[Optional[int], Optional[float]]]) -> bool:
+    """输入文件已成功处理、之后未被修改，且输出文件仍然存在"""
+    entry = completed.get(input_key(input_path))
+    if entry is None or not os.path.exists(output_path):
+        return False
+    try:
+        stat = os.stat(input_path)
+    except OSError:
+        return False
+    return entry == (stat.st_size, stat.st_mtime)
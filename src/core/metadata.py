@@ -0,0 +1,420 @@
+"""
+元数据透传模块
+
+读取源文件中的原始元数据段（JPEG 的 APP1/APP2/APP13，或 PNG/WebP/TIFF 中的
+EXIF、ICC、XMP 数据块），保存时不经解析、逐字节写入输出文件。
+只有方向标签和EXIF缩略图会在需要时就地修改。
+"""
+
+import io
+import struct
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+from PIL import Image, PngImagePlugin
+
+from . import orientation as exif_orientation
+
+
+# JPEG 标记
+APP1 = 0xE1
+APP2 = 0xE2
+APP13 = 0xED
+SOS = 0xDA
+EOI = 0xD9
+
+# 元数据段标识
+EXIF_HEADER = b'Exif\x00\x00'
+XMP_HEADER = b'http://ns.adobe.com/xap/1.0/\x00'
+XMP_EXTENSION_HEADER = b'http://ns.adobe.com/xmp/extension/\x00'
+ICC_HEADER = b'ICC_PROFILE\x00'
+PHOTOSHOP_HEADER = b'Photoshop 3.0\x00'
+
+# 单个 JPEG 段的最大负载（长度字段包含自身的2字节）
+MAX_SEGMENT_PAYLOAD = 0xFFFF - 2
+
+# TIFF 标签
+TAG_JPEG_INTERCHANGE_FORMAT = 0x0201
+TAG_JPEG_INTERCHANGE_FORMAT_LENGTH = 0x0202
+TAG_XMP = 700
+TAG_ICC_PROFILE = 34675
+
+# TIFF IFD0 中描述图像数据布局的标签，不能随EXIF写入其他文件
+TIFF_STRUCTURE_TAGS = frozenset((
+    254, 255, 256, 257, 258, 259, 262, 266, 273, 277, 278, 279, 280, 281, 284,
+    317, 320, 322, 323, 324, 325, 338, 339, 340, 341, 347, 530, 531, 532,
+    TAG_XMP, TAG_ICC_PROFILE,
+))
+
+# EXIF 缩略图的默认边长
+THUMBNAIL_SIZE = (160, 120)
+
+
+@dataclass
+class SourceMetadata:
+    """源文件的原始元数据
+
+    exif 为不含 "Exif\\0\\0" 头的TIFF数据；jpeg_segments 为JPEG源文件中按原顺序
+    保存的 (标记, 负载) 列表，写回JPEG时直接复用。
+    """
+    exif: Optional[bytes] = None
+    icc_profile: Optional[bytes] = None
+    xmp: Optional[bytes] = None
+    jpeg_segments: List[Tuple[int, bytes]] = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        """是否没有任何可透传的元数据"""
+        return not (self.exif or self.icc_profile or self.xmp or self.jpeg_segments)
+
+
+def _is_passthrough_segment(marker: int, payload: bytes) -> bool:
+    if marker == APP1:
+        return payload.startswith((EXIF_HEADER, XMP_HEADER, XMP_EXTENSION_HEADER))
+    if marker == APP2:
+        # MPF等段包含指向文件内其他位置的偏移量，不能原样复制
+        return payload.startswith(ICC_HEADER)
+    return marker == APP13 and payload.startswith(PHOTOSHOP_HEADER)
+
+
+def read_jpeg_segments(fp: BinaryIO) -> List[Tuple[int, bytes]]:
+    """读取JPEG文件头中需要透传的元数据段（读到SOS为止，不读取图像数据）
+
+    读取后恢复文件位置，不影响后续解码。
+    """
+    position = fp.tell()
+    segments = []
+    try:
+        fp.seek(0)
+        if fp.read(2) != b'\xff\xd8':
+            return segments
+        while True:
+            byte = fp.read(1)
+            if not byte:
+                break
+            if byte != b'\xff':
+                continue
+            marker = fp.read(1)
+            while marker == b'\xff':
+                marker = fp.read(1)
+            if not marker:
+                break
+            marker = marker[0]
+            if marker in (SOS, EOI):
+                break
+            if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+                continue
+            length_bytes = fp.read(2)
+            if len(length_bytes) < 2:
+                break
+            length = struct.unpack('>H', length_bytes)[0]
+            payload = fp.read(length - 2)
+            if _is_passthrough_segment(marker, payload):
+                segments.append((marker, payload))
+    finally:
+        fp.seek(position)
+    return segments
+
+
+def _strip_exif_header(exif: Optional[bytes]) -> Optional[bytes]:
+    if exif and exif.startswith(EXIF_HEADER):
+        return exif[len(EXIF_HEADER):]
+    return exif or None
+
+
+def read_metadata(handle) -> SourceMetadata:
+    """读取图片句柄对应文件的原始元数据
+
+    JPEG 直接读取原始段；PNG/WebP 使用文件头中已经原样保存的数据块；
+    TIFF 的EXIF标签分散在文件结构中，只能由 Pillow 重新序列化。
+    """
+    image = handle.image
+    info = image.info
+
+    if image.format == 'JPEG':
+        segments = read_jpeg_segments(handle.file)
+        metadata = SourceMetadata(jpeg_segments=segments)
+        icc_chunks = []
+        for marker, payload in segments:
+            if marker == APP1 and payload.startswith(EXIF_HEADER) and metadata.exif is None:
+                metadata.exif = payload[len(EXIF_HEADER):]
+            elif marker == APP1 and payload.startswith(XMP_HEADER):
+                metadata.xmp = payload[len(XMP_HEADER):]
+            elif marker == APP2:
+                icc_chunks.append(payload)
+        if icc_chunks:
+            # 负载格式: ICC_PROFILE\0 + 序号 + 总数 + 数据
+            icc_chunks.sort(key=lambda chunk: chunk[len(ICC_HEADER)])
+            metadata.icc_profile = b''.join(chunk[len(ICC_HEADER) + 2:] for chunk in icc_chunks)
+        return metadata
+
+    metadata = SourceMetadata(
+        exif=_strip_exif_header(info.get('exif')),
+        icc_profile=info.get('icc_profile') or None,
+        xmp=info.get('xmp') or None
+    )
+    if image.format == 'PNG' and metadata.xmp is None and info.get('XML:com.adobe.xmp'):
+        metadata.xmp = info['XML:com.adobe.xmp'].encode('utf-8')
+    if image.format == 'TIFF':
+        if metadata.exif is None:
+            exif = _tiff_descriptive_exif(image)
+            if len(exif):
+                metadata.exif = _strip_exif_header(exif.tobytes())
+        if metadata.xmp is None and hasattr(image, 'tag_v2'):
+            xmp = image.tag_v2.get(TAG_XMP)
+            if xmp:
+                metadata.xmp = xmp if isinstance(xmp, bytes) else str(xmp).encode('utf-8')
+    return metadata
+
+
+def _tiff_descriptive_exif(image: Image.Image) -> Image.Exif:
+    """TIFF源的EXIF：去掉图像数据布局标签
+
+    Pillow 解码TIFF时已按方向标签转置像素，方向标签随之改为1。
+    """
+    exif = Image.Exif()
+    source = image.getexif()
+    if not len(source):
+        return exif
+    exif.load(source.tobytes())
+    for tag in TIFF_STRUCTURE_TAGS:
+        if tag in exif:
+            del exif[tag]
+    if exif_orientation.ORIENTATION_TAG in exif and exif_orientation.decoder_applies_orientation(image):
+        exif[exif_orientation.ORIENTATION_TAG] = 1
+    return exif
+
+
+class _TiffBlock:
+    """EXIF TIFF数据块的最小解析器，只定位条目，不解析标签值"""
+
+    def __init__(self, data: bytes):
+        if data[:2] == b'II':
+            self.endian = '<'
+        elif data[:2] == b'MM':
+            self.endian = '>'
+        else:
+            raise ValueError("无效的TIFF数据头")
+        self.data = bytearray(data)
+        if self._unpack('H', 2) != 42:
+            raise ValueError("无效的TIFF数据头")
+
+    def _unpack(self, fmt: str, offset: int) -> int:
+        return struct.unpack_from(self.endian + fmt, self.data, offset)[0]
+
+    def _pack(self, fmt: str, offset: int, value: int) -> None:
+        struct.pack_into(self.endian + fmt, self.data, offset, value)
+
+    def ifd_offset(self, index: int) -> int:
+        """第 index 个IFD的偏移（0为主图，1为缩略图），不存在时返回0"""
+        offset = self._unpack('I', 4)
+        for _ in range(index):
+            if not offset:
+                return 0
+            offset = self._unpack('I', self.next_pointer(offset))
+        return offset
+
+    def next_pointer(self, ifd_offset: int) -> int:
+        """IFD中“下一个IFD偏移”字段的位置"""
+        count = self._unpack('H', ifd_offset)
+        return ifd_offset + 2 + count * 12
+
+    def find_entry(self, ifd_offset: int, tag: int) -> Optional[Tuple[int, int, int]]:
+        """查找条目，返回 (条目偏移, 类型, 数量)"""
+        count = self._unpack('H', ifd_offset)
+        for i in range(count):
+            entry = ifd_offset + 2 + i * 12
+            if self._unpack('H', entry) == tag:
+                return entry, self._unpack('H', entry + 2), self._unpack('I', entry + 4)
+        return None
+
+    def read_value(self, entry: int, value_type: int) -> int:
+        """读取单值 SHORT/LONG 条目"""
+        return self._unpack('H' if value_type == 3 else 'I', entry + 8)
+
+    def write_value(self, entry: int, value_type: int, value: int) -> None:
+        """就地写入单值 SHORT/LONG 条目"""
+        self._pack('H' if value_type == 3 else 'I', entry + 8, value)
+
+
+def patch_orientation(exif: bytes, orientation: int) -> bytes:
+    """就地修改方向标签，其余字节保持不变"""
+    try:
+        block = _TiffBlock(exif)
+        ifd0 = block.ifd_offset(0)
+        found = block.find_entry(ifd0, exif_orientation.ORIENTATION_TAG)
+    except (ValueError, struct.error):
+        return exif
+
+    if found is not None:
+        entry, value_type, count = found
+        if value_type == 3 and count == 1:
+            if block.read_value(entry, value_type) != orientation:
+                block.write_value(entry, value_type, orientation)
+            return bytes(block.data)
+
+    if orientation == 1:
+        return exif
+
+    # 没有可就地修改的方向条目时，只能重新序列化
+    parsed = Image.Exif()
+    parsed.load(EXIF_HEADER + exif)
+    parsed[exif_orientation.ORIENTATION_TAG] = orientation
+    return _strip_exif_header(parsed.tobytes())
+
+
+def _render_thumbnail(image: Image.Image, bounds: Tuple[int, int]) -> bytes:
+    width, height = image.size
+    scale = min(bounds[0] / width, bounds[1] / height, 1.0)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    thumbnail = image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    if thumbnail.mode != 'RGB':
+        thumbnail = thumbnail.convert('RGB')
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, format='JPEG', quality=75)
+    return buffer.getvalue()
+
+
+def replace_thumbnail(exif: bytes, image: Optional[Image.Image]) -> bytes:
+    """用新图片重新生成EXIF缩略图（image为None时移除缩略图）
+
+    只修改缩略图IFD中的偏移/长度条目和缩略图数据本身；没有缩略图时原样返回。
+    """
+    try:
+        block = _TiffBlock(exif)
+        ifd1 = block.ifd_offset(1)
+        if not ifd1:
+            return exif
+        offset_entry = block.find_entry(ifd1, TAG_JPEG_INTERCHANGE_FORMAT)
+        length_entry = block.find_entry(ifd1, TAG_JPEG_INTERCHANGE_FORMAT_LENGTH)
+    except (ValueError, struct.error):
+        return exif
+    if offset_entry is None or length_entry is None:
+        return exif
+
+    old_offset = block.read_value(offset_entry[0], offset_entry[1])
+    old_length = block.read_value(length_entry[0], length_entry[1])
+    data_end = old_offset + old_length
+    at_end = data_end == len(block.data)
+
+    new_thumbnail = None
+    if image is not None:
+        bounds = THUMBNAIL_SIZE
+        try:
+            with Image.open(io.BytesIO(bytes(block.data[old_offset:data_end]))) as old:
+                bounds = old.size
+        except Exception:
+            pass
+        new_thumbnail = _render_thumbnail(image, bounds)
+        base_length = old_offset if at_end else len(block.data)
+        if len(EXIF_HEADER) + base_length + len(new_thumbnail) > MAX_SEGMENT_PAYLOAD:
+            new_thumbnail = None
+
+    if new_thumbnail is None:
+        # 断开缩略图IFD，数据位于末尾时一并截掉
+        block._pack('I', block.next_pointer(block.ifd_offset(0)), 0)
+        return bytes(block.data[:old_offset] if at_end else block.data)
+
+    if at_end:
+        del block.data[old_offset:]
+    new_offset = len(block.data)
+    block.data.extend(new_thumbnail)
+    block.write_value(offset_entry[0], offset_entry[1], new_offset)
+    block.write_value(length_entry[0], length_entry[1], len(new_thumbnail))
+    return bytes(block.data)
+
+
+def patch_exif(exif: Optional[bytes], image: Optional[Image.Image] = None,
+               orientation: Optional[int] = None) -> Optional[bytes]:
+    """按需修改EXIF：方向不同时改写方向标签，传入图片时重新生成缩略图"""
+    if not exif:
+        return exif
+    if orientation is not None:
+        exif = patch_orientation(exif, exif_orientation.normalize(orientation))
+    if image is not None:
+        exif = replace_thumbnail(exif, image)
+    return exif
+
+
+def _segment(marker: int, payload: bytes) -> bytes:
+    return bytes((0xFF, marker)) + struct.pack('>H', len(payload) + 2) + payload
+
+
+def _jpeg_segments_for(metadata: SourceMetadata, exif: Optional[bytes]) -> List[bytes]:
+    """生成要写入JPEG输出的原始段"""
+    if metadata.jpeg_segments:
+        segments = []
+        exif_written = False
+        for marker, payload in metadata.jpeg_segments:
+            if marker == APP1 and payload.startswith(EXIF_HEADER) and not exif_written:
+                exif_written = True
+                if exif is None:
+                    continue
+                payload = EXIF_HEADER + exif
+            segments.append(_segment(marker, payload))
+        return segments
+
+    segments = []
+    if exif:
+        segments.append(_segment(APP1, EXIF_HEADER + exif))
+    if metadata.xmp and len(XMP_HEADER) + len(metadata.xmp) <= MAX_SEGMENT_PAYLOAD:
+        segments.append(_segment(APP1, XMP_HEADER + metadata.xmp))
+    if metadata.icc_profile:
+        chunk_size = MAX_SEGMENT_PAYLOAD - len(ICC_HEADER) - 2
+        chunks = [metadata.icc_profile[i:i + chunk_size]
+                  for i in range(0, len(metadata.icc_profile), chunk_size)]
+        for index, chunk in enumerate(chunks, 1):
+            segments.append(_segment(APP2, ICC_HEADER + bytes((index, len(chunks))) + chunk))
+    return segments
+
+
+def splice_jpeg_segments(jpeg_data: bytes, segments: List[bytes]) -> bytes:
+    """把原始段插入JPEG数据（SOI及JFIF APP0之后）"""
+    insert_at = 2
+    if jpeg_data[2:4] == b'\xff\xe0':
+        insert_at = 4 + struct.unpack('>H', jpeg_data[4:6])[0]
+    return jpeg_data[:insert_at] + b''.join(segments) + jpeg_data[insert_at:]
+
+
+def save_with_metadata(image: Image.Image, fp: Union[str, BinaryIO], output_format: str,
+                       save_kwargs: Dict[str, Any], metadata: SourceMetadata,
+                       orientation: Optional[int] = None) -> None:
+    """保存图片并透传源文件元数据
+
+    Args:
+        image: 待保存的图片（已转换为输出格式支持的模式）
+        fp: 输出路径或可写的二进制文件对象
+        output_format: 输出格式
+        save_kwargs: 编码参数
+        metadata: read_metadata 返回的源元数据
+        orientation: 输出像素的方向，与源不同时改写方向标签
+    """
+    output_format = output_format.upper()
+    save_kwargs = {key: value for key, value in save_kwargs.items()
+                   if key not in ('exif', 'icc_profile', 'xmp')}
+    exif = patch_exif(metadata.exif, image, orientation)
+
+    if output_format == 'JPEG':
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', **save_kwargs)
+        data = splice_jpeg_segments(buffer.getvalue(), _jpeg_segments_for(metadata, exif))
+        if isinstance(fp, (str, bytes)) or hasattr(fp, '__fspath__'):
+            with open(fp, 'wb') as output:
+                output.write(data)
+        else:
+            fp.write(data)
+        return
+
+    if exif:
+        save_kwargs['exif'] = EXIF_HEADER + exif
+    if metadata.icc_profile:
+        save_kwargs['icc_profile'] = metadata.icc_profile
+    if metadata.xmp:
+        if output_format == 'PNG':
+            pnginfo = PngImagePlugin.PngInfo()
+            pnginfo.add_itxt('XML:com.adobe.xmp', metadata.xmp.decode('utf-8', 'replace'))
+            save_kwargs['pnginfo'] = pnginfo
+        elif output_format == 'TIFF':
+            # TIFF 没有 xmp 参数，写入 XMLPacket 标签
+            save_kwargs['tiffinfo'] = {TAG_XMP: metadata.xmp}
+        else:
+            save_kwargs['xmp'] = metadata.xmp
+    image.save(fp, format=output_format, **save_kwargs)
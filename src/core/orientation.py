@@ -0,0 +1,152 @@
+"""
+EXIF方向模块
+
+不对整幅图片做旋转，而是把显示方向下的水印位置映射到存储方向的像素坐标，
+只对水印局部层做变换，输出时保留原始的 Orientation 标签。
+"""
+
+from typing import Optional, Tuple
+from PIL import Image, TiffImagePlugin
+
+
+# EXIF Orientation 标签
+ORIENTATION_TAG = 0x0112
+
+# 存储方向 -> 显示方向 所需的变换（与 ImageOps.exif_transpose 一致）
+_TO_DISPLAY = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# 显示方向 -> 存储方向 所需的变换（逆变换）
+_TO_STORED = dict(_TO_DISPLAY)
+_TO_STORED[6] = Image.Transpose.ROTATE_90
+_TO_STORED[8] = Image.Transpose.ROTATE_270
+
+
+def normalize(orientation) -> int:
+    """规范化方向值，无效值视为1（不变换）"""
+    try:
+        orientation = int(orientation)
+    except (TypeError, ValueError):
+        return 1
+    return orientation if orientation in _TO_DISPLAY else 1
+
+
+def decoder_applies_orientation(image: Image.Image) -> bool:
+    """解码时是否已由 Pillow 按方向标签转置
+
+    Pillow 打开TIFF时按显示方向给出尺寸，加载时自行转置像素并删除方向标签。
+    """
+    return isinstance(image, TiffImagePlugin.TiffImageFile)
+
+
+def get_orientation(image: Image.Image) -> int:
+    """读取图片解码后仍需处理的EXIF方向（没有、无效或已由解码器处理时返回1）"""
+    if decoder_applies_orientation(image):
+        return 1
+    try:
+        return normalize(image.getexif().get(ORIENTATION_TAG, 1))
+    except Exception:
+        return 1
+
+
+def swaps_axes(orientation: int) -> bool:
+    """该方向在显示时是否交换宽高"""
+    return orientation in (5, 6, 7, 8)
+
+
+def display_size(size: Tuple[int, int], orientation: int) -> Tuple[int, int]:
+    """存储尺寸 -> 显示尺寸（宽高互换是对称的，反向同样适用）"""
+    width, height = size
+    return (height, width) if swaps_axes(orientation) else (width, height)
+
+
+def to_stored_point(point: Tuple[float, float], stored_size: Tuple[int, int],
+                    orientation: int) -> Tuple[float, float]:
+    """显示坐标 -> 存储坐标（像素边界坐标）"""
+    x, y = point
+    w, h = stored_size
+    if orientation == 2:
+        return w - x, y
+    if orientation == 3:
+        return w - x, h - y
+    if orientation == 4:
+        return x, h - y
+    if orientation == 5:
+        return y, x
+    if orientation == 6:
+        return y, h - x
+    if orientation == 7:
+        return w - y, h - x
+    if orientation == 8:
+        return w - y, x
+    return x, y
+
+
+def to_display_point(point: Tuple[float, float], stored_size: Tuple[int, int],
+                     orientation: int) -> Tuple[float, float]:
+    """存储坐标 -> 显示坐标（像素边界坐标）"""
+    u, v = point
+    w, h = stored_size
+    if orientation == 2:
+        return w - u, v
+    if orientation == 3:
+        return w - u, h - v
+    if orientation == 4:
+        return u, h - v
+    if orientation == 5:
+        return v, u
+    if orientation == 6:
+        return h - v, u
+    if orientation == 7:
+        return h - v, w - u
+    if orientation == 8:
+        return v, w - u
+    return u, v
+
+
+def _map_box(box, stored_size, orientation, mapper) -> Tuple[int, int, int, int]:
+    left, top, width, height = box
+    x1, y1 = mapper((left, top), stored_size, orientation)
+    x2, y2 = mapper((left + width, top + height), stored_size, orientation)
+    return int(min(x1, x2)), int(min(y1, y2)), int(abs(x2 - x1)), int(abs(y2 - y1))
+
+
+def to_stored_box(box: Tuple[int, int, int, int], stored_size: Tuple[int, int],
+                  orientation: int) -> Tuple[int, int, int, int]:
+    """显示方向的 (left, top, width, height) -> 存储方向的 (left, top, width, height)"""
+    return _map_box(box, stored_size, orientation, to_stored_point)
+
+
+def to_display_box(box: Tuple[int, int, int, int], stored_size: Tuple[int, int],
+                   orientation: int) -> Tuple[int, int, int, int]:
+    """存储方向的 (left, top, width, height) -> 显示方向的 (left, top, width, height)"""
+    return _map_box(box, stored_size, orientation, to_display_point)
+
+
+def to_stored(image: Image.Image, orientation: int) -> Image.Image:
+    """把按显示方向绘制的局部图层变换到存储方向"""
+    method = _TO_STORED.get(orientation)
+    return image.transpose(method) if method is not None else image
+
+
+def to_display(image: Image.Image, orientation: int) -> Image.Image:
+    """把存储方向的图片变换到显示方向（仅用于缩略图等小图）"""
+    method = _TO_DISPLAY.get(orientation)
+    return image.transpose(method) if method is not None else image
+
+
+def orientation_exif(orientation: int) -> Optional[bytes]:
+    """生成只包含方向标签的EXIF数据块（方向为1时返回None）"""
+    orientation = normalize(orientation)
+    if orientation == 1:
+        return None
+    exif = Image.Exif()
+    exif[ORIENTATION_TAG] = orientation
+    return exif.tobytes()
@@ -0,0 +1,306 @@
+"""
+性能剖析模块
+
+提供轻量的阶段计时：处理流程中的每个阶段用 span() 包裹，按阶段汇总耗时并输出
+p50/p95/max 直方图；可选地对每张图片运行 cProfile，保留最慢的N张图片的
+pstats 数据。未启用时 span() 直接返回共享的空上下文，几乎没有开销。
+
+开启 trace 时还会保留每个区间的线程、图片和起止时间，可导出为 Chrome/Perfetto
+trace-event JSON，在时间线上查看并发批处理中的排队、I/O等待和线程空闲。
+"""
+
+import contextlib
+import cProfile
+import heapq
+import json
+import math
+import os
+import pstats
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+_NULL_SPAN = contextlib.nullcontext()
+
+# 直方图条形的最大宽度（字符数）
+BAR_WIDTH = 30
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """已排序样本的百分位数（最近秩）"""
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Profiler:
+    """阶段计时器（线程安全）
+
+    span(stage) 记录一个阶段的耗时；image(path) 标记一张图片的处理范围，
+    范围内记录的阶段都归属于该图片，并记录图片的总耗时（阶段名 'total'）。
+    image() 返回的字典按阶段累计该图片的耗时（毫秒）和 count() 记录的计数，
+    供处理日志逐张记录。
+    top_n 大于0时对每张图片运行 cProfile，只保留最慢的 top_n 张。
+    trace 为True时保留每个区间，供 write_trace 导出时间线。
+    summarize 为False时只为 image() 逐张累计耗时，不保留阶段直方图的样本
+    （只写处理日志时内存不随图片数增长）。
+    """
+
+    def __init__(self, enabled: bool = True, top_n: int = 0, trace: bool = False,
+                 summarize: bool = True):
+        self.enabled = enabled
+        self.top_n = max(0, int(top_n or 0))
+        self.trace = trace
+        self.summarize = summarize
+        self._origin = time.perf_counter()
+        self._durations: Dict[str, List[float]] = {}
+        # (名称, 类别, 图片, 线程id, 线程名, 开始, 结束)
+        self._spans: List[Tuple[str, str, Optional[str], int, str, float, float]] = []
+        self._slowest: List[Tuple[float, int, str, Optional[pstats.Stats]]] = []
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def current_file(self) -> Optional[str]:
+        """当前线程正在处理的图片"""
+        return getattr(self._local, 'file', None)
+
+    def span(self, stage: str):
+        """记录一个阶段的耗时（上下文管理器）"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(stage)
+
+    @contextlib.contextmanager
+    def _span(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(stage, start, time.perf_counter())
+
+    def record(self, stage: str, seconds: float) -> None:
+        """直接记录一个阶段的耗时（秒）"""
+        if not self.summarize:
+            return
+        with self._lock:
+            self._durations.setdefault(stage, []).append(seconds)
+
+    def add_span(self, stage: str, start: float, end: float, file: Optional[str] = None,
+                 category: str = 'stage', record: bool = True) -> None:
+        """记录一个已结束的区间（perf_counter 时间）
+
+        file 为None时归属于当前线程正在处理的图片；record 为False时只进入时间线，
+        不计入阶段直方图（如排队等待）。
+        """
+        if not self.enabled:
+            return
+        if record:
+            self.record(stage, end - start)
+            image_stats = getattr(self._local, 'stats', None)
+            if image_stats is not None and file is None:
+                stages = image_stats['stages']
+                stages[stage] = stages.get(stage, 0.0) + (end - start) * 1000
+        if self.trace:
+            thread = threading.current_thread()
+            span = (stage, category, file if file is not None else self.current_file,
+                    threading.get_ident(), thread.name, start, end)
+            with self._lock:
+                self._spans.append(span)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """为当前线程正在处理的图片累加一个计数（如缓存命中）"""
+        image_stats = getattr(self._local, 'stats', None)
+        if amount and image_stats is not None:
+            counters = image_stats['counters']
+            counters[name] = counters.get(name, 0) + amount
+
+    def image(self, path: str):
+        """标记一张图片的处理范围（可嵌套，只有最外层生效）
+
+        作为上下文管理器时返回该图片的 {'stages': {...}, 'counters': {...}}，
+        嵌套调用返回外层的同一个字典；未启用时返回None。
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        if self.current_file is not None:
+            return contextlib.nullcontext(self._local.stats)
+        return self._image(str(path))
+
+    @contextlib.contextmanager
+    def _image(self, path: str) -> Iterator[Dict[str, Dict]]:
+        self._local.file = path
+        self._local.stats = stats = {'stages': {}, 'counters': {}}
+        profile = self._start_cprofile()
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+            self._local.file = None
+            self._local.stats = None
+            stats['stages']['total'] = elapsed * 1000
+            self.add_span('total', start, start + elapsed, path, category='image')
+            self._keep_if_slow(elapsed, path, profile)
+
+    def _start_cprofile(self) -> Optional[cProfile.Profile]:
+        if not self.top_n:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 同一时刻只能有一个 cProfile 处于启用状态（Python 3.12+ 的并发任务）
+            return None
+        return profile
+
+    def _keep_if_slow(self, elapsed: float, path: str, profile: Optional[cProfile.Profile]) -> None:
+        if not self.top_n:
+            return
+        with self._lock:
+            self._sequence += 1
+            if len(self._slowest) >= self.top_n and elapsed <= self._slowest[0][0]:
+                return
+            stats = pstats.Stats(profile) if profile is not None else None
+            entry = (elapsed, self._sequence, path, stats)
+            if len(self._slowest) < self.top_n:
+                heapq.heappush(self._slowest, entry)
+            else:
+                heapq.heapreplace(self._slowest, entry)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """按阶段汇总耗时（毫秒），按记录的先后顺序排列阶段"""
+        with self._lock:
+            durations = {stage: sorted(values) for stage, values in self._durations.items()}
+
+        result = {}
+        for stage, ordered in durations.items():
+            result[stage] = {
+                'count': len(ordered),
+                'p50_ms': percentile(ordered, 50) * 1000,
+                'p95_ms': percentile(ordered, 95) * 1000,
+                'max_ms': ordered[-1] * 1000,
+                'total_ms': sum(ordered) * 1000,
+            }
+        return result
+
+    def slowest(self) -> List[Tuple[str, float, Optional[pstats.Stats]]]:
+        """最慢的图片：[(路径, 耗时秒, pstats.Stats 或 None)]，从慢到快"""
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)
+        return [(path, elapsed, stats) for elapsed, _, path, stats in entries]
+
+    def format_report(self) -> str:
+        """生成按阶段的耗时直方图
+
+        条形长度表示该阶段总耗时占图片总耗时的比例；阶段可以嵌套
+        （如 font_load 包含在 render 中），因此比例之和可能超过100%。
+        """
+        summary = self.summary()
+        if not summary:
+            return "没有记录到任何阶段耗时"
+
+        reference = summary.get('total', {}).get('total_ms') or max(s['total_ms'] for s in summary.values())
+        lines = [
+            f"{'阶段':<12} {'次数':>6} {'p50(ms)':>10} {'p95(ms)':>10} {'max(ms)':>10} {'合计(ms)':>11}  占比",
+        ]
+        stages = [stage for stage in summary if stage != 'total']
+        if 'total' in summary:
+            stages.append('total')
+        for stage in stages:
+            stats = summary[stage]
+            share = stats['total_ms'] / reference if reference else 0.0
+            bar = '█' * max(1 if stats['total_ms'] else 0, int(round(min(share, 1.0) * BAR_WIDTH)))
+            lines.append(
+                f"{stage:<12} {stats['count']:>6} {stats['p50_ms']:>10.1f} {stats['p95_ms']:>10.1f} "
+                f"{stats['max_ms']:>10.1f} {stats['total_ms']:>11.1f}  {bar} {share * 100:.0f}%"
+            )
+
+        slowest = self.slowest()
+        if slowest:
+            lines.append("")
+            lines.append(f"最慢的 {len(slowest)} 张图片:")
+            for path, elapsed, _ in slowest:
+                lines.append(f"  {elapsed * 1000:>10.1f} ms  {path}")
+        return "\n".join(lines)
+
+    def dump_stats(self, directory: str, limit: int = 15) -> List[str]:
+        """把最慢图片的 cProfile 数据写入目录（.pstats 文件和可读的 .txt 摘要）
+
+        Returns:
+            List[str]: 写入的 .pstats 文件路径
+        """
+        os.makedirs(directory, exist_ok=True)
+        written = []
+        for rank, (path, elapsed, stats) in enumerate(self.slowest(), 1):
+            if stats is None:
+                continue
+            name = re.sub(r'[^\w.-]+', '_', os.path.basename(path)) or 'image'
+            base = os.path.join(directory, f"{rank:02d}_{name}")
+            stats.dump_stats(base + '.pstats')
+            with open(base + '.txt', 'w', encoding='utf-8') as f:
+                f.write(f"{path}  {elapsed * 1000:.1f} ms\n\n")
+                pstats.Stats(base + '.pstats', stream=f).sort_stats('cumulative').print_stats(limit)
+            written.append(base + '.pstats')
+        return written
+
+    def trace_events(self) -> List[Dict]:
+        """生成 Chrome trace-event 格式的事件列表（时间单位为微秒）"""
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self._spans)
+
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+                   'args': {'name': 'PhotoWatermark'}}]
+        thread_names = {}
+        for index, (name, category, file, tid, thread_name, start, end) in enumerate(spans):
+            thread_names.setdefault(tid, thread_name)
+            timestamp = round((start - self._origin) * 1_000_000, 3)
+            args = {'file': file} if file else {}
+            if category == 'wait':
+                # 等待区间之间会相互重叠，用异步事件放在独立的轨道上
+                common = {'name': name, 'cat': category, 'id': index, 'pid': pid, 'tid': tid}
+                events.append(dict(common, ph='b', ts=timestamp, args=args))
+                events.append(dict(common, ph='e', ts=round((end - self._origin) * 1_000_000, 3)))
+                continue
+            event = {
+                'name': os.path.basename(file) if category == 'image' and file else name,
+                'cat': category,
+                'ph': 'X',
+                'pid': pid,
+                'tid': tid,
+                'ts': timestamp,
+                'dur': round((end - start) * 1_000_000, 3),
+            }
+            if args:
+                event['args'] = args
+            events.append(event)
+
+        for tid, thread_name in thread_names.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': thread_name}})
+        return events
+
+    def write_trace(self, path: str) -> int:
+        """把记录的区间写为 Chrome/Perfetto 可打开的 trace-event JSON
+
+        Returns:
+            int: 写入的区间数量
+        """
+        events = self.trace_events()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+        return sum(1 for event in events if event['ph'] in ('X', 'b'))
+
+
+# 未启用剖析时使用的共享实例
+NULL_PROFILER = Profiler(enabled=False)
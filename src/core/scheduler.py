@@ -0,0 +1,157 @@
+"""
+内存感知调度模块
+
+根据图片文件头中的尺寸和色彩模式估算每个任务的内存占用，只在总占用不超过
+内存预算时才放行新任务；单个任务就超出预算的大图进入独立的串行通道独占执行。
+"""
+
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+
+# 处理流程中的全尺寸中间副本数量：
+# 源模式副本：解码后的原图、add_*_watermark 中的 copy()、合成后转回原模式
+SOURCE_COPIES = 3
+# RGBA副本：convert('RGBA')、全尺寸水印层、alpha_composite 的结果
+RGBA_COPIES = 3
+
+_SIZE_UNITS = {
+    '': 1024 ** 2,  # 不带单位时按MB计
+    'K': 1024,
+    'M': 1024 ** 2,
+    'G': 1024 ** 3,
+    'T': 1024 ** 4,
+}
+
+
+def parse_memory_size(value) -> Optional[int]:
+    """解析内存大小（如 512M、2G、1.5GB；纯数字按MB计），返回字节数
+
+    None、空字符串或0表示不限制。
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value * _SIZE_UNITS['']) or None
+
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?\s*', str(value), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"无效的内存大小: {value}")
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS[unit.upper()]) or None
+
+
+def bytes_per_pixel(mode: str) -> int:
+    """Pillow 内部存储该色彩模式时每个像素占用的字节数
+
+    单通道8位模式占1字节，16位模式占2字节，其余（RGB、LA等）按4字节对齐存储。
+    """
+    if mode in ('1', 'L', 'P'):
+        return 1
+    if mode.startswith('I;16'):
+        return 2
+    return 4
+
+
+def estimate_job_memory(size: Tuple[int, int], mode: str) -> int:
+    """估算处理一张图片的峰值内存（字节）"""
+    pixels = size[0] * size[1]
+    per_pixel = bytes_per_pixel(mode) * SOURCE_COPIES + 4 * RGBA_COPIES
+    return pixels * per_pixel
+
+
+class MemoryBudget:
+    """内存预算
+
+    acquire 在预算不足时阻塞。没有任务在执行时总会放行，避免单个任务
+    超出预算时永远无法执行。
+    """
+
+    def __init__(self, limit: Optional[int]):
+        self.limit = limit
+        self.in_use = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    def fits(self, cost: int) -> bool:
+        """该任务能否与其他任务并发执行"""
+        return self.limit is None or cost <= self.limit
+
+    def acquire(self, cost: int) -> None:
+        with self._condition:
+            if self.limit is not None:
+                self._condition.wait_for(
+                    lambda: self.in_use == 0 or self.in_use + cost <= self.limit
+                )
+            self.in_use += cost
+            self.peak = max(self.peak, self.in_use)
+
+    def release(self, cost: int) -> None:
+        with self._condition:
+            self.in_use -= cost
+            self._condition.notify_all()
+
+
+class JobScheduler:
+    """按内存预算放行任务的线程池
+
+    submit 会阻塞直到任务被放行，因此调用方按顺序提交即可形成背压。
+    超出预算的任务在独立的串行通道中执行，并等待其他任务全部结束后独占预算。
+    已提交但未结束的任务数不超过 max_pending（默认为工作线程数的2倍）：
+    任务通常持有打开的文件句柄或已读入的数据，不限制时提交方会远远跑在
+    工作线程前面，耗尽文件描述符或内存。
+    """
+
+    def __init__(self, workers: int = 1, max_memory: Optional[int] = None,
+                 max_pending: Optional[int] = None):
+        self.workers = max(1, int(workers or 1))
+        self.budget = MemoryBudget(max_memory)
+        self.max_pending = max(1, int(max_pending or self.workers * 2))
+        self._pending = threading.BoundedSemaphore(self.max_pending)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='watermark')
+        self._serial_lane = ThreadPoolExecutor(max_workers=1, thread_name_prefix='watermark-large')
+        self.stats = {'admitted': 0, 'serial': 0}
+
+    def __enter__(self) -> 'JobScheduler':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def submit(self, cost: int, fn: Callable, *args, **kwargs) -> Future:
+        """提交任务（未结束的任务已达上限或预算不足时阻塞）"""
+        self._pending.acquire()
+        if self.budget.fits(cost):
+            executor = self._pool
+            self.stats['admitted'] += 1
+        else:
+            # 独占整个预算：等待在执行的任务全部结束
+            cost = self.budget.limit
+            executor = self._serial_lane
+            self.stats['serial'] += 1
+
+        try:
+            self.budget.acquire(cost)
+        except BaseException:
+            self._pending.release()
+            raise
+
+        def run():
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.budget.release(cost)
+                self._pending.release()
+
+        try:
+            return executor.submit(run)
+        except BaseException:
+            self.budget.release(cost)
+            self._pending.release()
+            raise
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+        self._serial_lane.shutdown(wait=wait)
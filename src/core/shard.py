@@ -0,0 +1,148 @@
+"""
+分片模块
+
+多台机器共享同一存储处理同一批图片时，每台机器用 `--shard INDEX/COUNT` 只处理
+其中一个分片：按图片相对路径的稳定哈希划分，各分片互不相交、合起来覆盖全部图片，
+不需要任何协调。每个分片写出自己的处理日志和清单（manifest），`merge-reports`
+把各分片清单中的统计合并为一份报告。
+"""
+
+import glob
+import hashlib
+import json
+import os
+import socket
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+MANIFEST_SUFFIX = '.manifest.json'
+
+# 未指定 --journal 时，分片日志和清单存放在输出目录下的该子目录中
+REPORT_DIR = '.shards'
+
+# 统计项（与 ImageProcessor.stats 一致）
+STAT_KEYS = ('total_files', 'processed_files', 'failed_files', 'no_exif_files', 'skipped_files',
+             'deduplicated_files')
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """解析 'INDEX/COUNT'（INDEX 从0开始），返回 (index, count)"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f"无效的分片: {value}（格式为 INDEX/COUNT，如 0/4）")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"无效的分片: {value}（需要 0 <= INDEX < COUNT）")
+    return index, count
+
+
+def shard_key(relative_path: str) -> str:
+    """分片使用的键：规范化并统一为 '/' 分隔，不同操作系统的节点结果一致"""
+    return os.path.normpath(relative_path).replace(os.sep, '/')
+
+
+def shard_of(relative_path: str, count: int) -> int:
+    """相对路径所属的分片（稳定哈希，与进程、机器和 PYTHONHASHSEED 无关）"""
+    key = shard_key(relative_path).encode('utf-8', 'surrogateescape')
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % count
+
+
+def shard_name(index: int, count: int) -> str:
+    return f"shard-{index}-of-{count}"
+
+
+def shard_path(path: str, index: int, count: int) -> str:
+    """在文件名中插入分片编号，如 run.jsonl → run.shard-0-of-4.jsonl"""
+    base, ext = os.path.splitext(path)
+    return f"{base}.{shard_name(index, count)}{ext}"
+
+
+def manifest_path(journal_path: str) -> str:
+    """与分片日志对应的清单路径"""
+    return os.path.splitext(journal_path)[0] + MANIFEST_SUFFIX
+
+
+def build_manifest(index: int, count: int, input_path: str, output_dir: Optional[str],
+                   journal_path: str, stats: Dict[str, int], started: datetime) -> Dict[str, Any]:
+    """分片完成时写出的清单"""
+    finished = datetime.now()
+    return {
+        'shard': {'index': index, 'count': count},
+        'host': socket.gethostname(),
+        'pid': os.getpid(),
+        'input': input_path,
+        'output': output_dir,
+        'journal': journal_path,
+        'started': started.isoformat(timespec='seconds'),
+        'finished': finished.isoformat(timespec='seconds'),
+        'duration_s': round((finished - started).total_seconds(), 3),
+        'stats': {key: stats.get(key, 0) for key in STAT_KEYS},
+    }
+
+
+def write_manifest(path: str, manifest: Dict[str, Any]) -> None:
+    """写出清单（先写临时文件再替换，其他节点读不到写了一半的清单）"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+def find_manifests(paths: Iterable[str]) -> List[str]:
+    """展开清单文件和目录（目录中查找 *.manifest.json，也查找其 .shards 子目录）"""
+    manifests = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory in (path, os.path.join(path, REPORT_DIR)):
+                manifests.extend(sorted(glob.glob(os.path.join(directory, '*' + MANIFEST_SUFFIX))))
+        else:
+            manifests.append(path)
+    return manifests
+
+
+def merge_manifests(manifests: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """合并各分片清单的统计，并检查分片是否齐全
+
+    返回的 missing 为缺少的分片编号，duplicates 为出现多次的分片编号（同一分片
+    重复运行时以最后完成的为准）。
+    """
+    counts = {manifest['shard']['count'] for manifest in manifests}
+    if len(counts) > 1:
+        raise ValueError(f"清单的分片总数不一致: {sorted(counts)}")
+    count = counts.pop() if counts else 0
+
+    latest: Dict[int, Dict[str, Any]] = {}
+    duplicates = set()
+    for manifest in manifests:
+        index = manifest['shard']['index']
+        if index in latest:
+            duplicates.add(index)
+            if manifest['finished'] < latest[index]['finished']:
+                continue
+        latest[index] = manifest
+
+    totals = {key: sum(manifest['stats'].get(key, 0) for manifest in latest.values())
+              for key in STAT_KEYS}
+    shards = [latest[index] for index in sorted(latest)]
+    return {
+        'count': count,
+        'shards': shards,
+        'missing': [index for index in range(count) if index not in latest],
+        'duplicates': sorted(duplicates),
+        'stats': totals,
+        'started': min((manifest['started'] for manifest in shards), default=None),
+        'finished': max((manifest['finished'] for manifest in shards), default=None),
+    }
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if 'shard' not in manifest or 'stats' not in manifest:
+        raise ValueError(f"不是分片清单: {path}")
+    return manifest
@@ -0,0 +1,491 @@
+"""
+分块处理模块
+
+超大TIFF（扫描件、拼接全景等）不整体解码：按条带或分块逐行读取源图，
+只在与水印局部层重叠的分块中合成水印，并逐行写出分块TIFF。
+峰值内存由“图片宽度 × 分块高度”决定，而不是整幅图片的大小。
+"""
+
+import io
+import os
+import struct
+import zlib
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Tuple, Union
+from PIL import Image
+
+from . import orientation as exif_orientation
+from .scheduler import bytes_per_pixel
+
+
+# 默认输出分块边长（TIFF要求为16的倍数）
+TILE_SIZE = 512
+# 超过该像素数（百万像素）的TIFF输入默认使用分块处理
+DEFAULT_MIN_MEGAPIXELS = 64
+# 单个源行带（一行条带/分块）解码后的上限；超过时分块处理不能限制内存
+MAX_BAND_BYTES = 256 * 1024 ** 2
+
+# 支持分块读写的色彩模式：(每像素采样数, Photometric, ExtraSamples)
+_MODE_LAYOUT = {
+    'L': (1, 1, None),
+    'RGB': (3, 2, None),
+    'RGBA': (4, 2, 2),  # 非预乘alpha
+}
+
+# TIFF 数据类型
+BYTE, ASCII, SHORT, LONG, UNDEFINED, LONG8 = 1, 2, 3, 4, 7, 16
+_TYPE_FORMATS = {BYTE: 'B', ASCII: 'B', SHORT: 'H', LONG: 'I', UNDEFINED: 'B', LONG8: 'Q'}
+
+# TIFF 标签
+TAG_IMAGE_WIDTH = 256
+TAG_IMAGE_LENGTH = 257
+TAG_BITS_PER_SAMPLE = 258
+TAG_COMPRESSION = 259
+TAG_PHOTOMETRIC = 262
+TAG_FILL_ORDER = 266
+TAG_STRIP_OFFSETS = 273
+TAG_ORIENTATION = 274
+TAG_SAMPLES_PER_PIXEL = 277
+TAG_ROWS_PER_STRIP = 278
+TAG_STRIP_BYTE_COUNTS = 279
+TAG_PLANAR_CONFIGURATION = 284
+TAG_PREDICTOR = 317
+TAG_TILE_WIDTH = 322
+TAG_TILE_LENGTH = 323
+TAG_TILE_OFFSETS = 324
+TAG_TILE_BYTE_COUNTS = 325
+TAG_EXTRA_SAMPLES = 338
+TAG_SAMPLE_FORMAT = 339
+TAG_JPEG_TABLES = 347
+TAG_YCBCR_SUBSAMPLING = 530
+TAG_XMP = 700
+TAG_ICC_PROFILE = 34675
+
+# 解码单个条带/分块时需要从源文件复制的标签
+_DECODE_TAGS = (
+    TAG_BITS_PER_SAMPLE, TAG_COMPRESSION, TAG_PHOTOMETRIC, TAG_FILL_ORDER,
+    TAG_SAMPLES_PER_PIXEL, TAG_PLANAR_CONFIGURATION, TAG_PREDICTOR,
+    TAG_EXTRA_SAMPLES, TAG_SAMPLE_FORMAT, TAG_JPEG_TABLES, TAG_YCBCR_SUBSAMPLING,
+)
+
+# 透传模式下复制的IFD0描述性文本标签：
+# ImageDescription、Make、Model、Software、DateTime、Artist、Copyright
+_DESCRIPTIVE_TAGS = (270, 271, 272, 305, 306, 315, 33432)
+
+# Adobe Deflate
+COMPRESSION_DEFLATE = 8
+
+
+class TiledUnsupportedError(ValueError):
+    """源图无法分块处理（调用方应回退到整图处理）"""
+
+
+def _encode_ifd(entries: Sequence[Tuple[int, int, Union[bytes, Sequence[int]]]],
+                ifd_offset: int, bigtiff: bool = False, endian: str = '<') -> bytes:
+    """编码一个IFD及其外部数据（下一个IFD偏移为0）
+
+    entries 为 (标签, 类型, 值) 列表，值为字节串或整数序列。
+    """
+    count_format, offset_format = ('Q', 'Q') if bigtiff else ('H', 'I')
+    inline_size = 8 if bigtiff else 4
+    entry_size = 20 if bigtiff else 12
+    entries = sorted(entries, key=lambda entry: entry[0])
+
+    header_size = struct.calcsize(endian + count_format) + entry_size * len(entries) + inline_size
+    data_offset = ifd_offset + header_size
+    body = bytearray(struct.pack(endian + count_format, len(entries)))
+    external = bytearray()
+
+    for tag, value_type, values in entries:
+        if isinstance(values, (bytes, bytearray)):
+            payload = bytes(values)
+            count = len(payload)
+        else:
+            count = len(values)
+            payload = struct.pack(endian + _TYPE_FORMATS[value_type] * count, *values)
+
+        if len(payload) <= inline_size:
+            value_field = payload.ljust(inline_size, b'\x00')
+        else:
+            value_field = struct.pack(endian + offset_format, data_offset + len(external))
+            external.extend(payload)
+            if len(external) % 2:
+                external.append(0)
+
+        body.extend(struct.pack(endian + ('HHQ' if bigtiff else 'HHI'), tag, value_type, count))
+        body.extend(value_field)
+
+    body.extend(struct.pack(endian + offset_format, 0))
+    return bytes(body + external)
+
+
+def _tag_entry(image: Image.Image, tag: int):
+    """把源图的标签转换为 (标签, 类型, 值)，不支持的类型返回None"""
+    value = image.tag_v2.get(tag)
+    if value is None:
+        return None
+    value_type = image.tag_v2.tagtype.get(tag, SHORT)
+    if value_type == UNDEFINED or isinstance(value, bytes):
+        return tag, UNDEFINED, bytes(value)
+    if value_type not in (BYTE, SHORT, LONG):
+        return None
+    values = value if isinstance(value, tuple) else (value,)
+    return tag, value_type, tuple(int(v) for v in values)
+
+
+def band_layout(image: Image.Image) -> Tuple[int, int, int]:
+    """源TIFF的存储尺寸和行带高度 (宽, 高, 行带高度)
+
+    Raises:
+        TiledUnsupportedError: 整幅图片只有一个行带（如单条带TIFF），或一个行带
+            解码后超过 MAX_BAND_BYTES，按行带读取无法限制内存
+    """
+    tags = image.tag_v2
+    width, height = int(tags[TAG_IMAGE_WIDTH]), int(tags[TAG_IMAGE_LENGTH])
+    if TAG_TILE_OFFSETS in tags:
+        band_height = int(tags[TAG_TILE_LENGTH])
+    else:
+        band_height = int(tags.get(TAG_ROWS_PER_STRIP, height))
+    band_height = min(band_height, height)
+    if band_height >= height:
+        raise TiledUnsupportedError("整幅图片只有一个条带/分块行，无法按行带读取")
+    band_bytes = width * band_height * bytes_per_pixel(image.mode)
+    if band_bytes > MAX_BAND_BYTES:
+        raise TiledUnsupportedError(
+            f"单个条带/分块行过大（{band_bytes // 1024 ** 2}MB），超过 {MAX_BAND_BYTES // 1024 ** 2}MB")
+    return width, height, band_height
+
+
+class TiffBandReader:
+    """按行带读取TIFF
+
+    每次解码一行条带（或一行分块），把这些条带的原始压缩数据和必要的标签
+    组装成一个内存中的小TIFF交给 Pillow 解码，因此支持 Pillow/libtiff 能解码的
+    所有压缩方式，且不需要读取整幅图片。
+    """
+
+    def __init__(self, handle):
+        image = handle.image
+        if image.format != 'TIFF':
+            raise TiledUnsupportedError("不是TIFF文件")
+        tags = image.tag_v2
+        if tags.get(TAG_PLANAR_CONFIGURATION, 1) != 1:
+            raise TiledUnsupportedError("不支持按平面存储的TIFF")
+
+        self.handle = handle
+        self.image = image
+        self.mode = image.mode
+
+        if TAG_TILE_OFFSETS in tags:
+            self.block_width = int(tags[TAG_TILE_WIDTH])
+            offsets, counts = tags[TAG_TILE_OFFSETS], tags.get(TAG_TILE_BYTE_COUNTS)
+        elif TAG_STRIP_OFFSETS in tags:
+            self.block_width = None
+            offsets, counts = tags[TAG_STRIP_OFFSETS], tags.get(TAG_STRIP_BYTE_COUNTS)
+        else:
+            raise TiledUnsupportedError("缺少条带/分块偏移")
+        # Pillow 按显示方向给出尺寸，分块处理始终在存储方向上进行
+        self.width, self.height, self.block_height = band_layout(image)
+        if self.block_width is None:
+            self.block_width = self.width
+
+        self.offsets = offsets if isinstance(offsets, tuple) else (offsets,)
+        counts = counts if isinstance(counts, tuple) else (counts,)
+        if counts is None or len(counts) != len(self.offsets):
+            raise TiledUnsupportedError("条带/分块字节数与偏移不匹配")
+        self.byte_counts = counts
+        self.blocks_across = -(-self.width // self.block_width)
+        self.block_rows = -(-self.height // self.block_height)
+        if len(self.offsets) < self.blocks_across * self.block_rows:
+            raise TiledUnsupportedError("条带/分块数量不足")
+
+        self._decode_entries = [entry for entry in (_tag_entry(image, tag) for tag in _DECODE_TAGS) if entry]
+        self.tiled = TAG_TILE_OFFSETS in tags
+
+    def _read_block(self, index: int) -> bytes:
+        fp = self.handle.file
+        position = fp.tell()
+        try:
+            fp.seek(self.offsets[index])
+            return fp.read(self.byte_counts[index])
+        finally:
+            fp.seek(position)
+
+    def read_band(self, row: int) -> Image.Image:
+        """解码第 row 行条带/分块，返回全宽的行带图片"""
+        first = row * self.blocks_across
+        blocks = [self._read_block(first + i) for i in range(self.blocks_across)]
+        rows = min(self.block_height, self.height - row * self.block_height)
+
+        if self.tiled:
+            # 分块在文件中总是完整尺寸，边缘分块解码后再裁掉填充部分
+            band_height = self.block_height
+            layout = [(TAG_TILE_WIDTH, LONG, (self.block_width,)),
+                      (TAG_TILE_LENGTH, LONG, (self.block_height,))]
+            offset_tag, count_tag = TAG_TILE_OFFSETS, TAG_TILE_BYTE_COUNTS
+            band_width = self.blocks_across * self.block_width
+        else:
+            band_height = rows
+            layout = [(TAG_ROWS_PER_STRIP, LONG, (rows,))]
+            offset_tag, count_tag = TAG_STRIP_OFFSETS, TAG_STRIP_BYTE_COUNTS
+            band_width = self.width
+
+        entries = list(self._decode_entries) + layout + [
+            (TAG_IMAGE_WIDTH, LONG, (band_width,)),
+            (TAG_IMAGE_LENGTH, LONG, (band_height,)),
+            (count_tag, LONG, tuple(len(block) for block in blocks)),
+        ]
+        # 偏移字段的长度与取值无关，先用占位值确定IFD大小
+        placeholder = entries + [(offset_tag, LONG, (0,) * len(blocks))]
+        data_start = 8 + len(_encode_ifd(placeholder, 8))
+        offsets, position = [], data_start
+        for block in blocks:
+            offsets.append(position)
+            position += len(block)
+        ifd = _encode_ifd(entries + [(offset_tag, LONG, tuple(offsets))], 8)
+
+        data = b'II*\x00' + struct.pack('<I', 8) + ifd + b''.join(blocks)
+        with Image.open(io.BytesIO(data)) as band:
+            band.load()
+            if band.mode != self.mode:
+                band = band.convert(self.mode)
+            if band.size != (self.width, rows):
+                band = band.crop((0, 0, self.width, rows))
+            else:
+                band = band.copy()
+        return band
+
+    def bands(self) -> Iterator[Tuple[int, Image.Image]]:
+        """依次产生 (起始行, 行带图片)"""
+        for row in range(self.block_rows):
+            yield row * self.block_height, self.read_band(row)
+
+
+class TiledTiffWriter:
+    """逐行写出分块TIFF
+
+    分块按行写入文件，全部写完后在文件末尾写入IFD并回填文件头中的IFD偏移。
+    bigtiff 为None时，未压缩数据超过2GB自动使用BigTIFF。
+    """
+
+    def __init__(self, fp: Union[str, BinaryIO], size: Tuple[int, int], mode: str,
+                 tile_size: int = TILE_SIZE, compress_level: int = 6,
+                 extra_entries: Optional[List[Tuple[int, int, Union[bytes, Sequence[int]]]]] = None,
+                 bigtiff: Optional[bool] = None):
+        if mode not in _MODE_LAYOUT:
+            raise TiledUnsupportedError(f"不支持分块写出的色彩模式: {mode}")
+        if tile_size % 16:
+            raise ValueError("分块边长必须是16的倍数")
+
+        self.width, self.height = size
+        self.mode = mode
+        self.tile_size = tile_size
+        self.compress_level = compress_level
+        self.extra_entries = list(extra_entries or [])
+        self.samples = _MODE_LAYOUT[mode][0]
+        if bigtiff is None:
+            bigtiff = self.width * self.height * self.samples >= 2 ** 31
+        self.bigtiff = bigtiff
+        self.tiles_across = -(-self.width // tile_size)
+        self.tile_offsets: List[int] = []
+        self.tile_byte_counts: List[int] = []
+        self.rows_written = 0
+
+        self._own_file = isinstance(fp, str)
+        self._fp = open(fp, 'wb') if self._own_file else fp
+        self._start = self._fp.tell()
+        if self.bigtiff:
+            self._fp.write(b'II+\x00' + struct.pack('<HHQ', 8, 0, 0))
+        else:
+            self._fp.write(b'II*\x00' + struct.pack('<I', 0))
+
+    def __enter__(self) -> 'TiledTiffWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        elif self._own_file:
+            self._fp.close()
+
+    def _position(self) -> int:
+        return self._fp.tell() - self._start
+
+    def write_row(self, row: Image.Image) -> None:
+        """写入一行分块（全宽、高度为 tile_size，最后一行可以更矮）"""
+        if row.mode != self.mode:
+            row = row.convert(self.mode)
+        tile = self.tile_size
+        for column in range(self.tiles_across):
+            left = column * tile
+            block = row.crop((left, 0, left + tile, tile))  # 超出部分以0填充
+            data = zlib.compress(block.tobytes(), self.compress_level)
+            self.tile_offsets.append(self._position())
+            self.tile_byte_counts.append(len(data))
+            self._fp.write(data)
+            if self._position() % 2:
+                self._fp.write(b'\x00')
+        self.rows_written += min(tile, row.height)
+
+    def close(self) -> None:
+        """写入IFD并回填文件头"""
+        if self._fp is None:
+            return
+        samples, photometric, extra_samples = _MODE_LAYOUT[self.mode]
+        offset_type = LONG8 if self.bigtiff else LONG
+        entries = [
+            (TAG_IMAGE_WIDTH, LONG, (self.width,)),
+            (TAG_IMAGE_LENGTH, LONG, (self.height,)),
+            (TAG_BITS_PER_SAMPLE, SHORT, (8,) * samples),
+            (TAG_COMPRESSION, SHORT, (COMPRESSION_DEFLATE,)),
+            (TAG_PHOTOMETRIC, SHORT, (photometric,)),
+            (TAG_SAMPLES_PER_PIXEL, SHORT, (samples,)),
+            (TAG_PLANAR_CONFIGURATION, SHORT, (1,)),
+            (TAG_TILE_WIDTH, LONG, (self.tile_size,)),
+            (TAG_TILE_LENGTH, LONG, (self.tile_size,)),
+            (TAG_TILE_OFFSETS, offset_type, tuple(self.tile_offsets)),
+            (TAG_TILE_BYTE_COUNTS, offset_type, tuple(self.tile_byte_counts)),
+        ]
+        if extra_samples is not None:
+            entries.append((TAG_EXTRA_SAMPLES, SHORT, (extra_samples,)))
+        used = {entry[0] for entry in entries}
+        entries.extend(entry for entry in self.extra_entries if entry[0] not in used)
+
+        ifd_offset = self._position()
+        self._fp.write(_encode_ifd(entries, ifd_offset, self.bigtiff))
+        end = self._fp.tell()
+        self._fp.seek(self._start + (8 if self.bigtiff else 4))
+        self._fp.write(struct.pack('<Q' if self.bigtiff else '<I', ifd_offset))
+        self._fp.seek(end)
+
+        if self._own_file:
+            self._fp.close()
+        self._fp = None
+
+
+def should_tile(handle, output_format: str,
+                min_megapixels: Optional[float] = DEFAULT_MIN_MEGAPIXELS) -> bool:
+    """是否对该任务使用分块处理
+
+    TIFF输入、TIFF输出、像素数超过阈值（阈值为None表示不分块），且源图能按行带
+    读取（见 band_layout）。
+    """
+    if min_megapixels is None or (output_format or '').upper() != 'TIFF':
+        return False
+    try:
+        if handle.format != 'TIFF' or handle.mode not in _MODE_LAYOUT:
+            return False
+        width, height = handle.size
+        if width * height < min_megapixels * 1_000_000:
+            return False
+        band_layout(handle.image)
+    except Exception:
+        return False
+    return True
+
+
+def estimate_memory(handle, tile_size: int = TILE_SIZE) -> int:
+    """估算分块处理的峰值内存（字节）
+
+    同时存在的全宽缓冲：源行带（源条带/分块高度）、输出行及其RGBA合成区域。
+    """
+    width, height, band_height = band_layout(handle.image)
+    per_pixel = bytes_per_pixel(handle.mode)
+    return width * (band_height * per_pixel * 2 + tile_size * (per_pixel + 4))
+
+
+def _composite_into_row(row: Image.Image, row_top: int, layer: Image.Image,
+                        position: Tuple[int, int]) -> Image.Image:
+    """只在与水印局部层重叠的区域内合成"""
+    layer_x, layer_y = position
+    left = max(layer_x, 0)
+    right = min(layer_x + layer.width, row.width)
+    top = max(layer_y, row_top)
+    bottom = min(layer_y + layer.height, row_top + row.height)
+    if left >= right or top >= bottom:
+        return row
+
+    region = row.crop((left, top - row_top, right, bottom - row_top)).convert('RGBA')
+    source = layer.crop((left - layer_x, top - layer_y, right - layer_x, bottom - layer_y))
+    # 与整图处理一致：先以水印自身为蒙版贴到透明层上，再做alpha合成
+    overlay = Image.new('RGBA', source.size, (0, 0, 0, 0))
+    overlay.paste(source, (0, 0), source if source.mode == 'RGBA' else None)
+    region = Image.alpha_composite(region, overlay)
+    row.paste(region.convert(row.mode), (left, top - row_top))
+    return row
+
+
+def process_tiled(handle, output: Union[str, BinaryIO], watermark_processor,
+                  text: Optional[str] = None, source_metadata=None,
+                  tile_size: int = TILE_SIZE) -> None:
+    """分块处理TIFF并写出分块TIFF
+
+    Args:
+        handle: 源图的 ImageHandle
+        output: 输出路径或可写、可定位的二进制文件对象
+        watermark_processor: 用于生成水印局部层的 WatermarkProcessor
+        text: 水印文本（时间水印需要）
+        source_metadata: 透传模式下的源元数据（写入XMP和描述性文本标签）
+        tile_size: 输出分块边长
+
+    Raises:
+        TiledUnsupportedError: 源图无法分块读取时抛出，调用方应回退到整图处理
+    """
+    reader = TiffBandReader(handle)
+    tags = reader.image.tag_v2
+    orientation = exif_orientation.normalize(tags.get(TAG_ORIENTATION, 1))
+    watermark = watermark_processor.watermark_layer((reader.width, reader.height), text, orientation)
+
+    # 像素保持存储方向，写回方向标签；ICC与整图保存一致总是保留
+    extra_entries = []
+    if orientation != 1:
+        extra_entries.append((TAG_ORIENTATION, SHORT, (orientation,)))
+    icc_profile = reader.image.info.get('icc_profile')
+    if icc_profile:
+        extra_entries.append((TAG_ICC_PROFILE, UNDEFINED, icc_profile))
+    if source_metadata is not None:
+        for tag in _DESCRIPTIVE_TAGS:
+            value = tags.get(tag)
+            if isinstance(value, str) and value:
+                extra_entries.append((tag, ASCII, value.encode('utf-8') + b'\x00'))
+        if source_metadata.xmp:
+            extra_entries.append((TAG_XMP, BYTE, source_metadata.xmp))
+
+    # 写入路径时先写到临时文件，全部写完再替换，中途失败不会留下不完整的输出
+    target = output + '.part' if isinstance(output, str) else output
+    try:
+        with TiledTiffWriter(target, (reader.width, reader.height), reader.mode, tile_size,
+                             extra_entries=extra_entries) as writer:
+            _write_bands(reader, writer, watermark)
+    except BaseException:
+        if target is not output:
+            try:
+                os.remove(target)
+            except OSError:
+                pass
+        raise
+    if target is not output:
+        os.replace(target, output)
+
+
+def _write_bands(reader: TiffBandReader, writer: TiledTiffWriter, watermark) -> None:
+    """把源行带重新切分为输出分块行，合成水印后逐行写出"""
+    width, height, tile_size = reader.width, reader.height, writer.tile_size
+    row_top = 0
+    row = Image.new(reader.mode, (width, min(tile_size, height)))
+
+    for band_top, band in reader.bands():
+        consumed = 0
+        while consumed < band.height:
+            take = min(band.height - consumed, row_top + row.height - (band_top + consumed))
+            piece = band.crop((0, consumed, width, consumed + take))
+            row.paste(piece, (0, band_top + consumed - row_top))
+            consumed += take
+
+            if band_top + consumed == row_top + row.height:
+                if watermark is not None:
+                    row = _composite_into_row(row, row_top, *watermark)
+                writer.write_row(row)
+                row_top += row.height
+                if row_top >= height:
+                    break
+                row = Image.new(reader.mode, (width, min(tile_size, height - row_top)))
@@ -4,20 +4,79 @@
 负责在图片上绘制文本水印。
 """
 
+import math
 import os
+import threading
+from collections import OrderedDict
 from typing import Tuple, Optional
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 from PIL.ImageColor import getcolor
 
-from .config import Config, WatermarkConfig, WatermarkType, TextWatermarkConfig, ImageWatermarkConfig, ScaleMode
+from .config import Config, WatermarkType, TextWatermarkConfig, ImageWatermarkConfig, ScaleMode, MetadataMode
+from . import encoder
+from . import metadata as source_metadata
+from . import orientation as exif_orientation
+from . import tiled
+from .image_handle import open_image_handle
+from .profiling import NULL_PROFILER, Profiler
 from ..utils.font_manager import font_manager, StyledFontWrapper
 
 
+# 模糊阴影缓存：相同文本、字体、颜色和模糊半径的阴影在多张图片之间复用
+_SHADOW_CACHE_SIZE = 32
+_shadow_cache: "OrderedDict[tuple, Optional[Tuple[Image.Image, Tuple[int, int]]]]" = OrderedDict()
+_shadow_cache_lock = threading.Lock()
+
+# 水印局部层缓存：同一配置、文本、图片尺寸和方向的水印层在多张图片之间复用
+# （缓存的局部层只读，合成时只作为粘贴源）
+_LAYER_CACHE_SIZE = 16
+_layer_cache: "OrderedDict[tuple, Optional[Tuple[Image.Image, Tuple[int, int]]]]" = OrderedDict()
+_layer_cache_lock = threading.Lock()
+
+# 水印图片缓存：按路径、修改时间和文件大小缓存解码后的水印图片（只读）
+_LOGO_CACHE_SIZE = 8
+_logo_cache: "OrderedDict[tuple, Image.Image]" = OrderedDict()
+_logo_cache_lock = threading.Lock()
+
+
+def _file_stamp(path: str) -> Optional[Tuple[str, int, int]]:
+    """文件的 (路径, 修改时间, 大小)，文件不存在时返回None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+def _ensure_parent_dir(output) -> None:
+    """输出为文件路径时确保所在目录存在（写入内存缓冲区时无需处理）"""
+    if isinstance(output, str):
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+
+
+def get_cache_stats() -> dict:
+    """水印相关缓存的当前条目数"""
+    return {
+        'layers': len(_layer_cache),
+        'logos': len(_logo_cache),
+        'shadows': len(_shadow_cache),
+    }
+
+
+def clear_caches() -> None:
+    """清空水印局部层、水印图片和阴影缓存"""
+    for cache, lock in ((_layer_cache, _layer_cache_lock), (_logo_cache, _logo_cache_lock),
+                        (_shadow_cache, _shadow_cache_lock)):
+        with lock:
+            cache.clear()
+
+
 class WatermarkProcessor:
     """水印处理器"""
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, profiler: Optional[Profiler] = None):
         self.config = config
+        self.profiler = profiler or NULL_PROFILER
     
     def _get_font(self, font_size: int, font_path: Optional[str] = None, 
                   bold: bool = False, italic: bool = False, text: str = "") -> ImageFont.ImageFont:
@@ -26,7 +85,13 @@ class WatermarkProcessor:
         target_font_path = font_path or self.config.config.font_path
         
         # 使用字体管理器获取字体，传递文本内容用于中文检测
-        return font_manager.get_font(target_font_path, font_size, bold, italic, text)
+        hits, misses = font_manager.get_thread_cache_counts()
+        with self.profiler.span('font_load'):
+            font = font_manager.get_font(target_font_path, font_size, bold, italic, text)
+        after_hits, after_misses = font_manager.get_thread_cache_counts()
+        self.profiler.count('font_cache_hits', after_hits - hits)
+        self.profiler.count('font_cache_misses', after_misses - misses)
+        return font
     
     def _parse_color(self, color_str: str) -> Tuple[int, int, int]:
         """解析颜色字符串"""
@@ -135,6 +200,77 @@ class WatermarkProcessor:
             # 普通文本
             draw.text((x, y), text, font=base_font, fill=fill)
     
+    def _render_blurred_shadow(self, text: str, font: ImageFont.ImageFont,
+                               color: Tuple[int, int, int, int],
+                               blur: int) -> Optional[Tuple[Image.Image, Tuple[int, int]]]:
+        """渲染模糊阴影（带缓存）
+
+        仅在单通道遮罩上绘制文本，并裁剪到字形边界加模糊半径的范围后做一次高斯模糊，
+        再用纯色填充着色。
+
+        返回: (shadow: RGBA图像, offset: 相对文本绘制位置的偏移) 或 None（无可见字形）
+        """
+        cache_key = (text, font, color, blur)
+        with _shadow_cache_lock:
+            if cache_key in _shadow_cache:
+                _shadow_cache.move_to_end(cache_key)
+                self.profiler.count('shadow_cache_hits')
+                return _shadow_cache[cache_key]
+        self.profiler.count('shadow_cache_misses')
+
+        # 高斯模糊的有效影响范围约为3倍半径
+        pad = int(math.ceil(blur * 3))
+        text_width, text_height = self._get_text_size(text, font)
+        # 字形可能超出测量框（字体顶部留白、样式偏移），预留额外边距
+        origin = pad + text_height
+        mask = Image.new('L', (text_width + origin * 2, text_height + origin * 2), 0)
+        self._draw_multiline_text(ImageDraw.Draw(mask), (origin, origin), text, font, 255)
+
+        shadow = None
+        glyph_box = mask.getbbox()
+        if glyph_box:
+            left = max(0, glyph_box[0] - pad)
+            top = max(0, glyph_box[1] - pad)
+            right = min(mask.width, glyph_box[2] + pad)
+            bottom = min(mask.height, glyph_box[3] + pad)
+            shadow_mask = mask.crop((left, top, right, bottom)).filter(ImageFilter.GaussianBlur(blur))
+
+            alpha = color[3]
+            if alpha < 255:
+                shadow_mask = shadow_mask.point(lambda v: v * alpha // 255)
+
+            shadow_img = Image.new('RGBA', shadow_mask.size, color[:3] + (0,))
+            shadow_img.putalpha(shadow_mask)
+            shadow = (shadow_img, (left - origin, top - origin))
+
+        with _shadow_cache_lock:
+            _shadow_cache[cache_key] = shadow
+            while len(_shadow_cache) > _SHADOW_CACHE_SIZE:
+                _shadow_cache.popitem(last=False)
+        return shadow
+
+    def _draw_shadow(self, layer: Image.Image, draw: ImageDraw.ImageDraw, position: Tuple[int, int],
+                     text: str, font: ImageFont.ImageFont, color: Tuple[int, int, int, int], blur: int):
+        """在局部层上绘制文本阴影（blur > 0 时合成缓存的模糊阴影）"""
+        if blur <= 0:
+            self._draw_multiline_text(draw, position, text, font, color)
+            return
+
+        shadow = self._render_blurred_shadow(text, font, color, blur)
+        if shadow is None:
+            return
+
+        shadow_img, (offset_x, offset_y) = shadow
+        dest_x = position[0] + offset_x
+        dest_y = position[1] + offset_y
+
+        # 裁掉超出局部层的部分（alpha_composite 不接受负坐标）
+        source = (max(0, -dest_x), max(0, -dest_y),
+                  min(shadow_img.width, layer.width - dest_x),
+                  min(shadow_img.height, layer.height - dest_y))
+        if source[2] > source[0] and source[3] > source[1]:
+            layer.alpha_composite(shadow_img, dest=(max(0, dest_x), max(0, dest_y)), source=source)
+
     def _scale_watermark_image(self, watermark_img: Image.Image, target_size: Tuple[int, int], 
                               img_config: ImageWatermarkConfig) -> Image.Image:
         """缩放水印图片"""
@@ -204,54 +340,141 @@ class WatermarkProcessor:
         result.putdata(new_data)
         return result
     
-    def process_watermark(self, image: Image.Image, text: Optional[str] = None) -> Image.Image:
-        """根据配置类型处理水印"""
+    def _resolve_orientation(self, image: Image.Image, orientation: Optional[int]) -> int:
+        """确定图片的EXIF方向（未指定时从图片读取）"""
+        if orientation is None:
+            return exif_orientation.get_orientation(image)
+        return exif_orientation.normalize(orientation)
+    
+    def _orient_layer(self, layer: Image.Image, position: Tuple[int, int],
+                      image_size: Tuple[int, int], orientation: int) -> Tuple[Image.Image, Tuple[int, int]]:
+        """把显示方向下位于 position 的局部层映射到存储方向
+        
+        只变换水印局部层，不旋转整幅图片。返回 (变换后的局部层, 存储方向的粘贴坐标)。
+        """
+        if orientation == 1:
+            return layer, position
+        left, top, _, _ = exif_orientation.to_stored_box(
+            (position[0], position[1], layer.width, layer.height), image_size, orientation
+        )
+        return exif_orientation.to_stored(layer, orientation), (left, top)
+    
+    def process_watermark(self, image: Image.Image, text: Optional[str] = None,
+                          orientation: Optional[int] = None) -> Image.Image:
+        """根据配置类型处理水印
+        
+        orientation 为图片的EXIF方向，None表示从图片读取。水印按显示方向定位，
+        直接绘制在存储方向的像素上，输出时应保留原方向标签。
+        """
+        orientation = self._resolve_orientation(image, orientation)
+        
+        # 先生成水印局部层，再合成到图片上（分别计时）
+        with self.profiler.span('render'):
+            layer = self.watermark_layer(image.size, text, orientation)
+        
+        with self.profiler.span('composite'):
+            if layer is None:
+                # 没有可绘制的水印（空文本、缺少水印图片），返回原图副本
+                result = image.copy()
+            else:
+                result = self._composite_layer(image, *layer)
+        
+        # 确保返回的图片格式与输出格式兼容
+        if hasattr(self.config.config, 'output_format') and self.config.config.output_format.upper() == 'JPEG':
+            result = encoder.prepare_for_format(result, 'JPEG')
+        
+        return result
+    
+    def watermark_layer(self, image_size: Tuple[int, int], text: Optional[str] = None,
+                        orientation: int = 1) -> Optional[Tuple[Image.Image, Tuple[int, int]]]:
+        """按配置类型生成水印局部层，不需要整幅图片
+        
+        返回 (局部层, 存储方向的粘贴坐标)，没有可绘制的水印时返回None。
+        分块处理大图时只把该局部层合成到与之重叠的分块中。
+        相同配置、文本、尺寸和方向的结果会被缓存，返回的局部层不能修改。
+        """
+        orientation = exif_orientation.normalize(orientation)
+        cache_key = self._layer_cache_key(image_size, text, orientation)
+        with _layer_cache_lock:
+            if cache_key in _layer_cache:
+                _layer_cache.move_to_end(cache_key)
+                self.profiler.count('layer_cache_hits')
+                return _layer_cache[cache_key]
+        self.profiler.count('layer_cache_misses')
+        
+        layer = self._render_watermark_layer(image_size, text, orientation)
+        
+        with _layer_cache_lock:
+            _layer_cache[cache_key] = layer
+            while len(_layer_cache) > _LAYER_CACHE_SIZE:
+                _layer_cache.popitem(last=False)
+        return layer
+    
+    def _layer_cache_key(self, image_size: Tuple[int, int], text: Optional[str], orientation: int) -> tuple:
+        """水印局部层的缓存键：配置的完整表示，图片水印还包括水印文件的修改时间"""
+        config = self.config.config
+        logo_stamp = None
+        if config.watermark_type == WatermarkType.IMAGE and config.image_watermark.image_path:
+            logo_stamp = _file_stamp(config.image_watermark.image_path)
+        return repr(config), text, tuple(image_size), orientation, logo_stamp
+    
+    def _render_watermark_layer(self, image_size: Tuple[int, int], text: Optional[str],
+                                orientation: int) -> Optional[Tuple[Image.Image, Tuple[int, int]]]:
+        """按配置类型渲染水印局部层（不使用缓存）"""
         watermark_type = self.config.config.watermark_type
         
         if watermark_type == WatermarkType.TIMESTAMP:
-            # 时间水印（原有功能）
             if text is None:
                 raise ValueError("时间水印需要提供文本内容")
-            result = self.add_watermark(image, text)
-        elif watermark_type == WatermarkType.TEXT:
-            # 文本水印
-            result = self.add_text_watermark(image)
-        elif watermark_type == WatermarkType.IMAGE:
-            # 图片水印
-            result = self.add_image_watermark(image)
-        else:
-            raise ValueError(f"不支持的水印类型: {watermark_type}")
+            return self._timestamp_watermark_layer(image_size, text, orientation)
+        if watermark_type == WatermarkType.TEXT:
+            return self._text_watermark_layer(image_size, orientation)
+        if watermark_type == WatermarkType.IMAGE:
+            return self._image_watermark_layer(image_size, orientation)
+        raise ValueError(f"不支持的水印类型: {watermark_type}")
+    
+    def _composite_layer(self, image: Image.Image, layer: Image.Image,
+                         position: Tuple[int, int]) -> Image.Image:
+        """把水印局部层合成到图片上，返回新图片并保持原色彩模式"""
+        if layer.mode != 'RGBA' and 'transparency' not in layer.info:
+            # 没有透明通道的水印直接覆盖
+            watermarked_image = image.copy()
+            watermarked_image.paste(layer, position)
+            return watermarked_image
         
-        # 确保返回的图片格式与输出格式兼容
-        if hasattr(self.config.config, 'output_format') and self.config.config.output_format.upper() == 'JPEG':
-            if result.mode in ('RGBA', 'LA'):
-                # 创建白色背景
-                background = Image.new('RGB', result.size, (255, 255, 255))
-                if result.mode == 'RGBA':
-                    background.paste(result, mask=result.split()[-1])
-                else:
-                    background.paste(result)
-                result = background
-            elif result.mode != 'RGB':
-                result = result.convert('RGB')
+        base = image if image.mode == 'RGBA' else image.convert('RGBA')
+        overlay = Image.new('RGBA', base.size, (0, 0, 0, 0))
+        overlay.paste(layer, position, layer if layer.mode == 'RGBA' else None)
+        watermarked_image = Image.alpha_composite(base, overlay)
         
-        return result
+        if image.mode != 'RGBA':
+            watermarked_image = watermarked_image.convert(image.mode)
+        
+        return watermarked_image
     
-    def add_text_watermark(self, image: Image.Image) -> Image.Image:
-        """添加自定义文本水印
+    def add_text_watermark(self, image: Image.Image, orientation: Optional[int] = None) -> Image.Image:
+        """添加自定义文本水印"""
+        orientation = self._resolve_orientation(image, orientation)
+        layer = self._text_watermark_layer(image.size, orientation)
+        if layer is None:
+            return image.copy()
+        return self._composite_layer(image, *layer)
+    
+    def _text_watermark_layer(self, image_size: Tuple[int, int], orientation: int):
+        """生成自定义文本水印的局部层
 
         处理流程：
         - 在局部 RGBA 层中居中绘制文本及其阴影/描边
         - 根据配置旋转该局部层（expand=True）
-        - 将旋转后的局部层以中心对齐的方式粘贴回原图，避免裁切
+        - 以中心对齐的方式计算粘贴位置，避免裁切
+        - 按EXIF方向把局部层映射到存储方向
         """
         text_config = self.config.config.text_watermark
 
         if not text_config.text.strip():
-            return image.copy()
+            return None
 
-        watermarked_image = image.copy()
-        img_width, img_height = watermarked_image.size
+        img_width, img_height = exif_orientation.display_size(image_size, orientation)
 
         font_size = text_config.font_size or self.config.get_auto_font_size(img_width, img_height)
         font = self._get_font(font_size, text_config.font_path, text_config.font_bold, text_config.font_italic, text_config.text)
@@ -282,14 +505,8 @@ class WatermarkProcessor:
             shadow_x = local_x + text_config.shadow_offset_x
             shadow_y = local_y + text_config.shadow_offset_y
 
-            if text_config.shadow_blur > 0:
-                shadow_overlay = Image.new('RGBA', text_layer.size, (0, 0, 0, 0))
-                shadow_draw = ImageDraw.Draw(shadow_overlay)
-                self._draw_multiline_text(shadow_draw, (shadow_x, shadow_y), text_config.text, font, shadow_color)
-                shadow_overlay = shadow_overlay.filter(ImageFilter.GaussianBlur(text_config.shadow_blur))
-                text_layer = Image.alpha_composite(text_layer, shadow_overlay)
-            else:
-                self._draw_multiline_text(layer_draw, (shadow_x, shadow_y), text_config.text, font, shadow_color)
+            self._draw_shadow(text_layer, layer_draw, (shadow_x, shadow_y), text_config.text,
+                              font, shadow_color, text_config.shadow_blur)
 
         # stroke
         if text_config.stroke_enabled:
@@ -319,78 +536,81 @@ class WatermarkProcessor:
         # paste rotated layer so that centers align with the intended (x,y) text box
         paste_x = int(x + text_width / 2 - rotated_layer.width / 2)
         paste_y = int(y + text_height / 2 - rotated_layer.height / 2)
-
-        if watermarked_image.mode != 'RGBA':
-            watermarked_image = watermarked_image.convert('RGBA')
-
-        overlay = Image.new('RGBA', watermarked_image.size, (0, 0, 0, 0))
-        overlay.paste(rotated_layer, (paste_x, paste_y), rotated_layer)
-        watermarked_image = Image.alpha_composite(watermarked_image, overlay)
-
-        if image.mode != 'RGBA':
-            watermarked_image = watermarked_image.convert(image.mode)
-
-        return watermarked_image
+        return self._orient_layer(rotated_layer, (paste_x, paste_y), image_size, orientation)
     
-    def add_image_watermark(self, image: Image.Image) -> Image.Image:
+    def add_image_watermark(self, image: Image.Image, orientation: Optional[int] = None) -> Image.Image:
         """添加图片水印"""
+        orientation = self._resolve_orientation(image, orientation)
+        layer = self._image_watermark_layer(image.size, orientation)
+        if layer is None:
+            return image.copy()  # 如果没有水印图片，返回原图
+        return self._composite_layer(image, *layer)
+    
+    def _load_watermark_image(self, path: str) -> Image.Image:
+        """读取并解码水印图片（带缓存，返回的图片不能修改）"""
+        stamp = _file_stamp(path)
+        with _logo_cache_lock:
+            if stamp in _logo_cache:
+                _logo_cache.move_to_end(stamp)
+                self.profiler.count('logo_cache_hits')
+                return _logo_cache[stamp]
+        self.profiler.count('logo_cache_misses')
+        
+        with Image.open(path) as watermark_img:
+            watermark_img.load()
+            watermark_img = watermark_img.copy()
+        
+        if stamp is not None:
+            with _logo_cache_lock:
+                _logo_cache[stamp] = watermark_img
+                while len(_logo_cache) > _LOGO_CACHE_SIZE:
+                    _logo_cache.popitem(last=False)
+        return watermark_img
+    
+    def _image_watermark_layer(self, image_size: Tuple[int, int], orientation: int):
+        """生成图片水印的局部层（没有水印图片或读取失败时返回None）"""
         img_config = self.config.config.image_watermark
         
         if not img_config.image_path or not os.path.exists(img_config.image_path):
-            return image.copy()  # 如果没有水印图片，返回原图
+            return None
         
-        # 创建副本以避免修改原图
-        watermarked_image = image.copy()
+        display_width, display_height = exif_orientation.display_size(image_size, orientation)
         
         try:
-            # 打开水印图片
-            with Image.open(img_config.image_path) as watermark_img:
-                watermark_img = watermark_img.copy()
-                
-                # 处理缩放
-                watermark_img = self._scale_watermark_image(watermark_img, watermarked_image.size, img_config)
-                
-                # 处理旋转和翻转
-                watermark_img = self._transform_watermark_image(watermark_img, img_config)
-                
-                # 处理透明度
-                if img_config.alpha < 1.0:
-                    watermark_img = self._apply_watermark_alpha(watermark_img, img_config.alpha)
-                
-                # 计算水印位置
-                wm_width, wm_height = watermark_img.size
-                x, y = self.config.get_position_coordinates(
-                    watermarked_image.width, watermarked_image.height, wm_width, wm_height
-                )
-                
-                # 合并水印到原图
-                if watermark_img.mode == 'RGBA' or 'transparency' in watermark_img.info:
-                    # 有透明通道的水印
-                    if watermarked_image.mode != 'RGBA':
-                        watermarked_image = watermarked_image.convert('RGBA')
-                    
-                    # 创建一个与原图同尺寸的透明层
-                    overlay = Image.new('RGBA', watermarked_image.size, (0, 0, 0, 0))
-                    overlay.paste(watermark_img, (x, y), watermark_img if watermark_img.mode == 'RGBA' else None)
-                    watermarked_image = Image.alpha_composite(watermarked_image, overlay)
-                else:
-                    # 没有透明通道的水印
-                    watermarked_image.paste(watermark_img, (x, y))
-                
-                return watermarked_image
-                
+            # 读取水印图片（缩放总是生成新图片，不会修改缓存中的原图）
+            watermark_img = self._load_watermark_image(img_config.image_path)
+            
+            # 处理缩放（按显示方向的尺寸计算）
+            watermark_img = self._scale_watermark_image(watermark_img, (display_width, display_height), img_config)
+            
+            # 处理旋转和翻转
+            watermark_img = self._transform_watermark_image(watermark_img, img_config)
+            
+            # 处理透明度
+            if img_config.alpha < 1.0:
+                watermark_img = self._apply_watermark_alpha(watermark_img, img_config.alpha)
+            
+            # 计算水印位置
+            wm_width, wm_height = watermark_img.size
+            x, y = self.config.get_position_coordinates(
+                display_width, display_height, wm_width, wm_height
+            )
+            return self._orient_layer(watermark_img, (x, y), image_size, orientation)
+            
         except Exception as e:
             if self.config.config.verbose:
                 print(f"添加图片水印失败: {e}")
-            return image.copy()
+            return None
     
-    def add_watermark(self, image: Image.Image, text: str) -> Image.Image:
+    def add_watermark(self, image: Image.Image, text: str, orientation: Optional[int] = None) -> Image.Image:
         """在图片上添加文本水印"""
-        # 创建副本以避免修改原图
-        watermarked_image = image.copy()
-        
-        # 获取图片尺寸
-        img_width, img_height = watermarked_image.size
+        orientation = self._resolve_orientation(image, orientation)
+        return self._composite_layer(image, *self._timestamp_watermark_layer(image.size, text, orientation))
+    
+    def _timestamp_watermark_layer(self, image_size: Tuple[int, int], text: str, orientation: int):
+        """生成时间水印的局部层"""
+        # 获取图片尺寸（显示方向）
+        img_width, img_height = exif_orientation.display_size(image_size, orientation)
         
         # 计算并使用配置的字体大小（优先使用显式配置的 font_size）
         configured_size = None
@@ -458,14 +678,8 @@ class WatermarkProcessor:
             shadow_x = local_x + getattr(tw_cfg, 'shadow_offset_x', 2)
             shadow_y = local_y + getattr(tw_cfg, 'shadow_offset_y', 2)
 
-            if getattr(tw_cfg, 'shadow_blur', 0) > 0:
-                shadow_overlay = Image.new('RGBA', text_layer.size, (0, 0, 0, 0))
-                shadow_draw = ImageDraw.Draw(shadow_overlay)
-                self._draw_multiline_text(shadow_draw, (shadow_x, shadow_y), text, font, shadow_color)
-                shadow_overlay = shadow_overlay.filter(ImageFilter.GaussianBlur(getattr(tw_cfg, 'shadow_blur', 0)))
-                text_layer = Image.alpha_composite(text_layer, shadow_overlay)
-            else:
-                self._draw_multiline_text(layer_draw, (shadow_x, shadow_y), text, font, shadow_color)
+            self._draw_shadow(text_layer, layer_draw, (shadow_x, shadow_y), text,
+                              font, shadow_color, getattr(tw_cfg, 'shadow_blur', 0))
 
         # 描边
         if tw_cfg and getattr(tw_cfg, 'stroke_enabled', False):
@@ -497,42 +711,31 @@ class WatermarkProcessor:
         # align rotated layer center to the intended text center
         paste_x = int(x + text_width / 2 - rotated_layer.width / 2)
         paste_y = int(y + text_height / 2 - rotated_layer.height / 2)
-
-        if watermarked_image.mode != 'RGBA':
-            watermarked_image = watermarked_image.convert('RGBA')
-
-        overlay = Image.new('RGBA', watermarked_image.size, (0, 0, 0, 0))
-        overlay.paste(rotated_layer, (paste_x, paste_y), rotated_layer)
-        watermarked_image = Image.alpha_composite(watermarked_image, overlay)
-
-        # 如果输出格式不支持透明度且需要转换为RGB（例如JPEG），在调用方会处理
-        if image.mode != 'RGBA':
-            watermarked_image = watermarked_image.convert(image.mode)
-
-        return watermarked_image
+        return self._orient_layer(rotated_layer, (paste_x, paste_y), image_size, orientation)
     
-    def process_image(self, input_path: str, output_path: str, watermark_text: str) -> bool:
-        """处理单张图片"""
+    def process_image(self, input_path, output_path: str, watermark_text: str) -> bool:
+        """处理单张图片（input_path 可以是路径或已打开的 ImageHandle）"""
         try:
             # 打开图片
-            with Image.open(input_path) as img:
+            with open_image_handle(input_path) as handle:
+                img = handle.load()
+                source_encoding = encoder.get_source_encoding(img)
+                orientation = exif_orientation.get_orientation(img)
+                
                 # 添加水印
-                watermarked_img = self.add_watermark(img, watermark_text)
+                watermarked_img = self.add_watermark(img, watermark_text, orientation)
                 
                 # 确保输出目录存在
-                os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                
-                # 保存图片
-                save_kwargs = {}
-                if self.config.config.output_format.upper() == 'JPEG':
-                    save_kwargs['quality'] = self.config.config.output_quality
-                    save_kwargs['optimize'] = True
-                elif self.config.config.output_format.upper() == 'PNG':
-                    save_kwargs['optimize'] = True
+                _ensure_parent_dir(output_path)
                 
-                watermarked_img.save(output_path, 
-                                   format=self.config.config.output_format, 
-                                   **save_kwargs)
+                # 保存图片（保留原方向标签）
+                encoder.save_image(
+                    watermarked_img, output_path, self.config.config.output_format,
+                    self.config.config.encoder_profile, self.config.config.output_quality,
+                    source_encoding, self.config.config.webp_method,
+                    exif=exif_orientation.orientation_exif(orientation),
+                    metadata=self._read_source_metadata(handle)
+                )
                 
                 return True
                 
@@ -541,63 +744,95 @@ class WatermarkProcessor:
                 print(f"处理图片 {input_path} 时出错: {e}")
             return False
     
-    def process_image_with_options(self, input_path: str, output_path: str, 
+    def process_image_with_options(self, input_path, output_path: str, 
                                  watermark_text: str = None, output_format: str = None, 
-                                 quality: int = 95, resize_config: dict = None) -> bool:
-        """处理单张图片（带完整选项）"""
+                                 quality: int = 95, resize_config: dict = None,
+                                 encoder_profile=None, raise_errors: bool = False) -> bool:
+        """处理单张图片（带完整选项）
+        
+        input_path 可以是路径，也可以是任务中已打开的 ImageHandle（不会再次打开文件）。
+        output_path 可以是文件路径，也可以是可写的二进制文件对象（如 io.BytesIO）。
+        raise_errors 为True时出错直接抛出异常（供调用方记录具体错误），否则返回False。
+        """
         try:
             # 打开图片
-            with Image.open(input_path) as img:
-                # 调整图片尺寸
-                if resize_config and resize_config.get('enabled', False):
-                    img = self._resize_image(img, resize_config)
-                
-                # 根据水印类型添加水印
-                watermarked_img = self.process_watermark(img, watermark_text)
-                
-                # 确保输出目录存在
-                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            with self.profiler.image(getattr(input_path, 'path', input_path)), \
+                    open_image_handle(input_path) as handle:
+                img = handle.image
+                # 源JPEG的编码信息和EXIF方向需要在变换之前获取
+                source_encoding = encoder.get_source_encoding(img)
+                orientation = exif_orientation.get_orientation(img)
                 
                 # 确定输出格式
                 if output_format is None:
                     output_format = self.config.config.output_format
                 
-                # 处理格式转换
-                if output_format.upper() == 'JPEG':
-                    # JPEG不支持透明通道，需要转换
-                    if watermarked_img.mode in ('RGBA', 'LA'):
-                        # 创建白色背景
-                        background = Image.new('RGB', watermarked_img.size, (255, 255, 255))
-                        if watermarked_img.mode == 'RGBA':
-                            background.paste(watermarked_img, mask=watermarked_img.split()[-1])
-                        else:
-                            background.paste(watermarked_img)
-                        watermarked_img = background
-                    elif watermarked_img.mode != 'RGB':
-                        watermarked_img = watermarked_img.convert('RGB')
+                if encoder_profile is None:
+                    encoder_profile = self.config.config.encoder_profile
+                
+                resize_enabled = bool(resize_config and resize_config.get('enabled', False))
+                
+                # 超大TIFF按分块流式处理，不解码整幅图片
+                if not resize_enabled and tiled.should_tile(
+                        handle, output_format, self.config.config.tiled_min_megapixels):
+                    try:
+                        _ensure_parent_dir(output_path)
+                        with self.profiler.span('metadata'):
+                            metadata = self._read_source_metadata(handle)
+                        with self.profiler.span('tiled'):
+                            tiled.process_tiled(handle, output_path, self, watermark_text, metadata)
+                        return True
+                    except tiled.TiledUnsupportedError as e:
+                        if self.config.config.verbose:
+                            print(f"无法分块处理 {output_path}，改为整图处理: {e}")
+                
+                # 解码像素
+                with self.profiler.span('decode'):
+                    handle.load()
+                
+                # 调整图片尺寸
+                if resize_enabled:
+                    with self.profiler.span('resize'):
+                        img = self._resize_image(img, resize_config, orientation)
+                
+                # 根据水印类型添加水印
+                watermarked_img = self.process_watermark(img, watermark_text, orientation)
+                
+                # 确保输出目录存在
+                _ensure_parent_dir(output_path)
                 
-                # 保存图片
-                save_kwargs = {}
-                if output_format.upper() == 'JPEG':
-                    save_kwargs['quality'] = quality
-                    save_kwargs['optimize'] = True
-                elif output_format.upper() == 'PNG':
-                    save_kwargs['optimize'] = True
+                with self.profiler.span('metadata'):
+                    metadata = self._read_source_metadata(handle)
                 
-                watermarked_img.save(output_path, format=output_format.upper(), **save_kwargs)
+                # 处理格式转换并保存图片
+                with self.profiler.span('encode'):
+                    encoder.save_image(
+                        watermarked_img, output_path, output_format, encoder_profile,
+                        quality, source_encoding, self.config.config.webp_method,
+                        exif=exif_orientation.orientation_exif(orientation),
+                        metadata=metadata
+                    )
                 return True
                 
         except Exception as e:
+            if raise_errors:
+                raise
             if self.config.config.verbose:
                 print(f"处理图片 {input_path} 时出错: {e}")
             return False
     
-    def _resize_image(self, img: Image.Image, resize_config: dict) -> Image.Image:
-        """调整图片尺寸"""
+    def _read_source_metadata(self, handle):
+        """透传模式下读取源文件的原始元数据段，否则返回None"""
+        if self.config.config.metadata_mode != MetadataMode.PASSTHROUGH:
+            return None
+        return source_metadata.read_metadata(handle)
+    
+    def _resize_image(self, img: Image.Image, resize_config: dict, orientation: int = 1) -> Image.Image:
+        """调整图片尺寸（宽高按显示方向解释）"""
         if not resize_config.get('enabled', False):
             return img
             
-        original_size = img.size
+        original_size = exif_orientation.display_size(img.size, orientation)
         resize_type = resize_config.get('type', 'none')
         
         if resize_type == 'width':
@@ -627,33 +862,37 @@ class WatermarkProcessor:
         else:
             return img
             
+        new_size = exif_orientation.display_size(new_size, orientation)
         return img.resize(new_size, Image.Resampling.LANCZOS)
     
-    def preview_watermark(self, image: Image.Image, text: str) -> Image.Image:
+    def preview_watermark(self, image: Image.Image, text: str, orientation: Optional[int] = None) -> Image.Image:
         """预览水印效果（不保存）"""
         # 保持向后兼容：返回合成图像
-        img, _ = self.preview_with_bbox(image, text)
+        img, _ = self.preview_with_bbox(image, text, orientation)
         return img
 
-    def preview_with_bbox(self, image: Image.Image, text: str):
+    def preview_with_bbox(self, image: Image.Image, text: str, orientation: Optional[int] = None):
         """生成带水印的预览图，并返回水印在原始图片坐标系下的包围盒
 
         返回: (watermarked_image: Image.Image, watermark_bbox: Optional[Tuple[int,int,int,int]])
-        watermark_bbox 是 (left, top, width, height) 或 None
+        watermarked_image 保持存储方向；watermark_bbox 是显示方向下的 (left, top, width, height) 或 None
         """
-        # 仅处理文本和图片两类水印
-        watermark_type = self.config.config.watermark_type
-        base_img = image.copy()
-        overlay = Image.new('RGBA', base_img.size, (0, 0, 0, 0))
+        orientation = self._resolve_orientation(image, orientation)
+        rendered = self.render_preview_layer(image.size, text, orientation)
+        return self.place_preview_layer(image, rendered, orientation)
 
-        if watermark_type == WatermarkConfig.watermark_type.__class__:
-            # defensive fallback
-            pass
+    def render_preview_layer(self, image_size: Tuple[int, int], text: Optional[str],
+                             orientation: int = 1) -> Optional[Tuple[Image.Image, Tuple[int, int]]]:
+        """渲染预览用的水印图层（测量文字、绘制、旋转、缩放水印图片），不计算位置
 
-        if watermark_type == WatermarkConfig.watermark_type.__class__:
-            pass
+        返回 (显示方向的图层, 定位参考尺寸)，没有可绘制的水印时返回None。
+        参考尺寸是未旋转的文字尺寸或缩放后的水印图片尺寸，用于按配置计算位置。
+        只改变位置、边距或自定义坐标时可复用该结果，交给 place_preview_layer 重新合成。
+        """
+        watermark_type = self.config.config.watermark_type
+        display_width, display_height = exif_orientation.display_size(image_size, orientation)
 
-        if watermark_type.name == 'TEXT' or watermark_type.name == 'TIMESTAMP' or watermark_type.name == 'TEXT':
+        if watermark_type in (WatermarkType.TEXT, WatermarkType.TIMESTAMP):
             # 文本类（包括时间戳）
             try:
                 # 获取字体大小与路径
@@ -664,7 +903,7 @@ class WatermarkProcessor:
                     font_size = None
 
                 if font_size is None:
-                    font_size = self.config.get_auto_font_size(base_img.width, base_img.height)
+                    font_size = self.config.get_auto_font_size(display_width, display_height)
 
                 # 优先使用 text_watermark 的 font_path
                 try:
@@ -694,14 +933,8 @@ class WatermarkProcessor:
                     shadow_color = shadow_color_rgb + (shadow_alpha,)
                     shadow_x = local_x + getattr(tw_cfg, 'shadow_offset_x', 2)
                     shadow_y = local_y + getattr(tw_cfg, 'shadow_offset_y', 2)
-                    if getattr(tw_cfg, 'shadow_blur', 0) > 0:
-                        shadow_overlay = Image.new('RGBA', text_layer.size, (0, 0, 0, 0))
-                        shadow_draw = ImageDraw.Draw(shadow_overlay)
-                        self._draw_multiline_text(shadow_draw, (shadow_x, shadow_y), text_content, font, shadow_color)
-                        shadow_overlay = shadow_overlay.filter(ImageFilter.GaussianBlur(getattr(tw_cfg, 'shadow_blur', 0)))
-                        text_layer = Image.alpha_composite(text_layer, shadow_overlay)
-                    else:
-                        self._draw_multiline_text(layer_draw, (shadow_x, shadow_y), text_content, font, shadow_color)
+                    self._draw_shadow(text_layer, layer_draw, (shadow_x, shadow_y), text_content,
+                                      font, shadow_color, getattr(tw_cfg, 'shadow_blur', 0))
 
                 # 描边
                 if tw_cfg and getattr(tw_cfg, 'stroke_enabled', False):
@@ -717,7 +950,7 @@ class WatermarkProcessor:
                 # 主文本 - 对于不同类型选择颜色/透明度来源：
                 # - TEXT 类型：优先使用 text_watermark 中的 font_color/font_alpha（若设置），否则回退到全局
                 # - TIMESTAMP 类型：使用全局 config.font_color/config.font_alpha（不使用 text_watermark 的颜色）
-                if watermark_type.name == 'TEXT':
+                if watermark_type == WatermarkType.TEXT:
                     if tw_cfg and getattr(tw_cfg, 'font_color', None):
                         cfg_color = getattr(tw_cfg, 'font_color')
                         cfg_alpha = getattr(tw_cfg, 'font_alpha', self.config.config.font_alpha)
@@ -741,34 +974,52 @@ class WatermarkProcessor:
                     rot_angle = 0.0
 
                 if rot_angle != 0:
-                        rotated_layer = text_layer.rotate(rot_angle, expand=True, resample=Image.Resampling.BICUBIC)
+                    rotated_layer = text_layer.rotate(rot_angle, expand=True, resample=Image.Resampling.BICUBIC)
                 else:
                     rotated_layer = text_layer
-
-                # 计算位置并按 add_text_watermark 的逻辑对齐（使旋转后层围绕原文本位置居中）
-                # 首先根据未旋转的文本尺寸计算参考位置
-                ref_x, ref_y = self.config.get_position_coordinates(base_img.width, base_img.height, text_width, text_height)
-                # align rotated layer center to the reference (unrotated) text center
-                paste_x = int(ref_x + text_width / 2 - rotated_layer.width / 2)
-                paste_y = int(ref_y + text_height / 2 - rotated_layer.height / 2)
-                overlay.paste(rotated_layer, (paste_x, paste_y), rotated_layer)
+                return rotated_layer, (text_width, text_height)
             except Exception:
-                pass
+                return None
 
-        elif watermark_type == WatermarkConfig.image_watermark.__class__ or watermark_type.name == 'IMAGE':
+        if watermark_type == WatermarkType.IMAGE:
             # 图片水印
             try:
                 img_cfg = self.config.config.image_watermark
                 if img_cfg and img_cfg.image_path and os.path.exists(img_cfg.image_path):
-                    with Image.open(img_cfg.image_path) as wm_img:
-                        wm = wm_img.copy()
-                        wm = self._scale_watermark_image(wm, base_img.size, img_cfg)
-                        wm = self._transform_watermark_image(wm, img_cfg)
-                        if img_cfg.alpha < 1.0:
-                            wm = self._apply_watermark_alpha(wm, img_cfg.alpha)
-                        wm_w, wm_h = wm.size
-                        x, y = self.config.get_position_coordinates(base_img.width, base_img.height, wm_w, wm_h)
-                        overlay.paste(wm, (x, y), wm if wm.mode == 'RGBA' else None)
+                    wm = self._load_watermark_image(img_cfg.image_path)
+                    wm = self._scale_watermark_image(wm, (display_width, display_height), img_cfg)
+                    wm = self._transform_watermark_image(wm, img_cfg)
+                    if img_cfg.alpha < 1.0:
+                        wm = self._apply_watermark_alpha(wm, img_cfg.alpha)
+                    return wm, wm.size
+            except Exception:
+                return None
+
+        return None
+
+    def place_preview_layer(self, image: Image.Image,
+                            rendered: Optional[Tuple[Image.Image, Tuple[int, int]]],
+                            orientation: Optional[int] = None):
+        """按当前位置配置把 render_preview_layer 的结果合成到图片上
+
+        返回值与 preview_with_bbox 相同。
+        """
+        orientation = self._resolve_orientation(image, orientation)
+        base_img = image.copy()
+        display_width, display_height = exif_orientation.display_size(base_img.size, orientation)
+        overlay = Image.new('RGBA', base_img.size, (0, 0, 0, 0))
+
+        if rendered is not None:
+            try:
+                layer, (ref_width, ref_height) = rendered
+                # 首先根据未旋转的参考尺寸计算位置，再使旋转后的图层围绕参考区域居中
+                ref_x, ref_y = self.config.get_position_coordinates(display_width, display_height, ref_width, ref_height)
+                paste_x = int(ref_x + ref_width / 2 - layer.width / 2)
+                paste_y = int(ref_y + ref_height / 2 - layer.height / 2)
+                layer, (paste_x, paste_y) = self._orient_layer(
+                    layer, (paste_x, paste_y), base_img.size, orientation
+                )
+                overlay.paste(layer, (paste_x, paste_y), layer if layer.mode == 'RGBA' else None)
             except Exception:
                 pass
 
@@ -779,7 +1030,9 @@ class WatermarkProcessor:
         if overlay.getbbox():
             bbox = overlay.getbbox()  # (left, upper, right, lower)
             wm_left, wm_top, wm_right, wm_bottom = bbox
-            watermark_bbox = (wm_left, wm_top, wm_right - wm_left, wm_bottom - wm_top)
+            watermark_bbox = exif_orientation.to_display_box(
+                (wm_left, wm_top, wm_right - wm_left, wm_bottom - wm_top), base_img.size, orientation
+            )
             result = Image.alpha_composite(result, overlay)
         else:
             watermark_bbox = None
@@ -0,0 +1,120 @@
+"""
+水印配置模型
+
+GUI 中唯一的水印配置对象。控件变化时按字段增量更新，并通知订阅者本次改动了
+哪些字段；预览据此决定需要重做的工作（例如只改了位置时不必重新测量和绘制文字）。
+字段使用点分路径表示，例如 'position'、'text_watermark.font_size'。
+"""
+
+import contextlib
+import copy
+from dataclasses import fields, is_dataclass
+from typing import Any, Callable, Dict, FrozenSet, Iterator, List, Optional, Set
+
+from ..core.config import WatermarkConfig
+
+
+# 只影响水印摆放位置、不影响水印图层内容的字段
+LAYOUT_FIELDS: FrozenSet[str] = frozenset({'position', 'custom_position', 'margin'})
+
+Listener = Callable[[FrozenSet[str]], None]
+
+
+def needs_render(changed: Optional[FrozenSet[str]]) -> bool:
+    """改动的字段是否需要重新渲染水印图层（None 表示未知改动，总是需要）"""
+    return changed is None or bool(changed - LAYOUT_FIELDS)
+
+
+class WatermarkConfigModel:
+    """可观察的水印配置
+
+    set/update 只记录值真正变化的字段；batch() 内的多次修改合并为一次通知。
+    """
+
+    def __init__(self, config: Optional[WatermarkConfig] = None):
+        self._config = config if config is not None else WatermarkConfig()
+        self._listeners: List[Listener] = []
+        self._batch_depth = 0
+        self._pending: Set[str] = set()
+
+    @property
+    def config(self) -> WatermarkConfig:
+        """当前配置（只读引用，修改请使用 set/update）"""
+        return self._config
+
+    def get(self, field: str) -> Any:
+        target, name = self._resolve(field)
+        return getattr(target, name)
+
+    def set(self, field: str, value: Any) -> bool:
+        """设置单个字段，返回值是否发生变化"""
+        target, name = self._resolve(field)
+        if getattr(target, name) == value:
+            return False
+        setattr(target, name, value)
+        self._pending.add(field)
+        self._notify()
+        return True
+
+    def update(self, values: Dict[str, Any]) -> FrozenSet[str]:
+        """设置多个字段（一次通知），返回发生变化的字段"""
+        changed = set()
+        with self.batch():
+            for field, value in values.items():
+                if self.set(field, value):
+                    changed.add(field)
+        return frozenset(changed)
+
+    @contextlib.contextmanager
+    def batch(self) -> Iterator[None]:
+        """合并块内的全部修改，退出最外层块时统一通知"""
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            self._notify()
+
+    def replace(self, config: WatermarkConfig) -> FrozenSet[str]:
+        """整体替换为另一份配置，只通知实际不同的字段"""
+        return self.update(dict(_flatten(config)))
+
+    def snapshot(self) -> WatermarkConfig:
+        """当前配置的独立副本（导出、保存模板等不受之后修改的影响）"""
+        return copy.deepcopy(self._config)
+
+    def subscribe(self, listener: Listener) -> Callable[[], None]:
+        """订阅字段变化通知，返回取消订阅的函数"""
+        self._listeners.append(listener)
+
+        def unsubscribe():
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+        return unsubscribe
+
+    def _resolve(self, field: str):
+        target = self._config
+        parts = field.split('.')
+        for part in parts[:-1]:
+            target = getattr(target, part)
+        if not hasattr(target, parts[-1]):
+            raise AttributeError(f"未知的配置字段: {field}")
+        return target, parts[-1]
+
+    def _notify(self) -> None:
+        if self._batch_depth or not self._pending:
+            return
+        changed = frozenset(self._pending)
+        self._pending.clear()
+        for listener in list(self._listeners):
+            listener(changed)
+
+
+def _flatten(config, prefix: str = '') -> Iterator:
+    """展开嵌套的配置数据类为 (点分路径, 值)"""
+    for f in fields(config):
+        value = getattr(config, f.name)
+        if is_dataclass(value):
+            yield from _flatten(value, f'{prefix}{f.name}.')
+        else:
+            yield f'{prefix}{f.name}', copy.deepcopy(value)
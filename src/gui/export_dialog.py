@@ -9,6 +9,9 @@ from tkinter import ttk, filedialog, messagebox
 import os
 from typing import Dict, Optional, Callable
 
+from ..core.config import EncoderProfile, MetadataMode
+from ..core.encoder import FORMAT_EXTENSIONS
+
 
 class ExportDialog:
     """导出设置对话框"""
@@ -25,6 +28,9 @@ class ExportDialog:
             'naming_rule': {'type': 'original', 'value': ''},
             'output_format': 'JPEG',
             'quality': 95,
+            'encoder_profile': EncoderProfile.BALANCED.value,
+            'metadata_mode': MetadataMode.STRIP.value,
+            'resumable': False,
             'resize': {
                 'enabled': False,
                 'type': 'none',
@@ -109,7 +115,7 @@ class ExportDialog:
         
         # 目录选择框架
         dir_frame = ttk.Frame(parent)
-        dir_frame.pack(fill='x', pady=(0, 15))
+        dir_frame.pack(fill='x', pady=(0, 5))
         
         self.output_dir_var = tk.StringVar(value=self.config['output_dir'])
         self.dir_entry = ttk.Entry(dir_frame, textvariable=self.output_dir_var, state='readonly')
@@ -117,6 +123,13 @@ class ExportDialog:
         
         ttk.Button(dir_frame, text="浏览", command=self._browse_output_dir).pack(side='right')
         
+        # 可恢复导出：在输出目录中保存任务队列，中断后再次导出到该目录时继续
+        self.resumable_var = tk.BooleanVar(value=self.config['resumable'])
+        ttk.Checkbutton(
+            parent, text="可恢复导出（中断后再次导出到此目录时跳过已完成的图片）",
+            variable=self.resumable_var
+        ).pack(anchor='w', pady=(0, 15))
+        
     def _create_naming_section(self, parent):
         """创建文件命名设置区域"""
         # 标题
@@ -196,13 +209,49 @@ class ExportDialog:
             format_options_frame, text="PNG", 
             variable=self.format_var, value="PNG",
             command=self._on_format_change
+        ).pack(side='left', padx=(0, 20))
+        
+        ttk.Radiobutton(
+            format_options_frame, text="WebP", 
+            variable=self.format_var, value="WEBP",
+            command=self._on_format_change
+        ).pack(side='left', padx=(0, 20))
+        
+        ttk.Radiobutton(
+            format_options_frame, text="TIFF", 
+            variable=self.format_var, value="TIFF",
+            command=self._on_format_change
         ).pack(side='left')
         
-        # JPEG质量设置
+        # 编码配置档
+        profile_frame = ttk.Frame(format_frame)
+        profile_frame.pack(fill='x', padx=10, pady=5)
+        
+        ttk.Label(profile_frame, text="编码方式:").pack(side='left')
+        
+        self.encoder_profile_var = tk.StringVar(value=self.config['encoder_profile'])
+        ttk.Combobox(
+            profile_frame,
+            textvariable=self.encoder_profile_var,
+            values=[profile.value for profile in EncoderProfile],
+            state='readonly',
+            width=20
+        ).pack(side='left', padx=(5, 0))
+        
+        # 元数据透传
+        self.keep_metadata_var = tk.BooleanVar(
+            value=self.config['metadata_mode'] == MetadataMode.PASSTHROUGH.value
+        )
+        ttk.Checkbutton(
+            format_frame, text="保留原图元数据 (EXIF/ICC/XMP)",
+            variable=self.keep_metadata_var
+        ).pack(anchor='w', padx=10, pady=5)
+        
+        # 质量设置（JPEG/WebP）
         self.quality_frame = ttk.Frame(format_frame)
         self.quality_frame.pack(fill='x', padx=10, pady=5)
         
-        ttk.Label(self.quality_frame, text="JPEG质量:").pack(side='left')
+        ttk.Label(self.quality_frame, text="质量:").pack(side='left')
         
         self.quality_var = tk.IntVar(value=self.config['quality'])
         self.quality_scale = ttk.Scale(
@@ -348,17 +397,17 @@ class ExportDialog:
             preview_name = example_name
             
         # 添加扩展名
-        format_ext = ".jpg" if self.format_var.get() == "JPEG" else ".png"
+        format_ext = FORMAT_EXTENSIONS.get(self.format_var.get(), ".jpg")
         preview_name += format_ext
         
         self.preview_label.config(text=f"预览: {preview_name}")
         
     def _on_format_change(self):
         """格式变化事件"""
-        is_jpeg = self.format_var.get() == "JPEG"
+        has_quality = self.format_var.get() in ("JPEG", "WEBP")
         
-        # 显示/隐藏JPEG质量设置
-        if is_jpeg:
+        # 显示/隐藏质量设置（PNG为无损格式）
+        if has_quality:
             self.quality_frame.pack(fill='x', padx=10, pady=5)
         else:
             self.quality_frame.pack_forget()
@@ -423,6 +472,10 @@ class ExportDialog:
             'naming_rule': naming_rule,
             'output_format': self.format_var.get(),
             'quality': self.quality_var.get(),
+            'encoder_profile': self.encoder_profile_var.get(),
+            'metadata_mode': (MetadataMode.PASSTHROUGH if self.keep_metadata_var.get()
+                              else MetadataMode.STRIP).value,
+            'resumable': self.resumable_var.get(),
             'resize': resize_config
         }
         
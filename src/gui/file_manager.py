@@ -4,14 +4,26 @@
 处理文件导入、导出和格式转换。
 """
 
+import hashlib
+import io
+import json
 import os
 import shutil
 from pathlib import Path
 from typing import List, Dict, Optional, Callable
 from PIL import Image
 import threading
+import time
 
-from ..utils.file_utils import list_files_by_extension
+from ..core import encoder
+from ..core.catalog import STATUS_DONE, STATUS_FAILED, CatalogEntry, FileCatalog
+from ..core.job_queue import DONE, PENDING, RUNNING, JobQueue, is_transient_error
+from ..core.profiling import NULL_PROFILER
+from .preflight import DEFAULT_SAMPLES, ExportPlan, estimate_output_bytes, plan_outputs
+
+
+# 可恢复导出时保存在输出目录中的任务队列文件
+EXPORT_QUEUE_NAME = '.photowatermark-queue.db'
 
 
 class FileManager:
@@ -19,7 +31,9 @@ class FileManager:
     
     def __init__(self):
         self.supported_input_formats = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif'}
-        self.supported_output_formats = {'JPEG', 'PNG'}
+        self.supported_output_formats = set(encoder.OUTPUT_FORMATS)
+        # 已导入的图片（图片列表与导出共用，元数据按需读取）
+        self.catalog = FileCatalog()
         
     def get_image_files_from_paths(self, paths: List[str], recursive: bool = False) -> List[str]:
         """从路径列表获取所有图片文件"""
@@ -37,9 +51,10 @@ class FileManager:
         return image_files
         
     def get_images_from_directory(self, directory: str, recursive: bool = False) -> List[str]:
-        """从目录获取图片文件"""
-        extensions = list(self.supported_input_formats)
-        return list_files_by_extension(directory, extensions, recursive)
+        """从目录获取图片文件（只列出目录项，不读取文件元数据）"""
+        scanned = FileCatalog()
+        scanned.scan(directory, self.supported_input_formats, recursive, include_hidden=True)
+        return scanned.paths()
         
     def is_supported_image(self, file_path: str) -> bool:
         """检查是否为支持的图片格式"""
@@ -47,24 +62,23 @@ class FileManager:
         return ext in self.supported_input_formats
         
     def get_image_info(self, file_path: str) -> Dict:
-        """获取图片信息"""
-        try:
-            with Image.open(file_path) as img:
-                return {
-                    'path': file_path,
-                    'filename': os.path.basename(file_path),
-                    'size': img.size,
-                    'mode': img.mode,
-                    'format': img.format,
-                    'file_size': os.path.getsize(file_path),
-                    'has_transparency': img.mode in ('RGBA', 'LA') or 'transparency' in img.info
-                }
-        except Exception as e:
+        """获取图片信息（已导入的图片使用目录中缓存的元数据）"""
+        entry = self.catalog.get(file_path) or CatalogEntry(file_path)
+        if entry.dimensions is None:
             return {
                 'path': file_path,
-                'filename': os.path.basename(file_path),
-                'error': str(e)
+                'filename': entry.filename,
+                'error': '无法读取图片'
             }
+        return {
+            'path': file_path,
+            'filename': entry.filename,
+            'size': entry.dimensions,
+            'mode': entry.mode,
+            'format': entry.image_format,
+            'file_size': entry.size,
+            'has_transparency': entry.has_transparency
+        }
             
     def validate_output_directory(self, output_dir: str, input_files: List[str]) -> tuple:
         """验证输出目录"""
@@ -82,18 +96,19 @@ class FileManager:
         if not os.access(output_dir, os.W_OK):
             return False, "输出目录没有写入权限"
             
-        # 检查是否与输入文件目录冲突
+        # 检查是否与输入文件目录冲突（每个输入目录只解析一次）
         output_path = Path(output_dir).resolve()
-        for input_file in input_files:
-            input_dir = Path(input_file).parent.resolve()
-            if output_path == input_dir:
+        input_dirs = {os.path.dirname(input_file) for input_file in input_files}
+        for input_dir in input_dirs:
+            if output_path == Path(input_dir).resolve():
                 return False, "为防止覆盖原图，不能导出到原文件目录"
                 
         return True, ""
         
     def generate_output_filename(self, input_path: str, naming_rule: Dict, output_format: str) -> str:
         """生成输出文件名"""
-        input_name = Path(input_path).stem
+        # 预检时对每个输入调用，使用字符串操作而不构造 Path 对象
+        input_name, input_ext = os.path.splitext(os.path.basename(input_path))
         
         # 应用命名规则
         if naming_rule.get('type') == 'prefix':
@@ -104,15 +119,41 @@ class FileManager:
             output_name = input_name
             
         # 添加扩展名
-        if output_format.upper() == 'JPEG':
-            ext = '.jpg'
-        elif output_format.upper() == 'PNG':
-            ext = '.png'
-        else:
-            ext = Path(input_path).suffix
+        ext = encoder.FORMAT_EXTENSIONS.get(output_format.upper(), input_ext)
             
         return f"{output_name}{ext}"
         
+    def preflight_export(self, input_files: List[str], output_dir: str,
+                         naming_rule: Dict, output_format: str) -> ExportPlan:
+        """导出预检：一次性分配全部输出路径（解决重名），不读取输入文件"""
+        return plan_outputs(
+            input_files, output_dir,
+            lambda input_file: self.generate_output_filename(input_file, naming_rule, output_format)
+        )
+        
+    def estimate_export_size(self, plan: ExportPlan, input_files: List[str],
+                             output_format: str, quality: int, resize_config: Dict,
+                             image_processor=None, encoder_profile=None,
+                             samples: int = DEFAULT_SAMPLES) -> Optional[int]:
+        """按导出设置抽样编码几张图片（只写入内存），估算全部输出的总字节数"""
+        def encoded_size(input_file: str) -> int:
+            buffer = io.BytesIO()
+            if image_processor:
+                success, message = image_processor.process_single_image(
+                    input_file, buffer, output_format, quality, resize_config, encoder_profile
+                )
+                if not success:
+                    raise ValueError(message)
+            else:
+                with Image.open(input_file) as img:
+                    source_encoding = encoder.get_source_encoding(img)
+                    img = self.resize_image(img, resize_config)
+                    encoder.save_image(img, buffer, output_format, encoder_profile,
+                                       quality, source_encoding)
+            return buffer.getbuffer().nbytes
+        
+        return estimate_output_bytes(plan, input_files, encoded_size, samples)
+        
     def resize_image(self, image: Image.Image, resize_config: Dict) -> Image.Image:
         """调整图片尺寸"""
         if not resize_config.get('enabled', False):
@@ -146,28 +187,16 @@ class FileManager:
         return image.resize(new_size, Image.Resampling.LANCZOS)
         
     def save_image(self, image: Image.Image, output_path: str, 
-                  output_format: str, quality: int = 95) -> bool:
+                  output_format: str, quality: int = 95,
+                  encoder_profile=None, source_encoding: Optional[Dict] = None) -> bool:
         """保存图片"""
         try:
             # 确保输出目录存在
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
             
-            if output_format.upper() == 'JPEG':
-                # 如果原图有透明通道，需要转换为RGB
-                if image.mode in ('RGBA', 'LA'):
-                    # 创建白色背景
-                    background = Image.new('RGB', image.size, (255, 255, 255))
-                    if image.mode == 'RGBA':
-                        background.paste(image, mask=image.split()[-1])
-                    else:
-                        background.paste(image)
-                    image = background
-                elif image.mode != 'RGB':
-                    image = image.convert('RGB')
-                    
-                image.save(output_path, 'JPEG', quality=quality, optimize=True)
-            elif output_format.upper() == 'PNG':
-                image.save(output_path, 'PNG', optimize=True)
+            if output_format.upper() in self.supported_output_formats:
+                encoder.save_image(image, output_path, output_format, encoder_profile,
+                                   quality, source_encoding)
             else:
                 image.save(output_path)
                 
@@ -180,42 +209,85 @@ class FileManager:
                            naming_rule: Dict, output_format: str, quality: int,
                            resize_config: Dict, image_processor,
                            progress_callback: Optional[Callable] = None,
-                           complete_callback: Optional[Callable] = None):
-        """异步处理图片"""
+                           complete_callback: Optional[Callable] = None,
+                           encoder_profile=None, trace_path: Optional[str] = None,
+                           queue_path: Optional[str] = None,
+                           plan: Optional[ExportPlan] = None):
+        """异步处理图片
+        
+        trace_path 不为空且 image_processor 使用开启了 trace 的 Profiler 时，
+        处理结束后把每张图片各阶段的时间线写为 Chrome/Perfetto trace-event JSON。
+        queue_path 不为空时经该 SQLite 任务队列处理：中断或取消后以同样的图片和
+        设置再次导出，已完成的图片不再处理，其余图片沿用第一次分配的输出文件名；
+        失败的图片按退避时间重试。队列属于另一次导出（图片或设置不同）时丢弃其中
+        的任务。没有剩余任务时删除队列文件。
+        plan 为 preflight_export 的预检结果（如确认对话框中已计算的），未给出时在
+        处理线程中预检；输出路径取自预检结果，不再逐个探测文件是否存在。
+        """
+        profiler = getattr(image_processor, 'profiler', NULL_PROFILER)
+        
+        def cancelled() -> bool:
+            return bool(progress_callback and hasattr(progress_callback, '__self__')
+                        and getattr(progress_callback.__self__, 'cancelled', False))
+        
         def process():
             try:
                 total_files = len(input_files)
                 processed_files = []
                 failed_files = []
                 
-                for i, input_file in enumerate(input_files):
-                    # 检查是否取消
-                    if progress_callback and hasattr(progress_callback, '__self__'):
-                        if getattr(progress_callback.__self__, 'cancelled', False):
+                export_plan = plan or self.preflight_export(
+                    input_files, output_dir, naming_rule, output_format
+                )
+                
+                if queue_path:
+                    export_key = self._export_key(input_files, naming_rule, output_format, quality,
+                                                  resize_config, image_processor, encoder_profile)
+                    self._process_queue(
+                        queue_path, export_key, input_files, export_plan.outputs, output_format,
+                        quality, resize_config, image_processor, encoder_profile,
+                        progress_callback, cancelled, processed_files, failed_files
+                    )
+                else:
+                    for i, input_file in enumerate(input_files):
+                        # 检查是否取消
+                        if cancelled():
                             break
                             
-                    try:
-                        # 更新进度
-                        if progress_callback:
-                            progress = (i / total_files) * 100
-                            status = f"正在处理: {os.path.basename(input_file)}"
-                            progress_callback(progress, status)
+                        try:
+                            # 更新进度
+                            if progress_callback:
+                                progress = (i / total_files) * 100
+                                status = f"正在处理: {os.path.basename(input_file)}"
+                                progress_callback(progress, status)
                             
-                        # 处理图片
-                        success = self._process_single_image(
-                            input_file, output_dir, naming_rule, 
-                            output_format, quality, resize_config, 
-                            image_processor
-                        )
+                            # 处理图片
+                            with profiler.image(input_file):
+                                success, message = self._export_image(
+                                    input_file, export_plan.outputs[i], output_format,
+                                    quality, resize_config, image_processor, encoder_profile
+                                )
                         
-                        if success:
-                            processed_files.append(input_file)
-                        else:
-                            failed_files.append(input_file)
+                            if success:
+                                processed_files.append(input_file)
+                            else:
+                                failed_files.append(input_file)
                             
-                    except Exception as e:
-                        print(f"处理图片失败 {input_file}: {e}")
-                        failed_files.append(input_file)
+                        except Exception as e:
+                            print(f"处理图片失败 {input_file}: {e}")
+                            failed_files.append(input_file)
+                
+                if trace_path and profiler.trace:
+                    try:
+                        profiler.write_trace(trace_path)
+                    except OSError as e:
+                        print(f"写入时间线失败 {trace_path}: {e}")
+                
+                # 记录处理状态（只更新已导入到目录中的图片）
+                for input_file in processed_files:
+                    self.catalog.set_status(input_file, STATUS_DONE)
+                for input_file in failed_files:
+                    self.catalog.set_status(input_file, STATUS_FAILED)
                         
                 # 完成回调
                 if complete_callback:
@@ -231,40 +303,154 @@ class FileManager:
         thread.daemon = True
         thread.start()
         
+    def _export_key(self, input_files: List[str], naming_rule: Dict, output_format: str,
+                    quality: int, resize_config: Dict, image_processor, encoder_profile) -> str:
+        """一次导出的标识：输入列表、导出设置和水印配置的哈希
+
+        输出路径不计入：续跑时预检会因已导出的文件分配到不同的名称。
+        """
+        watermark_config = getattr(getattr(image_processor, 'config', None), 'config', None)
+        settings = {
+            'naming_rule': naming_rule,
+            'output_format': output_format,
+            'quality': quality,
+            'resize': resize_config,
+            'encoder_profile': encoder_profile,
+            'watermark': watermark_config.to_dict() if watermark_config is not None else None,
+        }
+        digest = hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode('utf-8'))
+        for input_file in input_files:
+            digest.update(os.path.abspath(input_file).encode('utf-8', 'surrogateescape') + b'\0')
+        return digest.hexdigest()
+        
+    def _process_queue(self, queue_path: str, export_key: str,
+                       input_files: List[str], output_paths: List[str],
+                       output_format: str, quality: int,
+                       resize_config: Dict, image_processor, encoder_profile,
+                       progress_callback: Optional[Callable], cancelled: Callable[[], bool],
+                       processed_files: List[str], failed_files: List[str]) -> None:
+        """经任务队列导出（process_images_async 的可恢复模式）"""
+        profiler = getattr(image_processor, 'profiler', NULL_PROFILER)
+        
+        with JobQueue(queue_path) as queue:
+            # 上次取消的是另一次导出时丢弃其剩余任务（它们的输出名称和设置都已过时）
+            if queue.bind(export_key):
+                print(f"丢弃上一次未完成导出的剩余任务: {queue_path}")
+            # 输出路径取自预检结果，已在队列中的图片沿用上次的输出路径
+            queue.add(zip(input_files, output_paths))
+            queue.recover()
+            queue.retry_failed()
+            counts = queue.counts()
+            total_files = sum(counts.values())
+            finished = counts[DONE]
+            
+            while not cancelled():
+                job = queue.claim()
+                if job is None:
+                    delay = queue.next_ready_in()
+                    if delay is None:
+                        break
+                    # 只剩等待重试的任务
+                    time.sleep(min(delay, 0.5))
+                    continue
+                
+                if progress_callback:
+                    progress = (finished / total_files) * 100
+                    progress_callback(progress, f"正在处理: {os.path.basename(job.input)}")
+                
+                retry = False
+                try:
+                    with profiler.image(job.input):
+                        success, message = self._export_image(
+                            job.input, job.output, output_format, quality, resize_config,
+                            image_processor, encoder_profile, raise_errors=True
+                        )
+                except Exception as e:
+                    # 只有偶发的 I/O 错误值得重试，损坏或被拒绝的图片直接记为失败
+                    success, message = False, str(e)
+                    retry = is_transient_error(e)
+                
+                if success:
+                    queue.complete(job)
+                    processed_files.append(job.input)
+                    finished += 1
+                elif not queue.fail(job, message, retry):
+                    print(f"处理图片失败 {job.input}: {message}")
+                    failed_files.append(job.input)
+                    finished += 1
+            
+            counts = queue.counts()
+        
+        # 没有剩余任务（失败的图片已通过回调报告）时不再需要队列
+        if counts[PENDING] == counts[RUNNING] == 0:
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.remove(queue_path + suffix)
+                except OSError:
+                    pass
+        
+    def _resolve_output_path(self, input_file: str, output_dir: str, naming_rule: Dict,
+                             output_format: str) -> str:
+        """按命名规则生成单个输出路径，与已有文件冲突时追加序号（批量导出使用 preflight_export）"""
+        output_filename = self.generate_output_filename(
+            input_file, naming_rule, output_format
+        )
+        output_path = os.path.join(output_dir, output_filename)
+        
+        # 处理文件名冲突
+        counter = 1
+        base_path = output_path
+        while os.path.exists(output_path):
+            name, ext = os.path.splitext(base_path)
+            output_path = f"{name}_{counter}{ext}"
+            counter += 1
+        return output_path
+        
     def _process_single_image(self, input_file: str, output_dir: str,
                             naming_rule: Dict, output_format: str, quality: int,
-                            resize_config: Dict, image_processor) -> bool:
+                            resize_config: Dict, image_processor,
+                            encoder_profile=None) -> bool:
         """处理单张图片"""
+        profiler = getattr(image_processor, 'profiler', NULL_PROFILER)
         try:
-            # 生成输出文件名
-            output_filename = self.generate_output_filename(
-                input_file, naming_rule, output_format
-            )
-            output_path = os.path.join(output_dir, output_filename)
-            
-            # 处理文件名冲突
-            counter = 1
-            base_path = output_path
-            while os.path.exists(output_path):
-                name, ext = os.path.splitext(base_path)
-                output_path = f"{name}_{counter}{ext}"
-                counter += 1
-                
-            # 使用图像处理器处理图片
-            if image_processor:
-                success, message = image_processor.process_single_image(
-                    input_file, output_path, output_format, quality, resize_config
+            with profiler.span('output_name'):
+                # 生成输出文件名
+                output_path = self._resolve_output_path(
+                    input_file, output_dir, naming_rule, output_format
                 )
-                return success
-            else:
-                # 如果没有水印处理器，直接复制并调整尺寸
-                with Image.open(input_file) as img:
-                    # 调整尺寸
-                    img = self.resize_image(img, resize_config)
-                    
-                    # 保存图片
-                    return self.save_image(img, output_path, output_format, quality)
+            
+            success, message = self._export_image(
+                input_file, output_path, output_format, quality, resize_config,
+                image_processor, encoder_profile
+            )
+            return success
                     
         except Exception as e:
             print(f"处理单张图片失败 {input_file}: {e}")
             return False
+            
+    def _export_image(self, input_file: str, output_path: str, output_format: str,
+                      quality: int, resize_config: Dict, image_processor,
+                      encoder_profile=None, raise_errors: bool = False):
+        """把单张图片导出到 output_path，返回 (是否成功, 信息)
+
+        raise_errors 为True时处理器中的异常原样抛出（不经处理器时异常总是抛出）
+        """
+        # 使用图像处理器处理图片
+        if image_processor:
+            return image_processor.process_single_image(
+                input_file, output_path, output_format, quality, resize_config,
+                encoder_profile, raise_errors=raise_errors
+            )
+        
+        # 如果没有水印处理器，直接复制并调整尺寸
+        with Image.open(input_file) as img:
+            source_encoding = encoder.get_source_encoding(img)
+            
+            # 调整尺寸
+            img = self.resize_image(img, resize_config)
+            
+            # 保存图片
+            success = self.save_image(img, output_path, output_format, quality,
+                                      encoder_profile, source_encoding)
+        return success, "导出成功" if success else "保存失败"
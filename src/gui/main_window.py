@@ -7,7 +7,9 @@ PhotoWatermark GUI应用的主界面。
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
 import os
-from typing import List, Optional, Tuple
+import threading
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
 try:
     from tkinterdnd2 import TkinterDnD
@@ -17,28 +19,87 @@ except ImportError:
 
 from .widgets.drag_drop import DragDropFrame
 from .widgets.thumbnail import ThumbnailList
-from .widgets.progress import ProgressDialog
-from .widgets.export_confirm import ExportConfirmDialog
 from .widgets.enhanced_color_selector import EnhancedColorSelector, ColorSelectorWithLabel
-from .widgets.font_preview import FontSelector
-from .file_manager import FileManager
+from .file_manager import EXPORT_QUEUE_NAME, FileManager
+from .startup import StartupTimer
+from .config_model import WatermarkConfigModel, needs_render
 from .export_dialog import ExportDialog
-from ..core.config import Config, Position, DateFormat
+from ..core.config import Config, Position, DateFormat, EncoderProfile, MetadataMode, ScaleMode, WatermarkType
 from ..core.template_manager import TemplateManager
 from ..core.image_processor import ImageProcessor
+from ..core.profiling import Profiler
 from ..utils.font_manager import font_manager
 
+if TYPE_CHECKING:
+    from .widgets.progress import ProgressDialog
+
+# 设置该环境变量为文件路径时，导出过程的时间线写入该文件（Chrome trace-event JSON）
+TRACE_ENV = 'PHOTOWATERMARK_TRACE'
+
 
 class MainWindow:
     """主窗口类"""
     
+    # 控件变量 -> (配置字段, 类型转换)；变量变化时增量写入配置模型
+    _CONFIG_BINDINGS = (
+        ('color_var', 'font_color', str),
+        ('alpha_var', 'font_alpha', float),
+        ('margin_var', 'margin', int),
+        ('date_format_var', 'date_format', DateFormat),
+        ('text_content_var', 'text_watermark.text', str),
+        ('text_font_var', 'text_watermark.font_name', str),
+        ('text_font_size_var', 'text_watermark.font_size', int),
+        ('text_color_var', 'text_watermark.font_color', str),
+        ('text_alpha_var', 'text_watermark.font_alpha', float),
+        ('text_bold_var', 'text_watermark.font_bold', bool),
+        ('text_italic_var', 'text_watermark.font_italic', bool),
+        ('shadow_enabled_var', 'text_watermark.shadow_enabled', bool),
+        ('shadow_color_var', 'text_watermark.shadow_color', str),
+        ('shadow_offset_x_var', 'text_watermark.shadow_offset_x', int),
+        ('shadow_offset_y_var', 'text_watermark.shadow_offset_y', int),
+        ('shadow_blur_var', 'text_watermark.shadow_blur', int),
+        ('shadow_alpha_var', 'text_watermark.shadow_alpha', float),
+        ('stroke_enabled_var', 'text_watermark.stroke_enabled', bool),
+        ('stroke_color_var', 'text_watermark.stroke_color', str),
+        ('stroke_width_var', 'text_watermark.stroke_width', int),
+        ('image_path_var', 'image_watermark.image_path', str),
+        ('scale_mode_var', 'image_watermark.scale_mode',
+         lambda value: ScaleMode.PERCENTAGE if value == 'percentage' else ScaleMode.PIXEL),
+        ('scale_percentage_var', 'image_watermark.scale_percentage', float),
+        ('scale_width_var', 'image_watermark.scale_width', int),
+        ('scale_height_var', 'image_watermark.scale_height', int),
+        ('keep_ratio_var', 'image_watermark.keep_aspect_ratio', bool),
+        ('image_alpha_var', 'image_watermark.alpha', float),
+        ('flip_horizontal_var', 'image_watermark.flip_horizontal', bool),
+        ('flip_vertical_var', 'image_watermark.flip_vertical', bool),
+    )
+    # 只参与派生字段计算（见 _sync_derived_fields）的控件变量
+    _DERIVED_VARS = ('position_var', 'rotation_var', 'timestamp_font_size_var')
+    # 输入无效时预览区显示的提示
+    _INVALID_INPUT_MESSAGES = {
+        'font_size': "请正确输入字体大小",
+        'text_watermark.font_size': "请正确输入字体大小",
+        'rotation': "请正确输入旋转角度",
+    }
+    
     def __init__(self):
+        # 启动各阶段耗时写入调试日志
+        self._startup = StartupTimer()
+        
         # 使用TkinterDnD来支持拖拽功能
-        if DND_AVAILABLE:
-            self.root = TkinterDnD.Tk()
-        else:
-            self.root = tk.Tk()
-            print("警告: tkinterdnd2 未安装，拖拽功能将不可用")
+        with self._startup.phase('tk_init'):
+            if DND_AVAILABLE:
+                self.root = TkinterDnD.Tk()
+            else:
+                self.root = tk.Tk()
+                print("警告: tkinterdnd2 未安装，拖拽功能将不可用")
+        
+        # 系统字体扫描较慢，在后台进行，完成后再填入文本水印的字体列表
+        self.recommended_fonts = []
+        self._fonts_future: Future = Future()
+        threading.Thread(target=self._discover_fonts, name='font-discovery', daemon=True).start()
+        # 尚未构建的水印选项卡：选项卡索引 -> 构建函数（首次切换到该选项卡时构建）
+        self._deferred_tabs = {}
             
         self.file_manager = FileManager()
         self.config = Config()
@@ -48,8 +109,18 @@ class MainWindow:
         except Exception:
             self.template_manager = None
         self.image_processor = None
-        # 当前自定义坐标（像素，基于原始图片尺寸）
-        self.custom_position: Optional[Tuple[int, int]] = None
+        # 唯一的水印配置：控件变化时增量更新，并按改动的字段刷新预览
+        self.config_model = WatermarkConfigModel()
+        self.config_model.subscribe(self._on_config_changed)
+        # 已绑定到配置模型的控件变量；输入无效（保留原值）的配置字段
+        self._bound_vars = set()
+        self._invalid_fields = set()
+        # 预览缓存：解码后的原图、渲染好的水印图层、合成结果
+        self._preview_source = None
+        self._preview_layer = None
+        self._preview_composite = None
+        # 自上次重绘以来改动的配置字段，None 表示需要全部重做
+        self._pending_changes: Optional[set] = None
         # 按钮引用用于高亮当前预设位置
         self._position_buttons = {}
         # 保存最近一次预览的显示信息（用于坐标映射）
@@ -62,10 +133,55 @@ class MainWindow:
         self._setup_window()
         
         # 创建界面
-        self._create_widgets()
+        with self._startup.phase('widgets'):
+            self._create_widgets()
+            self._bind_config_vars()
         
         # 绑定事件
         self._bind_events()
+
+        # bind exit to save last session
+        try:
+            self.root.protocol('WM_DELETE_WINDOW', self._on_app_close)
+        except Exception:
+            pass
+        
+        # 首次绘制之后再恢复上次会话、加载字体列表
+        self.root.after_idle(self._finish_startup)
+        
+    def _discover_fonts(self):
+        """后台线程：扫描系统字体"""
+        try:
+            self._fonts_future.set_result(font_manager.get_recommended_fonts())
+        except Exception as e:
+            self._fonts_future.set_exception(e)
+    
+    def _finish_startup(self):
+        """首次绘制完成后执行的启动步骤"""
+        self._startup.check_first_paint()
+        with self._startup.phase('restore_session'):
+            self._restore_session()
+        self._poll_font_discovery()
+    
+    def _poll_font_discovery(self):
+        """轮询后台字体扫描结果（Tk 控件只能在主线程中更新）"""
+        if not self._fonts_future.done():
+            self.root.after(50, self._poll_font_discovery)
+            return
+        try:
+            fonts = self._fonts_future.result()
+        except Exception as e:
+            print(f"扫描系统字体失败: {e}")
+            fonts = []
+        self._startup.mark('fonts_loaded')
+        self.recommended_fonts = fonts
+        if hasattr(self, 'font_selector'):
+            self.font_selector.set_font_list(fonts)
+        # 字体路径由字体名称和字体列表共同决定
+        self._sync_derived_fields()
+    
+    def _restore_session(self):
+        """恢复上次会话（没有时加载默认模板）"""
         # Try to auto-restore last session
         try:
             if self.template_manager:
@@ -85,12 +201,6 @@ class MainWindow:
         except Exception:
             pass
 
-        # bind exit to save last session
-        try:
-            self.root.protocol('WM_DELETE_WINDOW', self._on_app_close)
-        except Exception:
-            pass
-
     def _setup_window(self):
         """设置主窗口"""
         self.root.title("PhotoWatermark - 图片水印工具")
@@ -107,14 +217,17 @@ class MainWindow:
     def _create_widgets(self):
         """创建界面组件"""
         # 创建菜单栏
-        self._create_menu()
+        with self._startup.phase('menu'):
+            self._create_menu()
         
         # 创建工具栏
-        self._create_toolbar()
+        with self._startup.phase('toolbar'):
+            self._create_toolbar()
         
         # 创建主要区域
         self._bind_events()
-        self._create_main_area()
+        with self._startup.phase('main_area'):
+            self._create_main_area()
         self._create_status_bar()
         
     def _create_main_area(self):
@@ -224,6 +337,37 @@ class MainWindow:
         self.format_var = tk.StringVar(value="JPEG")
         ttk.Radiobutton(format_frame, text="JPEG", variable=self.format_var, value="JPEG", command=self._on_format_change).pack(side='left')
         ttk.Radiobutton(format_frame, text="PNG", variable=self.format_var, value="PNG", command=self._on_format_change).pack(side='left', padx=(10, 0))
+        ttk.Radiobutton(format_frame, text="WebP", variable=self.format_var, value="WEBP", command=self._on_format_change).pack(side='left', padx=(10, 0))
+        ttk.Radiobutton(format_frame, text="TIFF", variable=self.format_var, value="TIFF", command=self._on_format_change).pack(side='left', padx=(10, 0))
+
+        # 编码配置档
+        profile_frame = ttk.Frame(export_frame)
+        profile_frame.pack(fill='x', padx=10, pady=(0, 5))
+        ttk.Label(profile_frame, text="编码方式:").pack(side='left')
+        self.encoder_profile_var = tk.StringVar(value=EncoderProfile.BALANCED.value)
+        ttk.Combobox(
+            profile_frame,
+            textvariable=self.encoder_profile_var,
+            values=[profile.value for profile in EncoderProfile],
+            state='readonly',
+            width=20
+        ).pack(side='left', padx=(5, 0))
+
+        # 元数据透传
+        self.keep_metadata_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            export_frame,
+            text="保留原图元数据 (EXIF/ICC/XMP)",
+            variable=self.keep_metadata_var
+        ).pack(anchor='w', padx=10, pady=(0, 5))
+
+        # 可恢复导出：在输出目录中保存任务队列，中断后再次导出到该目录时继续
+        self.resumable_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            export_frame,
+            text="可恢复导出（中断后再次导出时跳过已完成的图片）",
+            variable=self.resumable_var
+        ).pack(anchor='w', padx=10, pady=(0, 5))
 
         # JPEG质量设置
         self.quality_frame = ttk.Frame(export_frame)
@@ -370,7 +514,8 @@ class MainWindow:
         self.thumbnail_list = ThumbnailList(
             list_frame,
             self._on_selection_change,
-            self._on_list_change  # 添加列表变化回调
+            self._on_list_change,  # 添加列表变化回调
+            catalog=self.file_manager.catalog
         )
         self.thumbnail_list.pack(fill='both', expand=True)
 
@@ -599,13 +744,13 @@ class MainWindow:
     def _on_format_change(self):
         """格式改变事件"""
         if hasattr(self, 'quality_frame'):
-            if self.format_var.get() == "JPEG":
-                # 启用JPEG质量控件
+            if self.format_var.get() in ("JPEG", "WEBP"):
+                # 启用质量控件（JPEG/WebP）
                 self.quality_label_title.config(state='normal', foreground='black')
                 self.quality_scale.config(state='normal')
                 self.quality_label.config(state='normal', foreground='black')
             else:
-                # 禁用JPEG质量控件（PNG格式）
+                # 禁用质量控件（PNG格式）
                 self.quality_label_title.config(state='disabled', foreground='gray')
                 self.quality_scale.config(state='disabled')
                 self.quality_label.config(state='disabled', foreground='gray')
@@ -692,170 +837,8 @@ class MainWindow:
         self._show_export_confirmation(files_to_export, config)
         
     def _get_watermark_config(self):
-        """从GUI获取水印配置"""
-        from ..core.config import WatermarkConfig, WatermarkType, TextWatermarkConfig, ImageWatermarkConfig, Position, DateFormat, ScaleMode
-
-        # 获取文本和图片水印内容
-        text_content = self.text_content_var.get() if hasattr(self, 'text_content_var') else ""
-        image_path = self.image_path_var.get() if hasattr(self, 'image_path_var') else ""
-
-        # 判断水印类型：无文本且无图片时自动用时间水印
-        if (not text_content.strip()) and (not image_path.strip()):
-            watermark_type = WatermarkType.TIMESTAMP
-        else:
-            current_tab = self.watermark_notebook.index(self.watermark_notebook.select())
-            if current_tab == 1 and text_content.strip():
-                watermark_type = WatermarkType.TEXT
-            elif current_tab == 2 and image_path.strip():
-                watermark_type = WatermarkType.IMAGE
-            else:
-                watermark_type = WatermarkType.TIMESTAMP
-
-        # 获取选中字体的路径
-        selected_font_name = self.text_font_var.get() if hasattr(self, 'text_font_var') else ""
-        selected_font_path = None
-        if hasattr(self, 'recommended_fonts'):
-            for font_info in self.recommended_fonts:
-                if font_info['name'] == selected_font_name:
-                    selected_font_path = font_info['path']
-                    break
-
-        # 创建文本水印配置
-        text_watermark = TextWatermarkConfig(
-            text=text_content,
-            font_size=self.text_font_size_var.get() if hasattr(self, 'text_font_size_var') else 36,
-            font_color=self.text_color_var.get() if hasattr(self, 'text_color_var') else "white",
-            font_alpha=self.text_alpha_var.get() if hasattr(self, 'text_alpha_var') else 0.8,
-            font_path=selected_font_path,
-            font_name=selected_font_name,
-            font_bold=self.text_bold_var.get() if hasattr(self, 'text_bold_var') else False,
-            font_italic=self.text_italic_var.get() if hasattr(self, 'text_italic_var') else False,
-            shadow_enabled=self.shadow_enabled_var.get() if hasattr(self, 'shadow_enabled_var') else False,
-            shadow_offset_x=self.shadow_offset_x_var.get() if hasattr(self, 'shadow_offset_x_var') else 2,
-            shadow_offset_y=self.shadow_offset_y_var.get() if hasattr(self, 'shadow_offset_y_var') else 2,
-            stroke_enabled=self.stroke_enabled_var.get() if hasattr(self, 'stroke_enabled_var') else False,
-            stroke_width=self.stroke_width_var.get() if hasattr(self, 'stroke_width_var') else 1
-        )
-
-        # 创建图片水印配置
-        scale_mode_str = self.scale_mode_var.get() if hasattr(self, 'scale_mode_var') else "percentage"
-        scale_mode = ScaleMode.PERCENTAGE if scale_mode_str == "percentage" else ScaleMode.PIXEL
-
-        image_watermark = ImageWatermarkConfig(
-            image_path=image_path,
-            scale_mode=scale_mode,
-            scale_percentage=self.scale_percentage_var.get() if hasattr(self, 'scale_percentage_var') else 20.0,
-            scale_width=self.scale_width_var.get() if hasattr(self, 'scale_width_var') else 100,
-            scale_height=self.scale_height_var.get() if hasattr(self, 'scale_height_var') else 100,
-            keep_aspect_ratio=self.keep_ratio_var.get() if hasattr(self, 'keep_ratio_var') else True,
-            alpha=self.image_alpha_var.get() if hasattr(self, 'image_alpha_var') else 0.8
-        )
-
-        # 解析位置（如果用户选择了自定义坐标，Position(...) 可能会抛出异常）
-        position_str = self.position_var.get()
-        try:
-            position = Position(position_str)
-        except Exception:
-            # 允许非枚举的中间状态（例如 'custom'），在这种情况下保留现有配置或使用默认
-            try:
-                position = self.config.config.position
-            except Exception:
-                position = Position.BOTTOM_RIGHT
-
-        # 额外的通用设置
-        margin_val = None
-        try:
-            margin_val = int(self.margin_var.get()) if hasattr(self, 'margin_var') else None
-        except Exception:
-            margin_val = None
-
-        # 日期格式（用于时间水印）
-        date_format_val = None
-        try:
-            date_format_val = DateFormat(self.date_format_var.get()) if hasattr(self, 'date_format_var') else None
-        except Exception:
-            date_format_val = None
-
-        # 决定时间水印的字体大小来源（时间水印使用 timestamp_font_size_var）
-        chosen_font_size = None
-        if watermark_type == WatermarkType.TIMESTAMP:
-            chosen_font_size = self.timestamp_font_size_var.get() if hasattr(self, 'timestamp_font_size_var') else None
-        else:
-            chosen_font_size = self.text_font_size_var.get() if hasattr(self, 'text_font_size_var') else None
-
-        # 创建主配置
-        watermark_config = WatermarkConfig(
-            watermark_type=watermark_type,
-            position=position,
-            font_size=chosen_font_size,
-            font_path=selected_font_path,
-            font_color=self.color_var.get() if hasattr(self, 'color_var') else "white",
-            font_alpha=self.alpha_var.get() if hasattr(self, 'alpha_var') else 0.8,
-            text_watermark=text_watermark,
-            image_watermark=image_watermark
-        )
-
-        # apply optional common settings
-        if margin_val is not None:
-            watermark_config.margin = margin_val
-        if date_format_val is not None:
-            watermark_config.date_format = date_format_val
-
-        # read advanced visual options if UI exposes them
-        try:
-            if hasattr(self, 'shadow_color_var'):
-                watermark_config.text_watermark.shadow_color = self.shadow_color_var.get()
-        except Exception:
-            pass
-        try:
-            if hasattr(self, 'shadow_blur_var'):
-                watermark_config.text_watermark.shadow_blur = int(self.shadow_blur_var.get())
-        except Exception:
-            pass
-        try:
-            if hasattr(self, 'shadow_alpha_var'):
-                watermark_config.text_watermark.shadow_alpha = float(self.shadow_alpha_var.get())
-        except Exception:
-            pass
-        try:
-            if hasattr(self, 'stroke_color_var'):
-                watermark_config.text_watermark.stroke_color = self.stroke_color_var.get()
-        except Exception:
-            pass
-        try:
-            if hasattr(self, 'flip_horizontal_var'):
-                watermark_config.image_watermark.flip_horizontal = bool(self.flip_horizontal_var.get())
-        except Exception:
-            pass
-        try:
-            if hasattr(self, 'flip_vertical_var'):
-                watermark_config.image_watermark.flip_vertical = bool(self.flip_vertical_var.get())
-        except Exception:
-            pass
-
-        # 如果用户设置了自定义像素坐标，则将其写入配置，后端会优先使用 custom_position
-        if hasattr(self, 'custom_position') and self.custom_position is not None:
-            watermark_config.custom_position = self.custom_position
-
-        # 写入旋转角度到文本和图片水印配置（支持所有类型的水印）
-        try:
-            rot_val = float(self.rotation_var.get()) if hasattr(self, 'rotation_var') else 0.0
-        except Exception:
-            rot_val = 0.0
-
-        try:
-            if watermark_config.text_watermark is not None:
-                watermark_config.text_watermark.rotation = float(rot_val)
-        except Exception:
-            pass
-
-        try:
-            if watermark_config.image_watermark is not None:
-                watermark_config.image_watermark.rotation = float(rot_val)
-        except Exception:
-            pass
-
-        return watermark_config
+        """获取当前水印配置（配置模型的独立副本）"""
+        return self.config_model.snapshot()
 
     def _get_export_config(self) -> dict:
         """从设置面板获取导出配置"""
@@ -886,6 +869,10 @@ class MainWindow:
             'naming_rule': naming_rule,
             'output_format': self.format_var.get(),
             'quality': self.quality_var.get(),
+            'encoder_profile': self.encoder_profile_var.get(),
+            'metadata_mode': (MetadataMode.PASSTHROUGH if self.keep_metadata_var.get()
+                              else MetadataMode.STRIP).value,
+            'resumable': self.resumable_var.get(),
             'resize': resize_config
         }
         
@@ -901,11 +888,31 @@ class MainWindow:
         
     def _show_export_confirmation(self, files: List[str], config: dict):
         """显示导出确认对话框"""
+        from .widgets.export_confirm import ExportConfirmDialog
+        
+        # 预检：一次性分配输出文件名，对话框和导出共用（输入大小由对话框在后台线程中读取）
+        plan = self.file_manager.preflight_export(
+            files, config['output_dir'], config['naming_rule'], config['output_format']
+        )
+        
+        # 抽样编码估算输出大小（后台线程中执行，使用当前水印配置的副本）
+        estimate_config = Config(self._get_watermark_config())
+        estimate_config.config.metadata_mode = MetadataMode(
+            config.get('metadata_mode', MetadataMode.STRIP.value))
+        
+        def estimate():
+            return self.file_manager.estimate_export_size(
+                plan, files, config['output_format'], config['quality'], config['resize'],
+                ImageProcessor(estimate_config), config.get('encoder_profile')
+            )
+        
         confirm_dialog = ExportConfirmDialog(
             self.root, 
             files, 
             config, 
-            on_confirm=None  # 不使用回调，避免重复调用
+            on_confirm=None,  # 不使用回调，避免重复调用
+            plan=plan,
+            estimate=estimate
         )
         result = confirm_dialog.show()
         
@@ -914,11 +921,11 @@ class MainWindow:
             messagebox.showinfo("提示", "请在左侧设置面板中修改导出设置，然后重新点击导出按钮。")
         elif result is True:
             # 用户确认导出，开始实际导出过程
-            self._start_export_with_config(files, config)
+            self._start_export_with_config(files, config, plan)
         # result is False 表示用户取消，不做任何操作
         
-    def _start_export_with_config(self, files: List[str], config: dict):
-        """使用指定配置开始导出"""
+    def _start_export_with_config(self, files: List[str], config: dict, plan=None):
+        """使用指定配置开始导出（plan 为确认对话框中的预检结果）"""
         # 验证输出目录
         is_valid, error_msg = self.file_manager.validate_output_directory(
             config['output_dir'], files
@@ -928,6 +935,8 @@ class MainWindow:
             messagebox.showerror("错误", error_msg)
             return
             
+        from .widgets.progress import ProgressDialog
+        
         # 创建进度对话框
         progress_dialog = ProgressDialog(
             self.root, 
@@ -937,9 +946,13 @@ class MainWindow:
         
         # 更新水印配置
         self._update_watermark_config()
+        self.config.config.metadata_mode = MetadataMode(
+            config.get('metadata_mode', MetadataMode.STRIP.value))
         
-        # 创建图像处理器
-        self.image_processor = ImageProcessor(self.config)
+        # 创建图像处理器（设置了 PHOTOWATERMARK_TRACE 时记录导出时间线）
+        trace_path = os.environ.get(TRACE_ENV)
+        profiler = Profiler(trace=True) if trace_path else None
+        self.image_processor = ImageProcessor(self.config, profiler)
         
         # 开始异步处理
         self.file_manager.process_images_async(
@@ -953,7 +966,12 @@ class MainWindow:
             progress_callback=progress_dialog.update_progress,
             complete_callback=lambda success, failed: self._export_complete(
                 progress_dialog, success, failed
-            )
+            ),
+            encoder_profile=config.get('encoder_profile'),
+            trace_path=trace_path,
+            queue_path=(os.path.join(config['output_dir'], EXPORT_QUEUE_NAME)
+                        if config.get('resumable') else None),
+            plan=plan
         )
         
     def _update_watermark_config(self):
@@ -970,7 +988,7 @@ class MainWindow:
         # 这里可以设置取消标志
         pass
         
-    def _export_complete(self, progress_dialog: ProgressDialog, 
+    def _export_complete(self, progress_dialog: 'ProgressDialog', 
                         success_files: List[str], failed_files: List[str]):
         """导出完成回调"""
         total = len(success_files) + len(failed_files)
@@ -1005,18 +1023,149 @@ class MainWindow:
         # 创建选项卡
         self.watermark_notebook = ttk.Notebook(watermark_frame)
         self.watermark_notebook.pack(fill='both', expand=True, padx=10, pady=10)
-        # 时间水印选项卡
+        # 时间水印选项卡（默认显示，立即构建）
         self._create_timestamp_watermark_tab()
         
-        # 文本水印选项卡
-        self._create_text_watermark_tab()
-        
-        # 图片水印选项卡
-        self._create_image_watermark_tab()
+        # 文本水印和图片水印选项卡先放入空白页，首次切换时再构建
+        self._add_deferred_tab("文本水印", self._create_text_watermark_tab)
+        self._add_deferred_tab("图片水印", self._create_image_watermark_tab)
+        self.watermark_notebook.bind('<<NotebookTabChanged>>', self._on_watermark_tab_changed)
         
         # 通用位置设置
         self._create_position_settings(watermark_frame)
     
+    def _add_deferred_tab(self, text: str, builder):
+        """添加一个首次切换时才构建内容的选项卡"""
+        frame = ttk.Frame(self.watermark_notebook)
+        self.watermark_notebook.add(frame, text=text)
+        self._deferred_tabs[self.watermark_notebook.index(frame)] = (frame, builder)
+    
+    def _build_deferred_tab(self, index: int):
+        """构建尚未构建的选项卡"""
+        entry = self._deferred_tabs.pop(index, None)
+        if entry is None:
+            return
+        frame, builder = entry
+        with self._startup.phase(f"tab:{self.watermark_notebook.tab(index, 'text')}"):
+            builder(frame)
+        self._bind_config_vars()
+    
+    def _build_all_deferred_tabs(self):
+        """构建所有尚未构建的选项卡（应用模板或会话前，确保各项设置都有对应的控件）"""
+        for index in sorted(self._deferred_tabs):
+            self._build_deferred_tab(index)
+    
+    def _on_watermark_tab_changed(self, event=None):
+        """切换水印选项卡"""
+        try:
+            self._build_deferred_tab(self.watermark_notebook.index(self.watermark_notebook.select()))
+        except tk.TclError:
+            pass
+        # 水印类型取决于当前选项卡
+        self._sync_derived_fields()
+
+    @property
+    def custom_position(self) -> Optional[Tuple[int, int]]:
+        """当前自定义坐标（像素，基于原始图片尺寸）"""
+        return self.config_model.get('custom_position')
+
+    @custom_position.setter
+    def custom_position(self, value: Optional[Tuple[int, int]]):
+        self.config_model.set('custom_position', value)
+
+    def _bind_config_vars(self):
+        """把已创建的控件变量绑定到配置模型并写入当前值（每个变量只绑定一次）
+
+        选项卡延迟构建，构建完成后再次调用以绑定新创建的变量。
+        """
+        bindings = list(self._CONFIG_BINDINGS) + [(attr, None, None) for attr in self._DERIVED_VARS]
+        with self.config_model.batch():
+            for attr, field, convert in bindings:
+                if attr in self._bound_vars or not hasattr(self, attr):
+                    continue
+                self._bound_vars.add(attr)
+                getattr(self, attr).trace_add(
+                    'write', lambda *args, a=attr, f=field, c=convert: self._on_config_var_write(a, f, c))
+                self._on_config_var_write(attr, field, convert)
+
+    def _on_config_var_write(self, attr: str, field: Optional[str], convert):
+        """控件变量变化：更新对应的配置字段，再重新计算派生字段
+
+        输入中途的无效值（如清空的数字框）不写入配置，保留原值并在预览区给出提示。
+        """
+        invalid_before = set(self._invalid_fields)
+        with self.config_model.batch():
+            if field is not None:
+                value = self._read_config_var(attr, field, convert, None)
+                if field not in self._invalid_fields:
+                    self.config_model.set(field, value)
+            self._sync_derived_fields()
+        if self._invalid_fields != invalid_before:
+            self._schedule_redraw()
+
+    def _read_config_var(self, attr: str, field: str, convert, default):
+        """读取并转换控件变量；变量不存在时返回 default，输入无效时记下该字段并返回 default"""
+        if not hasattr(self, attr):
+            return default
+        try:
+            value = convert(getattr(self, attr).get())
+        except (tk.TclError, ValueError, TypeError):
+            self._invalid_fields.add(field)
+            return default
+        self._invalid_fields.discard(field)
+        return value
+
+    def _sync_derived_fields(self):
+        """计算由多个控件共同决定的配置字段：水印类型、位置、字体路径、字号和旋转角度"""
+        model = self.config_model
+        text_content = model.get('text_watermark.text')
+        image_path = model.get('image_watermark.image_path')
+
+        # 判断水印类型：无文本且无图片时自动用时间水印
+        watermark_type = WatermarkType.TIMESTAMP
+        try:
+            current_tab = self.watermark_notebook.index(self.watermark_notebook.select())
+        except (AttributeError, tk.TclError):
+            current_tab = 0
+        if current_tab == 1 and text_content.strip():
+            watermark_type = WatermarkType.TEXT
+        elif current_tab == 2 and image_path.strip():
+            watermark_type = WatermarkType.IMAGE
+
+        # 选中字体的路径
+        font_name = model.get('text_watermark.font_name')
+        font_path = next((f['path'] for f in self.recommended_fonts if f['name'] == font_name), None)
+
+        values = {
+            'watermark_type': watermark_type,
+            'font_path': font_path,
+            'text_watermark.font_path': font_path,
+        }
+
+        # 时间水印使用时间选项卡的字号，其他类型使用文本水印的字号
+        if watermark_type == WatermarkType.TIMESTAMP:
+            values['font_size'] = self._read_config_var(
+                'timestamp_font_size_var', 'font_size', int, model.get('font_size'))
+        else:
+            values['font_size'] = model.get('text_watermark.font_size')
+
+        # 旋转角度同时作用于文本和图片水印
+        rotation = self._read_config_var('rotation_var', 'rotation', float, model.get('text_watermark.rotation'))
+        values['text_watermark.rotation'] = rotation
+        values['image_watermark.rotation'] = rotation
+
+        # 'custom' 等非枚举的中间状态保留原位置，自定义坐标由 custom_position 决定
+        try:
+            values['position'] = Position(self.position_var.get())
+        except (AttributeError, ValueError, tk.TclError):
+            pass
+
+        model.update(values)
+
+    def _on_config_changed(self, changed):
+        """配置模型变化：记下改动的字段并调度重绘"""
+        self._schedule_redraw(changed=changed)
+    
     def _create_timestamp_watermark_tab(self):
         """创建时间水印选项卡"""
         timestamp_frame = ttk.Frame(self.watermark_notebook)
@@ -1031,7 +1180,7 @@ class MainWindow:
             color_frame,
             label_text="字体颜色:",
             initial_color="white",
-            on_color_change=lambda color: (self.color_var.set(color), self._schedule_redraw()),
+            on_color_change=self.color_var.set,
             label_width=8
         )
         self.timestamp_color_selector.pack(fill='x')
@@ -1043,8 +1192,7 @@ class MainWindow:
             timestamp_frame,
             from_=0.1, to=1.0,
             variable=self.alpha_var,
-            orient='horizontal',
-            command=lambda v: self._schedule_redraw()
+            orient='horizontal'
         )
         alpha_scale.pack(fill='x', padx=10, pady=(0, 10))
         # 字体大小（用于时间水印）
@@ -1052,7 +1200,6 @@ class MainWindow:
         self.timestamp_font_size_var = tk.IntVar(value=36)
         ts_size_entry = ttk.Entry(timestamp_frame, textvariable=self.timestamp_font_size_var, width=8)
         ts_size_entry.pack(anchor='w', padx=10, pady=(0, 10))
-        self.timestamp_font_size_var.trace_add('write', lambda *args: self._schedule_redraw())
 
         self._schedule_redraw()
 
@@ -1105,10 +1252,9 @@ class MainWindow:
             # ignore slider glitches
             pass
     
-    def _create_text_watermark_tab(self):
+    def _create_text_watermark_tab(self, text_frame):
         """创建文本水印选项卡"""
-        text_frame = ttk.Frame(self.watermark_notebook)
-        self.watermark_notebook.add(text_frame, text="文本水印")
+        from .widgets.font_preview import FontSelector
 
         # 文本内容
         ttk.Label(text_frame, text="水印文本:").pack(anchor='w', padx=10, pady=(10, 0))
@@ -1122,7 +1268,6 @@ class MainWindow:
             if content.endswith('\n'):
                 content = content[:-1]
             self.text_content_var.set(content)
-            self._schedule_redraw()
 
         text_entry.bind('<KeyRelease>', on_text_change)
         self.text_entry_widget = text_entry
@@ -1131,8 +1276,12 @@ class MainWindow:
         font_frame = ttk.LabelFrame(text_frame, text="字体设置")
         font_frame.pack(fill='x', padx=10, pady=(5, 0))
 
-        # 获取推荐字体列表
-        self.recommended_fonts = font_manager.get_recommended_fonts()
+        # 推荐字体列表由后台扫描填入；尚未完成时先显示空列表，完成后更新
+        if self._fonts_future.done() and not self.recommended_fonts:
+            try:
+                self.recommended_fonts = self._fonts_future.result()
+            except Exception:
+                pass
         
         # 创建字体选择器（包含预览功能）
         self.text_font_var = tk.StringVar()
@@ -1161,7 +1310,7 @@ class MainWindow:
             color_frame,
             label_text="字体颜色:",
             initial_color="white",
-            on_color_change=lambda color: (self.text_color_var.set(color), self._schedule_redraw()),
+            on_color_change=self.text_color_var.set,
             label_width=8
         )
         self.text_color_selector.pack(fill='x')
@@ -1178,11 +1327,9 @@ class MainWindow:
             from_=0.1, to=1.0,
             variable=self.text_alpha_var,
             orient='horizontal',
-            length=150,
-            command=lambda v: self._schedule_redraw()
+            length=150
         )
         alpha_scale.pack(side='right')
-        self.text_alpha_var.trace_add('write', lambda *args: self._schedule_redraw())
 
         # 效果设置
         effects_frame = ttk.LabelFrame(text_frame, text="视觉效果")
@@ -1210,7 +1357,7 @@ class MainWindow:
             shadow_color_frame,
             label_text="阴影颜色:",
             initial_color="black",
-            on_color_change=lambda color: (self.shadow_color_var.set(color), self._schedule_redraw()),
+            on_color_change=self.shadow_color_var.set,
             label_width=8
         )
         self.shadow_color_selector.pack(fill='x')
@@ -1243,15 +1390,9 @@ class MainWindow:
             from_=0.1, to=1.0,
             variable=self.shadow_alpha_var,
             orient='horizontal',
-            length=100,
-            command=lambda v: self._schedule_redraw()
+            length=100
         )
         shadow_alpha_scale.pack(side='right')
-        
-        # 绑定变化事件
-        self.shadow_offset_x_var.trace_add('write', lambda *args: self._schedule_redraw())
-        self.shadow_offset_y_var.trace_add('write', lambda *args: self._schedule_redraw())
-        self.shadow_blur_var.trace_add('write', lambda *args: self._schedule_redraw())
 
         # 描边效果
         self.stroke_enabled_var = tk.BooleanVar()
@@ -1275,7 +1416,7 @@ class MainWindow:
             stroke_color_frame,
             label_text="描边颜色:",
             initial_color="black",
-            on_color_change=lambda color: (self.stroke_color_var.set(color), self._schedule_redraw()),
+            on_color_change=self.stroke_color_var.set,
             label_width=8
         )
         self.stroke_color_selector.pack(fill='x')
@@ -1286,16 +1427,13 @@ class MainWindow:
         ttk.Label(stroke_width_frame, text="描边宽度:").pack(side='left')
         self.stroke_width_var = tk.IntVar(value=1)
         ttk.Entry(stroke_width_frame, textvariable=self.stroke_width_var, width=5).pack(side='right')
-        self.stroke_width_var.trace_add('write', lambda *args: self._schedule_redraw())
 
         # 初始化效果控件状态
         self._on_shadow_toggle()
         self._on_stroke_toggle()
     
-    def _create_image_watermark_tab(self):
+    def _create_image_watermark_tab(self, image_frame):
         """创建图片水印选项卡"""
-        image_frame = ttk.Frame(self.watermark_notebook)
-        self.watermark_notebook.add(image_frame, text="图片水印")
 
         # 图片选择
         ttk.Label(image_frame, text="水印图片:").pack(anchor='w', padx=10, pady=(10, 0))
@@ -1312,9 +1450,6 @@ class MainWindow:
             command=self._browse_watermark_image,
             width=8
         ).pack(side='right', padx=(5, 0))
-        self.image_path_var.trace_add('write', lambda *args: self._schedule_redraw())
-        
-        # (rotation mapping handled when building watermark_config)
 
         # 缩放设置
         scale_frame = ttk.LabelFrame(image_frame, text="尺寸设置")
@@ -1327,21 +1462,18 @@ class MainWindow:
         percentage_frame.pack(fill='x', padx=10, pady=5)
         ttk.Radiobutton(
             percentage_frame, text="按比例:",
-            variable=self.scale_mode_var, value="percentage",
-            command=lambda: self._schedule_redraw()
+            variable=self.scale_mode_var, value="percentage"
         ).pack(side='left')
         self.scale_percentage_var = tk.DoubleVar(value=20.0)
         percentage_entry = ttk.Entry(percentage_frame, textvariable=self.scale_percentage_var, width=8)
         percentage_entry.pack(side='left', padx=(5, 2))
         ttk.Label(percentage_frame, text="%").pack(side='left')
-        self.scale_percentage_var.trace_add('write', lambda *args: self._schedule_redraw())
 
         pixel_frame = ttk.Frame(scale_frame)
         pixel_frame.pack(fill='x', padx=10, pady=5)
         ttk.Radiobutton(
             pixel_frame, text="按像素:",
-            variable=self.scale_mode_var, value="pixel",
-            command=lambda: self._schedule_redraw()
+            variable=self.scale_mode_var, value="pixel"
         ).pack(side='left')
         self.scale_width_var = tk.IntVar(value=100)
         self.scale_height_var = tk.IntVar(value=100)
@@ -1356,9 +1488,6 @@ class MainWindow:
             scale_frame, text="保持宽高比",
             variable=self.keep_ratio_var
         ).pack(anchor='w', padx=10, pady=5)
-        self.scale_width_var.trace_add('write', lambda *args: self._schedule_redraw())
-        self.scale_height_var.trace_add('write', lambda *args: self._schedule_redraw())
-        self.keep_ratio_var.trace_add('write', lambda *args: self._schedule_redraw())
 
         # 透明度设置
         alpha_frame = ttk.LabelFrame(image_frame, text="透明度设置")
@@ -1422,13 +1551,12 @@ class MainWindow:
             state="readonly"
         )
         position_combo.pack(fill='x', padx=10, pady=(0, 10))
-        # 位置选择变化时同步内部 position_var 并刷新预览
+        # 位置选择变化时同步内部 position_var（随之更新配置模型并刷新预览）
         def _on_position_display_change(event=None):
             disp = self.position_display_var.get()
             eng = self._position_reverse_map.get(disp)
             if eng:
                 self.position_var.set(eng)
-            self._schedule_redraw()
 
         position_combo.bind('<<ComboboxSelected>>', _on_position_display_change)
 
@@ -1461,8 +1589,6 @@ class MainWindow:
         rot_slider.pack(side='left', fill='x', expand=True)
         rot_entry = ttk.Entry(rot_ui_frame, textvariable=self.rotation_var, width=6)
         rot_entry.pack(side='right', padx=(5, 0))
-        # 自动刷新并验证旋转角度输入
-        self.rotation_var.trace_add('write', lambda *args: self._schedule_redraw())
 
     # 坐标输入（像素）
         coord_frame = ttk.Frame(position_frame)
@@ -1499,7 +1625,6 @@ class MainWindow:
                         btn.state(['!pressed'])
                 except Exception:
                     pass
-            self._schedule_redraw()
         except Exception:
             pass
 
@@ -1509,7 +1634,6 @@ class MainWindow:
             x = int(self.coord_x_var.get())
             y = int(self.coord_y_var.get())
             self.custom_position = (x, y)
-            self._schedule_redraw()
         except Exception:
             messagebox.showerror("错误", "请输入有效的整数坐标")
 
@@ -1546,7 +1670,6 @@ class MainWindow:
             self.coord_x_var.set(px)
             self.coord_y_var.set(py)
             self.position_var.set('custom')
-            self._schedule_redraw()
         except Exception:
             pass
 
@@ -1606,8 +1729,8 @@ class MainWindow:
             self.coord_y_var.set(py)
             self.position_var.set('custom')
 
-            # 实时刷新预览（直接调用以获得更即时反馈）
-            self._update_preview_image(self.thumbnail_list.get_selected_files())
+            # 实时刷新预览（直接调用以获得更即时反馈；只改了坐标，复用已渲染的水印图层）
+            self._redraw_preview()
         except Exception:
             pass
 
@@ -1616,8 +1739,6 @@ class MainWindow:
         try:
             if self._dragging:
                 self._dragging = False
-                # 最终刷新
-                self._schedule_redraw()
         except Exception:
             pass
     
@@ -1630,8 +1751,6 @@ class MainWindow:
             else:
                 for child in self.shadow_frame.winfo_children():
                     self._disable_widget_recursive(child)
-        # 切换阴影后刷新预览
-        self._redraw_preview()
     
     def _on_stroke_toggle(self):
         """描边效果开关切换"""
@@ -1642,8 +1761,6 @@ class MainWindow:
             else:
                 for child in self.stroke_frame.winfo_children():
                     self._disable_widget_recursive(child)
-        # 切换描边后刷新预览
-        self._redraw_preview()
     
     def _on_font_change_enhanced(self, font_info, size, bold, italic):
         """增强字体选择器的变化事件"""
@@ -1653,14 +1770,10 @@ class MainWindow:
         self.text_font_size_var.set(size)
         self.text_bold_var.set(bold)
         self.text_italic_var.set(italic)
-        
-        # 刷新预览
-        self._redraw_preview()
     
     def _on_image_alpha_change(self):
         """图片透明度变化事件"""
         self._update_image_alpha_display()
-        self._schedule_redraw()
     
     def _update_image_alpha_display(self):
         """更新透明度显示"""
@@ -1675,17 +1788,14 @@ class MainWindow:
             def on_bold_change(*args):
                 if hasattr(self, 'text_bold_var'):
                     self.text_bold_var.set(self.font_selector.bold_var.get())
-                    self._schedule_redraw()
             
             def on_italic_change(*args):
                 if hasattr(self, 'text_italic_var'):
                     self.text_italic_var.set(self.font_selector.italic_var.get())
-                    self._schedule_redraw()
             
             def on_size_change(*args):
                 if hasattr(self, 'text_font_size_var'):
                     self.text_font_size_var.set(self.font_selector.size_var.get())
-                    self._schedule_redraw()
             
             # 绑定变化事件
             self.font_selector.bold_var.trace_add('write', on_bold_change)
@@ -1784,17 +1894,23 @@ class MainWindow:
             font=("Arial", 18)
         )
         # 绑定画布尺寸变化，重绘当前预览
-        self.preview_canvas.bind('<Configure>', lambda e: self._schedule_redraw())
+        self.preview_canvas.bind('<Configure>', lambda e: self._schedule_redraw(changed=frozenset()))
         # 绑定点击和拖拽事件，允许用户点击或拖拽设置自定义坐标
         self.preview_canvas.bind('<Button-1>', self._on_preview_mouse_down)
         self.preview_canvas.bind('<B1-Motion>', self._on_preview_mouse_move)
         self.preview_canvas.bind('<ButtonRelease-1>', self._on_preview_mouse_up)
 
-    def _schedule_redraw(self, delay: int = 200):
+    def _schedule_redraw(self, delay: int = 200, changed=None):
         """防抖调度重绘，delay 单位毫秒。
 
-        连续触发时会取消上一次计划，减少重复合成开销。
+        连续触发时会取消上一次计划，减少重复合成开销。changed 为触发重绘的配置字段，
+        多次调度的字段合并后决定重绘时需要重做的工作；None 表示全部重做，
+        空集合表示配置未变（如画布尺寸变化）。
         """
+        if changed is None or self._pending_changes is None:
+            self._pending_changes = None
+        else:
+            self._pending_changes |= changed
         try:
             if hasattr(self, '_redraw_after_id') and self._redraw_after_id:
                 self.root.after_cancel(self._redraw_after_id)
@@ -1810,85 +1926,27 @@ class MainWindow:
             self._init_preview_area()
             return
 
-        img_path = selected_files[0]
+        invalid = [message for field, message in self._INVALID_INPUT_MESSAGES.items()
+                   if field in self._invalid_fields]
+        if invalid:
+            # 字体大小或旋转角度输入不合法，给出友好提示
+            self._show_preview_message(invalid[0])
+            return
+
         try:
             from PIL import Image, ImageTk
-            from ..core.config import Config, WatermarkType
-            from ..core.image_processor import ImageProcessor
-            # 加载原图
-            img = Image.open(img_path)
-            # 获取当前水印配置
-            watermark_config = self._get_watermark_config()
-            preview_config = Config(watermark_config)
-            preview_config.config.preview_mode = True  # 标记为预览模式
-            # 如果当前为时间水印，确保预览配置使用时间选项的字体大小和字体路径
-            try:
-                if preview_config.config.watermark_type == WatermarkType.TIMESTAMP:
-                    if hasattr(self, 'timestamp_font_size_var'):
-                        preview_config.config.font_size = self.timestamp_font_size_var.get()
-                    # 使用当前选中的字体（共用文本水印的字体选择）
-                    selected_font_path = None
-                    try:
-                        selected_font_name = self.text_font_var.get() if hasattr(self, 'text_font_var') else ""
-                        if hasattr(self, 'recommended_fonts'):
-                            for font_info in self.recommended_fonts:
-                                if font_info.get('name') == selected_font_name:
-                                    selected_font_path = font_info.get('path')
-                                    break
-                    except Exception:
-                        selected_font_path = None
-
-                    if selected_font_path:
-                        preview_config.config.font_path = selected_font_path
+            from ..core import orientation as exif_orientation
+            source = self._load_preview_source(selected_files[0])
+            img_orientation = source['orientation']
+            watermarked_img, wm_bbox = self._render_preview(source)
 
-                    # 让时间水印使用界面上选择的颜色和透明度
-                    try:
-                        if hasattr(self, 'color_var'):
-                            preview_config.config.font_color = self.color_var.get()
-                        if hasattr(self, 'alpha_var'):
-                            preview_config.config.font_alpha = float(self.alpha_var.get())
-                    except Exception:
-                        pass
-            except Exception:
-                pass
-
-            # 当为文本水印时，让预览使用文本面板的颜色/透明度/字号覆盖
-            try:
-                if preview_config.config.watermark_type == WatermarkType.TEXT:
-                    if hasattr(self, 'text_color_var'):
-                        preview_config.config.text_watermark.font_color = self.text_color_var.get()
-                    if hasattr(self, 'text_alpha_var'):
-                        preview_config.config.text_watermark.font_alpha = float(self.text_alpha_var.get())
-                    if hasattr(self, 'text_font_size_var') and self.text_font_size_var.get():
-                        preview_config.config.text_watermark.font_size = int(self.text_font_size_var.get())
-            except Exception:
-                pass
-            # 合成水印
-            processor = ImageProcessor(preview_config)
-            # 依据当前水印类型准备文本（时间水印需从EXIF或回退到当前时间）
-            text_for_watermark = None
-            wm_type = preview_config.config.watermark_type
-            if wm_type == WatermarkType.TIMESTAMP:
-                try:
-                    text_for_watermark = processor.exif_reader.get_watermark_text(img_path, preview_config.config.date_format)
-                except Exception:
-                    # 回退到当前日期格式字符串（保险）
-                    from datetime import datetime
-                    text_for_watermark = processor.exif_reader.format_date(datetime.now(), preview_config.config.date_format)
-            elif wm_type == WatermarkType.TEXT:
-                text_for_watermark = preview_config.config.text_watermark.text
-
-            # 使用 preview_with_bbox 获取水印包围盒以便在预览中做交互
-            try:
-                watermarked_img, wm_bbox = processor.watermark_processor.preview_with_bbox(img, text_for_watermark)
-            except Exception:
-                watermarked_img = processor.watermark_processor.process_watermark(img, text_for_watermark)
-                wm_bbox = None
+            # 预览按显示方向展示（只转换缩放后的小图），包围盒已是显示方向坐标
+            display_w, display_h = exif_orientation.display_size(watermarked_img.size, img_orientation)
 
             # 缩放到预览区域
             canvas_w = max(10, self.preview_canvas.winfo_width())
             canvas_h = max(10, self.preview_canvas.winfo_height())
-            img_ratio = watermarked_img.width / watermarked_img.height
+            img_ratio = display_w / display_h
             canvas_ratio = canvas_w / canvas_h
 
             if img_ratio > canvas_ratio:
@@ -1899,7 +1957,9 @@ class MainWindow:
                 target_w = int(target_h * img_ratio)
 
             preview_img = watermarked_img.copy()
-            preview_img.thumbnail((target_w, target_h), Image.Resampling.LANCZOS)
+            preview_img.thumbnail(exif_orientation.display_size((target_w, target_h), img_orientation),
+                                  Image.Resampling.LANCZOS)
+            preview_img = exif_orientation.to_display(preview_img, img_orientation)
 
             self._preview_img_tk = ImageTk.PhotoImage(preview_img)
             self.preview_canvas.delete('all')
@@ -1908,16 +1968,16 @@ class MainWindow:
             img_top = (canvas_h - preview_img.height) // 2
             self._last_preview_info = {
                 'img_box': (img_left, img_top, preview_img.width, preview_img.height),
-                'orig_width': watermarked_img.width,
-                'orig_height': watermarked_img.height,
+                'orig_width': display_w,
+                'orig_height': display_h,
             }
             # 如果有水印包围盒（基于原始图片像素），将其映射到canvas上的显示坐标
             try:
                 if wm_bbox:
                     wm_left, wm_top, wm_w, wm_h = wm_bbox
                     # 计算缩放因子（preview_img 相对于 watermarked_img 的缩放）
-                    scale_x = preview_img.width / watermarked_img.width
-                    scale_y = preview_img.height / watermarked_img.height
+                    scale_x = preview_img.width / display_w
+                    scale_y = preview_img.height / display_h
                     canvas_wm_left = img_left + int(wm_left * scale_x)
                     canvas_wm_top = img_top + int(wm_top * scale_y)
                     canvas_wm_w = int(wm_w * scale_x)
@@ -1933,40 +1993,83 @@ class MainWindow:
                 anchor='nw'
             )
         except Exception as e:
-            # 验证字体大小与旋转角度输入是否合法，给出友好提示
-            bad_font_input = False
-            bad_rotation_input = False
-            try:
-                # 尝试读取并转换时间水印字号/文本水印字号
-                if hasattr(self, 'timestamp_font_size_var'):
-                    _ = int(self.timestamp_font_size_var.get())
-                if hasattr(self, 'text_font_size_var'):
-                    _ = int(self.text_font_size_var.get())
-            except Exception:
-                bad_font_input = True
-
-            try:
-                if hasattr(self, 'rotation_var'):
-                    # allow empty/str that can be converted
-                    _ = float(self.rotation_var.get())
-            except Exception:
-                bad_rotation_input = True
-
-            self.preview_canvas.delete('all')
-            if bad_font_input:
-                message = "请正确输入字体大小"
-            elif bad_rotation_input:
-                message = "请正确输入旋转角度"
-            else:
-                message = f"图片加载失败\n{e}"
-
-            self.preview_canvas.create_text(
-                self.preview_canvas.winfo_width()//2,
-                self.preview_canvas.winfo_height()//2,
-                text=message,
-                fill="red",
-                font=("Arial", 14)
-            )
+            # 出错后下次重绘从头开始
+            self._preview_source = None
+            self._preview_layer = None
+            self._preview_composite = None
+            self._show_preview_message(f"图片加载失败\n{e}")
+
+    def _load_preview_source(self, img_path: str) -> dict:
+        """解码预览原图并读取EXIF方向和拍摄时间；同一文件未修改时复用上次的结果"""
+        from ..core.image_handle import ImageHandle
+        from ..core.exif_reader import ExifReader
+        from ..core import orientation as exif_orientation
+
+        mtime = os.path.getmtime(img_path)
+        source = self._preview_source
+        if source and source['path'] == img_path and source['mtime'] == mtime:
+            return source
+
+        # EXIF读取与解码共用同一个句柄
+        with ImageHandle(img_path) as handle:
+            source = {
+                'path': img_path,
+                'mtime': mtime,
+                'image': handle.load().copy(),
+                'orientation': exif_orientation.get_orientation(handle.image),
+                'taken': ExifReader().extract_datetime(handle),
+            }
+        # 换了图片，之前渲染的水印图层和合成结果都不再适用
+        self._preview_source = source
+        self._preview_layer = None
+        self._preview_composite = None
+        return source
+
+    def _render_preview(self, source: dict):
+        """生成带水印的预览图，返回 (图片, 水印包围盒)
+
+        按自上次重绘以来改动的配置字段决定重做的工作：没有改动时（如画布尺寸变化）
+        复用上次的合成结果；只改了位置、边距或自定义坐标时复用已渲染的水印图层，
+        只重新定位和合成；其他改动重新测量、绘制水印。
+        """
+        from datetime import datetime
+        from ..core.exif_reader import ExifReader
+        from ..core.watermark import WatermarkProcessor
+
+        changed = self._pending_changes
+        self._pending_changes = set()
+        if changed is not None and not changed and self._preview_composite is not None:
+            return self._preview_composite
+
+        watermark_config = self.config_model.snapshot()
+        watermark_config.preview_mode = True  # 标记为预览模式
+        processor = WatermarkProcessor(Config(watermark_config))
+        image = source['image']
+        orientation = source['orientation']
+
+        if needs_render(changed) or self._preview_layer is None:
+            # 时间水印使用EXIF拍摄时间（没有时回退到当前时间）
+            text_for_watermark = None
+            if watermark_config.watermark_type == WatermarkType.TIMESTAMP:
+                taken = source['taken'] or datetime.now()
+                text_for_watermark = ExifReader().format_date(taken, watermark_config.date_format)
+            elif watermark_config.watermark_type == WatermarkType.TEXT:
+                text_for_watermark = watermark_config.text_watermark.text
+            self._preview_layer = processor.render_preview_layer(image.size, text_for_watermark, orientation)
+
+        self._preview_composite = processor.place_preview_layer(image, self._preview_layer, orientation)
+        return self._preview_composite
+
+    def _show_preview_message(self, message: str):
+        """在预览区显示提示文字"""
+        self.preview_canvas.delete('all')
+        self.preview_canvas.create_text(
+            self.preview_canvas.winfo_width()//2,
+            self.preview_canvas.winfo_height()//2,
+            text=message,
+            fill="red",
+            font=("Arial", 14)
+        )
 
     def _redraw_preview(self):
         """画布尺寸变化或其他情况需要重绘当前选中图片时调用"""
@@ -1994,6 +2097,9 @@ class MainWindow:
         """
         from ..core.config import WatermarkType as _WMT
 
+        # 配置中各类型的设置都需要写入控件，先构建尚未构建的选项卡
+        self._build_all_deferred_tabs()
+
         # 1) Position and custom pixel coordinates
         try:
             if getattr(wm_config, 'position', None) is not None:
@@ -2100,7 +2206,8 @@ class MainWindow:
                                 if f.get('path') == tw.font_path:
                                     font_name = f.get('name')
                                     break
-                        elif getattr(tw, 'font_name', None):
+                        # 字体列表尚未加载完成时按名称记下，加载后由字体选择器应用
+                        if not font_name and getattr(tw, 'font_name', None):
                             font_name = tw.font_name
                         
                         if font_name:
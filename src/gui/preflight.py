@@ -0,0 +1,126 @@
+"""
+导出预检
+
+在导出开始前一次性算出所有输出文件名并估算输出大小，导出确认对话框和导出过程
+都使用预检结果：输出目录只列出一次，重名通过内存中的占用集合解决（不逐个探测
+文件是否存在），输出大小由少量抽样编码的压缩比推算。分配文件名不读取输入文件；
+输入大小需要逐个 stat，由 ExportPlan.load_sizes 在后台线程中读取一次。
+十万张图片的导出也能立即显示汇总信息。
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+
+
+# 估算输出大小时抽样编码的图片数
+DEFAULT_SAMPLES = 8
+
+
+@dataclass
+class ExportPlan:
+    """导出预检结果（outputs、sizes 与输入列表一一对应）"""
+    output_dir: str
+    outputs: List[str] = field(default_factory=list)
+    # 输入字节数（无法读取的输入为None）；调用 load_sizes 之前整体为None
+    sizes: Optional[List[Optional[int]]] = None
+    renamed: int = 0  # 与已有文件或本批其他输出重名、追加了序号的输出数
+    estimated_bytes: Optional[int] = None
+    sampled: int = 0
+
+    @property
+    def input_bytes(self) -> int:
+        return sum(size for size in self.sizes or () if size is not None)
+
+    @property
+    def missing(self) -> int:
+        """无法读取的输入数"""
+        return sum(size is None for size in self.sizes or ())
+
+    def load_sizes(self, input_files: List[str]) -> List[Optional[int]]:
+        """读取输入大小（只读取一次；逐个 stat，应在后台线程中调用）"""
+        if self.sizes is None:
+            self.sizes = read_sizes(input_files)
+        return self.sizes
+
+
+def list_names(directory: str) -> Set[str]:
+    """目录中已有的文件名（按系统规则规范大小写）；目录不存在时为空"""
+    try:
+        return {os.path.normcase(name) for name in os.listdir(directory)}
+    except OSError:
+        return set()
+
+
+def read_sizes(paths: List[str]) -> List[Optional[int]]:
+    """读取每个输入的大小（无法读取时为None）"""
+    sizes = []
+    for path in paths:
+        try:
+            sizes.append(os.stat(path).st_size)
+        except OSError:
+            sizes.append(None)
+    return sizes
+
+
+def plan_outputs(input_files: List[str], output_dir: str,
+                 output_name: Callable[[str], str]) -> ExportPlan:
+    """为每个输入分配输出路径（不读取输入文件，输入大小见 ExportPlan.load_sizes）
+
+    output_name 返回输入对应的输出文件名。与输出目录中已有的文件或本批中先分配的
+    名称冲突时追加 _1、_2 …（与逐个探测文件是否存在的结果一致），整体为 O(n)。
+    """
+    plan = ExportPlan(output_dir)
+    taken = list_names(output_dir)
+    # 每个冲突名称下一次尝试的序号，同名文件很多时不必从 _1 重新探测
+    next_counter: Dict[str, int] = {}
+    for input_file in input_files:
+        filename = output_name(input_file)
+        key = os.path.normcase(filename)
+        if key in taken:
+            name, ext = os.path.splitext(filename)
+            counter = next_counter.get(key, 1)
+            while os.path.normcase(f"{name}_{counter}{ext}") in taken:
+                counter += 1
+            next_counter[key] = counter + 1
+            filename = f"{name}_{counter}{ext}"
+            key = os.path.normcase(filename)
+            plan.renamed += 1
+        taken.add(key)
+        plan.outputs.append(os.path.join(output_dir, filename))
+    return plan
+
+
+def sample_indices(sizes: List[Optional[int]], samples: int = DEFAULT_SAMPLES) -> List[int]:
+    """在可读取的输入中均匀抽样（按列表位置等距选取）"""
+    readable = [index for index, size in enumerate(sizes) if size]
+    if len(readable) <= samples:
+        return readable
+    step = len(readable) / samples
+    return [readable[int(i * step)] for i in range(samples)]
+
+
+def estimate_output_bytes(plan: ExportPlan, input_files: List[str],
+                          encoded_size: Callable[[str], int],
+                          samples: int = DEFAULT_SAMPLES) -> Optional[int]:
+    """抽样编码估算总输出字节数，结果同时写入 plan
+
+    encoded_size 返回单张图片按导出设置编码后的字节数。按抽样图片的
+    输出/输入字节比例推算全部输入；抽样全部失败时返回None。尚未读取输入大小时
+    先读取。
+    """
+    plan.load_sizes(input_files)
+    input_bytes = output_bytes = 0
+    sampled = 0
+    for index in sample_indices(plan.sizes, samples):
+        try:
+            output_bytes += encoded_size(input_files[index])
+        except Exception:
+            continue
+        input_bytes += plan.sizes[index]
+        sampled += 1
+    plan.sampled = sampled
+    if not sampled:
+        return None
+    plan.estimated_bytes = round(plan.input_bytes * output_bytes / input_bytes)
+    return plan.estimated_bytes
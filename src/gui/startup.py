@@ -0,0 +1,54 @@
+"""
+GUI启动计时
+
+记录主窗口启动各阶段的耗时并写入调试日志（logger: src.gui.startup）。
+设置环境变量 PHOTOWATERMARK_DEBUG=1 启动GUI即可在终端看到各阶段耗时。
+"""
+
+import contextlib
+import logging
+import time
+from typing import Dict, Iterator
+
+
+logger = logging.getLogger(__name__)
+
+# 从创建主窗口到首次绘制完成的预算（毫秒），超出时记录警告
+FIRST_PAINT_BUDGET_MS = 500.0
+
+
+class StartupTimer:
+    """启动阶段计时器
+
+    phase(name) 记录一个阶段的耗时；mark(name) 记录从创建计时器到当前的时间，
+    用于首次绘制、字体加载完成等里程碑。
+    """
+
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._origin) * 1000
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.phases[name] = elapsed
+            logger.debug("启动阶段 %-16s %8.1f ms", name, elapsed)
+
+    def mark(self, name: str) -> float:
+        elapsed = self.elapsed_ms()
+        self.phases[name] = elapsed
+        logger.debug("启动里程碑 %-14s %8.1f ms（自启动）", name, elapsed)
+        return elapsed
+
+    def check_first_paint(self) -> None:
+        """记录首次绘制时间，超出预算时写入警告"""
+        elapsed = self.mark('first_paint')
+        if elapsed > FIRST_PAINT_BUDGET_MS:
+            logger.warning("首次绘制耗时 %.1f ms，超出预算 %.0f ms", elapsed, FIRST_PAINT_BUDGET_MS)
@@ -4,13 +4,22 @@ GUI组件模块
 包含各种可复用的GUI组件
 """
 
-from .drag_drop import DragDropFrame
-from .thumbnail import ThumbnailList
-from .progress import ProgressDialog
-from .export_confirm import ExportConfirmDialog
-from .color_picker import ColorPicker, ColorPickerDialog, show_color_picker
-from .enhanced_color_selector import EnhancedColorSelector, ColorSelectorWithLabel
-from .font_preview import FontPreview, FontSelector
+import importlib
+
+# 组件按需导入：主窗口启动时只加载首屏用到的组件，对话框和取色器等在首次使用时才导入
+_LAZY_ATTRIBUTES = {
+    'DragDropFrame': '.drag_drop',
+    'ThumbnailList': '.thumbnail',
+    'ProgressDialog': '.progress',
+    'ExportConfirmDialog': '.export_confirm',
+    'ColorPicker': '.color_picker',
+    'ColorPickerDialog': '.color_picker',
+    'show_color_picker': '.color_picker',
+    'EnhancedColorSelector': '.enhanced_color_selector',
+    'ColorSelectorWithLabel': '.enhanced_color_selector',
+    'FontPreview': '.font_preview',
+    'FontSelector': '.font_preview',
+}
 
 __all__ = [
     'DragDropFrame',
@@ -25,3 +34,16 @@ __all__ = [
     'FontPreview',
     'FontSelector'
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
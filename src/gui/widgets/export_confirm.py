@@ -7,22 +7,39 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import os
+import threading
 from typing import Dict, List, Optional, Callable
 
 
+# 文件列表最多显示的行数（十万张图片的导出不逐行插入）
+MAX_LISTED_FILES = 1000
+
+
 class ExportConfirmDialog:
-    """导出确认对话框"""
+    """导出确认对话框
+    
+    plan 为 FileManager.preflight_export 的预检结果，提供输出文件名和重名信息，
+    输入大小在后台线程中读取，读取后更新摘要和文件列表；estimate 为估算输出总
+    字节数的函数，在同一后台线程中随后执行，完成后更新摘要。
+    """
     
     def __init__(self, parent, files: List[str], config: Dict, 
-                 on_confirm: Optional[Callable[[], None]] = None):
+                 on_confirm: Optional[Callable[[], None]] = None,
+                 plan=None, estimate: Optional[Callable[[], Optional[int]]] = None):
         self.parent = parent
         self.files = files
         self.config = config
         self.on_confirm = on_confirm
+        self.plan = plan
+        self.estimate = estimate
         self.result = False
+        self._file_items = []
+        self._size_error = None
         
         # 创建对话框
         self._create_dialog()
+        if estimate is not None or (plan is not None and plan.sizes is None):
+            self._start_background()
         
     def _create_dialog(self):
         """创建对话框窗口"""
@@ -116,6 +133,24 @@ class ExportConfirmDialog:
             font=('Arial', 10)
         ).pack(anchor='w', pady=(0, 5))
         
+        # 预检结果：输入总大小、重名和预计输出大小
+        if self.plan is not None:
+            self.size_label = ttk.Label(summary_frame, text=self._input_size_text(), font=('Arial', 10))
+            self.size_label.pack(anchor='w', pady=(0, 5))
+            
+            if self.plan.renamed:
+                ttk.Label(
+                    summary_frame,
+                    text=f"⚠️  {self.plan.renamed} 个输出文件重名，将自动追加序号",
+                    font=('Arial', 10)
+                ).pack(anchor='w', pady=(0, 5))
+        
+        if self.estimate is not None:
+            self.estimate_label = ttk.Label(
+                summary_frame, text="📦 预计输出大小: 估算中...", font=('Arial', 10)
+            )
+            self.estimate_label.pack(anchor='w', pady=(0, 5))
+        
         # 输出目录
         output_dir = self.config.get('output_dir', '')
         if len(output_dir) > 60:
@@ -131,9 +166,10 @@ class ExportConfirmDialog:
         
         # 输出格式
         format_info = self.config.get('output_format', 'JPEG')
-        if format_info == 'JPEG':
+        if format_info in ('JPEG', 'WEBP'):
             quality = self.config.get('quality', 95)
             format_info += f" (质量: {quality}%)"
+        format_info += f", 编码: {self.config.get('encoder_profile', 'balanced')}"
             
         ttk.Label(
             summary_frame,
@@ -190,17 +226,34 @@ class ExportConfirmDialog:
         # 填充文件列表
         self._populate_file_list()
         
-    def _populate_file_list(self):
-        """填充文件列表"""
-        for i, file_path in enumerate(self.files):
-            filename = os.path.basename(file_path)
-            
-            # 获取文件大小
+    def _input_size_text(self) -> str:
+        if self._size_error is not None:
+            return f"💾 原图总大小: 读取失败（{self._size_error}）"
+        if self.plan.sizes is None:
+            return "💾 原图总大小: 读取中..."
+        size_text = f"💾 原图总大小: {self._format_file_size(self.plan.input_bytes)}"
+        if self.plan.missing:
+            size_text += f"（{self.plan.missing} 个文件无法读取）"
+        return size_text
+    
+    def _size_text(self, index: int, file_path: str) -> str:
+        """列表中一个文件的大小（有预检结果时取自预检，尚未读取时显示读取中）"""
+        if self.plan is not None:
+            if self.plan.sizes is None:
+                return "读取中..."
+            size = self.plan.sizes[index]
+        else:
             try:
                 size = os.path.getsize(file_path)
-                size_str = self._format_file_size(size)
-            except:
-                size_str = "未知"
+            except OSError:
+                size = None
+        return self._format_file_size(size) if size is not None else "未知"
+        
+    def _populate_file_list(self):
+        """填充文件列表（超过 MAX_LISTED_FILES 的部分只显示数量）"""
+        for i, file_path in enumerate(self.files[:MAX_LISTED_FILES]):
+            filename = os.path.basename(file_path)
+            size_str = self._size_text(i, file_path)
                 
             # 获取目录路径
             dir_path = os.path.dirname(file_path)
@@ -208,7 +261,70 @@ class ExportConfirmDialog:
                 dir_path = "..." + dir_path[-37:]
                 
             # 插入到树形视图
-            self.file_tree.insert('', 'end', values=(filename, size_str, dir_path))
+            self._file_items.append(
+                self.file_tree.insert('', 'end', values=(filename, size_str, dir_path))
+            )
+        
+        remaining = len(self.files) - MAX_LISTED_FILES
+        if remaining > 0:
+            self.file_tree.insert('', 'end', values=(f"... 还有 {remaining} 个文件", '', ''))
+            
+    def _show_sizes(self):
+        """输入大小读取完成后更新摘要和文件列表"""
+        self.size_label.config(text=self._input_size_text())
+        for i, item in enumerate(self._file_items):
+            self.file_tree.set(item, 'size', self._size_text(i, self.files[i]))
+        
+    def _start_background(self):
+        """在后台线程中读取输入大小、估算输出大小，各自完成后在界面线程中更新"""
+        result = {}
+        
+        def run():
+            if self.plan is not None:
+                try:
+                    self.plan.load_sizes(self.files)
+                except Exception as e:
+                    # 读取失败时所有文件的大小记为未知，摘要中显示错误
+                    result['size_error'] = str(e)
+                    self.plan.sizes = [None] * len(self.files)
+                # 无论成功与否都通知界面线程，摘要和列表不会停留在“读取中”
+                result['sizes'] = True
+            if self.estimate is None:
+                return
+            try:
+                result['bytes'] = self.estimate()
+            except Exception as e:
+                result['estimate_error'] = str(e)
+                result['bytes'] = None
+        
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        
+        def poll():
+            if not self.dialog.winfo_exists():
+                return
+            # 先取线程状态：线程结束前写入的大小结果在本次轮询中一定可见
+            alive = thread.is_alive()
+            if result.pop('sizes', False):
+                self._size_error = result.get('size_error')
+                self._show_sizes()
+            if alive:
+                self.dialog.after(100, poll)
+                return
+            if self.estimate is None:
+                return
+            estimated = result.get('bytes')
+            if estimated is None:
+                text = "📦 预计输出大小: 无法估算"
+                if 'estimate_error' in result:
+                    text += f"（{result['estimate_error']}）"
+            else:
+                text = f"📦 预计输出大小: 约 {self._format_file_size(estimated)}"
+                if self.plan is not None and self.plan.sampled:
+                    text += f"（抽样 {self.plan.sampled} 张）"
+            self.estimate_label.config(text=text)
+        
+        self.dialog.after(100, poll)
             
     def _format_file_size(self, size_bytes: int) -> str:
         """格式化文件大小"""
@@ -216,8 +332,10 @@ class ExportConfirmDialog:
             return f"{size_bytes} B"
         elif size_bytes < 1024 * 1024:
             return f"{size_bytes / 1024:.1f} KB"
-        else:
+        elif size_bytes < 1024 ** 3:
             return f"{size_bytes / (1024 * 1024):.1f} MB"
+        else:
+            return f"{size_bytes / 1024 ** 3:.2f} GB"
             
     def _create_settings_preview(self, parent):
         """创建设置预览"""
@@ -237,9 +355,15 @@ class ExportConfirmDialog:
         format_text = self.config.get('output_format', 'JPEG')
         ttk.Label(left_frame, text=f"• 输出格式: {format_text}").pack(anchor='w', padx=(10, 0))
         
-        if format_text == 'JPEG':
+        if format_text in ('JPEG', 'WEBP'):
             quality = self.config.get('quality', 95)
             ttk.Label(left_frame, text=f"• 图片质量: {quality}%").pack(anchor='w', padx=(10, 0))
+        
+        profile = self.config.get('encoder_profile', 'balanced')
+        ttk.Label(left_frame, text=f"• 编码方式: {profile}").pack(anchor='w', padx=(10, 0))
+        
+        keep_metadata = self.config.get('metadata_mode', 'strip') == 'passthrough'
+        ttk.Label(left_frame, text=f"• 原图元数据: {'保留' if keep_metadata else '不保留'}").pack(anchor='w', padx=(10, 0))
             
         # 右列：尺寸设置
         ttk.Label(right_frame, text="尺寸设置:", font=('Arial', 9, 'bold')).pack(anchor='w')
@@ -174,6 +174,8 @@ class FontSelector(ttk.Frame):
         self.font_list = font_list
         self.on_font_change = on_font_change
         self.current_font_info = None
+        # 字体列表尚未加载时请求选中的字体，加载完成后再应用
+        self._pending_font: Optional[str] = None
         
         self._create_widgets(preview_width, preview_height)
         
@@ -236,17 +238,33 @@ class FontSelector(ttk.Frame):
         self.font_preview.pack(padx=5, pady=5)
         
         # 设置默认字体
-        if font_names:
-            # 优先选择支持中文的字体
-            chinese_fonts = [f for f in self.font_list if f.get('supports_chinese', False)]
-            if chinese_fonts:
-                self.font_var.set(chinese_fonts[0]['name'])
-                self.current_font_info = chinese_fonts[0]
-            else:
-                self.font_var.set(font_names[0])
-                self.current_font_info = self.font_list[0]
-            
-            self._update_preview()
+        self._select_default_font()
+    
+    def _select_default_font(self):
+        """选中默认字体（优先选择支持中文的字体）"""
+        if not self.font_list:
+            return
+        chinese_fonts = [f for f in self.font_list if f.get('supports_chinese', False)]
+        if chinese_fonts:
+            self.font_var.set(chinese_fonts[0]['name'])
+            self.current_font_info = chinese_fonts[0]
+        else:
+            self.font_var.set(self.font_list[0]['name'])
+            self.current_font_info = self.font_list[0]
+        
+        self._update_preview()
+    
+    def set_font_list(self, font_list: list):
+        """更新可选字体（后台字体扫描完成后调用）"""
+        self.font_list = font_list
+        self.font_combo.config(values=[font['name'] for font in font_list])
+        
+        pending, self._pending_font = self._pending_font, None
+        if pending and any(font['name'] == pending for font in font_list):
+            self.font_var.set(pending)
+            self._on_font_selected()
+        elif self.current_font_info is None:
+            self._select_default_font()
     
     def _on_font_selected(self, event=None):
         """字体选择变化"""
@@ -322,6 +340,8 @@ class FontSelector(ttk.Frame):
         if font_name in [f['name'] for f in self.font_list]:
             self.font_var.set(font_name)
             self._on_font_selected()
+        else:
+            self._pending_font = font_name
         
         # 设置大小和样式
         self.size_var.set(size)
@@ -10,24 +10,35 @@ from PIL import Image, ImageTk
 import os
 from typing import List, Dict, Optional, Callable
 
+from ...core.catalog import CatalogEntry, FileCatalog
+
 
 class ThumbnailItem:
     """缩略图项目"""
     
-    def __init__(self, file_path: str):
-        self.file_path = file_path
-        self.filename = os.path.basename(file_path)
-        self.file_size = os.path.getsize(file_path)
+    def __init__(self, entry: CatalogEntry):
+        self.entry = entry
+        self.file_path = entry.path
+        self.filename = entry.filename
         self.selected = False
         self.thumbnail = None
-        self.image_size = None
+        
+    @property
+    def file_size(self) -> int:
+        """文件字节数（首次显示时才读取）"""
+        return self.entry.size or 0
+        
+    @property
+    def image_size(self) -> Optional[tuple]:
+        return self.entry.dimensions
         
     def load_thumbnail(self, size: tuple = (150, 150)) -> Optional[ImageTk.PhotoImage]:
         """加载缩略图"""
         try:
             with Image.open(self.file_path) as img:
-                # 保存原始尺寸
-                self.image_size = img.size
+                # 保存原始尺寸等信息，之后不必再读取文件头
+                self.entry.set_dimensions(img.size, img.mode, img.format,
+                                          img.mode in ('RGBA', 'LA') or 'transparency' in img.info)
                 
                 # 创建缩略图
                 img.thumbnail(size, Image.Resampling.LANCZOS)
@@ -54,10 +65,13 @@ class ThumbnailList(ttk.Frame):
     """缩略图列表组件"""
     
     def __init__(self, parent, on_selection_change: Optional[Callable[[List[str]], None]] = None,
-                 on_list_change: Optional[Callable[[], None]] = None):
+                 on_list_change: Optional[Callable[[], None]] = None,
+                 catalog: Optional[FileCatalog] = None):
         super().__init__(parent)
         self.on_selection_change = on_selection_change
         self.on_list_change = on_list_change  # 新增：列表变化回调
+        # 列表中的文件（可与 FileManager 共用），按路径索引判断重复
+        self.catalog = catalog if catalog is not None else FileCatalog()
         self.items: List[ThumbnailItem] = []
         self.selected_items: List[ThumbnailItem] = []
         
@@ -127,6 +141,7 @@ class ThumbnailList(ttk.Frame):
     def _clear_all(self):
         """清空所有项目"""
         self.items.clear()
+        self.catalog.clear()
         self.selected_items.clear()
         self._refresh_display()
         self._notify_selection_change()
@@ -136,8 +151,11 @@ class ThumbnailList(ttk.Frame):
         """添加文件到列表"""
         added_count = 0
         for file_path in file_paths:
-            if self._is_image_file(file_path) and not self._file_exists(file_path):
-                item = ThumbnailItem(file_path)
+            if not self._is_image_file(file_path):
+                continue
+            entry = self.catalog.add(file_path)
+            if entry is not None:
+                item = ThumbnailItem(entry)
                 item.load_thumbnail()
                 self.items.append(item)
                 added_count += 1
@@ -153,7 +171,7 @@ class ThumbnailList(ttk.Frame):
         
     def _file_exists(self, file_path: str) -> bool:
         """检查文件是否已存在于列表中"""
-        return any(item.file_path == file_path for item in self.items)
+        return file_path in self.catalog
         
     def _refresh_display(self):
         """刷新显示"""
@@ -4,9 +4,12 @@
 负责系统字体的检测、加载和管理。
 """
 
+import io
 import os
 import platform
-from typing import List, Dict, Optional, Tuple
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple, Any
 from PIL import ImageFont
 import glob
 
@@ -42,17 +45,155 @@ class StyledFontWrapper:
         return getattr(self.base_font, name)
 
 
+class FontCache:
+    """有界LRU字体缓存
+
+    同时按条目数和估算内存限制缓存大小，超出时淘汰最久未使用的字体对象。
+    同一字体文件的字节数据在不同字号之间共享，每个文件只从磁盘读取一次；
+    当没有缓存条目再引用某个文件时，其字节数据随之释放。
+    """
+    
+    # 每个字体对象（FreeType face及其字形缓存）的估算内存开销
+    FACE_OVERHEAD = 128 * 1024
+    
+    def __init__(self, max_entries: int = 64, max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, Optional[str]]]" = OrderedDict()
+        self._file_data: Dict[str, bytes] = {}
+        self._lock = threading.RLock()
+        self._thread_counts = threading.local()
+        
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.file_loads = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+    
+    @property
+    def current_bytes(self) -> int:
+        """当前缓存占用的估算字节数（共享的字体文件只计算一次）"""
+        with self._lock:
+            file_bytes = sum(len(data) for data in self._file_data.values())
+            return file_bytes + len(self._entries) * self.FACE_OVERHEAD
+    
+    def get(self, key: str) -> Optional[ImageFont.ImageFont]:
+        """获取缓存的字体，命中时将其标记为最近使用"""
+        with self._lock:
+            entry = self._entries.get(key)
+            counts = self._thread_counts
+            if entry is None:
+                self.misses += 1
+                counts.misses = getattr(counts, 'misses', 0) + 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            counts.hits = getattr(counts, 'hits', 0) + 1
+            return entry[0]
+    
+    def thread_counts(self) -> Tuple[int, int]:
+        """当前线程累计的 (命中, 未命中) 次数，用于按任务统计缓存命中"""
+        counts = self._thread_counts
+        return getattr(counts, 'hits', 0), getattr(counts, 'misses', 0)
+    
+    def put(self, key: str, font: ImageFont.ImageFont) -> None:
+        """写入缓存，并在超出预算时淘汰最久未使用的条目"""
+        with self._lock:
+            self._entries[key] = (font, self._source_of(font))
+            self._entries.move_to_end(key)
+            self._evict()
+    
+    def load_truetype(self, font_path: str, font_size: int) -> ImageFont.FreeTypeFont:
+        """加载TrueType字体，同一文件的字节数据在不同字号间共享"""
+        with self._lock:
+            data = self._file_data.get(font_path)
+            if data is None:
+                with open(font_path, 'rb') as f:
+                    data = f.read()
+                self._file_data[font_path] = data
+                self.file_loads += 1
+        # BytesIO在未修改时直接返回原始bytes对象，因此各字号的字体共用同一份数据
+        return ImageFont.truetype(io.BytesIO(data), font_size)
+    
+    def configure(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None) -> None:
+        """调整缓存上限，立即按新的预算进行淘汰"""
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max(1, max_entries)
+            if max_bytes is not None:
+                self.max_bytes = max(0, max_bytes)
+            self._evict()
+    
+    def clear(self) -> None:
+        """清空缓存及共享的字体文件数据"""
+        with self._lock:
+            self._entries.clear()
+            self._file_data.clear()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'files': len(self._file_data),
+                'bytes': self.current_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'file_loads': self.file_loads
+            }
+    
+    def _source_of(self, font: Any) -> Optional[str]:
+        """查找字体对象所引用的共享字体文件路径"""
+        base_font = font.base_font if isinstance(font, StyledFontWrapper) else font
+        font_bytes = getattr(base_font, 'font_bytes', None)
+        if font_bytes is None:
+            return None
+        for path, data in self._file_data.items():
+            if data is font_bytes:
+                return path
+        return None
+    
+    def _evict(self) -> None:
+        """淘汰条目直到满足条目数和内存预算（至少保留最近使用的一项）"""
+        while len(self._entries) > self.max_entries or (
+                len(self._entries) > 1 and self.current_bytes > self.max_bytes):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+            self._release_unreferenced_files()
+        
+        self._release_unreferenced_files()
+    
+    def _release_unreferenced_files(self) -> None:
+        """释放不再被任何缓存条目引用的字体文件数据"""
+        referenced = {source for _, source in self._entries.values()}
+        for path in list(self._file_data):
+            if path not in referenced:
+                del self._file_data[path]
+
+
 class FontManager:
     """字体管理器"""
     
-    def __init__(self):
-        self._font_cache: Dict[str, ImageFont.ImageFont] = {}
+    def __init__(self, max_cache_entries: int = 64, max_cache_bytes: int = 256 * 1024 * 1024):
+        self._font_cache = FontCache(max_cache_entries, max_cache_bytes)
         self._system_fonts: Optional[List[Dict[str, str]]] = None
+        self._scan_lock = threading.Lock()
         
     def get_system_fonts(self) -> List[Dict[str, str]]:
-        """获取系统字体列表"""
+        """获取系统字体列表（线程安全，GUI在后台线程中预先扫描）"""
         if self._system_fonts is None:
-            self._system_fonts = self._scan_system_fonts()
+            with self._scan_lock:
+                if self._system_fonts is None:
+                    self._system_fonts = self._scan_system_fonts()
         return self._system_fonts
     
     def _scan_system_fonts(self) -> List[Dict[str, str]]:
@@ -362,8 +503,9 @@ class FontManager:
         has_chinese = self._contains_chinese(text)
         cache_key = f"{font_path}_{font_size}_{bold}_{italic}_{has_chinese}"
         
-        if cache_key in self._font_cache:
-            return self._font_cache[cache_key]
+        cached_font = self._font_cache.get(cache_key)
+        if cached_font is not None:
+            return cached_font
         
         try:
             # 如果指定了字体路径，尝试查找对应样式的变体
@@ -374,7 +516,7 @@ class FontManager:
                     font = self._get_chinese_font(font_size, bold, italic)
                 else:
                     target_font_path = self._find_font_variant(font_path, bold, italic)
-                    font = ImageFont.truetype(target_font_path, font_size)
+                    font = self._font_cache.load_truetype(target_font_path, font_size)
                     
                     # 如果找到的字体路径和原路径相同，说明没有找到对应的样式变体
                     # 在这种情况下，我们返回一个包装的字体对象，用于后续的样式处理
@@ -387,7 +529,7 @@ class FontManager:
                 else:
                     font = self._get_default_font(font_size, bold, italic)
             
-            self._font_cache[cache_key] = font
+            self._font_cache.put(cache_key, font)
             return font
             
         except Exception:
@@ -397,11 +539,11 @@ class FontManager:
                     default_font = self._get_chinese_font(font_size, bold, italic)
                 else:
                     default_font = self._get_default_font(font_size, bold, italic)
-                self._font_cache[cache_key] = default_font
+                self._font_cache.put(cache_key, default_font)
                 return default_font
             except Exception:
                 default_font = ImageFont.load_default()
-                self._font_cache[cache_key] = default_font
+                self._font_cache.put(cache_key, default_font)
                 return default_font
     
     def _create_styled_font_wrapper(self, font: ImageFont.ImageFont, bold: bool, italic: bool) -> StyledFontWrapper:
@@ -429,7 +571,7 @@ class FontManager:
             chinese_font_path = chinese_fonts[0]['path']
             try:
                 target_font_path = self._find_font_variant(chinese_font_path, bold, italic)
-                font = ImageFont.truetype(target_font_path, font_size)
+                font = self._font_cache.load_truetype(target_font_path, font_size)
                 
                 # 如果找不到对应样式变体，创建样式包装器
                 if target_font_path == chinese_font_path and (bold or italic):
@@ -457,7 +599,7 @@ class FontManager:
                 for font_info in system_fonts:
                     if font_name.lower() in font_info['name'].lower():
                         target_font_path = self._find_font_variant(font_info['path'], bold, italic)
-                        font = ImageFont.truetype(target_font_path, font_size)
+                        font = self._font_cache.load_truetype(target_font_path, font_size)
                         
                         if target_font_path == font_info['path'] and (bold or italic):
                             font = self._create_styled_font_wrapper(font, bold, italic)
@@ -558,7 +700,7 @@ class FontManager:
             if (font_info.get('supports_chinese', False) and 
                 font_info.get('style') == target_style):
                 try:
-                    return ImageFont.truetype(font_info['path'], font_size)
+                    return self._font_cache.load_truetype(font_info['path'], font_size)
                 except Exception:
                     continue
         
@@ -566,7 +708,7 @@ class FontManager:
         for font_info in system_fonts:
             if font_info.get('supports_chinese', False):
                 try:
-                    return ImageFont.truetype(font_info['path'], font_size)
+                    return self._font_cache.load_truetype(font_info['path'], font_size)
                 except Exception:
                     continue
         
@@ -574,14 +716,14 @@ class FontManager:
         for font_info in system_fonts:
             if font_info.get('style') == target_style:
                 try:
-                    return ImageFont.truetype(font_info['path'], font_size)
+                    return self._font_cache.load_truetype(font_info['path'], font_size)
                 except Exception:
                     continue
         
         # 如果还是找不到，选择第一个可用字体
         for font_info in system_fonts:
             try:
-                return ImageFont.truetype(font_info['path'], font_size)
+                return self._font_cache.load_truetype(font_info['path'], font_size)
             except Exception:
                 continue
         
@@ -685,6 +827,18 @@ class FontManager:
         
         return sorted(available_styles, key=self._get_style_priority)
     
+    def configure_cache(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None) -> None:
+        """配置字体缓存的条目数和内存上限"""
+        self._font_cache.configure(max_entries, max_bytes)
+    
+    def get_thread_cache_counts(self) -> Tuple[int, int]:
+        """当前线程的字体缓存 (命中, 未命中) 累计次数"""
+        return self._font_cache.thread_counts()
+    
+    def get_cache_stats(self) -> Dict[str, int]:
+        """获取字体缓存统计信息（命中、未命中、淘汰次数等）"""
+        return self._font_cache.get_stats()
+    
     def clear_cache(self):
         """清空字体缓存"""
         self._font_cache.clear()
@@ -0,0 +1,128 @@
+"""
+归档输入输出测试
+"""
+
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import unittest
+import zipfile
+from contextlib import redirect_stdout
+from unittest import mock
+
+from PIL import Image
+
+from src.core import archive
+from src.core.config import Config, WatermarkConfig
+from src.core.image_processor import ImageProcessor
+
+
+def _jpeg(color: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (160, 120), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class TestArchive(unittest.TestCase):
+    """归档输入输出测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _run(self, processor: ImageProcessor, input_path: str, output=None) -> None:
+        with redirect_stdout(io.StringIO()):
+            processor.process_archive(input_path, output)
+
+    def test_zip_to_zip(self):
+        """测试ZIP输入直接写入输出ZIP，JPEG成员不压缩，越界路径和非图片被跳过"""
+        input_path = os.path.join(self.temp_dir, 'shoot.zip')
+        with zipfile.ZipFile(input_path, 'w') as source:
+            source.writestr('shoot/a.jpg', _jpeg('red'))
+            source.writestr('shoot/sub/b.jpeg', _jpeg('blue'))
+            source.writestr('shoot/notes.txt', 'notes')
+            source.writestr('../escape.jpg', _jpeg('red'))
+
+        processor = ImageProcessor(Config())
+        self._run(processor, input_path)
+
+        output_path = os.path.join(self.temp_dir, 'shoot_watermark.zip')
+        self.assertFalse(os.path.exists(output_path + '.part'))
+        with zipfile.ZipFile(output_path) as result:
+            infos = {info.filename: info for info in result.infolist()}
+            self.assertEqual(set(infos), {'shoot/a.jpg', 'shoot/sub/b.jpeg'})
+            self.assertTrue(all(info.compress_type == zipfile.ZIP_STORED for info in infos.values()))
+            with Image.open(io.BytesIO(result.read('shoot/a.jpg'))) as image:
+                self.assertEqual(image.size, (160, 120))
+        self.assertEqual(processor.stats['processed_files'], 2)
+
+    def test_members_read_ahead_bounded(self):
+        """测试读取成员不会远远跑在工作线程前面（读入内存的成员数有上限）"""
+        input_path = os.path.join(self.temp_dir, 'shoot.tar')
+        data = _jpeg('red')
+        with tarfile.open(input_path, 'w') as source:
+            for i in range(40):
+                info = tarfile.TarInfo(f'shoot/{i}.jpg')
+                info.size = len(data)
+                source.addfile(info, io.BytesIO(data))
+
+        processor = ImageProcessor(Config(WatermarkConfig(workers=2)))
+        read = []
+        pending = []
+        iter_members = archive.iter_members
+
+        def counting_members(*args, **kwargs):
+            for member in iter_members(*args, **kwargs):
+                read.append(member.name)
+                yield member
+
+        def process_single_image(handle, target, **kwargs):
+            time.sleep(0.005)
+            pending.append(len(read) - len(pending))
+            return True, ''
+
+        processor.process_single_image = process_single_image
+        with mock.patch.object(archive, 'iter_members', counting_members):
+            self._run(processor, input_path, os.path.join(self.temp_dir, 'out'))
+
+        self.assertEqual(len(read), 40)
+        self.assertLessEqual(max(pending), 5)
+
+    def test_tar_to_directory(self):
+        """测试流式读取压缩TAR并按成员路径写出到目录，扩展名随输出格式变化"""
+        input_path = os.path.join(self.temp_dir, 'shoot.tar.gz')
+        with tarfile.open(input_path, 'w:gz') as source:
+            for name in ('a.jpg', 'day2/b.jpg'):
+                data = _jpeg('green')
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                source.addfile(info, io.BytesIO(data))
+
+        config = Config()
+        config.config.output_format = 'PNG'
+        processor = ImageProcessor(config)
+        output_dir = os.path.join(self.temp_dir, 'out')
+        self._run(processor, input_path, output_dir)
+
+        self.assertEqual(processor.stats['total_files'], 2)
+        with Image.open(os.path.join(output_dir, 'day2', 'b.png')) as image:
+            self.assertEqual(image.format, 'PNG')
+        self.assertTrue(os.path.exists(os.path.join(output_dir, 'a.png')))
+
+    def test_paths(self):
+        """测试归档识别、默认输出路径和成员路径规范化"""
+        self.assertEqual(archive.archive_suffix('A/Shoot.TAR.GZ'), '.tar.gz')
+        self.assertFalse(archive.is_archive('photo.jpg'))
+        self.assertEqual(archive.default_output_path('/x/shoot.tgz'), '/x/shoot_watermark.tgz')
+        self.assertEqual(archive.member_name('a\\b/../c.jpg'), 'a/c.jpg')
+        self.assertIsNone(archive.member_name('/etc/a.jpg'))
+        self.assertIsNone(archive.member_name('a/../../b.jpg'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+asyncio 批处理接口测试
+"""
+
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from PIL import Image
+
+from src.core.async_batch import AsyncImageProcessor
+from src.core.config import Config
+
+
+class TestAsyncImageProcessor(unittest.IsolatedAsyncioTestCase):
+    """asyncio 批处理器测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(4):
+            path = os.path.join(self.temp_dir, f'{i}.jpg')
+            Image.new('RGB', (80 + i, 60), 'white').save(path, 'JPEG')
+            self.paths.append(path)
+        self.processor = AsyncImageProcessor(Config(), concurrency=2)
+
+    def tearDown(self):
+        self.processor.close()
+        shutil.rmtree(self.temp_dir)
+
+    async def test_batch_results_in_completion_order(self):
+        """测试文件和内存任务混合处理，错误记录在结果中"""
+        with open(self.paths[0], 'rb') as f:
+            data = f.read()
+        output_path = os.path.join(self.temp_dir, 'out', 'a.jpg')
+        jobs = [(self.paths[1], output_path), (data, None),
+                (os.path.join(self.temp_dir, 'missing.jpg'), None)]
+
+        results = {result.input: result async for result in self.processor.process_batch(jobs)}
+
+        self.assertTrue(results[self.paths[1]].success)
+        self.assertIsNone(results[self.paths[1]].data)
+        with Image.open(output_path) as image:
+            self.assertEqual(image.size, (81, 60))
+        with Image.open(io.BytesIO(results['<memory>'].data)) as image:
+            self.assertEqual(image.size, (80, 60))
+        self.assertFalse(results[os.path.join(self.temp_dir, 'missing.jpg')].success)
+
+    async def test_stopping_iteration_cancels_queued_jobs(self):
+        """测试提前停止迭代时，排队中的任务不再执行"""
+        started = []
+        release = threading.Event()
+        original = self.processor.processor.process_single_image
+
+        def slow(handle, *args, **kwargs):
+            started.append(handle.path)
+            if handle.path != self.paths[0]:
+                release.wait(5)
+            return original(handle, *args, **kwargs)
+
+        self.processor.processor.process_single_image = slow
+        batch = self.processor.process_batch((path, None) for path in self.paths)
+        first = await batch.__anext__()
+        self.assertEqual(first.input, self.paths[0])
+        await batch.aclose()
+        release.set()
+
+        # 并发为2：停止迭代时在途的只有前两个任务，其余任务从未开始
+        await asyncio.sleep(0.1)
+        self.assertEqual(set(started) - set(self.paths[:2]), set())
+
+    async def test_process_bytes(self):
+        """测试单张内存图片的异步处理"""
+        with open(self.paths[2], 'rb') as f:
+            result = await self.processor.process_bytes(f.read(), output_format='PNG')
+        with Image.open(io.BytesIO(result)) as image:
+            self.assertEqual((image.format, image.size), ('PNG', (82, 60)))
+
+
+if __name__ == '__main__':
+    unittest.main()
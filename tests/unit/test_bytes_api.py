@@ -0,0 +1,75 @@
+"""
+内存图片处理接口测试
+"""
+
+import builtins
+import io
+import unittest
+from unittest import mock
+
+import piexif
+from PIL import Image
+
+from src.core.config import Config, WatermarkConfig
+from src.core.image_handle import ImageHandle
+from src.core.image_processor import ImageProcessor, watermark_bytes
+
+
+def _encode(image: Image.Image, output_format: str, **kwargs) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=output_format, **kwargs)
+    return buffer.getvalue()
+
+
+class TestBytesApi(unittest.TestCase):
+    """内存图片处理接口测试类"""
+
+    def setUp(self):
+        exif = piexif.dump({'Exif': {piexif.ExifIFD.DateTimeOriginal: b'2023:05:06 07:08:09'}})
+        self.jpeg = _encode(Image.new('RGB', (320, 240), (40, 90, 160)), 'JPEG', exif=exif)
+
+    def test_handle_reads_buffers_without_files(self):
+        """测试 bytes、bytearray 和 memoryview 都能直接解码"""
+        for data in (self.jpeg, bytearray(self.jpeg), memoryview(self.jpeg)):
+            with ImageHandle('<upload>', data=data) as handle:
+                self.assertTrue(handle.in_memory)
+                self.assertEqual(handle.format, 'JPEG')
+                self.assertEqual(handle.load().size, (320, 240))
+                with self.assertRaises(OSError):
+                    handle.stat
+
+    def test_process_bytes_without_filesystem(self):
+        """测试内存处理不打开任何文件，拍摄时间从内存中的EXIF读取"""
+        config = Config()
+        config.config.output_format = 'PNG'
+        processor = ImageProcessor(config)
+        real_open = builtins.open
+        opened = []
+
+        def tracking_open(file, *args, **kwargs):
+            opened.append(file)
+            return real_open(file, *args, **kwargs)
+
+        processor.process_bytes(self.jpeg)  # 预热字体
+        with mock.patch('builtins.open', tracking_open):
+            result = processor.process_bytes(memoryview(self.jpeg))
+        self.assertEqual(opened, [])
+        with Image.open(io.BytesIO(result)) as image:
+            self.assertEqual((image.format, image.size), ('PNG', (320, 240)))
+        self.assertEqual(processor.stats['processed_files'], 2)
+        self.assertEqual(processor.stats['no_exif_files'], 0)
+
+    def test_watermark_bytes(self):
+        """测试便捷函数接受 WatermarkConfig，错误以异常报告"""
+        result = watermark_bytes(self.jpeg, WatermarkConfig(output_format='JPEG'), quality=70)
+        with Image.open(io.BytesIO(result)) as image:
+            self.assertEqual(image.format, 'JPEG')
+
+        with self.assertRaises(ValueError):
+            watermark_bytes(self.jpeg, WatermarkConfig(max_megapixels=0.01))
+        with self.assertRaises(Image.UnidentifiedImageError):
+            watermark_bytes(b'not an image')
+
+
+if __name__ == '__main__':
+    unittest.main()
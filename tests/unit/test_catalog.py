@@ -0,0 +1,115 @@
+"""
+文件目录测试
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from PIL import Image
+
+from src.core import catalog
+from src.core.catalog import FileCatalog
+from src.core.config import Config
+from src.core.image_processor import ImageProcessor
+from src.gui.file_manager import FileManager
+
+
+class TestFileCatalog(unittest.TestCase):
+    """文件目录测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _image(self, relative_path, size=(60, 40)):
+        path = os.path.join(self.temp_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.new('RGB', size, 'white').save(path, 'PNG' if path.lower().endswith('.png') else 'JPEG')
+        return path
+
+    def test_metadata_is_loaded_lazily(self):
+        """测试加入目录时不读取文件，元数据在首次访问时读取并缓存"""
+        path = self._image('a.jpg', (80, 30))
+        file_size = os.path.getsize(path)
+        files = FileCatalog()
+        with mock.patch.object(catalog.os, 'stat', wraps=os.stat) as stat, \
+                mock.patch.object(catalog.Image, 'open', wraps=Image.open) as image_open:
+            entry = files.add(path)
+            self.assertEqual((stat.call_count, image_open.call_count), (0, 0))
+
+            self.assertEqual(entry.size, file_size)
+            self.assertIsNotNone(entry.mtime)
+            self.assertEqual((stat.call_count, image_open.call_count), (1, 0))
+
+            self.assertEqual(entry.dimensions, (80, 30))
+            self.assertEqual(entry.image_format, 'JPEG')
+            self.assertEqual(entry.dimensions, (80, 30))
+            self.assertEqual(image_open.call_count, 1)
+
+        self.assertEqual(entry.status, catalog.STATUS_PENDING)
+        self.assertIsNone(files.add('missing.jpg').dimensions)
+
+    def test_duplicates_detected_by_normalized_path(self):
+        """测试同一文件的不同写法只加入一次"""
+        path = self._image('a.jpg')
+        files = FileCatalog([path])
+        relative = os.path.join(os.path.relpath(self.temp_dir), '.', 'a.jpg')
+        self.assertIn(relative, files)
+        self.assertIsNone(files.add(relative))
+        self.assertEqual(files.extend([path, self._image('b.jpg')])[0].filename, 'b.jpg')
+        self.assertEqual(len(files), 2)
+
+        files.set_status(relative, catalog.STATUS_DONE)
+        self.assertEqual([entry.path for entry in files.with_status(catalog.STATUS_DONE)], [path])
+
+    def test_scan(self):
+        """测试扫描：扩展名不区分大小写、排序、隐藏文件和递归"""
+        for name in ('b.JPG', 'a.png', 'notes.txt', '.hidden.jpg', 'sub/c.jpeg', '.cache/d.jpg'):
+            if name.endswith('.txt'):
+                open(os.path.join(self.temp_dir, name), 'w').close()
+            else:
+                self._image(name)
+        extensions = ImageProcessor.SUPPORTED_FORMATS
+
+        def scanned(**options):
+            files = FileCatalog()
+            files.scan(self.temp_dir, extensions, **options)
+            return [os.path.relpath(path, self.temp_dir) for path in files.paths()]
+
+        self.assertEqual(scanned(), ['a.png', 'b.JPG'])
+        self.assertEqual(scanned(recursive=True), ['a.png', 'b.JPG', os.path.join('sub', 'c.jpeg')])
+        self.assertEqual(scanned(recursive=True, include_hidden=True),
+                         [os.path.join('.cache', 'd.jpg'), '.hidden.jpg', 'a.png', 'b.JPG',
+                          os.path.join('sub', 'c.jpeg')])
+
+        self.assertEqual(FileManager().get_images_from_directory(self.temp_dir),
+                         sorted(os.path.join(self.temp_dir, name)
+                                for name in ('.hidden.jpg', 'a.png', 'b.JPG')))
+
+    def test_image_processor_updates_status(self):
+        """测试处理器处理目录中的文件并记录每个文件的处理结果"""
+        good = self._image('photos/good.jpg')
+        bad = os.path.join(self.temp_dir, 'photos', 'bad.jpg')
+        with open(bad, 'wb') as f:
+            f.write(b'not an image')
+        output_dir = os.path.join(self.temp_dir, 'out')
+
+        processor = ImageProcessor(Config())
+        with redirect_stdout(io.StringIO()):
+            processor.process_images(os.path.join(self.temp_dir, 'photos'), output_dir)
+
+        self.assertEqual(processor.catalog.paths(), [bad, good])
+        self.assertEqual(processor.catalog.get(good).status, catalog.STATUS_DONE)
+        self.assertEqual(processor.catalog.get(bad).status, catalog.STATUS_FAILED)
+        self.assertEqual(os.listdir(output_dir), ['good.jpg'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+"""
+命令行启动开销测试
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HEAVY_MODULES = ('PIL', 'piexif', 'tqdm', 'src.core.watermark', 'src.utils.font_manager')
+
+
+def _run_python(*args):
+    return subprocess.run([sys.executable] + list(args), cwd=ROOT, capture_output=True,
+                          text=True, check=True)
+
+
+class TestCliStartup(unittest.TestCase):
+    """命令行启动开销测试类"""
+
+    def test_import_does_not_load_heavy_modules(self):
+        """测试导入包和命令行模块时不加载图像处理依赖，公开的类仍可按需访问"""
+        code = (
+            "import sys, src, src.cli\n"
+            f"print(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+            "src.ImageProcessor\n"
+            "print('PIL' in sys.modules)\n"
+        )
+        lines = _run_python('-c', code).stdout.split()
+        self.assertEqual(lines, ['[]', 'True'])
+
+    def test_metadata_subcommand(self):
+        """测试元数据子命令可用且不导入 PIL"""
+        result = _run_python('-X', 'importtime', '-m', 'src', 'positions')
+        self.assertIn('bottom-right', result.stdout)
+        imported = {line.split('|')[-1].strip() for line in result.stderr.splitlines()}
+        self.assertFalse({module for module in imported if module.split('.')[0] in ('PIL', 'piexif', 'tqdm')})
+
+
+if __name__ == '__main__':
+    unittest.main()
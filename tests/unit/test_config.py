@@ -6,7 +6,7 @@ import unittest
 import json
 import tempfile
 import os
-from src.core.config import Config, WatermarkConfig, Position, DateFormat
+from src.core.config import Config, WatermarkConfig, Position, DateFormat, EncoderProfile
 
 
 class TestConfig(unittest.TestCase):
@@ -24,6 +24,7 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(config.date_format, DateFormat.YYYY_MM_DD)
         self.assertEqual(config.output_format, "JPEG")
         self.assertEqual(config.output_quality, 95)
+        self.assertEqual(config.encoder_profile, EncoderProfile.BALANCED)
         self.assertFalse(config.recursive)
         self.assertFalse(config.preview_mode)
         self.assertFalse(config.verbose)
@@ -60,6 +61,17 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(config.position, Position.CENTER)
         self.assertEqual(config.date_format, DateFormat.MMM_DD_YYYY)
     
+    def test_encoder_profile_round_trip(self):
+        """测试编码配置档的序列化"""
+        config = WatermarkConfig(encoder_profile=EncoderProfile.KEEP_SOURCE_QUALITY, webp_method=2)
+        
+        config_dict = config.to_dict()
+        self.assertEqual(config_dict['encoder_profile'], "keep-source-quality")
+        
+        restored = WatermarkConfig.from_dict(config_dict)
+        self.assertEqual(restored.encoder_profile, EncoderProfile.KEEP_SOURCE_QUALITY)
+        self.assertEqual(restored.webp_method, 2)
+    
     def test_save_and_load_config(self):
         """测试配置文件保存和加载"""
         original_config = WatermarkConfig(
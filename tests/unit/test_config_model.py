@@ -0,0 +1,64 @@
+"""
+水印配置模型测试
+"""
+
+import unittest
+
+from src.core.config import Position, WatermarkConfig
+from src.gui.config_model import LAYOUT_FIELDS, WatermarkConfigModel, needs_render
+
+
+class TestWatermarkConfigModel(unittest.TestCase):
+    """水印配置模型测试类"""
+
+    def setUp(self):
+        self.model = WatermarkConfigModel()
+        self.notifications = []
+        self.unsubscribe = self.model.subscribe(self.notifications.append)
+
+    def test_set_notifies_changed_fields(self):
+        """测试只有值真正变化时才通知，并携带改动的字段"""
+        self.assertTrue(self.model.set('text_watermark.font_size', 48))
+        self.assertFalse(self.model.set('text_watermark.font_size', 48))
+        self.assertEqual(self.model.get('text_watermark.font_size'), 48)
+        self.assertEqual(self.notifications, [frozenset({'text_watermark.font_size'})])
+
+        with self.assertRaises(AttributeError):
+            self.model.set('text_watermark.no_such_field', 1)
+
+    def test_batch_merges_notifications(self):
+        """测试批量修改合并为一次通知"""
+        with self.model.batch():
+            self.model.set('position', Position.TOP_LEFT)
+            with self.model.batch():
+                self.model.set('margin', 5)
+            self.assertEqual(self.notifications, [])
+        self.assertEqual(self.notifications, [frozenset({'position', 'margin'})])
+        self.assertFalse(needs_render(self.notifications[0]))
+
+        changed = self.model.update({'margin': 5, 'font_color': 'red'})
+        self.assertEqual(changed, frozenset({'font_color'}))
+        self.assertTrue(needs_render(changed))
+        self.assertTrue(needs_render(None))
+        self.assertTrue(LAYOUT_FIELDS >= self.notifications[0])
+
+    def test_snapshot_and_replace(self):
+        """测试快照不受之后修改影响，整体替换只通知不同的字段"""
+        snapshot = self.model.snapshot()
+        self.model.set('text_watermark.text', 'hello')
+        self.assertEqual(snapshot.text_watermark.text, '')
+
+        other = WatermarkConfig(custom_position=(10, 20))
+        other.text_watermark.text = 'hello'
+        other.image_watermark.alpha = 0.5
+        self.assertEqual(self.model.replace(other),
+                         frozenset({'custom_position', 'image_watermark.alpha'}))
+        self.assertEqual(self.model.config.custom_position, (10, 20))
+
+        self.unsubscribe()
+        self.model.set('margin', 1)
+        self.assertEqual(len(self.notifications), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+"""
+常驻水印服务测试
+"""
+
+import base64
+import io
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from src.core import daemon as daemon_module
+from src.core.config import Config
+from src.core.daemon import (DaemonClient, DaemonError, WatermarkDaemon, merge_config,
+                             read_token_file)
+
+
+class TestWatermarkDaemon(unittest.TestCase):
+    """常驻水印服务测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, 'input.jpg')
+        Image.new('RGB', (120, 80), 'white').save(self.input_path, 'JPEG')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _start(self, address, token=None):
+        config = Config()
+        config.config.text_watermark.text = 'daemon'
+        daemon = WatermarkDaemon(address, config, workers=2, token=token)
+        thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(daemon.close)
+        return daemon
+
+    def test_process_paths_and_bytes(self):
+        """测试文件路径和内存数据两种任务，结果逐条返回"""
+        daemon = self._start(('127.0.0.1', 0), token='secret')
+        output_path = os.path.join(self.temp_dir, 'out', 'a.jpg')
+        with open(self.input_path, 'rb') as f:
+            data = f.read()
+
+        with DaemonClient(daemon.address, timeout=10, token='secret') as client:
+            replies = list(client.process([
+                {'id': 'a', 'input': self.input_path, 'output': output_path},
+                {'id': 'b', 'data': data},
+                {'id': 'c', 'input': os.path.join(self.temp_dir, 'missing.jpg')},
+            ], config={'font_color': 'red'}))
+
+            done = replies[-1]
+            self.assertTrue(done['done'])
+            self.assertEqual((done['ok'], done['failed']), (2, 1))
+            results = {reply['job']: reply for reply in replies[:-1]}
+            self.assertEqual(results['a']['output'], output_path)
+            self.assertTrue(os.path.exists(output_path))
+            with Image.open(io.BytesIO(results['b']['data'])) as image:
+                self.assertEqual(image.size, (120, 80))
+            self.assertEqual(results['c']['status'], 'failed')
+
+            with self.assertRaises(DaemonError):
+                list(client.process([{'input': self.input_path}], config={'no_such_field': 1}))
+
+            status = client.ping()
+            self.assertEqual(status['jobs_ok'], 2)
+            self.assertGreaterEqual(status['caches']['watermark']['layers'], 1)
+            client.shutdown()
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), '当前平台不支持Unix域套接字')
+    def test_unix_socket(self):
+        """测试Unix域套接字，关闭后删除套接字文件"""
+        path = os.path.join(self.temp_dir, 'watermark.sock')
+        daemon = self._start(path)
+        with DaemonClient(path, timeout=10) as client:
+            self.assertTrue(client.ping()['ok'])
+            client.shutdown()
+        daemon.close()
+        self.assertFalse(os.path.exists(path))
+
+    def test_job_error_reported_and_request_completed(self):
+        """测试任务在写回结果前出错时记为失败，请求仍以 done 汇总结束"""
+        daemon = self._start(('127.0.0.1', 0), token='secret')
+        with open(self.input_path, 'rb') as f:
+            # 预先编码：只让服务端编码结果时出错
+            data = base64.b64encode(f.read()).decode('ascii')
+
+        with DaemonClient(daemon.address, timeout=10, token='secret') as client, \
+                mock.patch.object(daemon_module.base64, 'b64encode', side_effect=MemoryError('encode')):
+            replies = list(client.process([
+                {'id': 'a', 'data': data},
+                {'id': 'b', 'input': self.input_path, 'output': os.path.join(self.temp_dir, 'b.jpg')},
+            ]))
+            results = {reply['job']: reply for reply in replies[:-1]}
+            self.assertEqual(results['a']['status'], 'failed')
+            self.assertIn('encode', results['a']['message'])
+            self.assertEqual(results['b']['status'], 'ok')
+            done = replies[-1]
+            self.assertTrue(done['done'])
+            self.assertEqual((done['ok'], done['failed']), (1, 1))
+            self.assertEqual(len(replies), 3)
+            client.shutdown()
+
+    def test_tcp_requires_token(self):
+        """测试TCP模式必须配置令牌，未认证或令牌错误的连接被拒绝"""
+        with self.assertRaises(DaemonError):
+            WatermarkDaemon(('127.0.0.1', 0))
+
+        daemon = self._start(('127.0.0.1', 0), token='secret')
+        with socket.create_connection(daemon.address, 10) as sock:
+            sock.sendall(b'{"op": "ping"}\n')
+            reader = sock.makefile('rb')
+            self.assertIn(b'error', reader.readline())
+            self.assertEqual(reader.readline(), b'')
+            reader.close()
+        with self.assertRaises(DaemonError):
+            DaemonClient(daemon.address, timeout=10, token='wrong')
+
+        with DaemonClient(daemon.address, timeout=10, token='secret') as client:
+            self.assertTrue(client.ping()['ok'])
+            self.assertEqual(client.ping()['requests'], 0)
+            client.shutdown()
+
+    @unittest.skipUnless(os.name == 'posix', '仅在POSIX系统上检查文件权限')
+    def test_token_file(self):
+        """测试令牌文件不存在时以0600权限生成，权限过宽的令牌文件被拒绝"""
+        path = os.path.join(self.temp_dir, 'token')
+        token = read_token_file(path, create=True)
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+        self.assertEqual(read_token_file(path), token)
+
+        os.chmod(path, 0o644)
+        with self.assertRaises(DaemonError):
+            read_token_file(path)
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), '当前平台不支持Unix域套接字')
+    def test_unix_socket_owner_only(self):
+        """测试Unix域套接字只有所有者可以连接"""
+        path = os.path.join(self.temp_dir, 'watermark.sock')
+        daemon = self._start(path)
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+        daemon.shutdown()
+
+    def test_merge_config(self):
+        """测试请求配置按字段合并到基础配置"""
+        base = Config().config
+        merged = merge_config(base, {'margin': 5, 'text_watermark': {'text': 'hi'}})
+        self.assertEqual(merged.margin, 5)
+        self.assertEqual(merged.text_watermark.text, 'hi')
+        self.assertEqual(merged.text_watermark.font_size, base.text_watermark.font_size)
+        self.assertEqual(base.margin, Config().config.margin)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+输入去重测试
+"""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from PIL import Image
+
+from src.core import dedup
+from src.core.config import Config
+from src.core.image_processor import ImageProcessor
+from src.core.journal import Journal
+
+
+class TestDedup(unittest.TestCase):
+    """输入去重测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _save(self, relative, color='white', size=(60, 40)):
+        path = os.path.join(self.temp_dir, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.new('RGB', size, color).save(path, 'JPEG')
+        return path
+
+    def test_size_checked_before_hashing(self):
+        """测试只有大小相同的文件才计算哈希，内容不同或输出格式不同不算重复"""
+        a = self._save('a.jpg')
+        copy = os.path.join(self.temp_dir, 'backup', 'a.jpg')
+        os.makedirs(os.path.dirname(copy))
+        shutil.copyfile(a, copy)
+        other = self._save('other.jpg', size=(300, 200))
+
+        finder = dedup.DuplicateFinder()
+        self.assertIsNone(finder.find(a, '.jpg'))
+        self.assertIsNone(finder.find(other, '.jpg'))
+        self.assertEqual(finder.hashed_files, 0)
+        self.assertEqual(finder.find(copy, '.jpg'), a)
+        self.assertEqual(finder.hashed_files, 2)
+        self.assertIsNone(finder.find(copy, '.png'))
+
+    def test_duplicates_rendered_once(self):
+        """测试重复输入只渲染一次，输出以硬链接复用，并记录在处理日志中"""
+        input_dir = os.path.join(self.temp_dir, 'photos')
+        original = self._save('photos/2024/a.jpg')
+        for copy in ('backup/a.jpg', 'export/a_copy.jpg'):
+            path = os.path.join(input_dir, copy)
+            os.makedirs(os.path.dirname(path))
+            shutil.copyfile(original, path)
+        self._save('photos/2024/b.jpg', color='black')
+        output_dir = os.path.join(self.temp_dir, 'out')
+        journal_path = os.path.join(self.temp_dir, 'run.jsonl')
+
+        config = Config()
+        config.config.recursive = True
+        config.config.dedup = dedup.MODE_LINK
+        rendered = []
+        with Journal(journal_path) as journal:
+            processor = ImageProcessor(config, journal=journal)
+            original_process = processor.process_single_image
+
+            def process(handle, *args, **kwargs):
+                rendered.append(handle.path)
+                return original_process(handle, *args, **kwargs)
+
+            processor.process_single_image = process
+            with redirect_stdout(io.StringIO()):
+                processor.process_images(input_dir, output_dir)
+
+        self.assertEqual(len(rendered), 2)
+        self.assertEqual(processor.stats['processed_files'], 4)
+        self.assertEqual(processor.stats['deduplicated_files'], 2)
+        outputs = [os.path.join(output_dir, name) for name in
+                   ('2024/a.jpg', 'backup/a.jpg', 'export/a_copy.jpg')]
+        self.assertEqual(len({os.stat(path).st_ino for path in outputs}), 1)
+
+        with open(journal_path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(sum('duplicate_of' in record for record in records), 2)
+        self.assertTrue(all(record['status'] == 'ok' for record in records))
+
+    def test_fallback_date_separates_identical_files(self):
+        """测试内容相同但没有EXIF、修改时间不同的文件水印日期不同，不视为重复"""
+        input_dir = os.path.join(self.temp_dir, 'photos')
+        os.makedirs(input_dir)
+        paths = [os.path.join(input_dir, name) for name in ('2000.png', '2020.png', '2020_copy.png')]
+        Image.new('RGB', (200, 120), 'white').save(paths[0], 'PNG')
+        for path in paths[1:]:
+            shutil.copyfile(paths[0], path)
+        for path, year in zip(paths, (2000, 2020, 2020)):
+            timestamp = datetime(year, 1, 1, 12).timestamp()
+            os.utime(path, (timestamp, timestamp))
+        output_dir = os.path.join(self.temp_dir, 'out')
+
+        config = Config()
+        config.config.dedup = dedup.MODE_COPY
+        processor = ImageProcessor(config)
+        with redirect_stdout(io.StringIO()):
+            processor.process_images(input_dir, output_dir)
+
+        self.assertEqual(processor.stats['processed_files'], 3)
+        self.assertEqual(processor.stats['deduplicated_files'], 1)
+        outputs = []
+        for name in sorted(os.listdir(output_dir)):
+            with open(os.path.join(output_dir, name), 'rb') as f:
+                outputs.append(f.read())
+        self.assertEqual(len(outputs), 3)
+        self.assertNotEqual(outputs[0], outputs[1])
+        self.assertEqual(outputs[1], outputs[2])
+
+    def test_copy_output_replaces_existing(self):
+        """测试复制模式覆盖已有的目标文件"""
+        source = os.path.join(self.temp_dir, 'source.bin')
+        destination = os.path.join(self.temp_dir, 'sub', 'dest.bin')
+        with open(source, 'wb') as f:
+            f.write(b'new')
+        os.makedirs(os.path.dirname(destination))
+        with open(destination, 'wb') as f:
+            f.write(b'old')
+
+        self.assertEqual(dedup.copy_output(source, destination, dedup.MODE_COPY), dedup.MODE_COPY)
+        with open(destination, 'rb') as f:
+            self.assertEqual(f.read(), b'new')
+        self.assertNotEqual(os.stat(source).st_ino, os.stat(destination).st_ino)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+图片编码模块测试
+"""
+
+import io
+import unittest
+from PIL import Image, features
+
+from src.core.config import EncoderProfile
+from src.core import encoder
+
+
+class TestEncoder(unittest.TestCase):
+    """编码配置档测试类"""
+
+    def _make_jpeg(self, quality: int) -> bytes:
+        image = Image.effect_noise((64, 48), 30).convert('RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=quality, subsampling=0)
+        return buffer.getvalue()
+
+    def test_profile_save_kwargs(self):
+        """测试各配置档的保存参数"""
+        self.assertEqual(encoder.get_save_kwargs('PNG', EncoderProfile.FAST), {'compress_level': 1})
+        self.assertEqual(encoder.get_save_kwargs('png', 'smallest'), {'optimize': True})
+
+        jpeg_kwargs = encoder.get_save_kwargs('JPEG', 'smallest', quality=80)
+        self.assertTrue(jpeg_kwargs['progressive'])
+        self.assertEqual(jpeg_kwargs['quality'], 80)
+
+        # 默认使用balanced配置档
+        self.assertEqual(encoder.get_save_kwargs('JPEG'), {'optimize': True, 'quality': 95})
+
+    def test_webp_method_override(self):
+        """测试WebP编码速度可以覆盖配置档默认值"""
+        self.assertEqual(encoder.get_save_kwargs('WEBP', 'fast')['method'], 0)
+        self.assertEqual(encoder.get_save_kwargs('WEBP', 'fast', webp_method=5)['method'], 5)
+        self.assertEqual(encoder.get_save_kwargs('WEBP', 'fast', webp_method=9)['method'], 6)
+
+    def test_keep_source_quality_reuses_qtables(self):
+        """测试keep-source-quality沿用源JPEG的量化表和色度采样"""
+        with Image.open(io.BytesIO(self._make_jpeg(70))) as source:
+            source_encoding = encoder.get_source_encoding(source)
+            source_tables = source.quantization
+            image = source.copy()
+
+        self.assertEqual(source_encoding['subsampling'], 0)
+
+        buffer = io.BytesIO()
+        encoder.save_image(image, buffer, 'JPEG', EncoderProfile.KEEP_SOURCE_QUALITY,
+                           quality=95, source_encoding=source_encoding)
+        buffer.seek(0)
+        with Image.open(buffer) as output:
+            self.assertEqual(output.quantization, source_tables)
+
+    def test_source_encoding_for_non_jpeg(self):
+        """测试非JPEG源图没有可沿用的编码信息"""
+        self.assertIsNone(encoder.get_source_encoding(Image.new('RGB', (4, 4))))
+        kwargs = encoder.get_save_kwargs('JPEG', EncoderProfile.KEEP_SOURCE_QUALITY, quality=88)
+        self.assertEqual(kwargs['quality'], 88)
+
+    def test_jpeg_flattens_alpha(self):
+        """测试JPEG输出将透明通道合成到白色背景"""
+        image = Image.new('RGBA', (8, 8), (255, 0, 0, 0))
+        prepared = encoder.prepare_for_format(image, 'JPEG')
+        self.assertEqual(prepared.mode, 'RGB')
+        self.assertEqual(prepared.getpixel((0, 0)), (255, 255, 255))
+
+    @unittest.skipUnless(features.check('webp'), "Pillow未启用WebP支持")
+    def test_webp_output(self):
+        """测试WebP输出保留透明通道"""
+        image = Image.new('LA', (16, 16), (128, 100))
+        buffer = io.BytesIO()
+        encoder.save_image(image, buffer, 'WEBP', EncoderProfile.FAST)
+        buffer.seek(0)
+        with Image.open(buffer) as output:
+            self.assertEqual(output.format, 'WEBP')
+            self.assertEqual(output.mode, 'RGBA')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+字体管理模块测试
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from PIL import ImageFont
+
+from src.utils.font_manager import FontCache, FontManager, StyledFontWrapper
+
+
+class TestFontCache(unittest.TestCase):
+    """字体缓存测试类"""
+
+    def setUp(self):
+        """准备临时字体文件（使用Pillow内置的FreeType字体数据）"""
+        default_font = ImageFont.load_default(12)
+        if not hasattr(default_font, 'font_bytes'):
+            self.skipTest("当前Pillow版本没有内置FreeType字体")
+
+        self.temp_dir = tempfile.mkdtemp()
+        self.font_paths = []
+        for name in ('first.ttf', 'second.ttf'):
+            path = os.path.join(self.temp_dir, name)
+            with open(path, 'wb') as f:
+                f.write(default_font.font_bytes)
+            self.font_paths.append(path)
+        self.file_size = len(default_font.font_bytes)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_hit_and_miss_counters(self):
+        """测试命中和未命中计数"""
+        cache = FontCache()
+        self.assertIsNone(cache.get('a'))
+
+        font = cache.load_truetype(self.font_paths[0], 20)
+        cache.put('a', font)
+        self.assertIs(cache.get('a'), font)
+
+        stats = cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+
+    def test_font_file_read_once_across_sizes(self):
+        """测试同一字体文件在不同字号间共享字节数据"""
+        cache = FontCache()
+        fonts = []
+        for size in (12, 24, 36, 48):
+            font = cache.load_truetype(self.font_paths[0], size)
+            cache.put(f"font_{size}", font)
+            fonts.append(font)
+
+        self.assertEqual(cache.file_loads, 1)
+        for font in fonts[1:]:
+            self.assertIs(font.font_bytes, fonts[0].font_bytes)
+
+        # 共享的文件数据只计入一次
+        expected = self.file_size + len(fonts) * FontCache.FACE_OVERHEAD
+        self.assertEqual(cache.current_bytes, expected)
+
+    def test_evicts_least_recently_used_entry(self):
+        """测试按条目数淘汰最久未使用的字体"""
+        cache = FontCache(max_entries=2)
+        for key, size in (('a', 10), ('b', 11)):
+            cache.put(key, cache.load_truetype(self.font_paths[0], size))
+
+        # 访问a使b成为最久未使用的条目
+        cache.get('a')
+        cache.put('c', cache.load_truetype(self.font_paths[0], 12))
+
+        self.assertIn('a', cache)
+        self.assertIn('c', cache)
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_byte_budget_releases_file_data(self):
+        """测试按内存预算淘汰并释放不再引用的字体文件"""
+        budget = self.file_size + 2 * FontCache.FACE_OVERHEAD
+        cache = FontCache(max_entries=10, max_bytes=budget)
+
+        cache.put('first', cache.load_truetype(self.font_paths[0], 20))
+        cache.put('second', cache.load_truetype(self.font_paths[1], 20))
+
+        self.assertNotIn('first', cache)
+        self.assertIn('second', cache)
+        self.assertEqual(cache.get_stats()['files'], 1)
+        self.assertLessEqual(cache.current_bytes, budget)
+
+    def test_styled_wrapper_keeps_file_reference(self):
+        """测试样式包装器仍然引用共享的字体文件"""
+        cache = FontCache()
+        font = cache.load_truetype(self.font_paths[0], 20)
+        cache.put('styled', StyledFontWrapper(font, bold=True))
+        self.assertEqual(cache.get_stats()['files'], 1)
+
+    def test_configure_shrinks_cache(self):
+        """测试调整上限后立即淘汰"""
+        manager = FontManager(max_cache_entries=8)
+        for size in range(10, 15):
+            manager.get_font(self.font_paths[0], size)
+        self.assertEqual(manager.get_cache_stats()['entries'], 5)
+
+        manager.configure_cache(max_entries=2)
+        stats = manager.get_cache_stats()
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['evictions'], 3)
+        self.assertEqual(stats['file_loads'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+图片句柄模块测试
+"""
+
+import builtins
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import piexif
+from PIL import Image
+
+from src.core.config import Config, WatermarkConfig
+from src.core.image_handle import ImageHandle, open_image_handle
+from src.core.image_processor import ImageProcessor
+
+
+class TestImageHandle(unittest.TestCase):
+    """图片句柄测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _make_jpeg(self, name: str, exif_dict=None) -> str:
+        path = os.path.join(self.temp_dir, name)
+        image = Image.new('RGB', (320, 240), (40, 90, 160))
+        if exif_dict is not None:
+            image.save(path, 'JPEG', exif=piexif.dump(exif_dict))
+        else:
+            image.save(path, 'JPEG')
+        return path
+
+    def _count_opens(self, target_paths):
+        """包装内置open，统计目标文件被打开的次数"""
+        real_open = builtins.open
+        counts = {path: 0 for path in target_paths}
+
+        def counting_open(file, *args, **kwargs):
+            if isinstance(file, (str, os.PathLike)):
+                path = os.fspath(file)
+                if path in counts:
+                    counts[path] += 1
+            return real_open(file, *args, **kwargs)
+
+        return counts, mock.patch('builtins.open', side_effect=counting_open)
+
+    def test_handle_is_lazy_and_closes(self):
+        """测试句柄按需打开并在退出时关闭"""
+        path = self._make_jpeg('lazy.jpg')
+        handle = ImageHandle(path)
+        self.assertIsNone(handle._fp)
+
+        with handle:
+            self.assertEqual(handle.size, (320, 240))
+            self.assertEqual(handle.format, 'JPEG')
+            self.assertIsNotNone(handle._fp)
+
+        self.assertIsNone(handle._fp)
+
+    def test_open_image_handle_reuses_existing(self):
+        """测试传入已有句柄时不会被提前关闭"""
+        path = self._make_jpeg('reuse.jpg')
+        with ImageHandle(path) as handle:
+            with open_image_handle(handle) as shared:
+                self.assertIs(shared, handle)
+                _ = shared.image
+            self.assertIsNotNone(handle._fp)
+
+    def test_single_open_per_image(self):
+        """测试一次处理任务中每个输入文件只被打开一次"""
+        with_exif = self._make_jpeg('with_exif.jpg', {
+            'Exif': {piexif.ExifIFD.DateTimeOriginal: b'2023:05:06 07:08:09'}
+        })
+        # 没有日期标签，会走到piexif回退和文件修改时间回退
+        without_exif = self._make_jpeg('without_exif.jpg')
+
+        processor = ImageProcessor(Config(WatermarkConfig()))
+        counts, patcher = self._count_opens([with_exif, without_exif])
+
+        with patcher:
+            for path in (with_exif, without_exif):
+                output_path = os.path.join(self.temp_dir, 'out_' + os.path.basename(path))
+                success, message = processor.process_single_image(path, output_path, 'JPEG')
+                self.assertTrue(success, message)
+                self.assertTrue(os.path.exists(output_path))
+
+        self.assertEqual(counts[with_exif], 1)
+        self.assertEqual(counts[without_exif], 1)
+
+    def test_exif_date_read_through_handle(self):
+        """测试通过句柄读取拍摄时间"""
+        path = self._make_jpeg('date.jpg', {
+            'Exif': {piexif.ExifIFD.DateTimeOriginal: b'2023:05:06 07:08:09'}
+        })
+        processor = ImageProcessor(Config(WatermarkConfig()))
+
+        with ImageHandle(path) as handle:
+            text = processor.exif_reader.get_watermark_text(handle, processor.config.config.date_format)
+
+        self.assertEqual(text, '2023-05-06')
+
+    def test_pixel_limit_checked_before_decode(self):
+        """测试超过解压炸弹上限的图片可以读取文件头，整幅解码时才按句柄的上限拒绝"""
+        path = self._make_jpeg('large.jpg')
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 10_000):
+            with ImageHandle(path) as handle:
+                self.assertEqual(handle.size, (320, 240))
+                with self.assertRaises(Image.DecompressionBombError):
+                    handle.load()
+                handle.max_pixels = 320 * 240
+                self.assertEqual(handle.load().size, (320, 240))
+
+            processor = ImageProcessor(Config(WatermarkConfig(max_megapixels=1)))
+            output_path = os.path.join(self.temp_dir, 'out', 'large.jpg')
+            success, message = processor.process_single_image(path, output_path)
+            self.assertTrue(success, message)
+            self.assertEqual(Image.MAX_IMAGE_PIXELS, 10_000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+路径列表测试
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+
+from PIL import Image
+
+from src.core.config import Config, WatermarkConfig
+from src.core.image_processor import ImageProcessor
+from src.core.input_list import iter_input_list, iter_records
+
+
+class _TrickleStream:
+    """每次 read1 只返回几个字节，模拟管道中陆续到达的数据"""
+
+    def __init__(self, data: bytes, step: int = 3):
+        self._data = data
+        self._step = step
+        self.reads = 0
+
+    def read1(self, size: int) -> bytes:
+        self.reads += 1
+        chunk, self._data = self._data[:self._step], self._data[self._step:]
+        return chunk
+
+
+class TestInputList(unittest.TestCase):
+    """路径列表测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_newline_records(self):
+        """测试换行分隔、CRLF、空行和制表符分隔的输出路径"""
+        stream = io.BytesIO(b'a.jpg\r\n\nb c.jpg\tout/b.png\nlast.jpg')
+        self.assertEqual(list(iter_input_list(stream)),
+                         [('a.jpg', None), ('b c.jpg', 'out/b.png'), ('last.jpg', None)])
+
+    def test_null_records_stream_incrementally(self):
+        """测试NUL分隔（路径中可含换行），记录跨越读取块也能逐条产出"""
+        stream = _TrickleStream(b'line\nbreak.jpg\0x.jpg\0')
+        records = iter_records(stream, b'\0')
+        self.assertEqual(next(records), b'line\nbreak.jpg')
+        # 第一条记录到达后立即产出，不等待读完整个流
+        self.assertLess(stream.reads, 7)
+        self.assertEqual(list(records), [b'x.jpg'])
+
+    def test_process_input_list(self):
+        """测试按列表处理：显式输出路径原样使用，其余在输出目录下镜像输入路径"""
+        inputs = []
+        for name in ('d1/a.jpg', 'd2/a.jpg'):
+            path = os.path.join(self.temp_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            Image.new('RGB', (100, 80), 'white').save(path)
+            inputs.append(path)
+        explicit = os.path.join(self.temp_dir, 'custom', 'x.jpg')
+        output_dir = os.path.join(self.temp_dir, 'out')
+
+        processor = ImageProcessor(Config())
+        with redirect_stdout(io.StringIO()):
+            processor.process_input_list(iter([(inputs[0], explicit), (inputs[1], None)]), output_dir)
+
+        self.assertTrue(os.path.exists(explicit))
+        self.assertTrue(os.path.exists(processor.get_list_output_path(inputs[1], output_dir)))
+        self.assertNotEqual(processor.get_list_output_path(inputs[0], output_dir),
+                            processor.get_list_output_path(inputs[1], output_dir))
+        self.assertEqual(processor.stats['total_files'], 2)
+        self.assertEqual(processor.stats['processed_files'], 2)
+
+    def test_stream_consumed_at_worker_pace(self):
+        """测试长列表按工作线程的进度读取，排队的任务（及打开的文件）数有上限"""
+        path = os.path.join(self.temp_dir, 'a.jpg')
+        Image.new('RGB', (40, 30), 'white').save(path)
+        consumed = []
+        ahead = []
+
+        def entries():
+            for i in range(40):
+                consumed.append(i)
+                yield path, os.path.join(self.temp_dir, 'out', f'{i}.jpg')
+
+        def process_single_image(handle, output_path, **kwargs):
+            time.sleep(0.005)
+            ahead.append(len(consumed) - len(ahead))
+            return True, ''
+
+        processor = ImageProcessor(Config(WatermarkConfig(workers=2)))
+        processor.process_single_image = process_single_image
+        with redirect_stdout(io.StringIO()):
+            processor.process_input_list(entries())
+
+        self.assertEqual(len(ahead), 40)
+        self.assertLessEqual(max(ahead), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
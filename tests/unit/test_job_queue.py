@@ -0,0 +1,272 @@
+"""
+持久化任务队列测试
+"""
+
+import errno
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from PIL import Image
+
+from src.core import job_queue
+from src.core.config import Config
+from src.core.image_processor import ImageProcessor
+from src.core.job_queue import JobQueue
+from src.gui.file_manager import FileManager
+
+
+class TestJobQueue(unittest.TestCase):
+    """任务队列测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.queue_path = os.path.join(self.temp_dir, 'jobs.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_claims_are_exclusive(self):
+        """测试多个线程（各自的连接）领取任务时没有重复"""
+        with JobQueue(self.queue_path) as queue:
+            self.assertEqual(queue.add((f'{i}.jpg', f'out/{i}.jpg') for i in range(50)), 50)
+            self.assertEqual(queue.add([('0.jpg', 'other.jpg')]), 0)
+
+        claimed = []
+
+        def worker():
+            with JobQueue(self.queue_path) as queue:
+                while True:
+                    job = queue.claim()
+                    if job is None:
+                        break
+                    claimed.append(job.input)
+                    queue.complete(job)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(claimed), sorted(f'{i}.jpg' for i in range(50)))
+        with JobQueue(self.queue_path) as queue:
+            self.assertEqual(queue.counts()[job_queue.DONE], 50)
+
+    def test_retry_with_backoff_until_limit(self):
+        """测试失败的任务按退避时间重试，达到次数上限后记为失败"""
+        with JobQueue(self.queue_path, max_attempts=2, backoff=60) as queue:
+            queue.add([('a.jpg', 'out/a.jpg')])
+            job = queue.claim()
+            self.assertTrue(queue.fail(job, 'timeout'))
+            self.assertIsNone(queue.claim())
+            self.assertGreater(queue.next_ready_in(), 50)
+
+            queue.backoff = 0
+            queue._conn.execute('UPDATE jobs SET not_before = 0')
+            job = queue.claim()
+            self.assertEqual(job.attempts, 2)
+            self.assertFalse(queue.fail(job, 'timeout'))
+            self.assertEqual(queue.failures(), [('a.jpg', 'timeout')])
+            self.assertIsNone(queue.next_ready_in())
+
+    def test_only_transient_errors_retried(self):
+        """测试只有偶发的 I/O 错误会重试，确定性的失败直接记为失败"""
+        self.assertTrue(job_queue.is_transient_error(OSError(errno.EIO, 'I/O error')))
+        self.assertTrue(job_queue.is_transient_error(TimeoutError(errno.ETIMEDOUT, 'timed out')))
+        for error in (OSError('image file is truncated'), Image.UnidentifiedImageError('bad'),
+                      FileNotFoundError(errno.ENOENT, 'missing'), Image.DecompressionBombError('big'),
+                      ValueError('bad value')):
+            self.assertFalse(job_queue.is_transient_error(error), error)
+
+        with JobQueue(self.queue_path, max_attempts=3, backoff=0) as queue:
+            queue.add([('a.jpg', 'out/a.jpg')])
+            self.assertFalse(queue.fail(queue.claim(), 'corrupt', retry=False))
+            self.assertEqual(queue.failures(), [('a.jpg', 'corrupt')])
+
+    def test_image_processor_retries_transient_failures(self):
+        """测试处理器对损坏和超出像素上限的图片不重试，偶发的读取错误重试后成功"""
+        input_dir = os.path.join(self.temp_dir, 'photos')
+        os.makedirs(input_dir)
+        Image.new('RGB', (60, 40), 'white').save(os.path.join(input_dir, 'good.jpg'))
+        Image.new('RGB', (2000, 1000), 'white').save(os.path.join(input_dir, 'large.png'))
+        with open(os.path.join(input_dir, 'corrupt.jpg'), 'wb') as f:
+            f.write(b'not an image')
+        output_dir = os.path.join(self.temp_dir, 'out')
+
+        config = Config()
+        config.config.max_megapixels = 1
+        processor = ImageProcessor(config, queue=JobQueue(self.queue_path, max_attempts=3, backoff=0))
+        original = processor._process_handle
+        calls = []
+
+        def flaky(handle, *args):
+            calls.append(os.path.basename(handle.path))
+            if calls.count('good.jpg') == 1 and calls[-1] == 'good.jpg':
+                raise OSError(errno.EIO, 'Input/output error')
+            return original(handle, *args)
+
+        with processor.queue as queue, mock.patch.object(processor, '_process_handle', flaky), \
+                redirect_stdout(io.StringIO()):
+            processor.process_images(input_dir, output_dir)
+            failures = dict((os.path.basename(path), error) for path, error in queue.failures())
+            attempts = dict((os.path.basename(path), attempts) for path, attempts in
+                            queue._conn.execute('SELECT input, attempts FROM jobs'))
+
+        self.assertEqual(sorted(failures), ['corrupt.jpg', 'large.png'])
+        self.assertEqual(attempts, {'corrupt.jpg': 1, 'large.png': 1, 'good.jpg': 2})
+        self.assertEqual(os.listdir(output_dir), ['good.jpg'])
+
+    def test_recover_jobs_of_dead_process(self):
+        """测试已退出进程留下的 running 任务重新排队，存活进程的任务不动"""
+        with JobQueue(self.queue_path) as queue:
+            queue.add([('a.jpg', 'out/a.jpg'), ('b.jpg', 'out/b.jpg')])
+            queue.claim()
+            queue.owner = f"{queue.owner.rpartition(':')[0]}:{2 ** 22 + 1}"
+            queue.claim()
+            self.assertEqual(queue.recover(), 1)
+            self.assertEqual(queue.claim().input, 'b.jpg')
+
+    def test_image_processor_resumes_from_queue(self):
+        """测试处理器只处理队列中未完成的任务，输出路径沿用入队时的路径"""
+        input_dir = os.path.join(self.temp_dir, 'photos')
+        os.makedirs(input_dir)
+        for i in range(3):
+            Image.new('RGB', (60, 40), 'white').save(os.path.join(input_dir, f'{i}.jpg'))
+        output_dir = os.path.join(self.temp_dir, 'out')
+
+        # 模拟中断：0.jpg 已完成，1.jpg 处理中进程被杀死
+        with JobQueue(self.queue_path) as queue:
+            queue.add([(os.path.join(input_dir, '0.jpg'), os.path.join(output_dir, 'done.jpg')),
+                       (os.path.join(input_dir, '1.jpg'), os.path.join(output_dir, 'first.jpg'))])
+            queue.complete(queue.claim())
+            queue.owner = f"{queue.owner.rpartition(':')[0]}:{2 ** 22 + 1}"
+            queue.claim()
+
+        with JobQueue(self.queue_path) as queue:
+            processor = ImageProcessor(Config(), queue=queue)
+            with redirect_stdout(io.StringIO()):
+                processor.process_images(input_dir, output_dir)
+            self.assertEqual(queue.counts()[job_queue.DONE], 3)
+
+        self.assertEqual(sorted(os.listdir(output_dir)), ['2.jpg', 'first.jpg'])
+        self.assertEqual(processor.stats['total_files'], 3)
+        self.assertEqual(processor.stats['skipped_files'], 1)
+        self.assertEqual(processor.stats['processed_files'], 2)
+
+    def test_file_manager_resumes_cancelled_export(self):
+        """测试 GUI 导出取消后再次导出只处理剩余图片，完成后删除队列"""
+        paths = []
+        for name in ('a', 'b', 'c'):
+            path = os.path.join(self.temp_dir, f'{name}.jpg')
+            Image.new('RGB', (60, 40), 'white').save(path)
+            paths.append(path)
+        output_dir = os.path.join(self.temp_dir, 'export')
+        os.makedirs(output_dir)
+        queue_path = os.path.join(output_dir, 'queue.db')
+        processor = ImageProcessor(Config())
+
+        class Progress:
+            def __init__(self, cancel_after):
+                self.cancel_after = cancel_after
+                self.cancelled = False
+                self.calls = 0
+
+            def update(self, progress, status):
+                self.calls += 1
+                self.cancelled = self.calls > self.cancel_after
+
+        def export(progress):
+            finished = threading.Event()
+            results = []
+
+            def complete(processed, failed):
+                results.extend([processed, failed])
+                finished.set()
+
+            FileManager().process_images_async(
+                paths, output_dir, {'type': 'original', 'value': ''}, 'JPEG', 90,
+                {'enabled': False}, processor, progress_callback=progress.update,
+                complete_callback=complete, queue_path=queue_path)
+            self.assertTrue(finished.wait(30))
+            return results
+
+        # 处理第二张时取消：第二张完成后停止
+        processed, failed = export(Progress(cancel_after=1))
+        self.assertEqual((processed, failed), (paths[:2], []))
+        self.assertTrue(os.path.exists(queue_path))
+
+        # 再次导出只处理剩余图片（已导出的不会再导出为 a_1.jpg）
+        processed, failed = export(Progress(cancel_after=10))
+        self.assertEqual(processed, paths[2:])
+        self.assertEqual(sorted(os.listdir(output_dir)), ['a.jpg', 'b.jpg', 'c.jpg'])
+
+    def test_file_manager_discards_queue_of_other_export(self):
+        """测试取消后导出另一批图片到同一目录时，不处理上一次导出的剩余任务"""
+        paths = []
+        for name in ('a', 'b', 'c', 'd'):
+            path = os.path.join(self.temp_dir, f'{name}.jpg')
+            Image.new('RGB', (60, 40), 'white').save(path)
+            paths.append(path)
+        output_dir = os.path.join(self.temp_dir, 'export')
+        os.makedirs(output_dir)
+        queue_path = os.path.join(output_dir, 'queue.db')
+        processor = ImageProcessor(Config())
+
+        def export(files, cancel_after):
+            finished = threading.Event()
+            results = []
+
+            class Progress:
+                cancelled = False
+                calls = 0
+
+                def update(self, progress, status):
+                    self.calls += 1
+                    self.cancelled = self.calls > cancel_after
+
+            def complete(processed, failed):
+                results.extend([processed, failed])
+                finished.set()
+
+            with redirect_stdout(io.StringIO()):
+                FileManager().process_images_async(
+                    files, output_dir, {'type': 'original', 'value': ''}, 'JPEG', 90,
+                    {'enabled': False}, processor, progress_callback=Progress().update,
+                    complete_callback=complete, queue_path=queue_path)
+                self.assertTrue(finished.wait(30))
+            return results
+
+        processed, failed = export(paths[:3], cancel_after=0)
+        self.assertEqual(processed, paths[:1])
+
+        # 另一批图片：b、c 不再按上一次的设置导出
+        processed, failed = export(paths[3:], cancel_after=10)
+        self.assertEqual((processed, failed), (paths[3:], []))
+        self.assertEqual(sorted(os.listdir(output_dir)), ['a.jpg', 'd.jpg'])
+        self.assertFalse(os.path.exists(queue_path))
+
+    def test_export_key_covers_inputs_and_settings(self):
+        """测试导出标识随图片列表和导出设置变化"""
+        manager = FileManager()
+        processor = ImageProcessor(Config())
+        naming = {'type': 'original', 'value': ''}
+        key = manager._export_key(['a.jpg', 'b.jpg'], naming, 'JPEG', 90, {}, processor, None)
+        self.assertEqual(key, manager._export_key(['a.jpg', 'b.jpg'], naming, 'JPEG', 90, {},
+                                                  ImageProcessor(Config()), None))
+        self.assertNotEqual(key, manager._export_key(['a.jpg'], naming, 'JPEG', 90, {}, processor, None))
+        self.assertNotEqual(key, manager._export_key(['a.jpg', 'b.jpg'], naming, 'JPEG', 80, {},
+                                                     processor, None))
+        other = Config()
+        other.config.text_watermark.text = 'other'
+        self.assertNotEqual(key, manager._export_key(['a.jpg', 'b.jpg'], naming, 'JPEG', 90, {},
+                                                     ImageProcessor(other), None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+处理日志模块测试
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+
+from src.core.config import Config, WatermarkConfig
+from src.core.image_processor import ImageProcessor
+from src.core.journal import Journal, load_completed, read_journal
+
+
+class TestJournal(unittest.TestCase):
+    """处理日志测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.temp_dir, 'input')
+        self.output_dir = os.path.join(self.temp_dir, 'output')
+        self.journal_path = os.path.join(self.temp_dir, 'run.jsonl')
+        os.makedirs(self.input_dir)
+        for i in range(3):
+            Image.new('RGB', (320, 200), (60 * i, 90, 150)).save(os.path.join(self.input_dir, f'photo_{i}.jpg'))
+        with open(os.path.join(self.input_dir, 'broken.jpg'), 'wb') as f:
+            f.write(b'not an image')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _run(self, resume=False):
+        with Journal(self.journal_path) as journal:
+            processor = ImageProcessor(Config(WatermarkConfig(workers=2)), journal=journal)
+            processor.process_images(self.input_dir, self.output_dir, resume=resume)
+        return processor
+
+    def test_records(self):
+        """测试每个任务写入一条结构化记录"""
+        self._run()
+        records = {os.path.basename(r['input']): r for r in read_journal(self.journal_path)}
+        self.assertEqual(len(records), 4)
+
+        record = records['photo_0.jpg']
+        self.assertEqual(record['status'], 'ok')
+        self.assertEqual((record['width'], record['height']), (320, 200))
+        self.assertEqual((record['output_width'], record['output_height']), (320, 200))
+        self.assertEqual(record['bytes_out'], os.path.getsize(record['output']))
+        self.assertGreater(record['bytes_in'], 0)
+        for stage in ('decode', 'render', 'encode', 'total'):
+            self.assertIn(stage, record['stages'])
+        self.assertGreaterEqual(sum(record['cache'].values()), 1)
+
+        self.assertEqual(records['broken.jpg']['status'], 'failed')
+        self.assertIn('error', records['broken.jpg'])
+
+    def test_resume_skips_unchanged(self):
+        """测试续跑时跳过已成功且未修改的图片，重新处理修改过的和失败的"""
+        self._run()
+        Image.new('RGB', (100, 80)).save(os.path.join(self.input_dir, 'photo_1.jpg'))
+        os.remove(os.path.join(self.output_dir, 'photo_2.jpg'))
+
+        processor = self._run(resume=True)
+        self.assertEqual(processor.stats['skipped_files'], 1)
+
+        records = list(read_journal(self.journal_path))
+        rerun = sorted(os.path.basename(r['input']) for r in records[4:])
+        self.assertEqual(rerun, ['broken.jpg', 'photo_1.jpg', 'photo_2.jpg'])
+        self.assertEqual(len(load_completed(self.journal_path)), 3)
+
+    def test_resume_from_other_working_directory(self):
+        """测试以相对路径运行后，在其他工作目录下以另一种写法续跑仍能跳过"""
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(self.temp_dir)
+        with Journal(self.journal_path) as journal:
+            ImageProcessor(Config(), journal=journal).process_images('input', 'output')
+        self.assertTrue(all(os.path.isabs(r['input']) for r in read_journal(self.journal_path)))
+
+        os.chdir(self.input_dir)
+        with Journal(self.journal_path) as journal:
+            processor = ImageProcessor(Config(), journal=journal)
+            processor.process_images('.', self.output_dir, resume=True)
+        self.assertEqual(processor.stats['skipped_files'], 3)
+
+    def test_journal_only_keeps_no_samples(self):
+        """测试只写处理日志时剖析器不保留阶段样本，日志中仍有逐张的阶段耗时"""
+        for i in range(3, 40):
+            Image.new('RGB', (64, 48), 'white').save(os.path.join(self.input_dir, f'photo_{i}.jpg'))
+        processor = self._run()
+
+        self.assertEqual(processor.profiler._durations, {})
+        self.assertEqual(processor.profiler._spans, [])
+        records = [record for record in read_journal(self.journal_path) if record['status'] == 'ok']
+        self.assertEqual(len(records), 40)
+        self.assertTrue(all(record['stages']['total'] > 0 for record in records))
+
+    def test_truncated_line_ignored(self):
+        """测试中断时写了一半的最后一行被忽略"""
+        with Journal(self.journal_path) as journal:
+            journal.write({'input': 'a.jpg', 'status': 'ok', 'bytes_in': 1, 'mtime': 1.0})
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write('{"input": "b.jpg", "sta')
+
+        self.assertEqual([r['input'] for r in read_journal(self.journal_path)], ['a.jpg'])
+        self.assertEqual(load_completed(self.journal_path), {os.path.abspath('a.jpg'): (1, 1.0)})
+
+        # 重新打开后追加的记录不会与残缺的行拼在一起
+        with Journal(self.journal_path) as journal:
+            journal.write({'input': 'c.jpg', 'status': 'failed'})
+        self.assertEqual([r['input'] for r in read_journal(self.journal_path)], ['a.jpg', 'c.jpg'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+"""
+元数据透传模块测试
+"""
+
+import io
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import piexif
+from PIL import Image
+
+from src.core.config import Config, WatermarkConfig, MetadataMode
+from src.core import metadata
+from src.core.image_handle import ImageHandle
+from src.core.watermark import WatermarkProcessor
+
+
+ICC_PROFILE = b'fake-icc-profile' * 8
+XMP_PACKET = b'<x:xmpmeta xmlns:x="adobe:ns:meta/">test</x:xmpmeta>'
+PHOTOSHOP_PAYLOAD = metadata.PHOTOSHOP_HEADER + b'8BIM\x04\x04\x00\x00\x00\x00\x00\x00'
+
+
+class TestMetadata(unittest.TestCase):
+    """元数据透传测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _make_exif(self, orientation: int = 1) -> bytes:
+        thumbnail = io.BytesIO()
+        Image.new('RGB', (160, 120), (255, 0, 0)).save(thumbnail, 'JPEG')
+        return piexif.dump({
+            '0th': {piexif.ImageIFD.Make: b'Camera', piexif.ImageIFD.Orientation: orientation},
+            'Exif': {piexif.ExifIFD.DateTimeOriginal: b'2023:05:06 07:08:09'},
+            '1st': {piexif.ImageIFD.XResolution: (72, 1)},
+            'thumbnail': thumbnail.getvalue()
+        })
+
+    def _make_source_jpeg(self) -> str:
+        path = os.path.join(self.temp_dir, 'source.jpg')
+        buffer = io.BytesIO()
+        Image.new('RGB', (320, 240), (30, 120, 200)).save(
+            buffer, 'JPEG', exif=self._make_exif(), icc_profile=ICC_PROFILE, xmp=XMP_PACKET
+        )
+        data = buffer.getvalue()
+        # Pillow不支持写APP13，手工插入Photoshop段
+        app13 = b'\xff\xed' + struct.pack('>H', len(PHOTOSHOP_PAYLOAD) + 2) + PHOTOSHOP_PAYLOAD
+        with open(path, 'wb') as f:
+            f.write(data[:2] + app13 + data[2:])
+        return path
+
+    def _segments(self, path: str):
+        with open(path, 'rb') as f:
+            return metadata.read_jpeg_segments(f)
+
+    def test_read_jpeg_segments(self):
+        """测试读取JPEG原始元数据段"""
+        path = self._make_source_jpeg()
+        with ImageHandle(path) as handle:
+            source = metadata.read_metadata(handle)
+            # 读取元数据后仍可正常解码
+            handle.load()
+
+        markers = [marker for marker, _ in source.jpeg_segments]
+        self.assertIn(metadata.APP1, markers)
+        self.assertIn(metadata.APP2, markers)
+        self.assertIn(metadata.APP13, markers)
+        self.assertEqual(source.icc_profile, ICC_PROFILE)
+        self.assertEqual(source.xmp, XMP_PACKET)
+        self.assertTrue(source.exif.startswith((b'MM', b'II')))
+
+    def test_passthrough_jpeg_copies_segments(self):
+        """测试JPEG输出逐字节保留ICC/XMP/APP13，只替换EXIF缩略图"""
+        source_path = self._make_source_jpeg()
+        output_path = os.path.join(self.temp_dir, 'out', 'result.jpg')
+        config = Config(WatermarkConfig(metadata_mode=MetadataMode.PASSTHROUGH))
+        processor = WatermarkProcessor(config)
+        self.assertTrue(processor.process_image_with_options(source_path, output_path, '2023-05-06', 'JPEG'))
+
+        source_segments = self._segments(source_path)
+        output_segments = self._segments(output_path)
+        source_exif = [p for m, p in source_segments if p.startswith(metadata.EXIF_HEADER)][0]
+        output_exif = [p for m, p in output_segments if p.startswith(metadata.EXIF_HEADER)][0]
+
+        self.assertEqual(
+            [(m, p) for m, p in output_segments if not p.startswith(metadata.EXIF_HEADER)],
+            [(m, p) for m, p in source_segments if not p.startswith(metadata.EXIF_HEADER)]
+        )
+
+        # 缩略图之前的TIFF数据（IFD0/EXIF IFD）保持不变
+        block = metadata._TiffBlock(source_exif[len(metadata.EXIF_HEADER):])
+        ifd1 = block.ifd_offset(1)
+        entry, value_type, _ = block.find_entry(ifd1, metadata.TAG_JPEG_INTERCHANGE_FORMAT)
+        thumbnail_offset = block.read_value(entry, value_type) + len(metadata.EXIF_HEADER)
+        self.assertEqual(output_exif[:ifd1], source_exif[:ifd1])
+        self.assertNotEqual(output_exif[thumbnail_offset:], source_exif[thumbnail_offset:])
+
+        exif = piexif.load(output_exif)
+        self.assertEqual(exif['Exif'][piexif.ExifIFD.DateTimeOriginal], b'2023:05:06 07:08:09')
+        with Image.open(io.BytesIO(exif['thumbnail'])) as thumbnail:
+            self.assertEqual(thumbnail.size, (160, 120))
+            self.assertNotEqual(thumbnail.convert('RGB').getpixel((80, 60))[0], 255)
+
+    def test_strip_mode_drops_metadata(self):
+        """测试默认模式不保留源元数据"""
+        source_path = self._make_source_jpeg()
+        output_path = os.path.join(self.temp_dir, 'out', 'stripped.jpg')
+        processor = WatermarkProcessor(Config(WatermarkConfig()))
+        self.assertTrue(processor.process_image_with_options(source_path, output_path, '2023-05-06', 'JPEG'))
+        self.assertEqual(self._segments(output_path), [])
+
+    def test_passthrough_to_png(self):
+        """测试PNG输出保留EXIF/ICC/XMP"""
+        source_path = self._make_source_jpeg()
+        output_path = os.path.join(self.temp_dir, 'out', 'result.png')
+        config = Config(WatermarkConfig(metadata_mode=MetadataMode.PASSTHROUGH))
+        processor = WatermarkProcessor(config)
+        self.assertTrue(processor.process_image_with_options(source_path, output_path, '2023-05-06', 'PNG'))
+
+        with ImageHandle(output_path) as handle:
+            result = metadata.read_metadata(handle)
+        self.assertEqual(result.icc_profile, ICC_PROFILE)
+        self.assertEqual(result.xmp, XMP_PACKET)
+        self.assertEqual(piexif.load(metadata.EXIF_HEADER + result.exif)['0th'][piexif.ImageIFD.Make], b'Camera')
+
+    def test_patch_orientation_in_place(self):
+        """测试方向标签就地修改，其余字节不变"""
+        exif = self._make_exif(orientation=1)[len(metadata.EXIF_HEADER):]
+        patched = metadata.patch_orientation(exif, 6)
+
+        self.assertEqual(len(patched), len(exif))
+        self.assertEqual(sum(1 for a, b in zip(exif, patched) if a != b), 1)
+        self.assertEqual(piexif.load(metadata.EXIF_HEADER + patched)['0th'][piexif.ImageIFD.Orientation], 6)
+        self.assertEqual(metadata.patch_orientation(patched, 6), patched)
+
+    def test_remove_thumbnail(self):
+        """测试移除缩略图时截掉缩略图数据"""
+        exif = self._make_exif()[len(metadata.EXIF_HEADER):]
+        stripped = metadata.replace_thumbnail(exif, None)
+        self.assertLess(len(stripped), len(exif))
+        self.assertIsNone(piexif.load(metadata.EXIF_HEADER + stripped)['thumbnail'])
+
+    def test_tiff_exif_drops_layout_tags(self):
+        """测试TIFF源的EXIF去掉图像数据布局标签，方向已由解码器处理"""
+        source_path = os.path.join(self.temp_dir, 'source.tif')
+        exif = Image.Exif()
+        exif[piexif.ImageIFD.Make] = 'Scanner'
+        exif[piexif.ImageIFD.Orientation] = 6
+        Image.new('RGB', (40, 30), (30, 120, 200)).save(source_path, 'TIFF', exif=exif.tobytes())
+
+        with ImageHandle(source_path) as handle:
+            result = metadata.read_metadata(handle)
+        ifd0 = piexif.load(metadata.EXIF_HEADER + result.exif)['0th']
+        self.assertEqual(ifd0[piexif.ImageIFD.Make], b'Scanner')
+        self.assertEqual(ifd0[piexif.ImageIFD.Orientation], 1)
+        for tag in (piexif.ImageIFD.ImageWidth, piexif.ImageIFD.StripOffsets,
+                    piexif.ImageIFD.StripByteCounts):
+            self.assertNotIn(tag, ifd0)
+
+
+if __name__ == '__main__':
+    unittest.main()
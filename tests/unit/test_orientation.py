@@ -0,0 +1,126 @@
+"""
+EXIF方向处理测试
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from PIL import Image, ImageChops, ImageOps
+
+from src.core.config import Config, WatermarkConfig, Position
+from src.core import orientation as exif_orientation
+from src.core.watermark import WatermarkProcessor
+
+
+class TestOrientation(unittest.TestCase):
+    """EXIF方向测试类"""
+
+    DISPLAY_SIZE = (300, 200)
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _stored_image(self, orientation: int) -> Image.Image:
+        """构造显示方向为 DISPLAY_SIZE 的存储图片"""
+        display = Image.new('RGB', self.DISPLAY_SIZE, (60, 60, 60))
+        return exif_orientation.to_stored(display, orientation)
+
+    def _watermark_bbox(self, stored: Image.Image, result: Image.Image, orientation: int):
+        """按显示方向比较前后差异，返回水印所在区域"""
+        before = exif_orientation.to_display(stored, orientation)
+        after = exif_orientation.to_display(result, orientation)
+        return ImageChops.difference(before.convert('RGB'), after.convert('RGB')).getbbox()
+
+    def test_layer_round_trip(self):
+        """测试局部层的显示/存储变换互为逆变换"""
+        layer = Image.new('L', (7, 3))
+        layer.putpixel((1, 0), 255)
+        for orientation in range(1, 9):
+            stored = exif_orientation.to_stored(layer, orientation)
+            self.assertEqual(stored.size, exif_orientation.display_size(layer.size, orientation))
+            restored = exif_orientation.to_display(stored, orientation)
+            self.assertEqual(restored.tobytes(), layer.tobytes(), orientation)
+
+    def test_box_mapping_matches_transpose(self):
+        """测试包围盒映射与实际像素变换一致"""
+        display_box = (5, 2, 4, 3)
+        display = Image.new('L', (20, 10))
+        display.paste(255, (5, 2, 9, 5))
+        for orientation in range(1, 9):
+            stored = exif_orientation.to_stored(display, orientation)
+            left, top, width, height = exif_orientation.to_stored_box(display_box, stored.size, orientation)
+            self.assertEqual(stored.getbbox(), (left, top, left + width, top + height), orientation)
+            self.assertEqual(
+                exif_orientation.to_display_box((left, top, width, height), stored.size, orientation),
+                display_box
+            )
+
+    def test_watermark_placed_in_display_corner(self):
+        """测试各方向下水印都落在显示方向的右下角"""
+        config = Config(WatermarkConfig(position=Position.BOTTOM_RIGHT, margin=10))
+        processor = WatermarkProcessor(config)
+        width, height = self.DISPLAY_SIZE
+
+        for orientation in range(1, 9):
+            stored = self._stored_image(orientation)
+            result = processor.add_watermark(stored, '2024-01-02', orientation)
+            self.assertEqual(result.size, stored.size)
+
+            bbox = self._watermark_bbox(stored, result, orientation)
+            self.assertIsNotNone(bbox, orientation)
+            left, top, right, bottom = bbox
+            self.assertGreater(left, width // 2, orientation)
+            self.assertGreater(top, height // 2, orientation)
+            self.assertLessEqual(right, width, orientation)
+            self.assertLessEqual(bottom, height, orientation)
+
+    def test_output_keeps_orientation_tag(self):
+        """测试输出保留方向标签，按方向显示时水印位置正确"""
+        input_path = os.path.join(self.temp_dir, 'rotated.jpg')
+        output_path = os.path.join(self.temp_dir, 'out', 'rotated.jpg')
+        exif = Image.Exif()
+        exif[exif_orientation.ORIENTATION_TAG] = 6
+        self._stored_image(6).save(input_path, 'JPEG', exif=exif.tobytes())
+
+        config = Config(WatermarkConfig(position=Position.TOP_LEFT, margin=10))
+        processor = WatermarkProcessor(config)
+        self.assertTrue(processor.process_image_with_options(input_path, output_path, '2024-01-02', 'JPEG'))
+
+        with Image.open(output_path) as output:
+            self.assertEqual(exif_orientation.get_orientation(output), 6)
+            self.assertEqual(output.size, (200, 300))
+            displayed = ImageOps.exif_transpose(output)
+
+        self.assertEqual(displayed.size, self.DISPLAY_SIZE)
+        background = Image.new('RGB', self.DISPLAY_SIZE, (60, 60, 60))
+        left, top, _, _ = ImageChops.difference(background, displayed).point(
+            lambda v: 255 if v > 40 else 0).getbbox()
+        self.assertLess(left, self.DISPLAY_SIZE[0] // 2)
+        self.assertLess(top, self.DISPLAY_SIZE[1] // 2)
+
+    def test_resize_uses_display_dimensions(self):
+        """测试尺寸调整按显示方向的宽度计算"""
+        processor = WatermarkProcessor(Config(WatermarkConfig()))
+        stored = self._stored_image(6)
+        resized = processor._resize_image(stored, {'enabled': True, 'type': 'width', 'width': 150}, 6)
+        self.assertEqual(exif_orientation.display_size(resized.size, 6), (150, 100))
+
+    def test_tiff_orientation_applied_by_decoder(self):
+        """测试TIFF的方向由 Pillow 解码时处理，不再重复转置"""
+        input_path = os.path.join(self.temp_dir, 'rotated.tif')
+        exif = Image.Exif()
+        exif[exif_orientation.ORIENTATION_TAG] = 6
+        self._stored_image(6).save(input_path, 'TIFF', exif=exif.tobytes())
+
+        with Image.open(input_path) as image:
+            self.assertEqual(exif_orientation.get_orientation(image), 1)
+            image.load()
+            self.assertEqual(image.size, self.DISPLAY_SIZE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+导出预检测试
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from src.gui import preflight
+from src.gui.file_manager import FileManager
+
+
+class TestPreflight(unittest.TestCase):
+    """导出预检测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.temp_dir, 'out')
+        os.makedirs(self.output_dir)
+        self.manager = FileManager()
+        self.naming_rule = {'type': 'original', 'value': ''}
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _save(self, relative, size=(64, 48)):
+        path = os.path.join(self.temp_dir, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.new('RGB', size, 'white').save(path)
+        return path
+
+    def test_collisions_resolved_in_memory(self):
+        """测试与已有文件和本批其他输出的重名都追加序号，结果与逐个探测一致"""
+        for name in ('a.jpg', 'a_1.jpg'):
+            open(os.path.join(self.output_dir, name), 'wb').close()
+        inputs = [self._save(f'{folder}/a.png') for folder in ('x', 'y', 'z')]
+        inputs.append(self._save('x/b.png'))
+
+        plan = self.manager.preflight_export(inputs, self.output_dir, self.naming_rule, 'JPEG')
+        names = [os.path.basename(path) for path in plan.outputs]
+        self.assertEqual(names, ['a_2.jpg', 'a_3.jpg', 'a_4.jpg', 'b.jpg'])
+        self.assertEqual(plan.renamed, 3)
+
+    def test_sizes_and_missing_inputs(self):
+        """测试预检不读取输入，大小单独读取，不存在的输入记为无法读取"""
+        path = self._save('x/a.png')
+        missing = os.path.join(self.temp_dir, 'x', 'gone.png')
+
+        with mock.patch.object(preflight.os, 'stat', wraps=os.stat) as stat:
+            plan = self.manager.preflight_export([path, missing], self.output_dir,
+                                                 self.naming_rule, 'PNG')
+            # 分配文件名时不读取输入（对话框在后台线程中读取大小）
+            self.assertEqual(stat.call_count, 0)
+        self.assertIsNone(plan.sizes)
+        self.assertEqual((plan.input_bytes, plan.missing), (0, 0))
+
+        self.assertEqual(plan.load_sizes([path, missing]), [os.path.getsize(path), None])
+        self.assertEqual((plan.input_bytes, plan.missing), (os.path.getsize(path), 1))
+
+    def test_estimate_from_samples(self):
+        """测试按抽样图片的压缩比推算总输出大小"""
+        plan = preflight.ExportPlan('out', outputs=['o'] * 100, sizes=[1000] * 99 + [None])
+        encoded = []
+
+        def encoded_size(path):
+            encoded.append(path)
+            return 250
+
+        estimated = preflight.estimate_output_bytes(plan, [f'{i}.jpg' for i in range(100)],
+                                                    encoded_size, samples=4)
+        self.assertEqual(len(encoded), 4)
+        self.assertEqual((estimated, plan.sampled), (99 * 250, 4))
+
+    def test_estimate_encodes_in_memory(self):
+        """测试不使用水印处理器时按导出设置抽样编码，不写出文件"""
+        inputs = [self._save(f'x/{i}.png', size=(200, 150)) for i in range(3)]
+        plan = self.manager.preflight_export(inputs, self.output_dir, self.naming_rule, 'JPEG')
+
+        estimated = self.manager.estimate_export_size(plan, inputs, 'JPEG', 80,
+                                                      {'enabled': False})
+        self.assertGreater(estimated, 0)
+        self.assertEqual(plan.sampled, 3)
+        self.assertEqual(os.listdir(self.output_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
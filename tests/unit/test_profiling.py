@@ -0,0 +1,111 @@
+"""
+性能剖析模块测试
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from PIL import Image
+
+from src.core.config import Config, WatermarkConfig
+from src.core.image_processor import ImageProcessor
+from src.core.profiling import NULL_PROFILER, Profiler, percentile
+
+
+class TestProfiling(unittest.TestCase):
+    """性能剖析测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_percentile(self):
+        """测试最近秩百分位数"""
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 95), 95)
+        self.assertEqual(percentile(samples, 100), 100)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_spans_and_disabled_profiler(self):
+        """测试阶段计时；未启用时不记录"""
+        profiler = Profiler()
+        for _ in range(3):
+            with profiler.span('encode'):
+                time.sleep(0.001)
+        summary = profiler.summary()
+        self.assertEqual(summary['encode']['count'], 3)
+        self.assertGreaterEqual(summary['encode']['max_ms'], summary['encode']['p50_ms'])
+
+        with NULL_PROFILER.span('encode'), NULL_PROFILER.image('a.jpg'):
+            pass
+        self.assertEqual(NULL_PROFILER.summary(), {})
+
+    def test_process_records_stages_and_slowest(self):
+        """测试处理流程记录各阶段耗时，并保留最慢图片的cProfile数据"""
+        input_dir = os.path.join(self.temp_dir, 'input')
+        os.makedirs(input_dir)
+        for i, size in enumerate(((200, 150), (1600, 1200), (300, 200))):
+            Image.new('RGB', size, (40 * i, 90, 160)).save(os.path.join(input_dir, f'photo_{i}.jpg'))
+
+        profiler = Profiler(top_n=2)
+        processor = ImageProcessor(Config(WatermarkConfig()), profiler)
+        processor.process_images(input_dir, os.path.join(self.temp_dir, 'output'))
+
+        summary = profiler.summary()
+        for stage in ('exif_read', 'decode', 'font_load', 'render', 'composite', 'encode', 'total'):
+            self.assertIn(stage, summary)
+        self.assertEqual(summary['total']['count'], 3)
+        self.assertIn('total', profiler.format_report())
+
+        slowest = profiler.slowest()
+        self.assertEqual(len(slowest), 2)
+        self.assertTrue(slowest[0][0].endswith('photo_1.jpg'))
+        self.assertGreaterEqual(slowest[0][1], slowest[1][1])
+
+        written = profiler.dump_stats(os.path.join(self.temp_dir, 'profile'))
+        self.assertEqual(len(written), 2)
+        self.assertTrue(all(os.path.exists(path) for path in written))
+
+    def test_trace_export(self):
+        """测试并发处理时导出 trace-event 时间线"""
+        input_dir = os.path.join(self.temp_dir, 'input')
+        os.makedirs(input_dir)
+        for i in range(4):
+            Image.new('RGB', (320, 240), (50 * i, 80, 120)).save(os.path.join(input_dir, f'photo_{i}.jpg'))
+
+        config = Config(WatermarkConfig(workers=2))
+        profiler = Profiler(trace=True)
+        ImageProcessor(config, profiler).process_images(input_dir, os.path.join(self.temp_dir, 'output'))
+
+        trace_path = os.path.join(self.temp_dir, 'trace', 'run.json')
+        count = profiler.write_trace(trace_path)
+        with open(trace_path, 'r', encoding='utf-8') as f:
+            events = json.load(f)['traceEvents']
+
+        complete = [event for event in events if event['ph'] == 'X']
+        self.assertEqual(count, len(complete) + sum(1 for event in events if event['ph'] == 'b'))
+        for event in complete:
+            for key in ('pid', 'tid', 'ts', 'dur'):
+                self.assertIn(key, event)
+            self.assertTrue(event['args']['file'].endswith('.jpg'))
+        names = {event['name'] for event in complete}
+        self.assertTrue({'decode', 'render', 'encode'} <= names)
+        self.assertEqual(sum(1 for event in complete if event['cat'] == 'image'), 4)
+
+        queued = [event for event in events if event['name'] == 'queued']
+        self.assertEqual(len(queued), 8)
+        self.assertTrue(any(event['ph'] == 'M' and event['name'] == 'thread_name' for event in events))
+
+        # 未开启 trace 时不保留区间
+        self.assertEqual(Profiler().trace_events()[1:], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+"""
+内存感知调度模块测试
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+from PIL import Image
+
+from src.core import image_processor
+from src.core.config import Config, WatermarkConfig
+from src.core.image_handle import ImageHandle
+from src.core.image_processor import ImageProcessor
+from src.core.scheduler import (JobScheduler, MemoryBudget, estimate_job_memory,
+                                parse_memory_size)
+
+
+class TestScheduler(unittest.TestCase):
+    """调度器测试类"""
+
+    def test_parse_memory_size(self):
+        """测试内存大小解析"""
+        self.assertEqual(parse_memory_size('512M'), 512 * 1024 ** 2)
+        self.assertEqual(parse_memory_size('2G'), 2 * 1024 ** 3)
+        self.assertEqual(parse_memory_size('1.5GB'), int(1.5 * 1024 ** 3))
+        self.assertEqual(parse_memory_size('256'), 256 * 1024 ** 2)
+        self.assertIsNone(parse_memory_size(None))
+        self.assertIsNone(parse_memory_size('0'))
+        with self.assertRaises(ValueError):
+            parse_memory_size('lots')
+
+    def test_estimate_scales_with_pixels_and_mode(self):
+        """测试内存估算随像素数和色彩模式变化"""
+        rgb = estimate_job_memory((4000, 3000), 'RGB')
+        self.assertEqual(estimate_job_memory((8000, 3000), 'RGB'), rgb * 2)
+        self.assertLess(estimate_job_memory((4000, 3000), 'L'), rgb)
+
+    def test_budget_limits_concurrency(self):
+        """测试总占用不超过预算，超预算任务独占执行"""
+        running = []
+        observed = []
+        lock = threading.Lock()
+
+        def job(cost):
+            with lock:
+                running.append(cost)
+                observed.append(list(running))
+            time.sleep(0.02)
+            with lock:
+                running.remove(cost)
+
+        with JobScheduler(workers=4, max_memory=100) as scheduler:
+            for cost in (40, 40, 40, 250, 30, 30, 30, 30):
+                scheduler.submit(cost, job, cost)
+
+        self.assertEqual(scheduler.stats['serial'], 1)
+        self.assertLessEqual(scheduler.budget.peak, 100)
+        self.assertEqual(scheduler.budget.in_use, 0)
+        for snapshot in observed:
+            if 250 in snapshot:
+                self.assertEqual(snapshot, [250])
+            else:
+                self.assertLessEqual(sum(snapshot), 100)
+
+    def test_pending_jobs_bounded(self):
+        """测试未结束的任务数不超过上限，提交方在工作线程之后等待"""
+        release = threading.Event()
+        submitted = []
+
+        def submit_all(scheduler):
+            for i in range(10):
+                scheduler.submit(0, release.wait)
+                submitted.append(i)
+
+        with JobScheduler(workers=2) as scheduler:
+            self.assertEqual(scheduler.max_pending, 4)
+            submitter = threading.Thread(target=submit_all, args=(scheduler,))
+            submitter.start()
+            time.sleep(0.1)
+            self.assertEqual(len(submitted), 4)
+            release.set()
+            submitter.join(5)
+        self.assertEqual(len(submitted), 10)
+
+    def test_idle_budget_admits_single_job(self):
+        """测试空闲时总会放行任务"""
+        budget = MemoryBudget(10)
+        budget.acquire(50)
+        self.assertEqual(budget.in_use, 50)
+        budget.release(50)
+
+
+class TestConcurrentProcessing(unittest.TestCase):
+    """并发批处理测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.temp_dir, 'input')
+        os.makedirs(self.input_dir)
+        for i in range(6):
+            size = (1200, 900) if i == 0 else (200, 150)
+            Image.new('RGB', size, (i * 30, 100, 150)).save(
+                os.path.join(self.input_dir, f'photo_{i}.jpg'), 'JPEG')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_process_images_with_budget(self):
+        """测试内存预算下的并发批处理"""
+        output_dir = os.path.join(self.temp_dir, 'output')
+        config = Config(WatermarkConfig(workers=3, max_memory='4M'))
+        processor = ImageProcessor(config)
+        processor.process_images(self.input_dir, output_dir)
+
+        self.assertEqual(processor.stats['processed_files'], 6)
+        self.assertEqual(processor.stats['failed_files'], 0)
+        self.assertEqual(len(os.listdir(output_dir)), 6)
+
+    def test_open_handles_bounded(self):
+        """测试提交方不会为排队的任务打开所有文件"""
+        for i in range(6, 30):
+            Image.new('RGB', (40, 30)).save(os.path.join(self.input_dir, f'photo_{i}.jpg'), 'JPEG')
+        handles = []
+
+        class TrackedHandle(ImageHandle):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                handles.append(self)
+
+        processor = ImageProcessor(Config(WatermarkConfig(workers=2)))
+        peak = []
+
+        def process_single_image(handle, output_path, **kwargs):
+            time.sleep(0.005)
+            peak.append(sum(h._fp is not None for h in list(handles)))
+            return True, ''
+
+        processor.process_single_image = process_single_image
+        with mock.patch.object(image_processor, 'ImageHandle', TrackedHandle), \
+                redirect_stdout(io.StringIO()):
+            processor.process_images(self.input_dir, os.path.join(self.temp_dir, 'output'))
+
+        self.assertEqual(len(handles), 30)
+        self.assertLessEqual(max(peak), 5)
+
+    def test_max_megapixels_rejects_before_decode(self):
+        """测试超过像素上限的图片被拒绝"""
+        config = Config(WatermarkConfig(max_megapixels=0.5))
+        processor = ImageProcessor(config)
+        output_path = os.path.join(self.temp_dir, 'output', 'big.jpg')
+        success, message = processor.process_single_image(
+            os.path.join(self.input_dir, 'photo_0.jpg'), output_path)
+
+        self.assertFalse(success)
+        self.assertIn('像素', message)
+        self.assertFalse(os.path.exists(output_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+分片处理测试
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from PIL import Image
+
+from src.core import shard
+from src.core.config import Config
+from src.core.image_processor import ImageProcessor
+
+
+class TestShard(unittest.TestCase):
+    """分片处理测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_partition_is_stable_and_disjoint(self):
+        """测试同一路径总落在同一分片，分隔符写法不影响结果"""
+        paths = [f'day{i % 3}/IMG_{i:04d}.jpg' for i in range(200)]
+        shards = [shard.shard_of(path, 4) for path in paths]
+        self.assertEqual(set(shards), {0, 1, 2, 3})
+        self.assertEqual(shard.shard_of('day1/./IMG_0001.jpg', 4), shard.shard_of('day1/IMG_0001.jpg', 4))
+
+        self.assertEqual(shard.parse_shard('2/4'), (2, 4))
+        for value in ('4/4', '-1/4', '1', 'a/b'):
+            with self.assertRaises(ValueError):
+                shard.parse_shard(value)
+        self.assertEqual(shard.shard_path('logs/run.jsonl', 1, 4), 'logs/run.shard-1-of-4.jsonl')
+
+    def test_shards_cover_all_images(self):
+        """测试各分片处理的图片互不相交且覆盖全部图片"""
+        input_dir = os.path.join(self.temp_dir, 'photos')
+        for i in range(10):
+            path = os.path.join(input_dir, f'sub{i % 2}', f'{i}.jpg')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            Image.new('RGB', (60, 40), 'white').save(path)
+        output_dir = os.path.join(self.temp_dir, 'out')
+
+        manifests = []
+        for index in range(3):
+            config = Config()
+            config.config.recursive = True
+            processor = ImageProcessor(config)
+            started = datetime.now()
+            with redirect_stdout(io.StringIO()):
+                processor.process_images(input_dir, output_dir, shard=(index, 3))
+            manifests.append(shard.build_manifest(index, 3, input_dir, output_dir, '',
+                                                  processor.stats, started))
+
+        report = shard.merge_manifests(manifests)
+        self.assertEqual(report['stats']['total_files'], 10)
+        self.assertEqual(report['stats']['processed_files'], 10)
+        self.assertEqual(report['missing'], [])
+        outputs = [name for _, _, names in os.walk(output_dir) for name in names]
+        self.assertEqual(len(outputs), 10)
+
+    def test_merge_reports_missing_and_duplicates(self):
+        """测试合并时检测缺失和重复的分片，清单可按目录查找"""
+        report_dir = os.path.join(self.temp_dir, 'out', shard.REPORT_DIR)
+        stats = {'total_files': 3, 'processed_files': 3}
+        for index, name in ((0, 'a'), (0, 'b'), (2, 'c')):
+            manifest = shard.build_manifest(index, 3, 'in', 'out', name, stats, datetime.now())
+            shard.write_manifest(os.path.join(report_dir, name + shard.MANIFEST_SUFFIX), manifest)
+
+        paths = shard.find_manifests([os.path.join(self.temp_dir, 'out')])
+        report = shard.merge_manifests([shard.load_manifest(path) for path in paths])
+        self.assertEqual(report['missing'], [1])
+        self.assertEqual(report['duplicates'], [0])
+        self.assertEqual(report['stats']['total_files'], 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+"""
+分块处理模块测试
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from PIL import Image, ImageChops
+
+from src.core.config import Config, WatermarkConfig, MetadataMode
+from src.core import tiled
+from src.core.image_handle import ImageHandle
+from src.core.scheduler import estimate_job_memory
+from src.core.watermark import WatermarkProcessor
+
+
+def _gradient(size, mode='RGB'):
+    """生成各处像素不同的测试图片，便于比较"""
+    horizontal = Image.linear_gradient('L').rotate(90).resize(size)
+    vertical = Image.linear_gradient('L').resize(size)
+    radial = Image.radial_gradient('L').resize(size)
+    return Image.merge('RGB', (horizontal, vertical, radial)).convert(mode)
+
+
+class TestTiled(unittest.TestCase):
+    """分块处理测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _source(self, name='source.tif', mode='RGB', size=(1300, 1100), **save_kwargs):
+        path = os.path.join(self.temp_dir, name)
+        save_kwargs.setdefault('compression', 'tiff_lzw')
+        _gradient(size, mode).save(path, 'TIFF', **save_kwargs)
+        return path
+
+    def _process(self, source, name, tiled_min_megapixels, **config):
+        output = os.path.join(self.temp_dir, 'out', name)
+        watermark_config = WatermarkConfig(output_format='TIFF',
+                                           tiled_min_megapixels=tiled_min_megapixels, **config)
+        processor = WatermarkProcessor(Config(watermark_config))
+        self.assertTrue(processor.process_image_with_options(source, output, '2024-01-01', 'TIFF'))
+        return output
+
+    def test_tiled_output_matches_full_processing(self):
+        """测试分块处理与整图处理的结果逐像素一致"""
+        for mode in ('RGB', 'L', 'RGBA'):
+            for compression in ('tiff_lzw', 'packbits'):
+                with self.subTest(mode=mode, compression=compression):
+                    source = self._source(f'{mode}_{compression}.tif', mode, compression=compression)
+                    tiled_path = self._process(source, 'tiled.tif', 0)
+                    full_path = self._process(source, 'full.tif', None)
+
+                    with Image.open(tiled_path) as tiled_image, Image.open(full_path) as full_image:
+                        self.assertEqual(tiled_image.tag_v2.get(tiled.TAG_TILE_WIDTH), tiled.TILE_SIZE)
+                        self.assertIsNone(full_image.tag_v2.get(tiled.TAG_TILE_WIDTH))
+                        self.assertEqual(tiled_image.mode, mode)
+                        self.assertIsNone(ImageChops.difference(tiled_image, full_image).getbbox())
+
+    def test_watermark_only_touches_overlapping_tiles(self):
+        """测试只有与水印重叠的分块被修改"""
+        source = self._source()
+        output = self._process(source, 'tiled.tif', 0)
+        processor = WatermarkProcessor(Config(WatermarkConfig(output_format='TIFF')))
+        layer, (x, y) = processor.watermark_layer((1300, 1100), '2024-01-01')
+
+        with Image.open(source) as original, Image.open(output) as result:
+            changed = ImageChops.difference(original, result).getbbox()
+        self.assertIsNotNone(changed)
+        left, top, right, bottom = changed
+        self.assertGreaterEqual(left, x)
+        self.assertGreaterEqual(top, y)
+        self.assertLessEqual(right, x + layer.width)
+        self.assertLessEqual(bottom, y + layer.height)
+
+    def test_orientation_and_metadata(self):
+        """测试保留方向标签（像素保持存储方向）和透传的元数据"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[271] = 'Scanner'
+        source = self._source(exif=exif, icc_profile=b'icc-profile' * 10)
+        tiled_path = self._process(source, 'tiled.tif', 0, metadata_mode=MetadataMode.PASSTHROUGH)
+        full_path = self._process(source, 'full.tif', None, metadata_mode=MetadataMode.PASSTHROUGH)
+
+        with Image.open(tiled_path) as tiled_image:
+            self.assertEqual(tiled_image.tag_v2.get(0x0112), 6)
+            self.assertEqual(tiled_image.tag_v2.get(271), 'Scanner')
+            self.assertEqual(tiled_image.info.get('icc_profile'), b'icc-profile' * 10)
+            # Pillow 加载时按方向标签转置，显示效果应与整图处理一致
+            tiled_image.load()
+            with Image.open(full_path) as full_image:
+                self.assertEqual(tiled_image.size, full_image.size)
+                self.assertIsNone(ImageChops.difference(tiled_image, full_image).getbbox())
+
+    def test_writer_round_trip(self):
+        """测试分块写出（含BigTIFF格式）可被正常读取"""
+        image = _gradient((700, 600))
+        for bigtiff in (False, True):
+            with self.subTest(bigtiff=bigtiff):
+                buffer = io.BytesIO()
+                writer = tiled.TiledTiffWriter(buffer, image.size, 'RGB', tile_size=256, bigtiff=bigtiff)
+                for top in range(0, image.height, 256):
+                    writer.write_row(image.crop((0, top, image.width, min(image.height, top + 256))))
+                writer.close()
+
+                buffer.seek(0)
+                with Image.open(buffer) as result:
+                    self.assertEqual(result.size, image.size)
+                    self.assertIsNone(ImageChops.difference(result.convert('RGB'), image).getbbox())
+
+    def test_should_tile_and_memory_estimate(self):
+        """测试分块条件和分块内存估算"""
+        source = self._source(size=(2000, 1500))
+        with ImageHandle(source) as handle:
+            self.assertTrue(tiled.should_tile(handle, 'TIFF', 2))
+            self.assertFalse(tiled.should_tile(handle, 'TIFF', 4))
+            self.assertFalse(tiled.should_tile(handle, 'JPEG', 0))
+            self.assertFalse(tiled.should_tile(handle, 'TIFF', None))
+            self.assertLess(tiled.estimate_memory(handle), estimate_job_memory(handle.size, handle.mode) / 4)
+
+    def test_single_strip_source_not_tiled(self):
+        """测试单条带TIFF（一个行带就是整幅图片）不使用分块处理"""
+        source = self._source(compression='raw')
+        with ImageHandle(source) as handle:
+            self.assertEqual(handle.image.tag_v2.get(tiled.TAG_ROWS_PER_STRIP), 1100)
+            self.assertFalse(tiled.should_tile(handle, 'TIFF', 0))
+            with self.assertRaises(tiled.TiledUnsupportedError):
+                tiled.TiffBandReader(handle)
+
+        output = self._process(source, 'full.tif', 0)
+        with Image.open(output) as result:
+            self.assertIsNone(result.tag_v2.get(tiled.TAG_TILE_WIDTH))
+
+    def test_source_above_pillow_pixel_limit(self):
+        """测试超过 Pillow 解压炸弹上限的TIFF仍可分块处理，整图处理被拒绝"""
+        source = self._source()
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 300_000):
+            self._process(source, 'tiled.tif', 0)
+            processor = WatermarkProcessor(Config(WatermarkConfig(output_format='TIFF')))
+            self.assertFalse(processor.process_image_with_options(
+                source, os.path.join(self.temp_dir, 'full.tif'), '2024-01-01', 'TIFF'))
+
+    def test_band_size_limit(self):
+        """测试单个行带超过上限时不分块"""
+        source = self._source()
+        with ImageHandle(source) as handle, mock.patch.object(tiled, 'MAX_BAND_BYTES', 1024):
+            self.assertFalse(tiled.should_tile(handle, 'TIFF', 0))
+
+    def test_failed_write_leaves_no_output(self):
+        """测试中途失败时删除临时文件，不留下不完整的输出"""
+        source = self._source()
+        output = os.path.join(self.temp_dir, 'partial.tif')
+        read_band = tiled.TiffBandReader.read_band
+
+        def failing_read_band(reader, row):
+            if row == 3:
+                raise OSError('读取失败')
+            return read_band(reader, row)
+
+        processor = WatermarkProcessor(Config(WatermarkConfig(output_format='TIFF')))
+        with ImageHandle(source) as handle, \
+                mock.patch.object(tiled.TiffBandReader, 'read_band', failing_read_band):
+            with self.assertRaises(OSError):
+                tiled.process_tiled(handle, output, processor, '2024-01-01')
+        self.assertEqual(os.listdir(self.temp_dir), ['source.tif'])
+
+    def test_unsupported_source_falls_back(self):
+        """测试按平面存储的TIFF回退到整图处理"""
+        source = self._source(compression='raw')
+        with ImageHandle(source) as handle:
+            handle.image.tag_v2[tiled.TAG_PLANAR_CONFIGURATION] = 2
+            with self.assertRaises(tiled.TiledUnsupportedError):
+                tiled.TiffBandReader(handle)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+水印处理模块测试
+"""
+
+import unittest
+from PIL import Image, ImageDraw
+
+from src.core.config import Config, WatermarkType
+from src.core import watermark as watermark_module
+from src.core.watermark import WatermarkProcessor
+
+
+class TestShadowRendering(unittest.TestCase):
+    """阴影渲染测试类"""
+
+    def setUp(self):
+        with watermark_module._shadow_cache_lock:
+            watermark_module._shadow_cache.clear()
+
+        self.config = Config()
+        self.config.config.watermark_type = WatermarkType.TEXT
+        text_config = self.config.config.text_watermark
+        text_config.text = "Shadow"
+        text_config.font_size = 32
+        text_config.font_color = "white"
+        text_config.font_alpha = 1.0
+        text_config.shadow_enabled = True
+        text_config.shadow_color = "black"
+        text_config.shadow_alpha = 1.0
+        self.processor = WatermarkProcessor(self.config)
+
+    def test_blurred_shadow_is_tight_and_cached(self):
+        """测试模糊阴影裁剪到字形范围并在多次调用间复用"""
+        font = self.processor._get_font(32, text="Shadow")
+        text_width, text_height = self.processor._get_text_size("Shadow", font)
+
+        shadow = self.processor._render_blurred_shadow("Shadow", font, (0, 0, 0, 255), 4)
+        self.assertIsNotNone(shadow)
+        shadow_img, _ = shadow
+        self.assertEqual(shadow_img.mode, 'RGBA')
+        # 阴影尺寸不超过字形尺寸加两侧的模糊范围
+        self.assertLessEqual(shadow_img.width, text_width + 2 * 12 + text_height)
+        self.assertLessEqual(shadow_img.height, text_height * 2 + 2 * 12)
+
+        again = self.processor._render_blurred_shadow("Shadow", font, (0, 0, 0, 255), 4)
+        self.assertIs(again, shadow)
+
+    def test_shadow_keeps_layer_drawable(self):
+        """测试模糊阴影合成到原局部层，后续绘制的文字不会丢失"""
+        self.config.config.text_watermark.shadow_blur = 4
+        image = Image.new('RGB', (400, 200), (128, 128, 128))
+
+        result = self.processor.add_text_watermark(image)
+
+        # 白色主文字必须可见（亮于背景），阴影使部分像素暗于背景
+        low, high = result.convert('L').getextrema()
+        self.assertGreater(high, 128)
+        self.assertLess(low, 128)
+
+    def test_shadow_clipped_to_layer(self):
+        """测试超出局部层的阴影被裁剪而不是报错"""
+        font = self.processor._get_font(32, text="Shadow")
+        layer = Image.new('RGBA', (20, 20), (0, 0, 0, 0))
+        self.processor._draw_shadow(layer, ImageDraw.Draw(layer), (-10, -10),
+                                    "Shadow", font, (0, 0, 0, 255), 8)
+        self.assertEqual(layer.size, (20, 20))
+
+
+if __name__ == '__main__':
+    unittest.main()